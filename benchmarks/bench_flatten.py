@@ -0,0 +1,300 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the flattening of bower.json at scale.
+
+Synthetic working sets of the specified sizes are generated, where the
+distributions are arranged into the specified number of layers (the
+depth of the dependency graph), with every distribution requiring a
+number of distributions from the layer below, and each providing a
+bower.json and the bower_components section of extras_calmjs.json.  A
+root distribution requires all the distributions in the top layer.
+
+Every phase is then executed for the root distribution in a fresh
+Python process for the specified number of repeats, with the wall time
+and CPU time (in seconds), the peak of the memory allocated by Python
+(through tracemalloc) and the peak resident set size (in KiB) of that
+process reported.  The phases are:
+
+flatten
+    Driver.flatten_dists_report, i.e. the semver aware merge
+flatten_calmjs
+    calmjs.dist.flatten_dist_egginfo_json, for comparison
+extras
+    calmjs.dist.flatten_extras_calmjs for the bower_components
+view
+    Driver.pkg_manager_view (includes resolving the distributions)
+init
+    Driver.pkg_manager_init into a temporary directory
+writer
+    the egg_info writer for bower.json, for every distribution
+
+With --zipped, the distributions are generated as zipped eggs instead,
+such that the reading of the metadata from those can be compared
+between calmjs (the flatten_calmjs and extras phases) and this package
+(the flatten and view phases).
+
+The results are written to stdout (or the output file) as JSON.
+
+Usage::
+
+    $ python benchmarks/bench_flatten.py [--sizes 10 100 1000 10000] \\
+        [--depths 1 4 16] [--phases flatten view ...] [--repeat N] \\
+        [--zipped] [--output results.json]
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT = 'bench-root'
+SIZES = (10, 100, 1000, 10000)
+DEPTHS = (1, 4, 16)
+PHASES = ('flatten', 'flatten_calmjs', 'extras', 'view', 'init', 'writer')
+PACKAGES = 200
+
+
+def dist_name(index):
+    return 'bench-dist-%05d' % index
+
+
+def write_dist(root, name, requires, bower_json, extras, zipped=False):
+    files = {
+        'PKG-INFO': 'Metadata-Version: 1.0\nName: %s\nVersion: 1.0\n' % name,
+        'requires.txt': '\n'.join(requires),
+    }
+    if bower_json is not None:
+        files['bower.json'] = json.dumps(bower_json)
+    if extras is not None:
+        files['extras_calmjs.json'] = json.dumps(extras)
+
+    if zipped:
+        path = os.path.join(root, '%s-1.0.egg' % name.replace('-', '_'))
+        with zipfile.ZipFile(path, 'w') as archive:
+            for filename, contents in sorted(files.items()):
+                archive.writestr('EGG-INFO/' + filename, contents)
+        return
+
+    egg_info = os.path.join(
+        root, '%s-1.0.egg-info' % name.replace('-', '_'))
+    os.mkdir(egg_info)
+    for filename, contents in files.items():
+        with open(os.path.join(egg_info, filename), 'w') as fd:
+            fd.write(contents)
+
+
+def generate(root, size, depth, seed=0, zipped=False):
+    """
+    Generate the working set of size distributions across depth layers
+    into root, as zipped eggs if zipped is True.
+    """
+
+    rng = random.Random(seed)
+    depth = max(1, min(depth, size))
+    layers = [[] for _ in range(depth)]
+    for index in range(size):
+        layers[index * depth // size].append(index)
+
+    for level, layer in enumerate(layers):
+        below = layers[level - 1] if level else []
+        for index in layer:
+            requires = [
+                dist_name(i)
+                for i in rng.sample(below, min(len(below), 3))
+            ]
+            packages = rng.sample(range(PACKAGES), 3)
+            bower_json = {
+                'dependencies': {
+                    'pkg%03d' % p: '~%d.%d.0' % (
+                        rng.randint(1, 3), rng.randint(0, 9))
+                    for p in packages
+                },
+            }
+            extras = {
+                'bower_components': {
+                    'pkg%03d' % p: 'pkg%03d/dist/pkg%03d.js' % (p, p)
+                    for p in packages
+                },
+            }
+            write_dist(
+                root, dist_name(index), requires, bower_json, extras, zipped)
+
+    write_dist(
+        root, ROOT, [dist_name(i) for i in layers[-1]],
+        {'name': ROOT, 'dependencies': {}}, None, zipped)
+
+
+def worker(phase, root, trace=False):
+    """
+    Execute the phase for the working set at root in this process, and
+    write the measurements as JSON to stdout.  If trace is True, the
+    memory allocations will be traced, which will slow down the phase.
+    """
+
+    import resource
+    import tracemalloc
+
+    from pkg_resources import WorkingSet
+    from calmjs import dist
+    from calmjs.bower import Driver
+    from calmjs.bower import write_bower_json
+
+    # zipped eggs are entries of the working set on their own.
+    dist.default_working_set = WorkingSet([root] + [
+        os.path.join(root, name) for name in sorted(os.listdir(root))
+        if name.endswith('.egg')
+    ])
+    driver = Driver(cache_dir='', interactive=False)
+    workdir = tempfile.mkdtemp()
+
+    if phase == 'writer':
+        from setuptools.dist import Distribution
+        distribution = Distribution({'name': ROOT})
+        cmd = distribution.get_command_obj('egg_info')
+        cmd.egg_info = workdir
+        targets = []
+        for item in dist.default_working_set:
+            distribution.bower_json = item.has_metadata(
+                'bower.json') and json.loads(item.get_metadata('bower.json'))
+            targets.append((
+                distribution.bower_json,
+                os.path.join(workdir, item.project_name + '.json')))
+
+    def run():
+        if phase == 'flatten':
+            driver.flatten_dists_report(
+                dist.find_packages_requirements_dists([ROOT]))
+        elif phase == 'flatten_calmjs':
+            dist.flatten_dist_egginfo_json(
+                dist.find_packages_requirements_dists([ROOT]),
+                filename='bower.json')
+        elif phase == 'extras':
+            dist.flatten_extras_calmjs([ROOT])
+        elif phase == 'view':
+            driver.pkg_manager_view(ROOT)
+        elif phase == 'init':
+            driver.working_dir = workdir
+            driver.pkg_manager_init(ROOT, overwrite=True)
+        elif phase == 'writer':
+            for value, target in targets:
+                distribution.bower_json = value
+                write_bower_json(cmd, 'bower_json', target)
+        else:
+            raise ValueError('unknown phase %r' % phase)
+
+    if trace:
+        tracemalloc.start()
+    cpu = time.process_time()
+    start = time.perf_counter()
+    try:
+        run()
+        wall = time.perf_counter() - start
+        cpu = time.process_time() - cpu
+        peak = tracemalloc.get_traced_memory()[1] if trace else None
+    finally:
+        if trace:
+            tracemalloc.stop()
+        shutil.rmtree(workdir)
+
+    maxrss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == 'darwin':
+        # reported in bytes rather than KiB.
+        maxrss //= 1024
+    json.dump({
+        'wall': wall,
+        'cpu': cpu,
+        'peak_traced': peak,
+        'peak_rss_kib': maxrss,
+    }, sys.stdout)
+
+
+def run_worker(phase, root, trace=False):
+    args = [sys.executable, __file__, '--worker', phase, root]
+    if trace:
+        args.append('--trace')
+    with open(os.devnull, 'w') as devnull:
+        # silence the logging and the outputs of distutils.
+        output = subprocess.check_output(args, stderr=devnull)
+    return json.loads(output.decode('utf8').splitlines()[-1])
+
+
+def measure(phase, root, repeat):
+    """
+    Run the phase for repeat times for the timings, then once more with
+    the memory allocations traced.
+    """
+
+    results = [run_worker(phase, root) for _ in range(repeat)]
+    traced = run_worker(phase, root, trace=True)
+    walls = sorted(r['wall'] for r in results)
+    return {
+        'wall': {
+            'min': walls[0],
+            'median': walls[len(walls) // 2],
+            'max': walls[-1],
+        },
+        'cpu': min(r['cpu'] for r in results),
+        'peak_traced': traced['peak_traced'],
+        'peak_rss_kib': max(
+            r['peak_rss_kib'] for r in results + [traced]),
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--sizes', type=int, nargs='+', default=SIZES)
+    parser.add_argument('--depths', type=int, nargs='+', default=DEPTHS)
+    parser.add_argument(
+        '--phases', nargs='+', choices=PHASES, default=PHASES)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--zipped', action='store_true')
+    parser.add_argument('--output', default=None)
+    parser.add_argument('--worker', nargs=2, help=argparse.SUPPRESS)
+    parser.add_argument('--trace', action='store_true', help=argparse.SUPPRESS)
+    opts = parser.parse_args(argv)
+
+    if opts.worker:
+        worker(*opts.worker, trace=opts.trace)
+        return
+
+    report = {
+        'python': sys.version.split()[0], 'zipped': opts.zipped,
+        'results': [],
+    }
+    for size in opts.sizes:
+        for depth in opts.depths:
+            if depth > size:
+                continue
+            root = tempfile.mkdtemp()
+            try:
+                generate(root, size, depth, zipped=opts.zipped)
+                for phase in opts.phases:
+                    result = {'size': size, 'depth': depth, 'phase': phase}
+                    result.update(measure(phase, root, opts.repeat))
+                    report['results'].append(result)
+                    print(
+                        'size=%d depth=%d phase=%s wall=%.4f' % (
+                            size, depth, phase, result['wall']['median']),
+                        file=sys.stderr,
+                    )
+            finally:
+                shutil.rmtree(root)
+
+    if opts.output:
+        with open(opts.output, 'w') as fd:
+            json.dump(report, fd, indent=4, sort_keys=True)
+    else:
+        json.dump(report, sys.stdout, indent=4, sort_keys=True)
+        print()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmark the startup costs associated with calmjs.bower.
+
+Each scenario is executed in a fresh Python process for the specified
+number of repeats, and the timings (in seconds) are written to stdout
+as JSON.  The ``eager`` scenario forces the construction of the default
+driver and runtime right after import, which is what was done at import
+time before these were made lazy, such that the saving can be read off
+by comparing it against the ``import`` scenario.  The ``main_version``
+scenario is the standalone entry point, which is to be compared against
+``calmjs_bower_version``.
+
+Usage::
+
+    $ python benchmarks/bench_import.py [--repeat N]
+"""
+
+from __future__ import print_function
+
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+SCENARIOS = (
+    ('baseline', [sys.executable, '-c', 'import setuptools']),
+    ('import', [
+        sys.executable, '-c', 'import setuptools; import calmjs.bower']),
+    ('eager', [sys.executable, '-c', (
+        'import setuptools; import calmjs.bower; '
+        'calmjs.bower.bower.runtime; calmjs.bower.bower.user_options'
+    )]),
+    ('calmjs_bower_version', [
+        sys.executable, '-c', 'from calmjs.runtime import main; main()',
+        'bower', '-V']),
+    ('main_version', [sys.executable, '-m', 'calmjs.bower', '-V']),
+)
+
+SETUP_PY = textwrap.dedent('''
+    from setuptools import setup
+    setup(name='bench_pkg', py_modules=[], bower_json={
+        'dependencies': {'jquery': '~3.1.0'}})
+''').lstrip()
+
+
+def timeit(args, repeat, cwd=None):
+    results = []
+    with open(os.devnull, 'w') as devnull:
+        for _ in range(repeat):
+            start = time.time()
+            subprocess.call(args, cwd=cwd, stdout=devnull, stderr=devnull)
+            results.append(time.time() - start)
+    results.sort()
+    return {
+        'min': results[0],
+        'median': results[len(results) // 2],
+        'max': results[-1],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument('--repeat', type=int, default=10)
+    opts = parser.parse_args(argv)
+
+    report = {'python': sys.version.split()[0], 'scenarios': {}}
+    for name, args in SCENARIOS:
+        report['scenarios'][name] = timeit(args, opts.repeat)
+
+    tmpdir = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(tmpdir, 'setup.py'), 'w') as fd:
+            fd.write(SETUP_PY)
+        report['scenarios']['egg_info'] = timeit(
+            [sys.executable, 'setup.py', '-q', 'egg_info'], opts.repeat,
+            cwd=tmpdir)
+    finally:
+        shutil.rmtree(tmpdir)
+
+    scenarios = report['scenarios']
+    report['lazy_saving'] = (
+        scenarios['eager']['median'] - scenarios['import']['median'])
+    json.dump(report, sys.stdout, indent=4, sort_keys=True)
+    print()
+
+
+if __name__ == '__main__':
+    main()
@@ -52,6 +52,10 @@ setup(
         'calmjs.extras_keys': [
             'bower_components = enabled',
         ],
+        'console_scripts': [
+            'calmjs-bower = calmjs.bower.main:main',
+            'calmjs-bower-batch = calmjs.bower.batch:run',
+        ],
         'calmjs.runtime': [
             'bower = calmjs.bower:bower.runtime',
         ],
@@ -63,6 +67,7 @@ setup(
         ],
         'egg_info.writers': [
             'bower.json = calmjs.bower:write_bower_json',
+            'bower_digest.txt = calmjs.bower:write_bower_digest',
         ],
     },
     test_suite="calmjs.bower.tests.make_suite",
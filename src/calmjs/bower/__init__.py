@@ -6,40 +6,62 @@ Provides some helper functions that deal with bower.json, and also the
 setuptools integration for certain bower features.
 """
 
-from functools import partial
-
-from calmjs.cli import PackageManagerDriver
-from calmjs.command import PackageManagerCommand
-from calmjs.dist import write_json_file
-from calmjs.runtime import PackageManagerRuntime
+import sys
 
 BOWER_FIELD = 'bower_json'
 BOWER_JSON = bower_json = 'bower.json'
 BOWER = 'bower'
-write_bower_json = partial(write_json_file, BOWER_FIELD)
+BOWERRC = '.bowerrc'
+BOWER_COMPONENTS = 'bower_components'
+INSTALL_STAMP = '.calmjs-bower-stamp.json'
+DESCRIPTION = 'bower compatibility helper'
+# the names provided by calmjs.bower.driver, which is only imported as
+# any of these are accessed, as that imports the complete setuptools
+# integration of calmjs along with pkg_resources.
+DRIVER_EXPORTS = (
+    'Driver',
+    'bower',
+    'get_bower_version',
+    'bower_view',
+    'bower_init',
+    'bower_install',
+    'bower_lock',
+    'bower_export',
+    'bower_verify',
+    'bower_why',
+    'bower_mirror',
+)
 
 
-class Driver(PackageManagerDriver):
+def write_bower_json(cmd, basename, filename):
+    """
+    The egg_info writer for bower.json; please refer to the function
+    calmjs.bower.writers.write_bower_json.
+    """
 
-    def __init__(self, **kw):
-        kw['pkg_manager_bin'] = BOWER
-        kw['pkgdef_filename'] = BOWER_JSON
-        kw['description'] = "bower compatibility helper"
-        super(Driver, self).__init__(**kw)
+    from calmjs.bower import writers
+    return writers.write_bower_json(cmd, basename, filename)
 
 
-class bower(PackageManagerCommand):
+def write_bower_digest(cmd, basename, filename):
     """
-    The bower specific setuptools command.
+    The egg_info writer for bower_digest.txt; please refer to the
+    function calmjs.bower.writers.write_bower_digest.
     """
 
-    # modules globals will be populated with friendly exported names.
-    cli_driver = Driver.create_for_module_vars(globals())
-    runtime = PackageManagerRuntime(
-        cli_driver, package_name='calmjs.bower',
-        description='bower support for the calmjs framework',
-    )
-    description = cli_driver.description
+    from calmjs.bower import writers
+    return writers.write_bower_digest(cmd, basename, filename)
+
+
+def __getattr__(name):
+    if name not in DRIVER_EXPORTS:
+        raise AttributeError(
+            'module %r has no attribute %r' % (__name__, name))
+    from calmjs.bower import driver
+    return getattr(driver, name)
 
 
-bower._initialize_user_options()
+if sys.version_info < (3, 7):  # pragma: no cover
+    # module level __getattr__ is unsupported, so import them up front.
+    from calmjs.bower import driver
+    globals().update((name, getattr(driver, name)) for name in DRIVER_EXPORTS)
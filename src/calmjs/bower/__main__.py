@@ -1,6 +1,4 @@
-from calmjs import bower
+from calmjs.bower.main import main
 
 if __name__ == '__main__':
-    # XXX workaround the nonsensical default prog assignment.
-    bower.bower.runtime.argparser.prog = 'bower'
-    bower.bower.runtime()
+    main()
@@ -0,0 +1,219 @@
+# -*- coding: utf-8 -*-
+"""
+The asyncio counterparts of the view, init and install actions.
+
+These are intended for the services that run many builds concurrently
+within a single event loop.  The invocation of bower is done through an
+asyncio subprocess, which is killed should the coroutine be cancelled,
+while the resolution of the distributions and the reading and writing
+of the files (for which asyncio has no native support) are done in the
+default executor of the loop.
+
+The installations natively from a package store, into a shared store,
+and the frozen or delta installations are the exception, as these are
+done by Driver.pkg_manager_install as a whole within the executor; a
+thread cannot be interrupted, so cancelling the coroutine will not stop
+such an installation (nor any bower process started by it), which will
+run to completion in the background.
+
+This module requires Python 3.7 or later; the Driver methods with the
+``_async`` suffix should be used instead of importing it directly.
+"""
+
+import asyncio
+import logging
+from functools import partial
+
+from calmjs.bower.events import CHUNK_SIZE
+from calmjs.bower.events import ERROR
+from calmjs.bower.events import JsonStreamDecoder
+from calmjs.bower.events import PackageTimings
+from calmjs.bower.events import log_event
+from calmjs.bower.timings import timer
+
+logger = logging.getLogger(__name__)
+
+
+def _executor(f, *a, **kw):
+    loop = asyncio.get_running_loop()
+    return loop.run_in_executor(None, partial(f, *a, **kw))
+
+
+def _release_lock(future):
+    if not future.cancelled() and future.exception() is None:
+        lock = future.result()
+        if lock is not None:
+            lock.release()
+
+
+async def _acquire_cache_lock(driver):
+    """
+    Acquire the cache lock of the driver within the executor, as that
+    blocks until it is.  Should this be cancelled while waiting, the
+    lock will be released once the executor has acquired it.
+    """
+
+    future = _executor(driver._acquire_cache_lock)
+    try:
+        return await asyncio.shield(future)
+    except asyncio.CancelledError:
+        future.add_done_callback(_release_lock)
+        raise
+
+
+async def view(driver, package_names, stream=None, explicit=False, **kw):
+    """
+    The asyncio counterpart of Driver.pkg_manager_view.
+    """
+
+    return await _executor(
+        driver.pkg_manager_view, package_names, stream=stream,
+        explicit=explicit, **kw)
+
+
+async def init(driver, package_names, **kw):
+    """
+    The asyncio counterpart of Driver.pkg_manager_init.  As there is no
+    terminal to prompt from, interactive mode is not available.
+    """
+
+    kw['interactive'] = False
+    return await _executor(driver.pkg_manager_init, package_names, **kw)
+
+
+async def _read_events(proc, events, fail_fast):
+    """
+    Decode the log entries from the stderr of the process, passing them
+    to events.  Returns the first error, if any.
+    """
+
+    decoder = JsonStreamDecoder()
+    start = timer()
+    error = None
+    while True:
+        chunk = await proc.stderr.read(CHUNK_SIZE)
+        if not chunk:
+            break
+        for event in decoder.feed(chunk.decode('utf8', 'replace')):
+            event['elapsed'] = round(timer() - start, 6)
+            if event.get('level') == ERROR and error is None:
+                error = event
+            events(event)
+            if error is not None and fail_fast:
+                return error
+    return error
+
+
+async def run_install(cmd, events=None, fail_fast=True, **call_kw):
+    """
+    Run the install command as an asyncio subprocess, passing the log
+    entries decoded from its stderr to events if provided (in which
+    case the command should have the --json flag).  The process is
+    killed if this is cancelled, or at the first error if fail_fast is
+    set.  Returns the returncode.
+    """
+
+    proc = await asyncio.create_subprocess_exec(
+        *cmd, stderr=asyncio.subprocess.PIPE if events else None, **call_kw)
+    try:
+        if events is not None:
+            error = await _read_events(proc, events, fail_fast)
+            if error is not None:
+                return (await _kill(proc)) or 1
+        return await proc.wait()
+    finally:
+        if proc.returncode is None:
+            logger.debug("killing '%s' (pid %s)", cmd[0], proc.pid)
+            await _kill(proc)
+
+
+async def _kill(proc):
+    if proc.returncode is None:
+        try:
+            proc.kill()
+        except ProcessLookupError:  # pragma: no cover
+            pass
+    return await proc.wait()
+
+
+async def install(
+        driver, package_names=None, args=(), env={}, incremental=False,
+        package_store=None, shared_store=None, frozen=False, delta=False,
+        record=False, events=None, progress=False, **kw):
+    """
+    The asyncio counterpart of Driver.pkg_manager_install, with the
+    installation done through an asyncio subprocess of bower.
+
+    The installations natively from a package store, into a shared
+    store, or the frozen and delta installations are done by
+    pkg_manager_install within the default executor instead, such that
+    events (if provided) will be invoked from the thread of that, and
+    cancellation will not stop the installation, which continues in
+    that thread until done.
+    """
+
+    package_store = package_store or driver.package_store
+    shared_store = shared_store or driver.shared_store
+    if frozen or delta or package_store or shared_store:
+        kw['interactive'] = False
+        return await _executor(
+            driver.pkg_manager_install, package_names, args=args, env=env,
+            incremental=incremental, package_store=package_store,
+            shared_store=shared_store, frozen=frozen, delta=delta,
+            record=record, events=events, progress=progress, **kw)
+
+    if package_names:
+        result = await init(driver, package_names, **kw)
+        if not result:
+            logger.warning(
+                "not continuing with '%s %s' as the generation of "
+                "'%s' failed", driver.pkg_manager_bin, driver.install_cmd,
+                driver.pkgdef_filename
+            )
+            return False
+
+    if incremental:
+        if await _executor(driver.is_install_unchanged, args):
+            logger.info(
+                "'%s' unchanged since the last installation; skipping",
+                driver.pkgdef_filename,
+            )
+            return True
+
+    if progress and events is None:
+        events = log_event
+
+    call_kw = driver._gen_call_kws(**env)
+    cmd = [driver._get_exec_binary(call_kw), driver.install_cmd]
+    cmd.extend(args)
+    cmd.extend(driver._registry_args())
+    package_timings = PackageTimings()
+
+    def callback(event):
+        package_timings(event)
+        events(event)
+
+    if events is not None:
+        cmd.append('--json')
+
+    with driver.span('subprocess', cmd=cmd) as span:
+        lock = await _acquire_cache_lock(driver)
+        try:
+            rc = await run_install(
+                cmd, events=callback if events is not None else None,
+                **call_kw)
+        finally:
+            if lock is not None:
+                lock.release()
+        span['returncode'] = rc
+        if events is not None:
+            span['packages'] = package_timings.durations()
+
+    if rc:
+        logger.error(
+            "'%s %s' exited with return code %s",
+            driver.pkg_manager_bin, driver.install_cmd, rc,
+        )
+        return False
+    return await _executor(
+        driver._finalize_install, args, incremental, None, record=record)
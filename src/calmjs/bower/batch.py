@@ -0,0 +1,377 @@
+# -*- coding: utf-8 -*-
+"""
+Generation of bower.json for multiple projects in a single batch.
+
+A manifest lists the projects, each being a target directory with the
+names of the Python packages to generate the bower.json for, e.g.::
+
+    [
+        {"working_dir": "app1", "package_names": ["example.app1"]},
+        {"working_dir": "app2", "package_names": ["example.app2"],
+         "explicit": true}
+    ]
+
+Relative directories are resolved against the location of the
+manifest.  All the projects are resolved against a single index of the
+distributions and the metadata within, such that the working set is
+only scanned once, and the installations may be done concurrently by
+a pool of threads or processes.  Concurrent installations coordinate
+through file locks: every invocation of bower holds the host wide locks
+for the packages declared by the project until it exits, which
+serializes the projects that declare any package in common (their
+transitive dependencies are not locked), while the packages added to
+a shared store are locked per package@version, such that different
+packages are added in parallel but every package@version only once.
+Usage::
+
+    $ calmjs-bower-batch manifest.json
+    $ calmjs-bower-batch --install --jobs 4 manifest.json
+    $ calmjs-bower-batch --install --jobs 8 --processes \\
+        --package-store ~/bower-store --shared-store ~/.bower-shared \\
+        manifest.json
+
+The same is available as ``python -m calmjs.bower.batch``.
+"""
+
+from __future__ import absolute_import
+
+import argparse
+import json
+import logging
+import os
+import sys
+import threading
+from multiprocessing import Pool
+from multiprocessing.pool import ThreadPool
+from os.path import dirname
+from os.path import expanduser
+from os.path import isdir
+from os.path import join
+
+import calmjs.dist
+
+from calmjs.bower.locks import get_cache_lock
+from calmjs.bower.zipped import read_dist_egginfo_json
+
+logger = logging.getLogger(__name__)
+
+
+class MetadataIndex(object):
+    """
+    An index of the distributions within a working set and the metadata
+    within those, shared between the drivers for multiple projects.
+
+    The resolved lists of distributions and the metadata read are kept
+    for the lifetime of the index, so it should only be used while the
+    working set is not being modified.
+    """
+
+    def __init__(self, working_set=None):
+        """
+        Arguments:
+
+        working_set
+            The working set to resolve the distributions from; defaults
+            to the one used by calmjs.dist.
+        """
+
+        self.working_set = working_set
+        self._dists = {}
+        self._metadata = {}
+        # the working set and the distributions within are not safe to
+        # be used from multiple threads.
+        self._lock = threading.Lock()
+
+    def find_dists(self, pkg_names, explicit=False):
+        """
+        Return the list of distributions for the package names, with
+        their requirements resolved unless explicit is set.
+        """
+
+        key = (bool(explicit), tuple(pkg_names))
+        with self._lock:
+            if key not in self._dists:
+                to_dists = (
+                    calmjs.dist.pkg_names_to_dists if explicit else
+                    calmjs.dist.find_packages_requirements_dists
+                )
+                self._dists[key] = to_dists(
+                    pkg_names, working_set=self.working_set)
+            return list(self._dists[key])
+
+    def read(self, dist, filename):
+        """
+        Return the json file within the metadata of the distribution,
+        or None if unavailable.
+        """
+
+        key = (dist.location, dist.project_name, dist.version, filename)
+        with self._lock:
+            if key not in self._metadata:
+                self._metadata[key] = read_dist_egginfo_json(dist, filename)
+            return self._metadata[key]
+
+    def __getstate__(self):
+        # the lock cannot be pickled for the worker processes.
+        state = dict(self.__dict__)
+        del state['_lock']
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+
+def read_manifest(path):
+    """
+    Read the list of projects from the manifest at path.  Returns a list
+    of dicts with the working_dir, package_names and explicit keys.
+
+    Raises ValueError for a malformed manifest.
+    """
+
+    with open(path) as fd:
+        raw = json.load(fd)
+
+    if not isinstance(raw, list):
+        raise ValueError("manifest '%s' must be a list of projects" % path)
+
+    base = dirname(os.path.abspath(path))
+    projects = []
+    for idx, item in enumerate(raw):
+        if not (isinstance(item, dict) and item.get('working_dir') and
+                isinstance(item.get('package_names'), list)):
+            raise ValueError(
+                "project %d in manifest '%s' must provide the working_dir "
+                "and the list of package_names" % (idx, path))
+        projects.append({
+            'working_dir': join(base, expanduser(item['working_dir'])),
+            'package_names': item['package_names'],
+            'explicit': bool(item.get('explicit')),
+        })
+    return projects
+
+
+# the index shared with the worker processes, as assigned by the
+# initializer of the pool within every one of them.
+_worker_index = None
+
+
+def _init_worker(index):
+    global _worker_index
+    _worker_index = index
+
+
+def _install_worker(payload):
+    driver_cls, driver_kw, project, kw = payload
+    runner = BatchRunner(
+        index=_worker_index, driver_cls=driver_cls, **driver_kw)
+    return runner._run(project, 'pkg_manager_install', kw)
+
+
+class BatchRunner(object):
+    """
+    Generates the bower.json for, and installs, multiple projects with
+    a shared MetadataIndex.
+    """
+
+    def __init__(
+            self, index=None, jobs=None, driver_cls=None, processes=False,
+            **driver_kw):
+        """
+        Arguments:
+
+        index
+            The MetadataIndex to use; a new one is created if not
+            provided.
+        jobs
+            The number of projects to install concurrently; defaults to
+            one at a time.
+        driver_cls
+            The class of the driver to create for every project; defaults
+            to calmjs.bower.Driver.
+        processes
+            If True, the concurrent installations are done by a pool of
+            processes rather than threads.
+
+        Other keyword arguments are passed to the driver_cls.
+        """
+
+        if driver_cls is None:
+            from calmjs.bower import Driver as driver_cls
+        self.index = index or MetadataIndex()
+        self.jobs = jobs or 1
+        self.driver_cls = driver_cls
+        self.processes = processes
+        self.driver_kw = driver_kw
+
+    def make_driver(self, project):
+        """
+        Return the driver for the project.
+        """
+
+        kw = dict(self.driver_kw)
+        kw.setdefault('interactive', False)
+        return self.driver_cls(
+            working_dir=project['working_dir'], index=self.index, **kw)
+
+    def _run(self, project, method, kw):
+        working_dir = project['working_dir']
+        try:
+            if not isdir(working_dir):
+                os.makedirs(working_dir)
+            driver = self.make_driver(project)
+            result = getattr(driver, method)(
+                project['package_names'], explicit=project['explicit'],
+                **kw)
+        except Exception as e:
+            logger.error(
+                "'%s' failed for '%s': %s", method, working_dir, e)
+            result = False
+        return dict(project, ok=bool(result))
+
+    def init(self, projects, overwrite=False, merge=False):
+        """
+        Generate and write the bower.json for every project.  Returns a
+        list of the projects, each with the outcome under the ok key.
+        """
+
+        kw = {'overwrite': overwrite, 'merge': merge}
+        return [
+            self._run(project, 'pkg_manager_init', kw)
+            for project in projects
+        ]
+
+    def install(self, projects, overwrite=False, merge=False, **kw):
+        """
+        Generate the bower.json for, and install, every project, with
+        up to jobs number of projects installed concurrently.  Returns a
+        list of the projects, each with the outcome under the ok key.
+
+        For concurrent installations, the invocations of bower are done
+        while holding the host wide locks for the packages declared by
+        the project, unless another cache_lock was provided for the
+        drivers; please refer to the module calmjs.bower.locks.
+
+        Other keyword arguments are passed to pkg_manager_install.
+        """
+
+        kw.update(overwrite=overwrite, merge=merge)
+        jobs = min(self.jobs, len(projects))
+        if jobs < 2:
+            return [
+                self._run(project, 'pkg_manager_install', kw)
+                for project in projects
+            ]
+
+        self.driver_kw.setdefault('cache_lock', get_cache_lock())
+        if self.processes:
+            return self._install_processes(projects, jobs, kw)
+
+        pool = ThreadPool(jobs)
+        try:
+            return pool.map(
+                lambda project: self._run(project, 'pkg_manager_install', kw),
+                projects,
+            )
+        finally:
+            pool.close()
+            pool.join()
+
+    def _install_processes(self, projects, jobs, kw):
+        # resolve everything before the workers are started, such that
+        # they do not have to repeat that.
+        filename = self.make_driver(projects[0]).pkgdef_filename
+        for project in projects:
+            try:
+                for dist in self.index.find_dists(
+                        project['package_names'], project['explicit']):
+                    self.index.read(dist, filename)
+            except Exception:
+                # the worker will report on this.
+                pass
+
+        pool = Pool(jobs, initializer=_init_worker, initargs=(self.index,))
+        try:
+            return pool.map(_install_worker, [
+                (self.driver_cls, self.driver_kw, project, kw)
+                for project in projects
+            ])
+        finally:
+            pool.close()
+            pool.join()
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        prog='calmjs-bower-batch',
+        description='generate bower.json for multiple projects',
+    )
+    parser.add_argument(
+        '--install', action='store_true',
+        help='also run the installation for every project')
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=1,
+        help='number of projects to install concurrently')
+    parser.add_argument(
+        '-P', '--processes', action='store_true',
+        help='install with a pool of processes rather than threads')
+    parser.add_argument(
+        '--package-store', metavar='DIR', default=None,
+        help='install natively from the local package store at DIR')
+    parser.add_argument(
+        '--shared-store', metavar='DIR', default=None,
+        help='keep the installed packages in the shared store at DIR')
+    parser.add_argument(
+        '-w', '--overwrite', action='store_true',
+        help='overwrite any existing bower.json')
+    parser.add_argument(
+        '-m', '--merge', action='store_true',
+        help='merge with any existing bower.json')
+    parser.add_argument(
+        '--incremental', action='store_true',
+        help='skip the installation for unchanged projects')
+    parser.add_argument('manifest', help='path to the manifest')
+    return parser
+
+
+def main(args=None, stdout=None):
+    stdout = stdout or sys.stdout
+    opts = make_argparser().parse_args(args)
+
+    try:
+        projects = read_manifest(opts.manifest)
+    except (IOError, OSError, ValueError) as e:
+        logger.error("unable to read manifest: %s", e)
+        return 2
+
+    runner = BatchRunner(
+        jobs=opts.jobs, processes=opts.processes,
+        package_store=opts.package_store, shared_store=opts.shared_store,
+    )
+    if opts.install:
+        results = runner.install(
+            projects, overwrite=opts.overwrite, merge=opts.merge,
+            incremental=opts.incremental,
+        )
+    else:
+        results = runner.init(
+            projects, overwrite=opts.overwrite, merge=opts.merge)
+
+    for result in results:
+        stdout.write('%s %s\n' % (
+            'ok' if result['ok'] else 'failed', result['working_dir']))
+    return 0 if all(result['ok'] for result in results) else 1
+
+
+def run(args=None):
+    """
+    The entry point for the calmjs-bower-batch console script.
+    """
+
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main(args))
+
+
+if __name__ == '__main__':  # pragma: no cover
+    run()
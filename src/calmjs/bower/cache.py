@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Persistent caching for calmjs.bower.
+
+Provides a small file based cache for JSON serializable values, which
+is used for keeping the results of expensive operations (such as the
+flattening of bower.json across the working set) across invocations of
+the different processes that make use of this package.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import hashlib
+import json
+import logging
+import os
+from os.path import exists
+from os.path import isdir
+from os.path import join
+from tempfile import mkstemp
+
+logger = logging.getLogger(__name__)
+
+CACHE_DIR_ENV = 'CALMJS_BOWER_CACHE_DIR'
+REGISTRY_CACHE_ENV = 'CALMJS_BOWER_REGISTRY_CACHE'
+STORE_ENV = 'CALMJS_BOWER_STORE'
+SHARED_STORE_ENV = 'CALMJS_BOWER_SHARED_STORE'
+DEFAULT_MAX_ENTRIES = 256
+CACHE_SUFFIX = '.json'
+
+
+def get_cache_dir():
+    """
+    Return the cache directory as specified by the environment, or None
+    if caching has not been enabled.
+    """
+
+    return os.environ.get(CACHE_DIR_ENV) or None
+
+
+def get_registry_cache():
+    """
+    Return the directory for the caching registry proxy as specified by
+    the environment, or None if it has not been enabled.
+    """
+
+    return os.environ.get(REGISTRY_CACHE_ENV) or None
+
+
+def get_package_store():
+    """
+    Return the package store as specified by the environment, or None.
+    """
+
+    return os.environ.get(STORE_ENV) or None
+
+
+def get_shared_store():
+    """
+    Return the shared store as specified by the environment, or None.
+    """
+
+    return os.environ.get(SHARED_STORE_ENV) or None
+
+
+def digest_key(*parts):
+    """
+    Produce a stable hexdigest from the JSON serializable parts.
+    """
+
+    raw = json.dumps(parts, sort_keys=True, separators=(',', ':'))
+    return hashlib.sha256(raw.encode('utf8')).hexdigest()
+
+
+def stat_key(path):
+    """
+    Return the identity of the file at path as a list of its path, its
+    modification time and its size.  Returns None if the path cannot be
+    stat'ed.
+    """
+
+    try:
+        st = os.stat(path)
+    except (IOError, OSError):
+        return None
+    return [path, repr(st.st_mtime), st.st_size]
+
+
+def dist_metadata_stat_key(dist, filename):
+    """
+    Return the identity of the metadata file of the given distribution.
+
+    If the distribution does not provide the file, the identity of the
+    egg-info directory is used instead so that the addition of the file
+    will also change the identity.  For distributions that are zipped,
+    the archive is used.  Returns None if the location cannot be
+    determined.
+    """
+
+    provider = getattr(dist, '_provider', None)
+    egg_info = getattr(provider, 'egg_info', None)
+    if not egg_info:
+        return None
+
+    if isdir(egg_info):
+        target = join(egg_info, filename)
+        if not exists(target):
+            target = egg_info
+    else:
+        target = getattr(getattr(provider, 'loader', None), 'archive', None)
+        if not target:
+            return None
+
+    result = stat_key(target)
+    if result is None:
+        return None
+    return [dist.project_name, dist.version] + result
+
+
+class JsonCache(object):
+    """
+    A directory of JSON files keyed by their filename, with eviction of
+    the least recently used entries once the number of entries exceed
+    the defined maximum.
+    """
+
+    def __init__(self, root, max_entries=DEFAULT_MAX_ENTRIES):
+        """
+        Arguments:
+
+        root
+            The directory where the cache entries will be stored.  Will
+            be created on demand.
+        max_entries
+            The maximum number of entries to retain.  Defaults to 256.
+        """
+
+        self.root = root
+        self.max_entries = max_entries
+
+    def _path(self, key):
+        return join(self.root, key + CACHE_SUFFIX)
+
+    def get(self, key, default=None):
+        """
+        Return the value stored for key, or the default.
+        """
+
+        path = self._path(key)
+        try:
+            with open(path) as fd:
+                value = json.load(fd)
+        except (IOError, OSError):
+            return default
+        except ValueError:
+            logger.warning("removing corrupted cache entry '%s'", path)
+            self._remove(path)
+            return default
+
+        try:
+            # mark this as the most recently used.
+            os.utime(path, None)
+        except (IOError, OSError):
+            pass
+        return value
+
+    def set(self, key, value):
+        """
+        Store the value for key, and evict the older entries as needed.
+        """
+
+        try:
+            os.makedirs(self.root)
+        except (IOError, OSError) as e:
+            if e.errno != errno.EEXIST:
+                logger.warning(
+                    "unable to create cache directory '%s': %s", self.root, e)
+                return
+
+        fd, tmp = mkstemp(suffix='.tmp', dir=self.root)
+        try:
+            with os.fdopen(fd, 'w') as stream:
+                json.dump(value, stream, sort_keys=True)
+            replace(tmp, self._path(key))
+        except (IOError, OSError) as e:
+            logger.warning("unable to write cache entry '%s': %s", key, e)
+            self._remove(tmp)
+            return
+
+        self.evict()
+
+    def entries(self):
+        """
+        Return a list of (mtime, path) for all entries in this cache,
+        sorted from the least recently used.
+        """
+
+        results = []
+        try:
+            names = os.listdir(self.root)
+        except (IOError, OSError):
+            return results
+
+        for name in names:
+            if not name.endswith(CACHE_SUFFIX):
+                continue
+            path = join(self.root, name)
+            try:
+                results.append((os.stat(path).st_mtime, path))
+            except (IOError, OSError):
+                continue
+        results.sort()
+        return results
+
+    def evict(self):
+        """
+        Remove the least recently used entries in excess of the maximum.
+        """
+
+        entries = self.entries()
+        excess = len(entries) - self.max_entries
+        for mtime, path in entries[:max(excess, 0)]:
+            logger.debug("evicting cache entry '%s'", path)
+            self._remove(path)
+
+    def clear(self):
+        for mtime, path in self.entries():
+            self._remove(path)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+        except (IOError, OSError):
+            pass
+
+
+def replace(src, dst):
+    """
+    Atomically move src to dst where possible.
+    """
+
+    if hasattr(os, 'replace'):
+        os.replace(src, dst)
+        return
+
+    try:  # pragma: no cover
+        os.rename(src, dst)
+    except OSError:  # pragma: no cover
+        # win32 under Python 2.7 will not rename over an existing file.
+        os.remove(dst)
+        os.rename(src, dst)
@@ -0,0 +1,198 @@
+# -*- coding: utf-8 -*-
+"""
+The client for the daemon serving the generation of bower.json.
+
+Only the standard library is imported by this module, such that sending
+a request to a running daemon does not incur the costs that the daemon
+is meant to avoid; the rest of calmjs is only imported should the
+request be served in-process, when the daemon is unavailable.  Usage::
+
+    $ python -m calmjs.bower.daemon serve &
+    $ python -m calmjs.bower.client view example.package
+"""
+
+from __future__ import absolute_import
+
+import argparse
+import errno
+import json
+import os
+import socket
+import stat
+import sys
+import tempfile
+from os.path import exists
+from os.path import join
+
+SOCKET_ENV = 'CALMJS_BOWER_DAEMON_SOCKET'
+ACTIONS = ('view', 'flatten', 'init')
+DEFAULT_TIMEOUT = 60
+
+
+class DaemonError(Exception):
+    """
+    Raised when the daemon cannot be reached.
+    """
+
+
+def check_private_dir(path):
+    """
+    Raise DaemonError unless the directory at path is owned by the
+    current user and inaccessible to everyone else, such that no other
+    user may have placed or replaced the socket within.
+    """
+
+    getuid = getattr(os, 'getuid', None)
+    if getuid is None:  # pragma: no cover
+        return
+    st = os.lstat(path)
+    if not stat.S_ISDIR(st.st_mode) or st.st_uid != getuid() or (
+            st.st_mode & 0o077):
+        raise DaemonError(
+            "'%s' must be a directory owned by the current user and "
+            "inaccessible to others" % path)
+
+
+def get_socket_path(create=False):
+    """
+    Return the path to the socket of the daemon, as specified by the
+    environment, or the default location within $XDG_RUNTIME_DIR, or
+    else within a directory private to the current user under the
+    temporary directory, which is created if create is True.
+
+    Raises DaemonError if the directory for the default location is
+    accessible to other users.
+    """
+
+    path = os.environ.get(SOCKET_ENV)
+    if path:
+        return path
+
+    root = os.environ.get('XDG_RUNTIME_DIR')
+    if not root:
+        root = join(tempfile.gettempdir(), 'calmjs.bower-%s' % (
+            getattr(os, 'getuid', lambda: 'user')()))
+        if create:
+            try:
+                os.mkdir(root, 0o700)
+            except OSError as e:
+                if e.errno != errno.EEXIST:
+                    raise
+    if exists(root) or create:
+        check_private_dir(root)
+    return join(root, 'calmjs.bower-daemon.sock')
+
+
+def request(socket_path, payload, timeout=DEFAULT_TIMEOUT):
+    """
+    Send the payload to the daemon at socket_path, and return the
+    response.  Raises DaemonError if the daemon cannot be reached.
+    """
+
+    if not hasattr(socket, 'AF_UNIX'):
+        raise DaemonError('unix domain sockets are unavailable')
+    sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    sock.settimeout(timeout)
+    try:
+        try:
+            sock.connect(socket_path)
+        except (IOError, OSError) as e:
+            raise DaemonError(
+                "unable to connect to '%s': %s" % (socket_path, e))
+        sock.sendall(json.dumps(payload).encode('utf8') + b'\n')
+        chunks = []
+        while True:
+            chunk = sock.recv(65536)
+            if not chunk:
+                break
+            chunks.append(chunk)
+    finally:
+        sock.close()
+
+    try:
+        return json.loads(b''.join(chunks).decode('utf8'))
+    except ValueError:
+        raise DaemonError("malformed response from '%s'" % socket_path)
+
+
+def is_running(socket_path):
+    try:
+        return request(socket_path, {'action': 'ping'}, timeout=5)['ok']
+    except (DaemonError, IOError, OSError, KeyError):
+        return False
+
+
+def make_argparser():
+    parser = argparse.ArgumentParser(
+        prog='python -m calmjs.bower.client',
+        description='daemon for serving the generation of bower.json',
+    )
+    parser.add_argument(
+        '--socket', default=None,
+        help='path to the socket; defaults to the %s environment variable '
+             'or a location in a directory private to the current user' % (
+                 SOCKET_ENV))
+    commands = parser.add_subparsers(dest='command')
+    commands.add_parser('serve', help='run the daemon')
+    commands.add_parser('stop', help='stop a running daemon')
+    commands.add_parser('ping', help='check whether the daemon is running')
+    for action in ACTIONS:
+        sub = commands.add_parser(action, help='%s bower.json' % action)
+        sub.add_argument('-E', '--explicit', action='store_true')
+        if action == 'init':
+            sub.add_argument('-w', '--overwrite', action='store_true')
+            sub.add_argument('-m', '--merge', action='store_true')
+        sub.add_argument('package_names', nargs='+')
+    return parser
+
+
+def main(args=None, stdout=None, stderr=None):
+    stdout = stdout or sys.stdout
+    stderr = stderr or sys.stderr
+    parser = make_argparser()
+    opts = parser.parse_args(args)
+
+    if opts.command == 'serve':
+        import logging
+        from calmjs.bower.daemon import serve
+        logging.basicConfig(level=logging.INFO)
+        serve(opts.socket)
+        return 0
+    if opts.command is None:
+        parser.print_usage(stderr)
+        return 2
+
+    payload = {k: v for k, v in vars(opts).items() if k not in (
+        'socket', 'command')}
+    payload['action'] = opts.command
+    if opts.command == 'init':
+        payload['working_dir'] = os.getcwd()
+
+    try:
+        response = request(opts.socket or get_socket_path(), payload)
+    except DaemonError as e:
+        if opts.command in ('stop', 'ping'):
+            stderr.write('%s\n' % e)
+            return 1
+        # serve the request in this process instead.
+        from calmjs.bower.daemon import BowerDaemon
+        response = BowerDaemon().handle(payload)
+
+    for level, message in response.get('log', []):
+        stderr.write('%s %s\n' % (level, message))
+    if not response['ok']:
+        stderr.write('%s\n' % response['error'])
+        return 1
+    if opts.command == 'init':
+        return 0 if response['result'] else 1
+    if opts.command != 'stop':
+        json.dump(
+            response['result'], stdout, indent=4, sort_keys=True,
+            separators=(',', ': '),
+        )
+        stdout.write('\n')
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,274 @@
+# -*- coding: utf-8 -*-
+"""
+A long running daemon for serving the generation of bower.json.
+
+The daemon keeps a Driver and the working set of the Python environment
+in memory, such that requests to view, flatten or init are served
+without the costs of the Python startup, the scan of entry points and
+the construction of the working set.  The working set is rebuilt when
+the locations on ``sys.path`` or the metadata of the distributions
+within are modified, i.e. when distributions are installed, removed or
+regenerated.
+
+Requests and responses are exchanged as a single line of JSON each over
+a Unix domain socket.  Usage::
+
+    $ python -m calmjs.bower.daemon serve &
+    $ python -m calmjs.bower.client view example.package
+
+The client, which only imports the standard library, will run the
+request in-process should the daemon not be available.
+"""
+
+from __future__ import absolute_import
+
+import json
+import logging
+import os
+import sys
+from os.path import exists
+
+try:  # pragma: no cover
+    import socketserver
+except ImportError:  # pragma: no cover
+    import SocketServer as socketserver
+
+from calmjs.bower.client import ACTIONS
+from calmjs.bower.client import DaemonError
+from calmjs.bower.client import get_socket_path
+from calmjs.bower.client import is_running
+from calmjs.bower.client import main
+
+logger = logging.getLogger(__name__)
+
+# the entries within the locations on sys.path that provide metadata.
+METADATA_SUFFIXES = ('.egg-info', '.dist-info', '.egg-link', '.egg', '.pth')
+
+
+class WorkingSetMonitor(object):
+    """
+    Tracks the distributions available from the locations on sys.path
+    and the metadata of the distributions within the working set used
+    by calmjs, and rebuilds that working set whenever any of those have
+    been modified.
+    """
+
+    def __init__(self):
+        self.generation = 0
+        self.signature = None
+        # path -> (mtime, entries), such that the listing of a location
+        # is only done when it has been modified.
+        self._listings = {}
+
+    def _entries(self, path):
+        try:
+            mtime = os.stat(path).st_mtime
+        except (IOError, OSError):
+            return None
+        cached = self._listings.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        try:
+            entries = sorted(
+                name for name in os.listdir(path)
+                if name.endswith(METADATA_SUFFIXES)
+            )
+        except (IOError, OSError):
+            entries = None
+        self._listings[path] = (mtime, entries)
+        return entries
+
+    def _signature(self):
+        from calmjs import dist
+        from calmjs.bower.cache import dist_metadata_stat_key
+
+        result = [(path, self._entries(path)) for path in sys.path if path]
+        result.extend(
+            dist_metadata_stat_key(d, 'requires.txt')
+            for d in dist.default_working_set
+        )
+        return result
+
+    def refresh(self):
+        """
+        Rebuild the working set if it has been modified.  Returns True
+        if that happened.
+        """
+
+        signature = self._signature()
+        if signature == self.signature:
+            return False
+
+        from pkg_resources import WorkingSet
+        from calmjs import dist
+
+        if self.signature is not None:
+            logger.info("installed distributions modified; reloading")
+            dist.default_working_set = WorkingSet()
+            signature = self._signature()
+        self.signature = signature
+        self.generation += 1
+        return True
+
+
+class RecordHandler(logging.Handler):
+    """
+    Collects the formatted log messages emitted during a request.
+    """
+
+    def __init__(self, level=logging.INFO):
+        super(RecordHandler, self).__init__(level)
+        self.records = []
+
+    def emit(self, record):
+        self.records.append([record.levelname, self.format(record)])
+
+
+class BowerDaemon(object):
+    """
+    Serves the requests for the bower Driver.
+    """
+
+    def __init__(self, driver=None, monitor=None):
+        """
+        Arguments:
+
+        driver
+            The Driver used to serve the requests; a default instance
+            will be created if not provided.
+        monitor
+            The WorkingSetMonitor; a default one is created if not
+            provided.
+        """
+
+        if driver is None:
+            from calmjs.bower import Driver
+            driver = Driver()
+        self.driver = driver
+        self.monitor = monitor or WorkingSetMonitor()
+
+    def _dists(self, package_names, explicit):
+        from calmjs.dist import convert_package_names
+        from calmjs.dist import find_packages_requirements_dists
+        from calmjs.dist import pkg_names_to_dists
+
+        pkg_names, malformed = convert_package_names(package_names)
+        if malformed:
+            raise ValueError(
+                'malformed package name(s) specified: %s' % ', '.join(
+                    malformed))
+        if explicit:
+            return pkg_names_to_dists(pkg_names)
+        return find_packages_requirements_dists(pkg_names)
+
+    def do_view(self, package_names, explicit=False, **kw):
+        return self.driver.pkg_manager_view(package_names, explicit=explicit)
+
+    def do_flatten(self, package_names, explicit=False, **kw):
+        result, conflicts = self.driver.flatten_dists_report(
+            self._dists(package_names, explicit))
+        return {'result': result, 'conflicts': conflicts}
+
+    def do_init(
+            self, package_names, explicit=False, working_dir=None,
+            overwrite=False, merge=False, **kw):
+        from calmjs.bower import Driver
+        driver = Driver(
+            working_dir=working_dir, cache_dir=self.driver.cache_dir or '',
+            interactive=False,
+        )
+        return driver.pkg_manager_init(
+            package_names, explicit=explicit, interactive=False,
+            overwrite=overwrite, merge=merge,
+        )
+
+    def do_ping(self, **kw):
+        return {'pid': os.getpid(), 'generation': self.monitor.generation}
+
+    def handle(self, request):
+        """
+        Handle a single request, which is a dict with the action and the
+        keyword arguments for that.  Returns the response as a dict.
+        """
+
+        handler = RecordHandler()
+        root = logging.getLogger('calmjs')
+        root.addHandler(handler)
+        try:
+            request = dict(request)
+            action = request.pop('action', None)
+            if action not in ACTIONS + ('ping',):
+                raise ValueError("unsupported action '%s'" % action)
+            self.monitor.refresh()
+            result = getattr(self, 'do_' + action)(**request)
+        except Exception as e:
+            logger.debug('request failed', exc_info=True)
+            return {
+                'ok': False, 'error': '%s: %s' % (type(e).__name__, e),
+                'log': handler.records,
+            }
+        finally:
+            root.removeHandler(handler)
+        return {'ok': True, 'result': result, 'log': handler.records}
+
+
+class _RequestHandler(socketserver.StreamRequestHandler):
+
+    def handle(self):
+        line = self.rfile.readline()
+        try:
+            request = json.loads(line.decode('utf8'))
+        except ValueError:
+            response = {'ok': False, 'error': 'malformed request'}
+        else:
+            if request.get('action') == 'stop':
+                response = {'ok': True, 'result': None}
+                self.server.stopping = True
+            else:
+                response = self.server.daemon.handle(request)
+        self.wfile.write(json.dumps(response).encode('utf8') + b'\n')
+
+
+class DaemonServer(socketserver.UnixStreamServer):
+    """
+    The server for the BowerDaemon.  Requests are served one at a time
+    as the working set is shared.
+    """
+
+    def __init__(self, socket_path, daemon):
+        self.daemon = daemon
+        self.socket_path = socket_path
+        self.stopping = False
+        if exists(socket_path):
+            if is_running(socket_path):
+                raise DaemonError(
+                    "daemon already running at '%s'" % socket_path)
+            os.unlink(socket_path)
+        socketserver.UnixStreamServer.__init__(
+            self, socket_path, _RequestHandler)
+
+    def serve_until_stopped(self):
+        try:
+            while not self.stopping:
+                self.handle_request()
+        finally:
+            self.server_close()
+            if exists(self.socket_path):
+                os.unlink(self.socket_path)
+
+
+def serve(socket_path=None, daemon=None):
+    """
+    Serve the daemon on socket_path until stopped.
+    """
+
+    socket_path = socket_path or get_socket_path(create=True)
+    daemon = daemon or BowerDaemon()
+    daemon.monitor.refresh()
+    server = DaemonServer(socket_path, daemon)
+    logger.info("serving on '%s'", socket_path)
+    server.serve_until_stopped()
+
+
+if __name__ == '__main__':  # pragma: no cover
+    sys.exit(main())
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+"""
+Planning of delta installations into the components directory.
+
+The metadata (``.bower.json``) of the packages already installed in the
+components directory is compared against the declarations within the
+target bower.json, such that only the packages that are missing, that
+no longer satisfy what is declared, or that are no longer required need
+to be acted on.
+"""
+
+from __future__ import absolute_import
+
+import json
+import logging
+import os
+from collections import deque
+from os.path import isdir
+from os.path import join
+
+from calmjs.bower.native import BOWER_META
+from calmjs.bower.semver import parse_range
+from calmjs.bower.semver import parse_version
+
+logger = logging.getLogger(__name__)
+
+ADD = 'add'
+CHANGE = 'change'
+REMOVE = 'remove'
+KEEP = 'keep'
+
+
+def read_installed(components_dir):
+    """
+    Return the metadata of every package installed within the components
+    directory, keyed by the installed name.
+    """
+
+    results = {}
+    if not isdir(components_dir):
+        return results
+    for name in sorted(os.listdir(components_dir)):
+        if name.startswith('.'):
+            continue
+        try:
+            with open(join(components_dir, name, BOWER_META)) as fd:
+                meta = json.load(fd)
+        except (IOError, OSError, ValueError):
+            logger.debug(
+                "no usable '%s' for installed '%s'", BOWER_META, name)
+            continue
+        if isinstance(meta, dict):
+            results[name] = meta
+    return results
+
+
+def split_spec(name, spec):
+    """
+    Split the declared spec into the source and the target.
+    """
+
+    if '#' in spec:
+        return tuple(spec.split('#', 1))
+    if '/' in spec or ':' in spec:
+        # an url or a path, with no target.
+        return spec, '*'
+    return name, spec
+
+
+def endpoint(name, spec):
+    """
+    Return the bower endpoint for the declared spec, in the form of
+    ``name=source#target``.
+    """
+
+    source, target = split_spec(name, spec)
+    if '#' not in spec and source != name:
+        return '%s=%s' % (name, spec)
+    return '%s=%s#%s' % (name, source, target)
+
+
+def satisfies(name, spec, meta):
+    """
+    Return whether the installed package described by meta satisfies
+    the declared spec.
+    """
+
+    source, target = split_spec(name, spec)
+    if (meta.get('_originalSource') or name) != source:
+        return False
+    try:
+        version_range = parse_range(target)
+        version = parse_version(meta.get('_release') or meta.get('version'))
+    except (TypeError, ValueError):
+        # not semver, so the installed target must be identical.
+        return meta.get('_target') == target
+    return version in version_range
+
+
+def plan_delta(pkgdef_json, installed, production=False):
+    """
+    Plan the changes required for the installed packages to fulfill
+    the declarations in pkgdef_json, including those declared by the
+    installed packages themselves.
+
+    Returns a dict with the packages to add and to change as mappings
+    of the name to the declared spec, and the sorted lists of the names
+    of the packages to remove and to keep.
+    """
+
+    resolutions = pkgdef_json.get('resolutions') or {}
+    keys = ['dependencies']
+    if not production:
+        keys.append('devDependencies')
+
+    # the queue of (name, spec, weak), where weak declarations are the
+    # ones from packages that are being changed, which may no longer be
+    # required by the new version, so they are only retained if already
+    # installed, and otherwise left for the installation to deal with.
+    queue = deque(
+        (name, spec, False)
+        for key in keys
+        for name, spec in sorted((pkgdef_json.get(key) or {}).items())
+    )
+    plan = {ADD: {}, CHANGE: {}, REMOVE: [], KEEP: []}
+    required = set()
+    retained = set()
+
+    while queue:
+        name, spec, weak = queue.popleft()
+        if name in required or (weak and name in retained):
+            continue
+        meta = installed.get(name)
+        if weak:
+            if meta is not None:
+                retained.add(name)
+            continue
+
+        required.add(name)
+        if name in resolutions:
+            source, target = split_spec(name, spec)
+            spec = '%s#%s' % (source, resolutions[name])
+        if meta is None:
+            plan[ADD][name] = spec
+            continue
+        weak = not satisfies(name, spec, meta)
+        if weak:
+            plan[CHANGE][name] = spec
+        else:
+            plan[KEEP].append(name)
+        queue.extend(
+            (dep, dep_spec, weak) for dep, dep_spec in sorted(
+                (meta.get('dependencies') or {}).items()))
+
+    plan[REMOVE] = sorted(
+        name for name in installed
+        if name not in required and name not in retained
+    )
+    plan[KEEP] = sorted(set(plan[KEEP]) | (retained - required))
+    return plan
+
+
+def retain_required(plan, installed):
+    """
+    Return a copy of the plan with the packages to remove that are
+    required, directly or transitively, by the packages to add or to
+    change moved into the ones to keep, according to the metadata of
+    the packages now installed.  As the dependencies of the packages
+    to add are only known once those are installed, this should be
+    applied after the installation.
+    """
+
+    queue = deque(sorted(set(plan[ADD]) | set(plan[CHANGE])))
+    required = set()
+    while queue:
+        name = queue.popleft()
+        if name in required:
+            continue
+        required.add(name)
+        meta = installed.get(name) or {}
+        queue.extend(sorted(meta.get('dependencies') or {}))
+
+    result = dict(plan)
+    result[REMOVE] = [
+        name for name in plan[REMOVE] if name not in required]
+    result[KEEP] = sorted(
+        set(plan[KEEP]) | required.intersection(plan[REMOVE]))
+    return result
@@ -0,0 +1,1651 @@
+# -*- coding: utf-8 -*-
+"""
+The driver and the setuptools command for bower.
+
+Everything defined here is also provided by the calmjs.bower package,
+which imports this module only as these are accessed.
+"""
+
+import json
+import logging
+import os
+import shutil
+import sys
+from contextlib import contextmanager
+from distutils.errors import DistutilsError
+from os.path import exists
+from os.path import isdir
+from os.path import join
+from os.path import realpath
+
+from calmjs import cli
+from calmjs.cli import PackageManagerDriver
+from calmjs.command import PackageManagerCommand
+from calmjs.dist import convert_package_names
+from calmjs.dist import find_packages_requirements_dists
+from calmjs.dist import pkg_names_to_dists
+from calmjs.utils import which
+
+from calmjs.bower import BOWER
+from calmjs.bower import BOWER_COMPONENTS
+from calmjs.bower import BOWER_JSON
+from calmjs.bower import BOWERRC
+from calmjs.bower import DESCRIPTION
+from calmjs.bower import INSTALL_STAMP
+# Only the modules required for the caching and the timings are imported
+# here; the modules for the features of the driver are imported within
+# the methods that use them, as this module is imported by setuptools
+# for every invocation of setup.py and by every invocation of the
+# runtime.
+from calmjs.bower.cache import JsonCache
+from calmjs.bower.cache import digest_key
+from calmjs.bower.cache import dist_metadata_stat_key
+from calmjs.bower.cache import get_cache_dir
+from calmjs.bower.cache import get_package_store
+from calmjs.bower.cache import get_registry_cache
+from calmjs.bower.cache import get_shared_store
+from calmjs.bower.cache import replace
+from calmjs.bower.cache import stat_key
+from calmjs.bower.timings import Timings
+from calmjs.bower.timings import child_cpu_time
+from calmjs.bower.timings import null_span
+from calmjs.bower.timings import timed
+from calmjs.bower.utils import lazy_class_attribute
+
+logger = logging.getLogger(__name__)
+
+
+def _import_aio():
+    # the asyncio support is only imported on demand, as it is not
+    # available for all the supported versions of Python.
+    if sys.version_info < (3, 7):
+        raise RuntimeError('asyncio support requires Python 3.7+')
+    from calmjs.bower import aio
+    return aio
+
+
+class Driver(PackageManagerDriver):
+
+    def __init__(
+            self, cache_dir=None, package_store=None, jobs=None,
+            shared_store=None, timings=None, index=None, cache_lock=None,
+            registry_cache=None, **kw):
+        """
+        Optional Arguments:
+
+        cache_dir
+            The directory for the persistent caches used by this driver.
+            Defaults to the value of the CALMJS_BOWER_CACHE_DIR
+            environment variable; caching is disabled if unset, or if
+            an empty value is provided.
+        package_store
+            The directory of a local store of bower packages; if set,
+            installation will be done natively from there instead of
+            through bower, falling back to bower if that fails.
+            Defaults to the value of the CALMJS_BOWER_STORE environment
+            variable.
+        jobs
+            The number of parallel workers for installation.  Defaults
+            to the number of processors.
+        shared_store
+            The directory of a content addressed store shared between
+            installations; if set, every package@version installed is
+            kept once in there and the components directory is filled
+            with hardlinks to those files.  Defaults to the value of the
+            CALMJS_BOWER_SHARED_STORE environment variable.
+        timings
+            A Timings instance for recording the spans of the phases
+            done by this driver, e.g. for profiling.  Alternatively,
+            the timings keyword argument may be set for the invocation
+            of any of the pkg_manager_* methods; please refer to the
+            collect_timings method.
+        index
+            A MetadataIndex (from calmjs.bower.batch) shared between the
+            drivers for multiple projects, such that the resolution of
+            the distributions and the reading of their metadata are only
+            done once for all of them.
+        cache_lock
+            The path to a directory of lock files, one for every bower
+            package, of which the ones for the packages declared by the
+            project will be held for the duration of every invocation of
+            bower install.  This serializes the installations on the
+            same host that declare any package in common; the transitive
+            dependencies are not locked.  Please refer to
+            calmjs.bower.locks.
+        registry_cache
+            The directory for the cache of a registry proxy, which will
+            be started for the lifetime of this driver on first use and
+            configured as the registry for the invocations of bower and
+            for the mirroring of packages.  Please refer to
+            calmjs.bower.proxy.  Defaults to the value of the
+            CALMJS_BOWER_REGISTRY_CACHE environment variable.
+
+        Other keyword arguments pass up to parent; please refer to its
+        definitions.
+        """
+
+        kw['pkg_manager_bin'] = BOWER
+        kw['pkgdef_filename'] = BOWER_JSON
+        kw['description'] = DESCRIPTION
+        super(Driver, self).__init__(**kw)
+        if package_store is None:
+            package_store = get_package_store()
+        self.package_store = package_store or None
+        self.jobs = jobs
+        if shared_store is None:
+            shared_store = get_shared_store()
+        self.shared_store = shared_store or None
+        self.timings = timings
+        self.timings_stream = None
+        self.index = index
+        self.cache_lock = cache_lock
+        if registry_cache is None:
+            registry_cache = get_registry_cache()
+        self.registry_cache = registry_cache or None
+        self._registry_server = None
+        if cache_dir is None:
+            cache_dir = get_cache_dir()
+        self.cache_dir = cache_dir or None
+        self.flatten_cache = (
+            JsonCache(join(self.cache_dir, 'flatten'))
+            if self.cache_dir else None
+        )
+        self.version_cache = (
+            JsonCache(join(self.cache_dir, 'version'), max_entries=16)
+            if self.cache_dir else None
+        )
+        self.why_cache = (
+            JsonCache(join(self.cache_dir, 'why'), max_entries=16)
+            if self.cache_dir else None
+        )
+        # the reverse dependency indexes built by this instance.
+        self._why_indexes = {}
+
+    @property
+    def _aliases(self):
+        aliases = super(Driver, self)._aliases
+        # as the lookup of attributes goes through the aliases, the
+        # default implementation must be used to avoid recursion.
+        getattribute = super(PackageManagerDriver, self).__getattribute__
+        for name in ('lock', 'export', 'verify', 'why', 'mirror'):
+            aliases['%s_%s' % (getattribute('pkg_manager_bin'), name)] = (
+                getattribute('pkg_manager_' + name))
+        return aliases
+
+    def get_registry_url(self):
+        """
+        Return the url of the registry proxy for this driver, starting
+        it if needed, or None if no registry_cache was specified.
+        """
+
+        if not self.registry_cache:
+            return None
+        if self._registry_server is None:
+            # imported on demand, as the http server is only needed here.
+            from calmjs.bower.proxy import RegistryProxy
+            from calmjs.bower.proxy import start_proxy
+            self._registry_server = start_proxy(
+                RegistryProxy(self.join_cwd(self.registry_cache)))
+            logger.info(
+                "using registry proxy at '%s' with cache '%s'",
+                self._registry_server.url, self.registry_cache,
+            )
+        return self._registry_server.url
+
+    def stop_registry_proxy(self):
+        """
+        Stop the registry proxy started by this driver, if any.
+        """
+
+        if self._registry_server is not None:
+            self._registry_server.shutdown()
+            self._registry_server.server_close()
+            self._registry_server = None
+
+    def _registry_args(self):
+        # the bower config for the registry, as command line arguments
+        # as the environment of the invocation may be replaced.
+        url = self.get_registry_url()
+        return ['--config.registry=' + url] if url else []
+
+    def span(self, name, **attrs):
+        """
+        Return a context manager that records a span named name for the
+        enclosed block, if timings are being recorded.
+        """
+
+        if self.timings is None:
+            return null_span()
+        return self.timings.span(name, **attrs)
+
+    @contextmanager
+    def collect_timings(self, enabled=True):
+        """
+        Collect the timings for the enclosed block if enabled, and then
+        write the spans as a line of JSON into the timings_stream, which
+        defaults to stderr.  Does nothing if timings are already being
+        recorded for this driver.
+        """
+
+        if not enabled or self.timings is not None:
+            yield self.timings
+            return
+
+        self.timings = Timings()
+        try:
+            yield self.timings
+        finally:
+            timings, self.timings = self.timings, None
+            timings.emit(self.timings_stream or sys.stderr)
+
+    def _version_key(self, call_kw):
+        try:
+            bower_bin = self._get_exec_binary(call_kw)
+        except (IOError, OSError):
+            return None
+        bower_id = stat_key(realpath(bower_bin))
+        if bower_id is None:
+            return None
+        node_bin = which(
+            self.node_bin, path=call_kw.get('env', {}).get('PATH'))
+        node_id = stat_key(realpath(node_bin)) if node_bin else None
+        return digest_key(bower_id, node_id)
+
+    def get_pkg_manager_version(self):
+        """
+        Return the version of bower as a tuple of integers.
+
+        If caching is enabled, the version is keyed by the resolved
+        location, modification time and size of both the bower and the
+        node binary, such that the underlying binaries will only be
+        executed if they have been changed.
+        """
+
+        key = None
+        if self.version_cache:
+            key = self._version_key(self._gen_call_kws())
+        if key:
+            version = self.version_cache.get(key)
+            if version is not None:
+                logger.debug("using cached bower version %s", version)
+                return tuple(version)
+
+        version = super(Driver, self).get_pkg_manager_version()
+        if key and version is not None:
+            self.version_cache.set(key, list(version))
+        return version
+
+    def _flatten_key(self, dists):
+        stats = []
+        for dist in dists:
+            stat = dist_metadata_stat_key(dist, self.pkgdef_filename)
+            if stat is None:
+                return None
+            stats.append(stat)
+        return digest_key(
+            'merge', self.pkgdef_filename, sorted(self.dep_keys), stats)
+
+    def flatten_dists_report(self, dists):
+        """
+        Flatten the package definition files from the list of provided
+        distributions, with the version ranges declared for the
+        dependencies intersected across all of them.
+
+        Returns a tuple of the flattened result and the list of the
+        conflicting declarations found; please refer to the function
+        calmjs.bower.merge.flatten_dists for details.
+
+        If caching is enabled, the results are keyed by the paths,
+        modification times and sizes of all the contributing metadata
+        files, such that subsequent calls with no changes to those files
+        will be served from the cache without reading them.
+        """
+
+        # the reading and the merging are recorded within this span.
+        with self.span('flatten', dists=len(dists)) as span:
+            key = self._flatten_key(dists) if self.flatten_cache else None
+            if key:
+                cached = self.flatten_cache.get(key)
+                span['cached'] = cached is not None
+                if cached is not None:
+                    logger.debug(
+                        "using cached flattened '%s' (%s)",
+                        self.pkgdef_filename, key,
+                    )
+                    return cached['result'], cached['conflicts']
+
+            from calmjs.bower.merge import merge_dists
+            from calmjs.bower.merge import read_dists
+
+            with self.span('read_metadata', dists=len(dists)) as child:
+                entries = read_dists(
+                    dists, self.pkgdef_filename,
+                    self.index.read if self.index else None,
+                )
+                child['files'] = len([obj for dist, obj in entries if obj])
+
+            with self.span('merge') as child:
+                result, conflicts = merge_dists(
+                    entries, self.dep_keys, filename=self.pkgdef_filename)
+                child['conflicts'] = len(conflicts)
+
+            if key:
+                self.flatten_cache.set(
+                    key, {'result': result, 'conflicts': conflicts})
+        return result, conflicts
+
+    def flatten_dists(self, dists):
+        """
+        Flatten the package definition files from the list of provided
+        distributions, with the conflicting version ranges logged as
+        warnings.  Please refer to flatten_dists_report for details.
+        """
+
+        result, conflicts = self.flatten_dists_report(dists)
+        for conflict in conflicts:
+            logger.warning(
+                "conflicting version ranges declared for '%s' in '%s': %s; "
+                "resolving to '%s'", conflict['name'], conflict['key'],
+                ', '.join("'%s' (%s)" % (spec, origin) for origin, spec in (
+                    conflict['declarations'])),
+                conflict['resolution'],
+            )
+        return result
+
+    @timed('view')
+    def pkg_manager_view(
+            self, package_names, stream=None, explicit=False, **kw):
+        """
+        Returns the manifest JSON for the Python package name, using
+        the flattening provided by ``flatten_dists``.
+
+        Please refer to the parent class for details on the arguments.
+        """
+
+        to_dists = {
+            False: find_packages_requirements_dists,
+            True: pkg_names_to_dists,
+        }
+
+        pkg_names, malformed = convert_package_names(package_names)
+        if malformed:
+            msg = 'malformed package name(s) specified: %s' % ', '.join(
+                malformed)
+            raise ValueError(msg)
+
+        if len(pkg_names) == 1:
+            logger.info(
+                "generating a flattened '%s' for '%s'",
+                self.pkgdef_filename, pkg_names[0],
+            )
+        else:
+            logger.info(
+                "generating a flattened '%s' for packages {%s}",
+                self.pkgdef_filename, ', '.join(pkg_names),
+            )
+
+        with self.span('resolve_dists') as span:
+            if self.index:
+                dists = self.index.find_dists(pkg_names, explicit)
+            else:
+                dists = to_dists[explicit](pkg_names)
+            span['dists'] = len(dists)
+        pkgdef_json = self.flatten_dists(dists)
+
+        if pkgdef_json.get(
+                self.pkg_name_field, NotImplemented) is NotImplemented:
+            # use the last item.
+            pkgdef_json[self.pkg_name_field] = pkg_names[-1]
+
+        if stream:
+            self.dump(pkgdef_json, stream)
+            stream.write('\n')
+
+        return pkgdef_json
+
+    def _why_key(self, pkg_names, explicit, dists):
+        stats = []
+        for dist in dists:
+            for filename in (self.pkgdef_filename, 'requires.txt'):
+                stat = dist_metadata_stat_key(dist, filename)
+                if stat is None:
+                    return None
+                stats.append(stat)
+        return digest_key(
+            'why', self.pkgdef_filename, sorted(self.dep_keys),
+            list(pkg_names), bool(explicit), stats)
+
+    def build_why_index(self, package_names, explicit=False):
+        """
+        Build the reverse dependency index for the package definition
+        files declared by the distributions required by package_names;
+        please refer to calmjs.bower.why.build_index for the structure.
+
+        The indexes are kept by this instance, and also in the cache if
+        caching is enabled, keyed by the metadata files involved.
+        """
+
+        from calmjs.bower.merge import read_dists
+        from calmjs.bower.why import build_index
+        from calmjs.bower.why import requirement_chains
+
+        pkg_names, malformed = convert_package_names(package_names)
+        if malformed:
+            raise ValueError(
+                'malformed package name(s) specified: %s' % ', '.join(
+                    malformed))
+
+        with self.span('resolve_dists') as span:
+            if self.index:
+                dists = self.index.find_dists(pkg_names, explicit)
+            elif explicit:
+                dists = pkg_names_to_dists(pkg_names)
+            else:
+                dists = find_packages_requirements_dists(pkg_names)
+            span['dists'] = len(dists)
+
+        key = self._why_key(pkg_names, explicit, dists)
+        if key in self._why_indexes:
+            return self._why_indexes[key]
+        if key and self.why_cache:
+            index = self.why_cache.get(key)
+            if index is not None:
+                self._why_indexes[key] = index
+                return index
+
+        with self.span('build_why_index', dists=len(dists)) as span:
+            entries = read_dists(
+                dists, self.pkgdef_filename,
+                self.index.read if self.index else None,
+            )
+            index = build_index(
+                entries, requirement_chains(dists, pkg_names),
+                self.dep_keys, filename=self.pkgdef_filename,
+            )
+            span['packages'] = len(index)
+
+        if key:
+            self._why_indexes[key] = index
+            if self.why_cache:
+                self.why_cache.set(key, index)
+        return index
+
+    @timed('why')
+    def pkg_manager_why(
+            self, name, package_names, stream=None, explicit=False, **kw):
+        """
+        Report why the bower package name is declared within the
+        package definition file generated for package_names, i.e. the
+        declarations made for it by the distributions and the chains of
+        requirements that lead to those, along with the resulting specs.
+
+        Returns a dict with the name, the flattened specs and the list
+        of declarations, or None if it was not declared at all.
+        """
+
+        entry = self.build_why_index(package_names, explicit).get(name)
+        if entry is None:
+            logger.error(
+                "'%s' is not declared in the '%s' of any of the required "
+                "distributions", name, self.pkgdef_filename,
+            )
+            return None
+
+        result = {'name': name}
+        result.update(entry)
+        if stream:
+            self.dump(result, stream)
+            stream.write('\n')
+        return result
+
+    def get_bower_components_dir(self):
+        """
+        Return the directory where bower will install its components
+        into, taking the directory setting in '.bowerrc' into account.
+        """
+
+        directory = BOWER_COMPONENTS
+        bowerrc = self.join_cwd(BOWERRC)
+        if exists(bowerrc):
+            try:
+                with open(bowerrc) as fd:
+                    directory = json.load(fd).get('directory') or directory
+            except (IOError, OSError, ValueError, AttributeError):
+                logger.warning("ignoring unusable '%s'", bowerrc)
+        return self.join_cwd(directory)
+
+    def make_install_stamp(self, args=(), native=False, lock=None):
+        """
+        Generate the stamp for the installation with the current
+        package definition file in the working directory.  The stamp
+        is derived from the canonical form of its contents, the identity
+        of the bower binary (or the native installer, if native is set),
+        the arguments passed to the install command and the contents of
+        the lock for frozen installations.  The identity is the resolved
+        location, modification time and size of both the bower and the
+        node binary, such that neither has to be executed for producing
+        the stamp.
+
+        Returns None if a stamp cannot be produced.
+        """
+
+        pkgdef_path = self.join_cwd(self.pkgdef_filename)
+        try:
+            with open(pkgdef_path) as fd:
+                pkgdef_json = json.load(fd)
+        except (IOError, OSError, ValueError):
+            logger.debug("unable to read '%s' for stamping", pkgdef_path)
+            return None
+
+        parts = [pkgdef_json, list(args)]
+        if lock is not None:
+            parts.append(lock)
+        if native:
+            return {
+                'digest': digest_key(*parts),
+                'installer': 'native',
+            }
+
+        binary = self._version_key(self._gen_call_kws())
+        if binary is None:
+            logger.debug(
+                "unable to locate the '%s' binary for stamping",
+                self.pkg_manager_bin,
+            )
+            return None
+
+        return {
+            'digest': digest_key(*parts),
+            'installer': self.pkg_manager_bin,
+            'binary': binary,
+        }
+
+    def is_install_unchanged(self, args=(), native=False, lock=None):
+        """
+        Return True if the stamp for the installation matches the one
+        written by the last successful installation.
+
+        If native is set, the stamp is produced for the installer that
+        wrote the previous one, as a native installation may have fallen
+        back to bower.
+        """
+
+        previous = self.read_install_stamp()
+        if not isinstance(previous, dict):
+            return False
+        native = native and previous.get('installer') == 'native'
+        stamp = self.make_install_stamp(args, native=native, lock=lock)
+        return stamp is not None and stamp == previous
+
+    def read_install_stamp(self):
+        path = join(self.get_bower_components_dir(), INSTALL_STAMP)
+        try:
+            with open(path) as fd:
+                return json.load(fd)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def write_install_stamp(self, stamp):
+        target = self.get_bower_components_dir()
+        path = join(target, INSTALL_STAMP)
+        try:
+            if not exists(target):
+                os.makedirs(target)
+            with open(path + '.tmp', 'w') as fd:
+                json.dump(stamp, fd, sort_keys=True)
+            replace(path + '.tmp', path)
+        except (IOError, OSError) as e:
+            logger.warning("unable to write install stamp '%s': %s", path, e)
+        else:
+            logger.debug("wrote install stamp '%s'", path)
+
+    @timed('init')
+    def pkg_manager_init(self, package_names, **kw):
+        """
+        Generate and write the package definition file into the working
+        directory.  Please refer to the parent class for details.
+        """
+
+        return super(Driver, self).pkg_manager_init(package_names, **kw)
+
+    def read_pkgdef(self):
+        """
+        Return the contents of the package definition file in the
+        working directory.
+        """
+
+        with open(self.join_cwd(self.pkgdef_filename)) as fd:
+            return json.load(fd)
+
+    def load_lock(self):
+        """
+        Return the lock from the lock file in the working directory.
+
+        Raises LockError if the lock file is unusable, or if it was not
+        produced for the current package definition file.
+        """
+
+        from calmjs.bower.lock import BOWER_LOCK
+        from calmjs.bower.lock import LockError
+        from calmjs.bower.lock import pkgdef_digest
+        from calmjs.bower.lock import read_lock
+
+        lock = read_lock(self.join_cwd(BOWER_LOCK))
+        try:
+            pkgdef_json = self.read_pkgdef()
+        except (IOError, OSError, ValueError) as e:
+            raise LockError("unable to read '%s': %s" % (
+                self.pkgdef_filename, e))
+        if lock.get('pkgdef') != pkgdef_digest(pkgdef_json):
+            raise LockError(
+                "'%s' is out of date with '%s'; it should be regenerated" % (
+                    BOWER_LOCK, self.pkgdef_filename))
+        return lock
+
+    def _make_native_installer(self, package_store, args, shared_store):
+        from calmjs.bower.native import LocalStore
+        from calmjs.bower.native import NativeInstaller
+        from calmjs.bower.native import ResolutionError
+        from calmjs.bower.shared import SharedStore
+
+        production = False
+        for arg in args:
+            if arg not in ('-p', '--production'):
+                raise ResolutionError(
+                    "argument '%s' is not supported by the native "
+                    "installer" % arg)
+            production = True
+
+        return NativeInstaller(
+            LocalStore(package_store), self.get_bower_components_dir(),
+            jobs=self.jobs, production=production,
+            shared=SharedStore(shared_store) if shared_store else None,
+        )
+
+    def native_install(
+            self, package_store, args=(), shared_store=None, lock=None):
+        """
+        Install the packages declared in the package definition file in
+        the working directory from the local package_store, without
+        invoking bower.  Packages will be linked from the shared_store,
+        if provided.  If a lock is provided, the exact packages recorded
+        in there are installed instead, without any resolution.
+
+        Raises ResolutionError if any of the packages or arguments
+        cannot be handled natively.
+        """
+
+        from calmjs.bower.lock import BOWER_LOCK
+        from calmjs.bower.native import ResolutionError
+
+        installer = self._make_native_installer(
+            package_store, args, shared_store)
+
+        if lock is not None:
+            logger.info(
+                "installing '%s' from package store '%s'",
+                BOWER_LOCK, package_store,
+            )
+            with self.span('resolve', locked=True):
+                resolved = installer.resolve_locked(lock['dependencies'])
+            return self._native_extract(installer, resolved)
+
+        try:
+            pkgdef_json = self.read_pkgdef()
+        except (IOError, OSError, ValueError) as e:
+            raise ResolutionError(
+                "unable to read '%s': %s" % (self.pkgdef_filename, e))
+
+        logger.info(
+            "installing '%s' from package store '%s'",
+            self.pkgdef_filename, package_store,
+        )
+        with self.span('resolve', locked=False):
+            resolved = installer.resolve(pkgdef_json)
+        return self._native_extract(installer, resolved)
+
+    def _native_extract(self, installer, resolved):
+        with self.span('extract', packages=len(resolved)):
+            return installer.install(resolved)
+
+    def _finalize_install(
+            self, args, incremental, lock, native=False, record=False):
+        if lock is not None:
+            from calmjs.bower.lock import BOWER_LOCK
+            from calmjs.bower.lock import verify_lock
+            with self.span('verify', packages=len(lock['dependencies'])):
+                mismatched = verify_lock(
+                    self.get_bower_components_dir(), lock)
+            if mismatched:
+                logger.error(
+                    "installed packages do not match the digests recorded "
+                    "in '%s': %s", BOWER_LOCK, ', '.join(mismatched),
+                )
+                return False
+        if incremental:
+            stamp = self.make_install_stamp(args, native=native, lock=lock)
+            if stamp is not None:
+                self.write_install_stamp(stamp)
+        if record:
+            self.record_files_manifest()
+        return True
+
+    def record_files_manifest(self):
+        """
+        Record the manifest of the size and the digest of every file
+        within the components directory, for the verify action.
+        """
+
+        from calmjs.bower.verify import FILES_MANIFEST
+        from calmjs.bower.verify import make_manifest
+        from calmjs.bower.verify import write_manifest
+
+        components_dir = self.get_bower_components_dir()
+        path = join(components_dir, FILES_MANIFEST)
+        try:
+            with self.span('record') as span:
+                manifest = make_manifest(
+                    components_dir, exclude=(INSTALL_STAMP,), jobs=self.jobs)
+                span['files'] = len(manifest['files'])
+                write_manifest(path, manifest)
+        except (IOError, OSError) as e:
+            logger.warning("unable to record manifest '%s': %s", path, e)
+        else:
+            logger.info(
+                "recorded %d file(s) into manifest '%s'",
+                len(manifest['files']), path,
+            )
+
+    @timed('install')
+    def pkg_manager_install(
+            self, package_names=None, args=(), env={}, incremental=False,
+            package_store=None, shared_store=None, frozen=False, delta=False,
+            record=False, events=None, progress=False, **kw):
+        """
+        Generate the package definition file for the package_names and
+        then invoke the install command.
+
+        If incremental is set, a stamp will be written into the bower
+        components directory upon successful installation, and the
+        install command will not be invoked again if the stamp for the
+        package definition file and the version of bower stays the same.
+
+        If package_store is set (or one is defined for this instance),
+        the installation is done natively from that through the method
+        native_install, with bower only invoked if that failed to
+        resolve the declared packages.
+
+        If shared_store is set (or one is defined for this instance),
+        the installed packages are kept in that shared store, with the
+        files in the components directory being hardlinks to those.
+
+        If frozen is set, the exact packages recorded in the lock file
+        are installed without any version resolution, and the installed
+        packages are then verified against the digests recorded there.
+        The lock file must have been produced for the package definition
+        file generated.
+
+        If delta is set, only the packages that are missing, that do not
+        satisfy their declarations or that are no longer required within
+        the components directory are acted on; please refer to the
+        method delta_install.  This has no effect if frozen is set.
+
+        If record is set, the manifest of the files installed within the
+        components directory is recorded after a successful installation
+        for the verification through pkg_manager_verify.
+
+        If events is set to a callable, bower is invoked with the --json
+        flag and the callable is invoked with every log entry (as a dict)
+        as it is written; the invocation is terminated at the first
+        error.  If progress is set, the entries are logged instead.
+
+        Returns True if the installation was successful, False if not.
+
+        Please refer to the parent class for details on the rest of the
+        arguments.
+        """
+
+        from calmjs.bower.events import log_event
+        from calmjs.bower.lock import LockError
+        from calmjs.bower.lock import lock_endpoints
+        from calmjs.bower.native import ResolutionError
+
+        if package_names:
+            result = self.pkg_manager_init(package_names, **kw)
+            if not result:
+                logger.warning(
+                    "not continuing with '%s %s' as the generation of "
+                    "'%s' failed", self.pkg_manager_bin, self.install_cmd,
+                    self.pkgdef_filename
+                )
+                return False
+        else:
+            logger.warning(
+                "no package name supplied, but continuing with '%s %s'",
+                self.pkg_manager_bin, self.install_cmd,
+            )
+
+        lock = None
+        if frozen:
+            try:
+                lock = self.load_lock()
+            except LockError as e:
+                logger.error("unable to install from lock file: %s", e)
+                return False
+
+        package_store = package_store or self.package_store
+        shared_store = shared_store or self.shared_store
+        if progress and events is None:
+            events = log_event
+        if incremental:
+            if self.is_install_unchanged(
+                    args, native=bool(package_store), lock=lock):
+                logger.info(
+                    "'%s' unchanged since the last installation; skipping",
+                    self.pkgdef_filename,
+                )
+                return True
+
+        if delta and lock is None:
+            plan = self.plan_delta(args)
+            if plan is not None:
+                return self.delta_install(
+                    plan, args, env, incremental, package_store,
+                    shared_store, record, events,
+                )
+
+        if package_store:
+            try:
+                self.native_install(package_store, args, shared_store, lock)
+            except ResolutionError as e:
+                logger.warning(
+                    "unable to install natively from package store: %s; "
+                    "falling back to '%s %s'",
+                    e, self.pkg_manager_bin, self.install_cmd,
+                )
+            else:
+                return self._finalize_install(
+                    args, incremental, lock, native=True, record=record)
+
+        if not self._invoke_install(
+                args, env, lock_endpoints(lock) if lock is not None else (),
+                events):
+            return False
+
+        if shared_store:
+            self.link_shared_store(shared_store)
+        return self._finalize_install(args, incremental, lock, record=record)
+
+    def plan_delta(self, args=()):
+        """
+        Plan the delta installation for the package definition file in
+        the working directory against the packages installed within the
+        components directory; please refer to calmjs.bower.delta for
+        details on the returned plan.
+
+        Returns None if the package definition file is unusable.
+        """
+
+        from calmjs.bower import delta
+
+        try:
+            pkgdef_json = self.read_pkgdef()
+        except (IOError, OSError, ValueError) as e:
+            logger.warning(
+                "unable to plan a delta installation as '%s' is unreadable: "
+                "%s", self.pkgdef_filename, e,
+            )
+            return None
+
+        production = '-p' in args or '--production' in args
+        with self.span('plan_delta') as span:
+            plan = delta.plan_delta(
+                pkgdef_json,
+                delta.read_installed(self.get_bower_components_dir()),
+                production=production,
+            )
+            span.update({key: len(plan[key]) for key in (
+                delta.ADD, delta.CHANGE, delta.REMOVE)})
+        return plan
+
+    def delta_install(
+            self, plan, args=(), env={}, incremental=False,
+            package_store=None, shared_store=None, record=False,
+            events=None):
+        """
+        Apply the delta installation plan to the components directory:
+        only the packages that are to be added or changed are installed,
+        either natively from the package_store or through the install
+        command with the endpoints of only those packages, and then the
+        packages no longer required are removed, except for the ones
+        that those installed turn out to depend on.  Nothing is removed
+        should the installation fail.
+
+        Returns True if the installation was successful, False if not.
+        """
+
+        from calmjs.bower.delta import ADD as DELTA_ADD
+        from calmjs.bower.delta import CHANGE as DELTA_CHANGE
+        from calmjs.bower.delta import KEEP as DELTA_KEEP
+        from calmjs.bower.delta import REMOVE as DELTA_REMOVE
+        from calmjs.bower.delta import endpoint
+        from calmjs.bower.delta import read_installed
+        from calmjs.bower.delta import satisfies
+        from calmjs.bower.native import ResolutionError
+
+        components_dir = self.get_bower_components_dir()
+        targets = dict(plan[DELTA_ADD])
+        targets.update(plan[DELTA_CHANGE])
+        logger.info(
+            "delta installation into '%s': %d to add, %d to change, %d to "
+            "remove, %d unchanged", components_dir, len(plan[DELTA_ADD]),
+            len(plan[DELTA_CHANGE]), len(plan[DELTA_REMOVE]),
+            len(plan[DELTA_KEEP]),
+        )
+
+        if not targets:
+            self._delta_remove(plan, components_dir)
+            return self._finalize_install(
+                args, incremental, None, native=bool(package_store),
+                record=record)
+
+        if package_store:
+            try:
+                installer = self._make_native_installer(
+                    package_store, args, shared_store)
+                with self.span('resolve', locked=False):
+                    resolved = installer.resolve({'dependencies': targets})
+                installed = read_installed(components_dir)
+                # only install the dependencies that are also required.
+                for name, (package, spec) in list(resolved.items()):
+                    if name not in targets and name in installed and (
+                            satisfies(name, spec, installed[name])):
+                        del resolved[name]
+                self._native_extract(installer, resolved)
+            except ResolutionError as e:
+                logger.warning(
+                    "unable to install natively from package store: %s; "
+                    "falling back to '%s %s'",
+                    e, self.pkg_manager_bin, self.install_cmd,
+                )
+            else:
+                self._delta_remove(plan, components_dir)
+                return self._finalize_install(
+                    args, incremental, None, native=True, record=record)
+
+        if not self._invoke_install(args, env, [
+                endpoint(name, spec) for name, spec in sorted(
+                    targets.items())], events):
+            return False
+
+        self._delta_remove(plan, components_dir)
+        if shared_store:
+            self.link_shared_store(shared_store)
+        return self._finalize_install(args, incremental, None, record=record)
+
+    def _delta_remove(self, plan, components_dir):
+        # only done once the installation was successful, such that the
+        # dependencies of the packages added are known.
+        from calmjs.bower.delta import REMOVE as DELTA_REMOVE
+        from calmjs.bower.delta import read_installed
+        from calmjs.bower.delta import retain_required
+
+        plan = retain_required(plan, read_installed(components_dir))
+        for name in plan[DELTA_REMOVE]:
+            logger.info("removing '%s' as it is no longer required", name)
+            shutil.rmtree(join(components_dir, name))
+
+    def _invoke_install(self, args=(), env={}, endpoints=(), events=None):
+        """
+        Invoke the install command with the arguments, followed by the
+        specific endpoints to install, if any.  If events is provided,
+        the invocation is done with the --json flag through an
+        EventStream, with events as the callback for the log entries.
+        Returns True if that was successful.
+        """
+
+        from calmjs.bower.events import EventStream
+        from calmjs.bower.events import PackageTimings
+
+        call_kw = self._gen_call_kws(**env)
+        logger.debug(
+            "invoking '%s %s'", self.pkg_manager_bin, self.install_cmd)
+        if self.env_path:
+            logger.debug(
+                "invoked with env_path '%s'", self.env_path)
+        if self.working_dir:
+            logger.debug(
+                "invoked from working directory '%s'", self.working_dir)
+        try:
+            cmd = [self._get_exec_binary(call_kw), self.install_cmd]
+            cmd.extend(args)
+            cmd.extend(self._registry_args())
+            cmd.extend(endpoints)
+            if events is not None:
+                cmd.append('--json')
+            with self.span('subprocess', cmd=cmd) as span:
+                with self._hold_cache_lock(endpoints):
+                    cpu_time = child_cpu_time()
+                    if events is None:
+                        rc = cli.call(cmd, **call_kw)
+                    else:
+                        package_timings = PackageTimings()
+
+                        def callback(event):
+                            package_timings(event)
+                            events(event)
+
+                        rc = EventStream(cmd, **call_kw).run(callback)
+                        span['packages'] = package_timings.durations()
+                span['returncode'] = rc
+                if cpu_time is not None:
+                    span['cpu'] = round(child_cpu_time() - cpu_time, 6)
+        except (IOError, OSError):
+            logger.error(
+                "invocation of the '%s' binary failed; please ensure it and "
+                "its dependencies are installed and available.", self.binary
+            )
+            # Still raise the exception as this is a lower level API.
+            raise
+
+        if rc:
+            logger.error(
+                "'%s %s' exited with return code %s",
+                self.pkg_manager_bin, self.install_cmd, rc,
+            )
+            return False
+        return True
+
+    def stream_install_events(
+            self, args=(), env={}, endpoints=(), fail_fast=True):
+        """
+        Return an EventStream for the invocation of the install command
+        with the --json flag, which can be iterated for the log entries
+        written by bower as they are written.  Unlike pkg_manager_install,
+        the package definition file is not generated; the process is only
+        started once the iteration begins.
+        """
+
+        from calmjs.bower.events import EventStream
+
+        call_kw = self._gen_call_kws(**env)
+        cmd = [self._get_exec_binary(call_kw), self.install_cmd]
+        cmd.extend(args)
+        cmd.extend(self._registry_args())
+        cmd.extend(endpoints)
+        cmd.append('--json')
+        return EventStream(cmd, fail_fast=fail_fast, **call_kw)
+
+    def pkg_manager_view_async(self, package_names, **kw):
+        """
+        Return the coroutine for pkg_manager_view; please refer to the
+        calmjs.bower.aio module.  Requires Python 3.7 or later.
+        """
+
+        return _import_aio().view(self, package_names, **kw)
+
+    def pkg_manager_init_async(self, package_names, **kw):
+        """
+        Return the coroutine for pkg_manager_init; please refer to the
+        calmjs.bower.aio module.  Requires Python 3.7 or later.
+        """
+
+        return _import_aio().init(self, package_names, **kw)
+
+    def pkg_manager_install_async(self, package_names=None, **kw):
+        """
+        Return the coroutine for pkg_manager_install; please refer to
+        the calmjs.bower.aio module.  Requires Python 3.7 or later.
+        """
+
+        return _import_aio().install(self, package_names, **kw)
+
+    def _cache_lock_names(self, endpoints=()):
+        # the names of the packages to be installed, which are either
+        # the ones specified as endpoints or declared by the package
+        # definition file; the ones only required by those cannot be
+        # known before bower resolves them.
+        if endpoints:
+            return sorted(set(
+                endpoint.split('=', 1)[0].split('#', 1)[0]
+                for endpoint in endpoints
+            ))
+        try:
+            pkgdef_json = self.read_pkgdef()
+        except (IOError, OSError, ValueError):
+            return []
+        names = set()
+        for key in ('dependencies', 'devDependencies'):
+            names.update(pkgdef_json.get(key) or {})
+        return sorted(names)
+
+    def _acquire_cache_lock(self, endpoints=()):
+        # returns the acquired locks, which must be released; None if
+        # no cache_lock is set.
+        if not self.cache_lock:
+            return None
+        from calmjs.bower.locks import PackageLocks
+        names = self._cache_lock_names(endpoints)
+        with self.span('cache_lock', packages=len(names)):
+            lock = PackageLocks(self.cache_lock, names)
+            lock.acquire()
+        return lock
+
+    @contextmanager
+    def _hold_cache_lock(self, endpoints=()):
+        lock = self._acquire_cache_lock(endpoints)
+        try:
+            yield
+        finally:
+            if lock is not None:
+                lock.release()
+
+    @timed('lock')
+    def pkg_manager_lock(
+            self, package_names=None, args=(), env={}, stream=None, **kw):
+        """
+        Install the packages through pkg_manager_install, and then write
+        the exact versions, sources and digests of the contents of the
+        installed packages into the lock file in the working directory.
+
+        Returns the lock, or None if the installation failed.
+
+        Please refer to pkg_manager_install for details on the rest of
+        the arguments.
+        """
+
+        from calmjs.bower.lock import BOWER_LOCK
+        from calmjs.bower.lock import make_lock
+        from calmjs.bower.lock import write_lock
+
+        if not self.pkg_manager_install(
+                package_names, args=args, env=env, **kw):
+            logger.error(
+                "not writing '%s' as the installation failed", BOWER_LOCK)
+            return None
+
+        try:
+            pkgdef_json = self.read_pkgdef()
+        except (IOError, OSError, ValueError) as e:
+            logger.error(
+                "not writing '%s' as '%s' is unreadable: %s",
+                BOWER_LOCK, self.pkgdef_filename, e,
+            )
+            return None
+
+        with self.span('write_lock') as span:
+            lock = make_lock(self.get_bower_components_dir(), pkgdef_json)
+            path = self.join_cwd(BOWER_LOCK)
+            write_lock(path, lock)
+            span['packages'] = len(lock['dependencies'])
+        logger.info(
+            "wrote '%s' with %d locked package(s)",
+            path, len(lock['dependencies']),
+        )
+        if stream:
+            self.dump(lock, stream)
+            stream.write('\n')
+        return lock
+
+    @timed('export')
+    def pkg_manager_export(
+            self, package_names, export_dir=None, globs=(), link=True,
+            hashed=False, **kw):
+        """
+        Reduce the components directory to the files referenced by the
+        bower_components extras declared by the Python packages and their
+        dependencies, plus the ones matching globs.  Glob patterns may
+        also be declared as the paths within those extras.
+
+        If export_dir is set, only those files are placed into there (as
+        hardlinks where possible if link is set, otherwise as copies),
+        with the components directory left as is; the files placed in
+        there by a previous export that are no longer referenced are
+        removed, but nothing else.  Otherwise, all other files within
+        the components directory are removed, other than the metadata of
+        the installed packages and the ones written by this driver.
+
+        If hashed is set, the files are exported under filenames with
+        the digest of their contents embedded, along with a manifest
+        that maps the original paths to those; this requires export_dir.
+
+        Returns the list of the paths of the files relative to the
+        components directory (or the manifest, if hashed), or None if
+        nothing was done.
+        """
+
+        from calmjs.bower.hashed import export_hashed
+        from calmjs.bower.prune import collect_files
+        from calmjs.bower.prune import export_files
+        from calmjs.bower.prune import prune_components
+        from calmjs.bower.zipped import flatten_dists_extras_calmjs
+
+        pkg_names, malformed = convert_package_names(package_names)
+        if malformed:
+            raise ValueError(
+                'malformed package name(s) specified: %s' % ', '.join(
+                    malformed))
+
+        if hashed and not export_dir:
+            logger.error("an export directory is required for hashed export")
+            return None
+
+        components_dir = self.get_bower_components_dir()
+        if not isdir(components_dir):
+            logger.error(
+                "components directory '%s' does not exist", components_dir)
+            return None
+
+        with self.span('resolve_dists') as span:
+            if self.index:
+                dists = self.index.find_dists(pkg_names, False)
+            else:
+                dists = find_packages_requirements_dists(pkg_names)
+            span['dists'] = len(dists)
+
+        with self.span('flatten_extras', dists=len(dists)):
+            extras = flatten_dists_extras_calmjs(
+                dists, read=self.index.read if self.index else None)
+
+        with self.span('collect') as span:
+            paths = list((extras.get(BOWER_COMPONENTS) or {}).values())
+            files, missing = collect_files(components_dir, paths, globs)
+            span['files'] = len(files)
+
+        for path in missing:
+            logger.warning(
+                "'%s' declared for '%s' matched nothing within '%s'",
+                path, BOWER_COMPONENTS, components_dir,
+            )
+        if not files:
+            logger.error(
+                "no files within '%s' are referenced by the '%s' extras "
+                "for {%s}", components_dir, BOWER_COMPONENTS,
+                ', '.join(pkg_names),
+            )
+            return None
+
+        if hashed:
+            export_dir = self.join_cwd(export_dir)
+            with self.span('place', files=len(files)) as span:
+                manifest, index = export_hashed(
+                    components_dir, files, export_dir, link=link)
+                span['digested'] = index.misses
+            logger.info(
+                "exported %d file(s) from '%s' into '%s' with hashed "
+                "filenames, %d of which were digested",
+                len(files), components_dir, export_dir, index.misses,
+            )
+            return manifest
+        elif export_dir:
+            export_dir = self.join_cwd(export_dir)
+            with self.span('place', files=len(files)) as span:
+                span['removed'] = removed = export_files(
+                    components_dir, files, export_dir, link=link)
+            logger.info(
+                "exported %d file(s) from '%s' into '%s', removing %d "
+                "file(s) from the previous export",
+                len(files), components_dir, export_dir, removed,
+            )
+        else:
+            with self.span('prune') as span:
+                span['removed'] = removed = prune_components(
+                    components_dir, files)
+            logger.info(
+                "pruned %d file(s) from '%s', keeping %d",
+                removed, components_dir, len(files),
+            )
+        return files
+
+    @timed('verify')
+    def pkg_manager_verify(self, package_names=None, **kw):
+        """
+        Verify the files within the components directory against the
+        manifest recorded at installation time (please refer to the
+        record argument for pkg_manager_install), logging the files
+        that are missing, extra or modified.
+
+        The package_names argument is accepted for the consistency
+        with the other actions, as the verification is done against the
+        recorded manifest alone.
+
+        Returns True if the files match the manifest, False if not.
+        """
+
+        from calmjs.bower.verify import EXTRA as VERIFY_EXTRA
+        from calmjs.bower.verify import FILES_MANIFEST
+        from calmjs.bower.verify import MISSING as VERIFY_MISSING
+        from calmjs.bower.verify import MODIFIED as VERIFY_MODIFIED
+        from calmjs.bower.verify import ManifestError
+        from calmjs.bower.verify import read_manifest
+        from calmjs.bower.verify import verify_manifest
+
+        components_dir = self.get_bower_components_dir()
+        try:
+            manifest = read_manifest(join(components_dir, FILES_MANIFEST))
+        except ManifestError as e:
+            logger.error("unable to verify '%s': %s", components_dir, e)
+            return False
+
+        with self.span('verify', files=len(manifest['files'])) as span:
+            report = verify_manifest(
+                components_dir, manifest, exclude=(INSTALL_STAMP,),
+                jobs=self.jobs,
+            )
+            span.update({key: len(value) for key, value in report.items()})
+
+        drifted = False
+        for key in (VERIFY_MISSING, VERIFY_EXTRA, VERIFY_MODIFIED):
+            for rel in report[key]:
+                drifted = True
+                logger.error("%s file in '%s': '%s'", key, components_dir, rel)
+        if drifted:
+            logger.error(
+                "'%s' does not match its manifest: %d missing, %d extra, "
+                "%d modified", components_dir, len(report[VERIFY_MISSING]),
+                len(report[VERIFY_EXTRA]), len(report[VERIFY_MODIFIED]),
+            )
+            return False
+        logger.info(
+            "verified %d file(s) in '%s'",
+            len(manifest['files']), components_dir,
+        )
+        return True
+
+    @timed('mirror')
+    def pkg_manager_mirror(
+            self, package_names=None, mirror_dir=None, fetcher=None,
+            explicit=False, dry_run=False, stream=None, **kw):
+        """
+        Mirror every bower package declared within the package
+        definition file generated for package_names, or within the ones
+        of every distribution in the working set if package_names is
+        None, along with their dependencies, into mirror_dir; please
+        refer to calmjs.bower.mirror for details.  The mirror may then
+        be used as the package store for the installations.
+
+        Arguments:
+
+        package_names
+            The Python package names, or None for the working set.
+        mirror_dir
+            The directory of the mirror.
+        fetcher
+            The calmjs.bower.mirror.Fetcher for the upstream source of
+            the packages; defaults to a RegistryFetcher, through the
+            registry proxy if a registry_cache is set.
+        explicit
+            If set, the requirements of package_names are not included.
+        dry_run
+            If set, only report the packages that would be fetched into
+            mirror_dir; please refer to calmjs.bower.mirror.Mirror.
+        stream
+            If provided, the report is also written to it.
+
+        Returns the report of the mirrored packages, or None if any of
+        the declared packages could not be mirrored.
+        """
+
+        from calmjs.bower.mirror import Mirror
+        from calmjs.bower.mirror import RegistryFetcher
+        from calmjs.bower.mirror import pkgdef_declarations
+        from calmjs.bower.mirror import working_set_declarations
+
+        if not mirror_dir:
+            logger.error("a mirror directory is required")
+            return None
+
+        with self.span('collect') as span:
+            if package_names is None:
+                declarations = working_set_declarations(
+                    self.pkgdef_filename, self.dep_keys)
+            else:
+                declarations = pkgdef_declarations(
+                    self.pkg_manager_view(package_names, explicit=explicit),
+                    self.dep_keys,
+                )
+            span['declarations'] = len(declarations)
+
+        mirror_dir = self.join_cwd(mirror_dir)
+        if fetcher is None:
+            registry = self.get_registry_url()
+            fetcher = RegistryFetcher(
+                registry, archives=registry + '/archives',
+            ) if registry else RegistryFetcher()
+        mirror = Mirror(mirror_dir, fetcher, self.jobs)
+        with self.span('fetch', dry_run=dry_run) as span:
+            report = mirror.mirror(declarations, dry_run=dry_run)
+            span['packages'] = count = sum(
+                len(versions) for versions in report['packages'].values())
+            span['fetched'] = report['fetched']
+
+        if dry_run:
+            logger.info(
+                "%d package(s) would be mirrored into '%s', %d of which "
+                "would be fetched", count, mirror_dir, report['fetched'],
+            )
+        else:
+            logger.info(
+                "mirrored %d package(s) into '%s', %d of which were "
+                "fetched", count, mirror_dir, report['fetched'],
+            )
+        if stream:
+            self.dump(report, stream)
+            stream.write('\n')
+        if report['missing']:
+            logger.error(
+                "unable to mirror %d declared package(s) into '%s'",
+                len(report['missing']), mirror_dir,
+            )
+            return None
+        return report
+
+    def link_shared_store(self, shared_store):
+        """
+        Move the packages installed in the components directory into the
+        shared_store, replacing them with links to the stored files.
+        """
+
+        from calmjs.bower.shared import SharedStore
+
+        components_dir = self.get_bower_components_dir()
+        try:
+            with self.span('link_shared_store') as span:
+                names = SharedStore(shared_store).relink_components(
+                    components_dir)
+                span['packages'] = len(names)
+        except (IOError, OSError) as e:
+            logger.warning(
+                "unable to link '%s' with shared store '%s': %s",
+                components_dir, shared_store, e,
+            )
+        else:
+            logger.info(
+                "linked %d package(s) in '%s' with shared store '%s'",
+                len(names), components_dir, shared_store,
+            )
+
+
+def _create_cli_driver(cls):
+    """
+    Create the default driver for the bower command; the friendly
+    exported names at the module level are proxies to this.
+    """
+
+    return Driver.create_for_module_vars({})
+
+
+def _create_runtime(cls):
+    """
+    Create the default runtime for the bower command.
+    """
+
+    from calmjs.bower.runtime import BowerRuntime
+    return BowerRuntime(
+        cls.cli_driver, package_name='calmjs.bower',
+        description='bower support for the calmjs framework',
+    )
+
+
+def _create_user_options(cls):
+    cls._initialize_user_options()
+    return cls.user_options
+
+
+# Subclassing object ensures this is a new-style class under Python 2,
+# as that is required for the lazy class attributes.
+class bower(PackageManagerCommand, object):
+    """
+    The bower specific setuptools command.
+    """
+
+    # As this module is imported by setuptools through its entry points
+    # for every invocation of setup.py, the driver, runtime and options
+    # are only constructed when they are first accessed.
+    cli_driver = lazy_class_attribute('cli_driver', _create_cli_driver)
+    runtime = lazy_class_attribute('runtime', _create_runtime)
+    user_options = lazy_class_attribute('user_options', _create_user_options)
+    description = DESCRIPTION
+    actions = PackageManagerCommand.actions + ('lock', 'export', 'verify')
+
+    @classmethod
+    def _initialize_user_options(cls):
+        cls.user_options = []
+        for full, short, desc in cls.runtime.pkg_manager_options:
+            if full in cls.actions:
+                cls.user_options.append((full, short, 'action: ' + desc))
+            else:
+                cls.user_options.append((full, short, desc))
+        for full, metavar, desc in cls.runtime.pkg_manager_value_options:
+            cls.user_options.append((full + '=', None, desc))
+
+    def _opt_keys(self):
+        for opt in self.user_options:
+            yield opt[0].rstrip('=').replace('-', '_')
+
+    def finalize_options(self):
+        if self.why or self.mirror:
+            # these are done in place of the view, and of every other
+            # action, through the same flow as the parent.
+            for key in self.actions:
+                setattr(self, key, key == 'view')
+        if self.lock:
+            # locking is done as part of the installation.
+            self.install = True
+        super(bower, self).finalize_options()
+
+    def run(self):
+        super(bower, self).run()
+        if self.export and not self.dry_run:
+            self.do_export()
+        if self.verify and not self.do_verify():
+            raise DistutilsError(
+                "'%s' does not match its recorded manifest" % (
+                    self.cli_driver.get_bower_components_dir()))
+
+    def do_view(self):
+        if self.why:
+            return self.do_why()
+        if self.mirror:
+            return self.do_mirror()
+        pkg_name = self.distribution.get_name()
+        self.cli_driver.pkg_manager_view(
+            pkg_name, stream=self.stream, timings=self.timings)
+
+    def do_init(self):
+        pkg_name = self.distribution.get_name()
+        self.cli_driver.pkg_manager_init(
+            pkg_name,
+            overwrite=self.overwrite, merge=self.merge,
+            interactive=self.interactive,
+            stream=self.stream,
+            timings=self.timings,
+        )
+
+    def do_install(self):
+        pkg_name = self.distribution.get_name()
+        install = (
+            self.cli_driver.pkg_manager_lock if self.lock else
+            self.cli_driver.pkg_manager_install
+        )
+        install(
+            pkg_name,
+            overwrite=self.overwrite, merge=self.merge,
+            interactive=self.interactive,
+            incremental=self.incremental,
+            frozen=self.frozen,
+            delta=self.delta,
+            record=self.record,
+            progress=self.progress,
+            timings=self.timings,
+            package_store=self.package_store or None,
+            shared_store=self.shared_store or None,
+            stream=self.stream,
+        )
+
+    def do_export(self):
+        pkg_name = self.distribution.get_name()
+        self.cli_driver.pkg_manager_export(
+            pkg_name,
+            export_dir=self.export_dir or None,
+            hashed=self.hashed,
+            timings=self.timings,
+        )
+
+    def do_why(self):
+        self.cli_driver.pkg_manager_why(
+            self.why, self.distribution.get_name(), stream=self.stream,
+            timings=self.timings,
+        )
+
+    def do_mirror(self):
+        if not self.cli_driver.pkg_manager_mirror(
+                self.distribution.get_name(), mirror_dir=self.mirror,
+                dry_run=self.dry_run, stream=self.stream,
+                timings=self.timings):
+            raise DistutilsError(
+                "unable to mirror the declared packages into '%s'" % (
+                    self.mirror))
+
+    def do_verify(self):
+        return self.cli_driver.pkg_manager_verify(
+            self.distribution.get_name(), timings=self.timings)
+
+
+# The friendly exported names, which will lazily construct the default
+# driver on first use.
+
+def get_bower_version():
+    return bower.cli_driver.get_pkg_manager_version()
+
+
+def bower_view(*a, **kw):
+    return bower.cli_driver.pkg_manager_view(*a, **kw)
+
+
+def bower_init(*a, **kw):
+    return bower.cli_driver.pkg_manager_init(*a, **kw)
+
+
+def bower_install(*a, **kw):
+    return bower.cli_driver.pkg_manager_install(*a, **kw)
+
+
+def bower_lock(*a, **kw):
+    return bower.cli_driver.pkg_manager_lock(*a, **kw)
+
+
+def bower_export(*a, **kw):
+    return bower.cli_driver.pkg_manager_export(*a, **kw)
+
+
+def bower_verify(*a, **kw):
+    return bower.cli_driver.pkg_manager_verify(*a, **kw)
+
+
+def bower_why(*a, **kw):
+    return bower.cli_driver.pkg_manager_why(*a, **kw)
+
+
+def bower_mirror(*a, **kw):
+    return bower.cli_driver.pkg_manager_mirror(*a, **kw)
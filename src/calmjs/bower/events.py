@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""
+Streaming of the structured output from bower.
+
+When invoked with ``--json``, bower writes its log entries to stderr as
+a JSON array of objects, e.g.::
+
+    [
+    {"level": "action", "id": "resolve", "message": "...", "data": {}},
+    {"level": "error", "id": "error", "code": "ENOTFOUND", ...}
+    ]
+
+with the final result written to stdout once everything is done.  The
+entries are decoded as they are written, such that they can be acted on
+as the installation progresses (e.g. for reporting the progress, or for
+the termination of the process at the first error).
+"""
+
+from __future__ import absolute_import
+
+import codecs
+import json
+import logging
+import os
+from subprocess import PIPE
+from subprocess import Popen
+from tempfile import TemporaryFile
+
+from calmjs.bower.timings import timer
+
+logger = logging.getLogger(__name__)
+
+ERROR = 'error'
+SEPARATORS = '[],\r\n\t '
+CHUNK_SIZE = 1 << 14
+
+
+class JsonStreamDecoder(object):
+    """
+    Incremental decoder of the JSON objects within a stream of text,
+    such as the entries of a JSON array that is still being written.
+    Text outside of the objects that is not part of the array (e.g.
+    warnings from Node.js) is skipped by the line.
+    """
+
+    def __init__(self):
+        self.buffer = ''
+        self.decoder = json.JSONDecoder()
+
+    def feed(self, text):
+        """
+        Feed the text into the decoder, returning the list of the
+        objects completed by that.
+        """
+
+        buf = self.buffer + text
+        pos = 0
+        results = []
+        while True:
+            while pos < len(buf) and buf[pos] in SEPARATORS:
+                pos += 1
+            if pos >= len(buf):
+                break
+            if buf[pos] != '{':
+                end = buf.find('\n', pos)
+                if end < 0:
+                    break
+                logger.debug("skipping non-JSON output: %r", buf[pos:end])
+                pos = end + 1
+                continue
+            try:
+                value, pos = self.decoder.raw_decode(buf, pos)
+            except ValueError:
+                # incomplete, wait for more.
+                break
+            results.append(value)
+        self.buffer = buf[pos:]
+        return results
+
+    def close(self):
+        """
+        Signal the end of the stream.  Raises ValueError if there are
+        any incomplete objects left.
+        """
+
+        leftover = self.buffer.strip(SEPARATORS)
+        self.buffer = ''
+        if leftover.startswith('{'):
+            raise ValueError(
+                'incomplete JSON object at end of stream: %r' % leftover[:80])
+
+
+class EventStream(object):
+    """
+    Run a command that writes a JSON array of log entries to stderr,
+    such as ``bower --json``, providing them as an iterable of events
+    as they are written.  Every event is annotated with the number of
+    seconds elapsed since the start of the command as ``elapsed``.
+
+    Once the iteration is completed, the returncode of the command will
+    be available, along with the result that it wrote to stdout as
+    decoded JSON (or None if it did not write anything that could be
+    decoded), and the first error event if there was any.
+    """
+
+    def __init__(self, cmd, fail_fast=True, **popen_kw):
+        """
+        Arguments:
+
+        cmd
+            The command to run.
+        fail_fast
+            If True, the command is terminated at the first event with
+            the error level, which will be the last event provided.
+        popen_kw
+            Further keyword arguments for subprocess.Popen.
+        """
+
+        self.cmd = cmd
+        self.fail_fast = fail_fast
+        self.popen_kw = popen_kw
+        self.returncode = None
+        self.result = None
+        self.error = None
+
+    def __iter__(self):
+        stdout = TemporaryFile()
+        start = timer()
+        proc = Popen(self.cmd, stdout=stdout, stderr=PIPE, **self.popen_kw)
+        text_decoder = codecs.getincrementaldecoder('utf8')('replace')
+        decoder = JsonStreamDecoder()
+        try:
+            fd = proc.stderr.fileno()
+            for chunk in iter(lambda: os.read(fd, CHUNK_SIZE), b''):
+                for event in decoder.feed(text_decoder.decode(chunk)):
+                    event['elapsed'] = round(timer() - start, 6)
+                    if event.get('level') == ERROR and self.error is None:
+                        self.error = event
+                    yield event
+                    if self.error is not None and self.fail_fast:
+                        return
+            decoder.feed(text_decoder.decode(b'', True))
+            try:
+                decoder.close()
+            except ValueError as e:
+                # e.g. the command was killed while writing; its return
+                # code will be reported as usual.
+                logger.warning(
+                    "ignoring the incomplete output of '%s': %s",
+                    self.cmd[0], e,
+                )
+        finally:
+            if proc.poll() is None:
+                proc.terminate()
+            proc.stderr.close()
+            self.returncode = proc.wait()
+            stdout.seek(0)
+            try:
+                self.result = json.loads(stdout.read().decode('utf8'))
+            except ValueError:
+                pass
+            stdout.close()
+
+    def run(self, callback=None):
+        """
+        Consume all the events, passing them to callback if provided.
+        Returns the returncode, which is never 0 if there was an error.
+        """
+
+        for event in self:
+            if callback:
+                callback(event)
+        if self.error is not None and not self.returncode:
+            self.returncode = 1
+        return self.returncode
+
+
+def package_name(event):
+    """
+    Return the name of the package that the event is about, or None.
+    """
+
+    data = event.get('data')
+    if not isinstance(data, dict):
+        return None
+    endpoint = data.get('endpoint')
+    if isinstance(endpoint, dict):
+        return endpoint.get('name') or endpoint.get('source')
+    pkg_meta = data.get('pkgMeta')
+    if isinstance(pkg_meta, dict):
+        return pkg_meta.get('name')
+    return None
+
+
+class PackageTimings(object):
+    """
+    A callback for the events that tracks the elapsed times between the
+    first and the last event for each package.
+    """
+
+    def __init__(self):
+        self.packages = {}
+
+    def __call__(self, event):
+        name = package_name(event)
+        if name is None:
+            return
+        first, last = self.packages.get(name, (event['elapsed'],) * 2)
+        self.packages[name] = (first, event['elapsed'])
+
+    def durations(self):
+        return {
+            name: round(last - first, 6)
+            for name, (first, last) in self.packages.items()
+        }
+
+
+def log_event(event):
+    """
+    Log the event, with the errors at the error level and everything
+    else at the info level.
+    """
+
+    if event.get('level') == ERROR:
+        logger.error(
+            "bower error %s: %s", event.get('code'), event.get('message'))
+        return
+    name = package_name(event)
+    logger.info(
+        "bower %s%s %s", name + ' ' if name else '', event.get('id'),
+        event.get('message'),
+    )
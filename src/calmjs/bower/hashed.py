@@ -0,0 +1,186 @@
+# -*- coding: utf-8 -*-
+"""
+Export of the referenced files with content hashed filenames.
+
+The files are placed into the export directory with the digest of their
+contents embedded into their filenames (e.g. ``jquery/dist/jquery.js``
+becomes ``jquery/dist/jquery.0123456789ab.js``), such that they may be
+served with far future expiry headers, along with a JSON manifest that
+maps the original paths to the hashed ones.
+
+The digests are recorded in a persistent index next to the components
+directory against the size and the modification time of the source
+files, so that unchanged files are not read again on later exports, and
+as the hashed filenames are derived from the contents, files already
+placed are left untouched.  Only the files listed by the manifest of the
+previous export are removed from the export directory.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import json
+import logging
+import os
+from os.path import dirname
+from os.path import exists
+from os.path import join
+from os.path import realpath
+from os.path import splitext
+
+from calmjs.bower.cache import replace
+from calmjs.bower.prune import place_file
+from calmjs.bower.prune import remove_files
+from calmjs.bower.shared import file_digest
+
+logger = logging.getLogger(__name__)
+
+MANIFEST_FILENAME = 'manifest.json'
+DIGEST_INDEX_FILENAME = '.calmjs-bower-digests.json'
+HASH_LENGTH = 12
+
+
+def hashed_name(rel, digest, length=HASH_LENGTH):
+    """
+    Return the relative path with the leading characters of the digest
+    inserted before the extension of the filename.
+    """
+
+    head, sep, filename = rel.rpartition('/')
+    base, ext = splitext(filename)
+    if not base:
+        # dotfiles have no extension.
+        base, ext = ext, ''
+    return '%s%s%s.%s%s' % (head, sep, base, digest[:length], ext)
+
+
+class DigestIndex(object):
+    """
+    The digests of the files, keyed by their relative paths, recorded
+    against their sizes and modification times.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.entries = {}
+        self.hits = 0
+        self.misses = 0
+        self.load()
+
+    def load(self):
+        try:
+            with open(self.path) as fd:
+                entries = json.load(fd)
+        except (IOError, OSError, ValueError):
+            logger.debug("no usable digest index at '%s'", self.path)
+            return
+        if isinstance(entries, dict):
+            self.entries = entries
+
+    def digest(self, rel, path):
+        """
+        Return the digest of the file at path, which is only read if
+        its size or modification time differ from what was recorded for
+        rel.
+        """
+
+        st = os.stat(path)
+        identity = [st.st_size, repr(st.st_mtime)]
+        entry = self.entries.get(rel)
+        if isinstance(entry, list) and entry[:2] == identity:
+            self.hits += 1
+            return entry[2]
+        self.misses += 1
+        digest = file_digest(path)
+        self.entries[rel] = identity + [digest]
+        return digest
+
+    def save(self, keep=None):
+        """
+        Write the index, only retaining the entries for keep if that is
+        specified.
+        """
+
+        if keep is not None:
+            keep = set(keep)
+            self.entries = {
+                k: v for k, v in self.entries.items() if k in keep}
+        with open(self.path + '.tmp', 'w') as fd:
+            json.dump(self.entries, fd, sort_keys=True)
+        replace(self.path + '.tmp', self.path)
+
+
+def read_manifest(path):
+    """
+    Return the manifest at path, or an empty one if unavailable.
+    """
+
+    try:
+        with open(path) as fd:
+            manifest = json.load(fd)
+    except (IOError, OSError, ValueError):
+        return {}
+    return manifest if isinstance(manifest, dict) else {}
+
+
+def get_index_path(components_dir):
+    """
+    Return the path to the digest index for the components directory,
+    which is kept next to it.
+    """
+
+    return join(dirname(realpath(components_dir)), DIGEST_INDEX_FILENAME)
+
+
+def write_manifest(path, manifest):
+    """
+    Write the manifest to path.
+    """
+
+    with open(path + '.tmp', 'w') as fd:
+        json.dump(
+            manifest, fd, indent=2, sort_keys=True, separators=(',', ': '))
+        fd.write('\n')
+    replace(path + '.tmp', path)
+
+
+def export_hashed(
+        components_dir, files, output_dir, link=True, index_path=None):
+    """
+    Place the files from the components directory into output_dir
+    under their content hashed filenames, as hardlinks if link is set
+    and possible, otherwise as copies, and write the manifest.  The
+    files listed by the previous manifest that are no longer in the
+    new one are removed; everything else within output_dir is left
+    untouched.
+
+    The digests are kept in the index at index_path, which defaults to
+    the one next to the components directory.
+
+    Returns a tuple of the manifest and the index used.
+    """
+
+    index = DigestIndex(index_path or get_index_path(components_dir))
+    manifest_path = join(output_dir, MANIFEST_FILENAME)
+    previous = read_manifest(manifest_path)
+    manifest = {}
+    for rel in files:
+        src = realpath(join(components_dir, *rel.split('/')))
+        target = manifest[rel] = hashed_name(rel, index.digest(rel, src))
+        dst = join(output_dir, *target.split('/'))
+        if exists(dst):
+            # same name means same contents.
+            continue
+        try:
+            os.makedirs(dirname(dst))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        place_file(src, dst, link)
+
+    write_manifest(manifest_path, manifest)
+    index.save(keep=files)
+    remove_files(output_dir, set(
+        target for target in previous.values() if hasattr(target, 'split')
+    ) - set(manifest.values()))
+    return manifest, index
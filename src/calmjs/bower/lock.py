@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+"""
+Lock file support for calmjs.bower.
+
+A lock file records the exact versions, the sources and the digests of
+the contents of every package installed into the bower components
+directory, such that the same tree can be installed again without any
+version resolution.
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import logging
+import os
+from os.path import isdir
+from os.path import join
+from os.path import relpath
+
+from calmjs.bower.cache import digest_key
+from calmjs.bower.cache import replace
+from calmjs.bower.native import BOWER_META
+from calmjs.bower.shared import file_digest
+
+logger = logging.getLogger(__name__)
+
+BOWER_LOCK = 'bower.lock'
+LOCK_VERSION = 1
+
+
+class LockError(ValueError):
+    """
+    Raised when a lock file is missing, invalid or out of date.
+    """
+
+
+def tree_digest(path, exclude=(BOWER_META,)):
+    """
+    Return the digest of the contents of the directory at path, derived
+    from the relative paths and the contents of all the files within.
+    """
+
+    entries = []
+    for root, dirs, filenames in os.walk(path):
+        for filename in filenames:
+            target = join(root, filename)
+            rel = relpath(target, path).replace(os.sep, '/')
+            if rel in exclude:
+                continue
+            entries.append('%s\0%s\n' % (rel, file_digest(target)))
+
+    h = hashlib.sha256()
+    for entry in sorted(entries):
+        h.update(entry.encode('utf8'))
+    return 'sha256-' + h.hexdigest()
+
+
+def pkgdef_digest(pkgdef_json):
+    """
+    Return the digest of the canonical form of the package definition.
+    """
+
+    return 'sha256-' + digest_key(pkgdef_json)
+
+
+def lock_entry(target):
+    """
+    Return the lock entry for the installed package directory at target,
+    or None if it does not have the metadata written by bower (or the
+    native installer).
+    """
+
+    try:
+        with open(join(target, BOWER_META)) as fd:
+            meta = json.load(fd)
+    except (IOError, OSError, ValueError):
+        return None
+
+    version = meta.get('_release')
+    if not version:
+        return None
+    return {
+        'version': version,
+        'source': meta.get('_source'),
+        'endpoint': meta.get('_originalSource') or meta.get('name'),
+        'target': meta.get('_target'),
+        'resolution': meta.get('_resolution'),
+        'digest': tree_digest(target),
+    }
+
+
+def make_lock(components_dir, pkgdef_json):
+    """
+    Produce the lock for the packages installed in components_dir that
+    were installed for the provided package definition.
+    """
+
+    dependencies = {}
+    if isdir(components_dir):
+        for name in sorted(os.listdir(components_dir)):
+            if name.startswith('.'):
+                continue
+            entry = lock_entry(join(components_dir, name))
+            if entry is None:
+                logger.warning(
+                    "'%s' in '%s' has no installation metadata; not locked",
+                    name, components_dir,
+                )
+                continue
+            dependencies[name] = entry
+
+    return {
+        'lockVersion': LOCK_VERSION,
+        'pkgdef': pkgdef_digest(pkgdef_json),
+        'dependencies': dependencies,
+    }
+
+
+def read_lock(path):
+    """
+    Read the lock file at path.  Raises LockError if it cannot be read
+    or is not a supported lock file.
+    """
+
+    try:
+        with open(path) as fd:
+            lock = json.load(fd)
+    except (IOError, OSError, ValueError) as e:
+        raise LockError("unable to read lock file '%s': %s" % (path, e))
+
+    if not isinstance(lock, dict) or lock.get('lockVersion') != LOCK_VERSION:
+        raise LockError("unsupported lock file '%s'" % path)
+    return lock
+
+
+def write_lock(path, lock):
+    """
+    Write the lock to path.
+    """
+
+    with open(path + '.tmp', 'w') as fd:
+        json.dump(lock, fd, indent=2, sort_keys=True, separators=(',', ': '))
+        fd.write('\n')
+    replace(path + '.tmp', path)
+
+
+def verify_lock(components_dir, lock):
+    """
+    Verify the packages installed in components_dir against the lock.
+    Returns a list of the names of the mismatched packages.
+    """
+
+    mismatched = []
+    for name, entry in sorted(lock['dependencies'].items()):
+        target = join(components_dir, name)
+        if not isdir(target) or tree_digest(target) != entry['digest']:
+            mismatched.append(name)
+    return mismatched
+
+
+def lock_endpoints(lock):
+    """
+    Return the list of the bower endpoints for the locked packages, in
+    the form of ``name=source#version``.
+    """
+
+    return [
+        '%s=%s#%s' % (name, entry.get('endpoint') or name, entry['version'])
+        for name, entry in sorted(lock['dependencies'].items())
+    ]
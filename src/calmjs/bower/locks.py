@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Advisory file locks for coordinating concurrent installations.
+
+The locks are held on files (using flock where available), such that
+they are effective across both the threads and the processes on a host.
+
+The cache of bower is guarded by a lock for every package, held by the
+invocations of bower install for the packages they were invoked for
+for the whole duration of the invocation.  This is a coarse mutex
+between the projects, as bower writes into its cache itself: only the
+names explicitly declared (or passed as endpoints) are known before
+bower resolves them, so the transitive dependencies are not locked,
+and every project that declares any of the same names is serialized
+regardless of the versions required.  The packages added to a shared
+store, on the other hand, are locked per package@version.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import logging
+import os
+import re
+import tempfile
+import time
+from os.path import dirname
+from os.path import join
+
+try:  # pragma: no cover
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+    import msvcrt
+
+logger = logging.getLogger(__name__)
+
+CACHE_LOCK_ENV = 'CALMJS_BOWER_CACHE_LOCK'
+
+
+def get_cache_lock():
+    """
+    Return the path to the directory of the lock files that guard the
+    cache of bower on this host, as specified by the environment or the
+    default location within the temporary directory.
+    """
+
+    default = join(tempfile.gettempdir(), 'calmjs.bower-%s.locks' % (
+        getattr(os, 'getuid', lambda: 'user')()))
+    return os.environ.get(CACHE_LOCK_ENV) or default
+
+
+def package_lock_path(root, name):
+    """
+    Return the path to the lock file for the bower package name within
+    the directory of lock files at root.
+    """
+
+    return join(root, re.sub(r'[^\w.-]', '_', name) + '.lock')
+
+
+class FileLock(object):
+    """
+    An exclusive lock on the file at path, to be used as a context
+    manager.  The file (and its directory) is created if not present.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._fd = None
+
+    def acquire(self):
+        try:
+            os.makedirs(dirname(self.path))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o666)
+        try:
+            if fcntl is not None:
+                try:
+                    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except (IOError, OSError):
+                    logger.debug("waiting for lock '%s'", self.path)
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+            else:  # pragma: no cover
+                while True:
+                    try:
+                        msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+                        break
+                    except (IOError, OSError):
+                        time.sleep(0.1)
+        except Exception:
+            os.close(fd)
+            raise
+        self._fd = fd
+
+    def release(self):
+        fd, self._fd = self._fd, None
+        if fd is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+            else:  # pragma: no cover
+                os.lseek(fd, 0, os.SEEK_SET)
+                msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+        finally:
+            os.close(fd)
+
+    @property
+    def locked(self):
+        return self._fd is not None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+
+class PackageLocks(object):
+    """
+    The exclusive locks for the named packages within the directory of
+    lock files at root, to be used as a context manager.  The locks are
+    acquired in a sorted order, such that holders of overlapping sets
+    of packages will not deadlock.
+    """
+
+    def __init__(self, root, names):
+        self.locks = [FileLock(path) for path in sorted(set(
+            package_lock_path(root, name) for name in names))]
+
+    def acquire(self):
+        acquired = []
+        try:
+            for lock in self.locks:
+                lock.acquire()
+                acquired.append(lock)
+        except Exception:
+            for lock in reversed(acquired):
+                lock.release()
+            raise
+
+    def release(self):
+        for lock in reversed(self.locks):
+            lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
@@ -0,0 +1,72 @@
+# -*- coding: utf-8 -*-
+"""
+The standalone entry point for the bower runtime.
+
+Unlike ``calmjs bower``, which bootstraps the complete calmjs runtime
+and builds the argument parsers of every registered runtime before any
+of the arguments are parsed, only the parser of the bower runtime is
+built here.  The version information is reported before the driver or
+the runtime are constructed; as the calmjs.bower package only imports
+its driver on demand, that is done without importing pkg_resources,
+setuptools or the calmjs framework where importlib.metadata is
+available.
+"""
+
+from __future__ import absolute_import
+
+import sys
+import warnings
+
+PROG = 'bower'
+PACKAGE_NAME = 'calmjs.bower'
+VERSION_FLAGS = ('-V', '--version')
+
+
+def version_info(package_name=PACKAGE_NAME):
+    """
+    Return the version information for the package, in the same form
+    as reported by the calmjs runtime.
+    """
+
+    try:
+        from importlib import metadata
+    except ImportError:  # pragma: no cover
+        metadata = None
+
+    if metadata is None:  # pragma: no cover
+        from pkg_resources import Requirement
+        from pkg_resources import working_set
+        dist = working_set.find(Requirement.parse(package_name))
+        return '%s %s from %s' % (
+            getattr(dist, 'project_name', '?'),
+            getattr(dist, 'version', '?'),
+            getattr(dist, 'location', '?'),
+        )
+
+    try:
+        dist = metadata.distribution(package_name)
+    except metadata.PackageNotFoundError:
+        return '? ? from ?'
+    return '%s %s from %s' % (
+        dist.metadata['Name'], dist.version, dist.locate_file(''))
+
+
+def main(args=None):
+    """
+    Run the bower runtime with the arguments, which default to the ones
+    this program was invoked with, and exit with the resulting status.
+    """
+
+    args = sys.argv[1:] if args is None else list(args)
+    options = args[:args.index('--')] if '--' in args else args
+    if any(flag in VERSION_FLAGS for flag in options):
+        sys.stdout.write(version_info() + '\n')
+        sys.exit(0)
+
+    from calmjs.bower import bower
+
+    with warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        runtime = bower.runtime
+    runtime.argparser.prog = PROG
+    sys.exit(0 if runtime(args) else 1)
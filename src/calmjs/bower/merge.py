@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""
+Semver aware merging of the bower.json declared across distributions.
+
+The default flattening provided by calmjs simply has the declarations
+from the child distributions replace those from their parents.  Here
+the version ranges declared for every package are intersected across
+all the distributions instead, such that the merged declaration will
+satisfy all of them where possible.  Where that is not possible, the
+conflict is reported and a ``resolutions`` entry for the version range
+declared by the child is produced, such that bower will not prompt for
+one during installation.
+"""
+
+from __future__ import absolute_import
+
+import logging
+
+from calmjs.bower.semver import parse_range
+from calmjs.bower.zipped import read_dist_egginfo_json
+
+logger = logging.getLogger(__name__)
+
+RESOLUTIONS = 'resolutions'
+
+
+class RangeParser(object):
+    """
+    Parses the declared targets into ranges, with the results memoized
+    such that every distinct target is only parsed once.
+    """
+
+    def __init__(self):
+        self._memo = {}
+
+    def __call__(self, name, spec):
+        """
+        Return a tuple of the source and Range for the declared spec, or
+        None if it is not a semver range (e.g. a URL or a branch).
+        """
+
+        if not hasattr(spec, 'split'):
+            return None
+        if '#' in spec:
+            source, target = spec.split('#', 1)
+        else:
+            source, target = name, spec
+        if target not in self._memo:
+            try:
+                self._memo[target] = parse_range(target)
+            except ValueError:
+                self._memo[target] = None
+        if self._memo[target] is None:
+            return None
+        return source, self._memo[target]
+
+
+def merge_declarations(name, declarations, parse_spec):
+    """
+    Merge the list of (origin, spec) declarations for the package name,
+    ordered from the parents to the child.
+
+    Returns a tuple of the merged spec and whether they conflict.
+    """
+
+    final = declarations[-1][1]
+    if len(declarations) == 1:
+        return final, False
+
+    parsed = [parse_spec(name, spec) for origin, spec in declarations]
+    if None in parsed or len(set(source for source, r in parsed)) != 1:
+        # not something that can be merged, so the child wins.
+        logger.debug(
+            "unable to merge non-semver declarations for '%s'; using '%s'",
+            name, final,
+        )
+        return final, False
+
+    result = parsed[0][1]
+    for source, version_range in parsed[1:]:
+        result = result.intersect(version_range)
+    if result.empty:
+        return final, True
+
+    if str(result) == str(parsed[-1][1]):
+        # the child is already the narrowest, keep it as declared.
+        return final, False
+    merged = str(result)
+    if '#' in final:
+        merged = '%s#%s' % (parsed[-1][0], merged)
+    return merged, False
+
+
+def read_dists(dists, filename, read=None):
+    """
+    Read the json file from every distribution.  Returns a list of the
+    distributions with their json, which will be None if unavailable.
+    The zipped distributions are read through the shared cache of the
+    opened archives from calmjs.bower.zipped by default.
+    """
+
+    read = read or read_dist_egginfo_json
+    return [(dist, read(dist, filename)) for dist in dists]
+
+
+def merge_dists(entries, dep_keys, filename='bower.json'):
+    """
+    Merge the json read from the distributions, as returned by the
+    function read_dists, ordered from the parents to the child, with
+    the dependencies declared under the dep_keys merged using the
+    version ranges.
+
+    Returns a tuple of the flattened json and a list of the conflicts,
+    each being a dict with the name of the package, the dep_key, the
+    declarations as a list of [project_name, spec] and the resolution.
+    """
+
+    parse_spec = RangeParser()
+    declared = {dep: {} for dep in dep_keys}
+    resolutions = {}
+    obj = None
+
+    for dist, obj in entries:
+        if not obj:
+            continue
+
+        obj = dict(obj)
+        logger.debug("merging '%s' for required '%s'", filename, dist)
+        for dep in dep_keys:
+            for name, spec in (obj.get(dep) or {}).items():
+                if spec is None:
+                    # explicitly removed by this distribution.
+                    declared[dep].pop(name, None)
+                else:
+                    declared[dep].setdefault(name, []).append(
+                        (dist.project_name, spec))
+        resolutions.update(obj.get(RESOLUTIONS) or {})
+
+    conflicts = []
+    generated = {}
+    merged = {dep: {} for dep in dep_keys}
+    for dep in dep_keys:
+        for name, declarations in sorted(declared[dep].items()):
+            spec, conflict = merge_declarations(
+                name, declarations, parse_spec)
+            merged[dep][name] = spec
+            if not conflict:
+                continue
+            resolution = resolutions.get(name, generated.get(
+                name, spec.split('#', 1)[-1]))
+            conflicts.append({
+                'name': name,
+                'key': dep,
+                'declarations': [list(d) for d in declarations],
+                'resolution': resolution,
+            })
+            if name not in resolutions:
+                generated[name] = resolution
+
+    if obj is None:
+        # top level object does not have egg-info defined
+        return merged, conflicts
+
+    obj.update(merged)
+    resolutions.update(generated)
+    if resolutions:
+        obj[RESOLUTIONS] = resolutions
+    return obj, conflicts
+
+
+def flatten_dists(dists, filename, dep_keys, read=None):
+    """
+    Flatten the json file from the list of distributions; please refer
+    to the function merge_dists for details.
+    """
+
+    return merge_dists(
+        read_dists(dists, filename, read), dep_keys, filename=filename)
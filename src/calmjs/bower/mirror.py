@@ -0,0 +1,621 @@
+# -*- coding: utf-8 -*-
+"""
+Offline mirror of the bower packages declared within a working set.
+
+Every bower package declared through the bower.json of the specified
+Python packages (or of every distribution within the working set) is
+resolved against an upstream source, along with the packages that
+those depend on, and each of the resolved versions is fetched once
+into a local mirror.  The mirror is laid out as a package store for
+the native installer (please refer to calmjs.bower.native), such that
+the installations done later with the mirror as the package store are
+served entirely from the local disk::
+
+    <mirror>/<name>/<tag>.tar.gz
+    <mirror>/index.json
+
+The compact index maps the name of every mirrored package to its
+versions, with the tag, size and sha256 digest of their archives.
+
+The upstream source is provided by a fetcher, which by default looks
+up the git repositories of the packages through the bower registry, as
+specified by the ``bower_registry`` environment variable, as bower
+does.  Fetching is done in parallel; the archives are downloaded into
+``.part`` files that are resumed where possible, and they are only
+moved into place once complete, such that an interrupted run may simply
+be restarted.  Usage::
+
+    $ python -m calmjs.bower.mirror ~/bower-mirror example.package
+    $ python -m calmjs.bower.mirror --jobs 16 ~/bower-mirror
+"""
+
+from __future__ import absolute_import
+
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import tarfile
+import tempfile
+import threading
+import zipfile
+from functools import partial
+from multiprocessing.pool import ThreadPool
+from os.path import exists
+from os.path import getsize
+from os.path import isdir
+from os.path import join
+from subprocess import PIPE
+from subprocess import Popen
+
+import calmjs.dist
+
+from calmjs.bower.cache import replace
+from calmjs.bower.locks import FileLock
+from calmjs.bower.merge import RESOLUTIONS
+from calmjs.bower.merge import read_dists
+from calmjs.bower.native import ARCHIVE_SUFFIXES
+from calmjs.bower.native import LocalStore
+from calmjs.bower.native import Package
+from calmjs.bower.native import ResolutionError
+from calmjs.bower.native import split_endpoint
+from calmjs.bower.semver import parse_version
+from calmjs.bower.verify import mmap_digest
+
+logger = logging.getLogger(__name__)
+
+REGISTRY_ENV = 'bower_registry'
+DEFAULT_REGISTRY = 'https://registry.bower.io'
+INDEX_FILENAME = 'index.json'
+INDEX_VERSION = 1
+PART_SUFFIX = '.part'
+CHUNK_SIZE = 65536
+GITHUB_URL = re.compile(
+    r'^(?:git|https?|ssh)://(?:git@)?github\.com/([^/]+)/(.+?)(?:\.git)?/?$')
+
+
+def get_registry():
+    """
+    Return the bower registry as specified by the environment, or the
+    default one.
+    """
+
+    return os.environ.get(REGISTRY_ENV) or DEFAULT_REGISTRY
+
+
+def open_url(url, timeout, headers={}):
+    """
+    Open the url with the headers, returning the response.
+    """
+
+    # imported on demand, as these are only needed by the registry
+    # fetcher and are relatively expensive to import.
+    try:
+        from urllib.request import Request
+        from urllib.request import urlopen
+    except ImportError:  # pragma: no cover
+        from urllib2 import Request
+        from urllib2 import urlopen
+
+    request = Request(url)
+    for key, value in headers.items():
+        request.add_header(key, value)
+    return urlopen(request, timeout=timeout)
+
+
+def run_git(args):
+    """
+    Run git with the list of args, returning its stdout.
+
+    Raises ResolutionError with the stderr of git should it fail.
+    """
+
+    proc = Popen(['git'] + args, stdin=PIPE, stdout=PIPE, stderr=PIPE)
+    stdout, stderr = proc.communicate(b'')
+    if proc.returncode:
+        raise ResolutionError("'git %s' exited with return code %s: %s" % (
+            args[0], proc.returncode,
+            stderr.decode('utf8', 'replace').strip()))
+    return stdout.decode('utf8', 'replace')
+
+
+class Fetcher(object):
+    """
+    The upstream source of the packages for a mirror.  Subclasses must
+    implement versions and fetch; they will be invoked from multiple
+    threads.
+    """
+
+    def versions(self, name):
+        """
+        Return the list of the tags available for the package name.
+        """
+
+        raise NotImplementedError
+
+    def suffix(self, name, tag):
+        """
+        Return the suffix of the archive for the package name at tag.
+        """
+
+        return '.tar.gz'
+
+    def fetch(self, name, tag, path):
+        """
+        Write the archive for the package name at tag into path.  If a
+        partial archive is already at path, it should be continued where
+        possible, or otherwise be overwritten.
+        """
+
+        raise NotImplementedError
+
+
+class StoreFetcher(Fetcher):
+    """
+    Fetch the packages from another package store, such as one that is
+    shared over the network.
+    """
+
+    def __init__(self, root):
+        self.store = LocalStore(root)
+        self._lock = threading.Lock()
+
+    def _package(self, name, tag):
+        with self._lock:
+            packages = self.store.packages(name)
+        for package in packages.values():
+            if package.tag == tag:
+                return package
+        raise ResolutionError(
+            "'%s#%s' not available in '%s'" % (name, tag, self.store.root))
+
+    def versions(self, name):
+        with self._lock:
+            return [package.tag for package in self.store.packages(
+                name).values()]
+
+    def suffix(self, name, tag):
+        package = self._package(name, tag)
+        if package.kind == 'git':
+            return '.tar.gz'
+        for suffix in ARCHIVE_SUFFIXES:
+            if package.path.endswith(suffix):
+                return suffix
+
+    def fetch(self, name, tag, path):
+        package = self._package(name, tag)
+        if package.kind == 'git':
+            run_git([
+                '--git-dir', package.path, 'archive',
+                '--format=tar.gz', '--output', os.path.abspath(path), tag,
+            ])
+            return
+        offset = getsize(path) if exists(path) else 0
+        with open(package.path, 'rb') as src:
+            src.seek(offset)
+            with open(path, 'ab' if offset else 'wb') as fd:
+                shutil.copyfileobj(src, fd, CHUNK_SIZE)
+
+
+class RegistryFetcher(Fetcher):
+    """
+    Fetch the packages from their git repositories, as looked up
+    through the bower registry.  The archives for the repositories
+    hosted on GitHub are downloaded directly, or through the archives
+    of a registry proxy (please refer to calmjs.bower.proxy) if one is
+    specified; the others are produced from a shallow clone of the tag.
+    """
+
+    def __init__(self, registry=None, timeout=60, archives=None):
+        self.registry = (registry or get_registry()).rstrip('/')
+        self.timeout = timeout
+        self.archives = (archives or 'https:/').rstrip('/')
+        self._urls = {}
+
+    def lookup(self, name):
+        """
+        Return the url of the repository for the package name.
+        """
+
+        if name not in self._urls:
+            response = open_url(
+                '%s/packages/%s' % (self.registry, name), self.timeout)
+            try:
+                self._urls[name] = json.loads(
+                    response.read().decode('utf8'))['url']
+            finally:
+                response.close()
+        return self._urls[name]
+
+    def versions(self, name):
+        stdout = run_git(['ls-remote', '--tags', self.lookup(name)])
+        tags = []
+        for line in stdout.splitlines():
+            ref = line.split('\t')[-1]
+            if ref.startswith('refs/tags/') and not ref.endswith('^{}'):
+                tags.append(ref[len('refs/tags/'):])
+        return tags
+
+    def download(self, url, path):
+        """
+        Download url into path, continuing any partial download.
+        """
+
+        offset = getsize(path) if exists(path) else 0
+        response = open_url(url, self.timeout, {
+            'Range': 'bytes=%d-' % offset} if offset else {})
+        try:
+            # servers that ignore the range will send everything.
+            resumed = offset and response.getcode() == 206
+            with open(path, 'ab' if resumed else 'wb') as fd:
+                shutil.copyfileobj(response, fd, CHUNK_SIZE)
+        finally:
+            response.close()
+
+    def fetch(self, name, tag, path):
+        url = self.lookup(name)
+        match = GITHUB_URL.match(url)
+        if match:
+            self.download('%s/codeload.github.com/%s/%s/tar.gz/%s' % (
+                self.archives, match.group(1), match.group(2), tag), path)
+            return
+
+        tmpdir = tempfile.mkdtemp()
+        try:
+            clone = join(tmpdir, 'clone.git')
+            run_git([
+                'clone', '-q', '--bare', '--depth', '1', '--branch', tag,
+                url, clone,
+            ])
+            run_git([
+                '--git-dir', clone, 'archive', '--format=tar.gz',
+                '--output', os.path.abspath(path), tag,
+            ])
+        finally:
+            shutil.rmtree(tmpdir)
+
+
+def check_archive(path, zipped=False):
+    """
+    Read through the archive at path, such that an incomplete or
+    corrupted archive will raise an exception.
+    """
+
+    if zipped:
+        with zipfile.ZipFile(path) as archive:
+            bad = archive.testzip()
+        if bad is not None:
+            raise zipfile.BadZipfile("bad member '%s'" % bad)
+        return
+
+    with tarfile.open(path) as archive:
+        for member in archive:
+            if member.isfile():
+                archive.extractfile(member).read()
+
+
+def pkgdef_declarations(pkgdef_json, dep_keys):
+    """
+    Return the set of (name, spec) declared within the package
+    definition, including its resolutions.
+    """
+
+    declarations = set()
+    for key in tuple(dep_keys) + (RESOLUTIONS,):
+        for name, spec in (pkgdef_json.get(key) or {}).items():
+            if spec:
+                declarations.add((name, spec))
+    return declarations
+
+
+def working_set_declarations(
+        filename='bower.json', dep_keys=('dependencies', 'devDependencies'),
+        working_set=None):
+    """
+    Return the set of (name, spec) declared within the package
+    definition files of every distribution within the working set.
+    """
+
+    # looked up at call time, such that it may be replaced.
+    if working_set is None:
+        working_set = calmjs.dist.default_working_set
+    declarations = set()
+    for dist, obj in read_dists(list(working_set), filename):
+        if obj:
+            declarations.update(pkgdef_declarations(obj, dep_keys))
+    return declarations
+
+
+class Mirror(object):
+    """
+    A local mirror of the packages provided by a fetcher.
+    """
+
+    def __init__(self, root, fetcher, jobs=None):
+        """
+        Arguments:
+
+        root
+            The directory of the mirror.
+        fetcher
+            The Fetcher for the upstream source of the packages.
+        jobs
+            The number of threads used for fetching; defaults to the
+            number of processors.
+        """
+
+        self.root = root
+        self.fetcher = fetcher
+        self.jobs = jobs
+        self._versions = {}
+        self._lock = threading.Lock()
+
+    def versions(self, source):
+        """
+        Return a mapping of the versions available from the fetcher for
+        the package source to their tags.  Results are memoized.
+        """
+
+        with self._lock:
+            if source in self._versions:
+                return self._versions[source]
+        versions = {}
+        for tag in self.fetcher.versions(source):
+            version = parse_version(tag)
+            if version is not None:
+                versions[version] = tag
+        with self._lock:
+            return self._versions.setdefault(source, versions)
+
+    def resolve(self, name, spec):
+        """
+        Return a tuple of the package source and the tag with the highest
+        version satisfying the declared spec.
+
+        Raises ResolutionError if the spec cannot be resolved.
+        """
+
+        source, version_range = split_endpoint(name, spec)
+        versions = self.versions(source)
+        version = version_range.max_satisfying(versions)
+        if version is None:
+            raise ResolutionError(
+                "no version of '%s' satisfying '%s' available upstream" % (
+                    source, spec))
+        return source, versions[version]
+
+    def path(self, source, tag):
+        return join(self.root, source, tag + self.fetcher.suffix(source, tag))
+
+    def lock(self, source, tag):
+        return FileLock(join(self.root, '.locks', source, '%s.lock' % tag))
+
+    def fetch(self, source, tag):
+        """
+        Fetch the archive for the package source at tag into the mirror,
+        unless it is already there.
+
+        Returns a tuple of the Package and whether it was fetched.
+        """
+
+        path = self.path(source, tag)
+        package = Package(source, parse_version(tag), tag, path)
+        if exists(path):
+            return package, False
+
+        with self.lock(source, tag):
+            if exists(path):
+                # fetched by another process while waiting.
+                return package, False
+            if not isdir(os.path.dirname(path)):
+                os.makedirs(os.path.dirname(path))
+            part = path + PART_SUFFIX
+            if exists(part):
+                logger.info(
+                    "resuming '%s#%s' from %d bytes", source, tag,
+                    getsize(part),
+                )
+            self.fetcher.fetch(source, tag, part)
+            try:
+                check_archive(part, zipped=path.endswith('.zip'))
+            except (EOFError, IOError, OSError, tarfile.TarError,
+                    zipfile.BadZipfile):
+                os.remove(part)
+                raise ResolutionError(
+                    "incomplete or invalid archive fetched for '%s#%s'" % (
+                        source, tag))
+            replace(part, path)
+        logger.info("mirrored '%s#%s' into '%s'", source, tag, path)
+        return package, True
+
+    def _resolve(self, declaration):
+        try:
+            return self.resolve(*declaration), None
+        except (IOError, OSError, ValueError, KeyError) as e:
+            return None, e
+
+    def _fetch(self, key, dry_run=False):
+        try:
+            if dry_run and not exists(self.path(*key)):
+                # the dependencies are unknown without the archive.
+                return None, True, {}, None
+            package, fetched = self.fetch(*key)
+            dependencies = package.read_json().get('dependencies') or {}
+            return package, fetched, dependencies, None
+        except (IOError, OSError, ValueError, tarfile.TarError) as e:
+            return None, False, {}, e
+
+    def mirror(self, declarations, dry_run=False):
+        """
+        Mirror the packages for the list of (name, spec) declarations,
+        along with their dependencies.  Every declaration is resolved
+        once, and every resolved version is only fetched once.
+
+        If dry_run is set, the declarations are resolved but nothing is
+        fetched or written; the versions not already mirrored are
+        reported as fetched, without their dependencies, as those are
+        only known from their archives.
+
+        Returns a dict with the mirrored packages as a mapping of their
+        names to the list of versions, the number of archives fetched,
+        and the mapping of the declarations that could not be mirrored
+        to the reasons.
+        """
+
+        resolved = {}
+        keys = set()
+        fetched = 0
+        missing = {}
+        pending = set(declarations)
+
+        pool = ThreadPool(self.jobs)
+        try:
+            while pending:
+                batch = sorted(pending)
+                resolved.update(zip(batch, pool.map(self._resolve, batch)))
+                new_keys = []
+                for declaration in batch:
+                    key, error = resolved[declaration]
+                    if error is not None:
+                        logger.error(
+                            "unable to resolve '%s#%s': %s",
+                            declaration[0], declaration[1], error,
+                        )
+                        missing['%s#%s' % declaration] = str(error)
+                    elif key not in keys:
+                        keys.add(key)
+                        new_keys.append(key)
+
+                pending = set()
+                fetch = partial(self._fetch, dry_run=dry_run)
+                for key, (package, is_new, dependencies, error) in zip(
+                        new_keys, pool.map(fetch, new_keys)):
+                    if error is not None:
+                        logger.error(
+                            "unable to fetch '%s#%s': %s", key[0], key[1],
+                            error,
+                        )
+                        missing['%s#%s' % key] = str(error)
+                        continue
+                    fetched += is_new
+                    if package is None:
+                        logger.info("would fetch '%s#%s'", key[0], key[1])
+                    pending.update(
+                        declaration for declaration in dependencies.items()
+                        if declaration not in resolved
+                    )
+        finally:
+            pool.close()
+            pool.join()
+
+        mirrored = sorted(
+            key for key in keys if '%s#%s' % key not in missing)
+        if not dry_run:
+            self.write_index(mirrored)
+        packages = {}
+        for source, tag in mirrored:
+            packages.setdefault(source, []).append(parse_version(tag))
+        return {
+            'packages': {
+                name: [str(version) for version in sorted(versions)]
+                for name, versions in packages.items()
+            },
+            'fetched': fetched,
+            'missing': missing,
+        }
+
+    def read_index(self):
+        """
+        Return the packages recorded in the index of the mirror.
+        """
+
+        try:
+            with open(join(self.root, INDEX_FILENAME)) as fd:
+                index = json.load(fd)
+        except (IOError, OSError, ValueError):
+            return {}
+        if index.get('version') != INDEX_VERSION:
+            return {}
+        return index.get('packages') or {}
+
+    def write_index(self, keys):
+        """
+        Add the archives for the list of (source, tag) within the mirror
+        to its index.  The digests of the archives already recorded are
+        reused if their sizes are unchanged.
+        """
+
+        index = self.read_index()
+        for source, tag in keys:
+            version = str(parse_version(tag))
+            path = self.path(source, tag)
+            size = getsize(path)
+            entry = index.setdefault(source, {}).get(version)
+            if not entry or entry[0] != tag or entry[1] != size:
+                index[source][version] = [tag, size, mmap_digest(path)]
+
+        if not isdir(self.root):
+            os.makedirs(self.root)
+        target = join(self.root, INDEX_FILENAME)
+        tmp = '%s.%d.tmp' % (target, os.getpid())
+        with open(tmp, 'w') as fd:
+            json.dump({
+                'version': INDEX_VERSION, 'packages': index,
+            }, fd, sort_keys=True, separators=(',', ':'))
+        replace(tmp, target)
+
+
+def make_argparser():
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='python -m calmjs.bower.mirror',
+        description='mirror the declared bower packages for offline use',
+    )
+    parser.add_argument(
+        '-j', '--jobs', type=int, default=None,
+        help='number of packages to fetch concurrently')
+    parser.add_argument(
+        '--registry', metavar='URL', default=None,
+        help='the bower registry to look up the packages from; defaults '
+             'to the bower_registry environment variable')
+    parser.add_argument(
+        '--store', metavar='DIR', default=None,
+        help='fetch from the package store at DIR instead of upstream')
+    parser.add_argument(
+        '-E', '--explicit', action='store_true',
+        help='only use the specified Python packages, not their '
+             'requirements')
+    parser.add_argument('mirror_dir', help='the directory of the mirror')
+    parser.add_argument(
+        'package_names', nargs='*',
+        help='names of the Python packages; defaults to the whole '
+             'working set')
+    return parser
+
+
+def main(args=None, stdout=None):
+    from calmjs.bower import Driver
+
+    stdout = stdout or sys.stdout
+    opts = make_argparser().parse_args(args)
+    fetcher = (
+        StoreFetcher(opts.store) if opts.store else
+        RegistryFetcher(opts.registry)
+    )
+    driver = Driver(jobs=opts.jobs)
+    report = driver.pkg_manager_mirror(
+        opts.package_names or None, mirror_dir=opts.mirror_dir,
+        fetcher=fetcher, explicit=opts.explicit,
+    )
+    if report is None:
+        return 1
+    for name, versions in sorted(report['packages'].items()):
+        stdout.write('%s %s\n' % (name, ' '.join(versions)))
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
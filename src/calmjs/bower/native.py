@@ -0,0 +1,458 @@
+# -*- coding: utf-8 -*-
+"""
+Native installation of bower packages.
+
+Provides an installer that resolves the dependencies declared within a
+bower.json against a local store of package archives or git mirrors,
+and then extracts the resolved packages into the bower components
+directory, without requiring Node.js, bower or network access.
+
+The layout of the local store is as follows::
+
+    <store>/<name>/<version>.tar.gz     (or .tgz, .tar, .zip)
+    <store>/<name>.git                  (a bare git mirror, with tags)
+"""
+
+from __future__ import absolute_import
+
+import json
+import logging
+import os
+import shutil
+import stat
+import tarfile
+import zipfile
+from collections import OrderedDict
+from collections import deque
+from functools import partial
+from io import BytesIO
+from multiprocessing.pool import ThreadPool
+from os.path import exists
+from os.path import isdir
+from os.path import join
+
+from calmjs.utils import fork_exec
+
+from calmjs.bower.semver import parse_range
+from calmjs.bower.semver import parse_version
+
+logger = logging.getLogger(__name__)
+
+ARCHIVE_SUFFIXES = ('.tar.gz', '.tgz', '.tar', '.zip')
+GIT_SUFFIX = '.git'
+BOWER_META = '.bower.json'
+# the errors raised for packages that are corrupted or unreadable.
+ARCHIVE_ERRORS = (
+    tarfile.TarError, zipfile.BadZipfile, EOFError, IOError, OSError)
+
+
+class ResolutionError(ValueError):
+    """
+    Raised when the native installer is unable to resolve the requested
+    packages.
+    """
+
+
+def split_endpoint(name, value):
+    """
+    Split the value of a declared dependency into the source package
+    name and its version range.
+
+    Raises ResolutionError for endpoints that cannot be served from a
+    local package store, such as URLs, paths and non-semver targets.
+    """
+
+    if '#' in value:
+        source, target = value.split('#', 1)
+    else:
+        source, target = name, value
+
+    if not source or '/' in source or ':' in source:
+        raise ResolutionError(
+            "endpoint '%s#%s' cannot be served from a package store" % (
+                name, value))
+
+    try:
+        return source, parse_range(target)
+    except ValueError:
+        raise ResolutionError(
+            "target '%s' for '%s' is not a valid version range" % (
+                target, name))
+
+
+def _normalize_member_name(name):
+    parts = [p for p in name.replace('\\', '/').split('/') if p not in (
+        '', '.')]
+    if not parts or '..' in parts or ':' in parts[0]:
+        return None
+    return parts
+
+
+def _read_tar_member(archive, member):
+    return archive.extractfile(member).read()
+
+
+def archive_files(archive):
+    """
+    Return a list of (path_parts, mode, reader) for every regular file
+    within the archive, with the top level directory stripped if all the
+    files are contained within a single one, much like what bower does.
+    """
+
+    if isinstance(archive, zipfile.ZipFile):
+        raw = [
+            (info.filename, (info.external_attr >> 16) & 0o777,
+                partial(archive.read, info))
+            for info in archive.infolist()
+            if not info.filename.endswith('/')
+        ]
+    else:
+        raw = [
+            (member.name, member.mode, partial(
+                _read_tar_member, archive, member))
+            for member in archive.getmembers()
+            if member.isfile()
+        ]
+
+    entries = []
+    for name, mode, reader in raw:
+        parts = _normalize_member_name(name)
+        if parts is None:
+            logger.warning("skipping unsafe archive member '%s'", name)
+            continue
+        entries.append((parts, mode, reader))
+
+    roots = set(parts[0] for parts, mode, reader in entries)
+    if len(roots) == 1 and all(len(e[0]) > 1 for e in entries):
+        entries = [(e[0][1:], e[1], e[2]) for e in entries]
+    return entries
+
+
+class Package(object):
+    """
+    A specific version of a package within the local store.
+    """
+
+    def __init__(self, name, version, tag, path, kind='archive'):
+        self.name = name
+        self.version = version
+        self.tag = tag
+        self.path = path
+        self.kind = kind
+        self._json = {}
+
+    def __repr__(self):
+        return '<Package %s#%s>' % (self.name, self.version)
+
+    def open(self):
+        """
+        Return an opened archive for this package.
+        """
+
+        if self.kind == 'git':
+            stdout, stderr = fork_exec([
+                'git', '--git-dir', self.path, 'archive', '--format=tar',
+                self.tag,
+            ], b'')
+            return tarfile.open(fileobj=BytesIO(stdout))
+        if self.path.endswith('.zip'):
+            return zipfile.ZipFile(self.path)
+        return tarfile.open(self.path)
+
+    def read_json(self, filename='bower.json'):
+        """
+        Return the contents of the JSON file at the root of the package,
+        or an empty dict if not available.  Results are memoized.
+        """
+
+        if filename not in self._json:
+            self._json[filename] = self._read_json(filename)
+        return dict(self._json[filename])
+
+    def _read_json(self, filename):
+        try:
+            archive = self.open()
+        except ARCHIVE_ERRORS as e:
+            raise ResolutionError("unable to open '%s': %s" % (self, e))
+        try:
+            for parts, mode, reader in archive_files(archive):
+                if parts == [filename]:
+                    try:
+                        return json.loads(reader().decode('utf8'))
+                    except ValueError:
+                        logger.warning(
+                            "ignoring invalid '%s' in '%s'", filename, self)
+                        break
+        except ARCHIVE_ERRORS as e:
+            raise ResolutionError("unable to read '%s': %s" % (self, e))
+        finally:
+            archive.close()
+        return {}
+
+    def extract(self, target):
+        """
+        Extract the files of this package into the target directory.
+        """
+
+        archive = self.open()
+        try:
+            for parts, mode, reader in archive_files(archive):
+                path = join(target, *parts)
+                dirname = os.path.dirname(path)
+                if not isdir(dirname):
+                    os.makedirs(dirname)
+                with open(path, 'wb') as fd:
+                    fd.write(reader())
+                if mode & stat.S_IXUSR:
+                    os.chmod(path, os.stat(path).st_mode | 0o111)
+        finally:
+            archive.close()
+
+
+class LocalStore(object):
+    """
+    A local store of package archives and git mirrors.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self._packages = {}
+
+    def _archive_packages(self, name):
+        results = {}
+        base = join(self.root, name)
+        if not isdir(base):
+            return results
+        for filename in os.listdir(base):
+            for suffix in ARCHIVE_SUFFIXES:
+                if not filename.endswith(suffix):
+                    continue
+                tag = filename[:-len(suffix)]
+                version = parse_version(tag)
+                if version is not None:
+                    results[version] = Package(
+                        name, version, tag, join(base, filename))
+                break
+        return results
+
+    def _git_packages(self, name):
+        results = {}
+        path = join(self.root, name + GIT_SUFFIX)
+        if not isdir(path):
+            return results
+        try:
+            stdout, stderr = fork_exec(
+                ['git', '--git-dir', path, 'tag', '-l'])
+        except (IOError, OSError):
+            logger.warning(
+                "unable to list tags in git mirror '%s'; is git available?",
+                path,
+            )
+            return results
+        for tag in stdout.split():
+            version = parse_version(tag)
+            if version is not None:
+                results[version] = Package(name, version, tag, path, 'git')
+        return results
+
+    def packages(self, name):
+        """
+        Return a mapping of all available versions to the packages for
+        the package name.
+        """
+
+        if name not in self._packages:
+            packages = self._git_packages(name)
+            # archives take precedence over the mirrors.
+            packages.update(self._archive_packages(name))
+            self._packages[name] = packages
+        return self._packages[name]
+
+    def resolve(self, name, version_range):
+        """
+        Return the package with the highest version that satisfies the
+        range, or None.
+        """
+
+        packages = self.packages(name)
+        version = version_range.max_satisfying(packages)
+        if version is None:
+            return None
+        return packages[version]
+
+
+class NativeInstaller(object):
+    """
+    Resolve and install packages from a LocalStore into the components
+    directory.
+    """
+
+    def __init__(
+            self, store, components_dir, jobs=None, production=False,
+            shared=None):
+        """
+        Arguments:
+
+        store
+            The LocalStore instance.
+        components_dir
+            The target directory, typically 'bower_components'.
+        jobs
+            The number of threads used for extraction; defaults to the
+            number of processors.
+        production
+            If True, devDependencies will not be installed.
+        shared
+            An optional SharedStore; if provided, packages are added to
+            that once and then linked into the components directory
+            from there, instead of being extracted every time.
+        """
+
+        self.store = store
+        self.components_dir = components_dir
+        self.jobs = jobs
+        self.production = production
+        self.shared = shared
+
+    def resolve(self, pkgdef_json):
+        """
+        Resolve the dependencies declared within the provided bower.json
+        and those declared by the resolved packages.
+
+        Returns an ordered dict of the installation name mapped to a
+        tuple of the resolved Package and the declared target.  The
+        first resolved version of any package takes precedence; if a
+        later declaration conflicts with it, a warning is logged.
+        Entries in the resolutions section will be used as the target
+        for their respective packages.
+        """
+
+        resolutions = pkgdef_json.get('resolutions') or {}
+        keys = ['dependencies']
+        if not self.production:
+            keys.append('devDependencies')
+
+        queue = deque(
+            (name, spec, None)
+            for key in keys
+            for name, spec in sorted((pkgdef_json.get(key) or {}).items())
+        )
+        resolved = OrderedDict()
+
+        while queue:
+            name, spec, parent = queue.popleft()
+            spec = resolutions.get(name, spec)
+            source, version_range = split_endpoint(name, spec)
+            if name in resolved:
+                package, target = resolved[name]
+                if package.version not in version_range:
+                    logger.warning(
+                        "'%s#%s' required by '%s' conflicts with the "
+                        "resolved version '%s'; keeping the latter",
+                        name, spec, parent, package.version,
+                    )
+                continue
+
+            package = self.store.resolve(source, version_range)
+            if package is None:
+                raise ResolutionError(
+                    "no version of '%s' satisfying '%s' available in '%s'" % (
+                        source, spec, self.store.root))
+            logger.debug("resolved '%s#%s' to '%s'", name, spec, package)
+            resolved[name] = (package, spec)
+            queue.extend(
+                (dep, dep_spec, name) for dep, dep_spec in sorted(
+                    (package.read_json().get('dependencies') or {}).items())
+            )
+
+        return resolved
+
+    def resolve_locked(self, locked):
+        """
+        Resolve the exact packages recorded within the dependencies of a
+        lock, i.e. a mapping of the installation name to the entry with
+        the endpoint and version for the package.
+
+        Returns an ordered dict in the same form as resolve.
+        """
+
+        resolved = OrderedDict()
+        for name, entry in sorted(locked.items()):
+            source, version_range = split_endpoint(name, '%s#%s' % (
+                entry.get('endpoint') or name, entry['version']))
+            package = self.store.resolve(source, version_range)
+            if package is None or str(package.version) != entry['version']:
+                raise ResolutionError(
+                    "locked '%s#%s' not available in '%s'" % (
+                        source, entry['version'], self.store.root))
+            resolved[name] = (package, entry.get('target') or str(
+                package.version))
+        return resolved
+
+    def install_package(self, name, package, target):
+        """
+        Extract a single package into the components directory under
+        name, replacing any existing installation.
+
+        Raises ResolutionError if the package cannot be extracted, such
+        as from a corrupted archive; the partially extracted files are
+        removed.
+        """
+
+        dest = join(self.components_dir, name)
+        tmp = join(self.components_dir, '.%s.%d.tmp' % (name, os.getpid()))
+        if exists(tmp):
+            shutil.rmtree(tmp)
+        try:
+            # created up front for the packages without any files.
+            os.makedirs(tmp)
+            if self.shared is None:
+                package.extract(tmp)
+            else:
+                version = str(package.version)
+                self.shared.ensure_package(package.name, version, package)
+                self.shared.link_tree(package.name, version, tmp)
+
+            meta = package.read_json()
+            meta.update({
+                'name': name,
+                'version': str(package.version),
+                '_release': str(package.version),
+                '_resolution': {'type': 'version', 'tag': package.tag},
+                '_source': package.path,
+                '_target': target,
+                '_originalSource': package.name,
+            })
+            with open(join(tmp, BOWER_META), 'w') as fd:
+                json.dump(meta, fd, indent=2, sort_keys=True)
+
+            if exists(dest):
+                shutil.rmtree(dest)
+            os.rename(tmp, dest)
+        except ARCHIVE_ERRORS as e:
+            raise ResolutionError("unable to install '%s#%s': %s" % (
+                name, package.version, e))
+        finally:
+            if exists(tmp):
+                shutil.rmtree(tmp)
+        logger.info("installed '%s#%s' into '%s'", name, package.version, dest)
+        return name
+
+    def install(self, resolved):
+        """
+        Install all resolved packages in parallel.  Returns the list of
+        installed names.
+        """
+
+        if not isdir(self.components_dir):
+            os.makedirs(self.components_dir)
+
+        pool = ThreadPool(self.jobs)
+        try:
+            return pool.map(
+                lambda item: self.install_package(item[0], *item[1]),
+                list(resolved.items()),
+            )
+        finally:
+            pool.close()
+            pool.join()
@@ -0,0 +1,572 @@
+# -*- coding: utf-8 -*-
+"""
+A caching proxy for the bower registry.
+
+Serves the lookups of the bower registry protocol (i.e. the paths under
+``/packages``) from an upstream registry, along with the archives of
+the packages under ``/archives/<host>/<path>``, which are fetched from
+``https://<host>/<path>`` for the allowed hosts only; by default, these
+are the host of the upstream registry and ``codeload.github.com``, with
+the requests for any other host refused.  The responses are kept in a
+cache directory and served from there until they are older than the
+maximum age, after which they are revalidated upstream through
+conditional requests; should the upstream be unavailable, the stale
+entries are served instead.
+
+Clients may also make conditional requests against the ETag and the
+Last-Modified headers provided by the proxy, and the archives may be
+requested from an offset through a Range header.  The least recently
+used entries are evicted once the size of the cache exceeds its budget.
+
+The proxy may be run as a server shared by many hosts, with those
+configured with the ``bower_registry`` environment variable (or the
+registry setting in ``.bowerrc``) pointing at it::
+
+    $ python -m calmjs.bower.proxy --port 5678 ~/.bower-registry-cache
+    $ bower_registry=http://localhost:5678 bower install
+
+Alternatively, the Driver will run one on demand for its invocations
+of bower if the registry_cache argument or the
+``CALMJS_BOWER_REGISTRY_CACHE`` environment variable is set.
+
+Note that bower itself only makes the lookups through the registry, as
+the packages are then fetched from the git (or GitHub) sources that
+were looked up; the archives are cached for the downloads made by the
+mirror (please refer to calmjs.bower.mirror).
+"""
+
+from __future__ import absolute_import
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sys
+import threading
+import time
+from email.utils import formatdate
+from email.utils import mktime_tz
+from email.utils import parsedate_tz
+from os.path import exists
+from os.path import getsize
+from os.path import join
+from tempfile import mkstemp
+
+try:  # pragma: no cover
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+    from socketserver import ThreadingMixIn
+    from urllib.error import HTTPError
+    from urllib.parse import urlsplit
+except ImportError:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+    from SocketServer import ThreadingMixIn
+    from urllib2 import HTTPError
+    from urlparse import urlsplit
+
+from calmjs.bower.cache import replace
+from calmjs.bower.mirror import CHUNK_SIZE
+from calmjs.bower.mirror import get_registry
+from calmjs.bower.mirror import open_url
+
+logger = logging.getLogger(__name__)
+
+PACKAGES_PATH = '/packages'
+ARCHIVES_PATH = '/archives'
+META_SUFFIX = '.json'
+DEFAULT_MAX_SIZE = 512 * 1024 * 1024
+DEFAULT_MAX_AGE = 600
+# the hosts of the archives downloaded by the mirror for the packages
+# from the default registry, which are all hosted on GitHub.
+DEFAULT_ARCHIVE_HOSTS = ('codeload.github.com',)
+# the values for the X-Cache header of the responses.
+HIT = 'HIT'
+MISS = 'MISS'
+REVALIDATED = 'REVALIDATED'
+STALE = 'STALE'
+
+
+def http_date(timestamp):
+    return formatdate(timestamp, usegmt=True)
+
+
+def parse_http_date(value):
+    """
+    Return the timestamp for the HTTP date, or None if invalid.
+    """
+
+    parsed = parsedate_tz(value or '')
+    if parsed is None:
+        return None
+    return mktime_tz(parsed)
+
+
+class BlobCache(object):
+    """
+    A directory of files keyed by their filename, each with its metadata
+    as a JSON file alongside, with eviction of the least recently used
+    entries once their total size exceeds the defined maximum.
+    """
+
+    def __init__(self, root, max_size=DEFAULT_MAX_SIZE):
+        """
+        Arguments:
+
+        root
+            The directory where the cache entries will be stored.  Will
+            be created on demand.
+        max_size
+            The maximum total size in bytes of the files to retain.
+        """
+
+        self.root = root
+        self.max_size = max_size
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return join(self.root, key)
+
+    def get(self, key):
+        """
+        Return the metadata stored for key, or None.
+        """
+
+        meta_path = self.path(key) + META_SUFFIX
+        try:
+            with open(meta_path) as fd:
+                meta = json.load(fd)
+        except (IOError, OSError):
+            return None
+        except ValueError:
+            logger.warning("removing corrupted cache entry '%s'", meta_path)
+            self.remove(key)
+            return None
+        if not exists(self.path(key)):
+            self.remove(key)
+            return None
+
+        try:
+            # mark this as the most recently used.
+            os.utime(meta_path, None)
+        except (IOError, OSError):
+            pass
+        return meta
+
+    def set_meta(self, key, meta):
+        fd, tmp = mkstemp(suffix='.tmp', dir=self.root)
+        with os.fdopen(fd, 'w') as stream:
+            json.dump(meta, stream, sort_keys=True)
+        replace(tmp, self.path(key) + META_SUFFIX)
+
+    def mkstemp(self):
+        """
+        Return a tuple of an opened file object and its path, for the
+        contents of an entry to be written into before it is added.
+        """
+
+        try:
+            os.makedirs(self.root)
+        except (IOError, OSError) as e:
+            if e.errno != errno.EEXIST:
+                raise
+        fd, tmp = mkstemp(suffix='.tmp', dir=self.root)
+        return os.fdopen(fd, 'wb'), tmp
+
+    def add(self, key, tmp, meta):
+        """
+        Add the file at tmp as the contents for key, along with its
+        metadata, and evict the older entries as needed.
+        """
+
+        meta['size'] = getsize(tmp)
+        replace(tmp, self.path(key))
+        self.set_meta(key, meta)
+        self.evict()
+
+    def entries(self):
+        """
+        Return a list of (mtime, size, key) for all entries in this
+        cache, sorted from the least recently used.
+        """
+
+        results = []
+        try:
+            names = os.listdir(self.root)
+        except (IOError, OSError):
+            return results
+
+        for name in names:
+            if not name.endswith(META_SUFFIX):
+                continue
+            key = name[:-len(META_SUFFIX)]
+            try:
+                results.append((
+                    os.stat(self.path(name)).st_mtime,
+                    getsize(self.path(key)),
+                    key,
+                ))
+            except (IOError, OSError):
+                continue
+        results.sort()
+        return results
+
+    def evict(self):
+        """
+        Remove the least recently used entries until their total size is
+        within the maximum.
+        """
+
+        with self._lock:
+            entries = self.entries()
+            total = sum(size for mtime, size, key in entries)
+            for mtime, size, key in entries:
+                if total <= self.max_size:
+                    break
+                logger.debug("evicting cache entry '%s'", key)
+                self.remove(key)
+                total -= size
+
+    def remove(self, key):
+        for path in (self.path(key) + META_SUFFIX, self.path(key)):
+            try:
+                os.remove(path)
+            except (IOError, OSError):
+                pass
+
+
+class UpstreamError(Exception):
+    """
+    Raised when the upstream responds with an error, or could not be
+    reached; the status is the one to respond to the client with.
+    """
+
+    def __init__(self, status, reason):
+        super(UpstreamError, self).__init__(status, reason)
+        self.status = status
+        self.reason = reason
+
+
+class RegistryProxy(object):
+    """
+    The caching of the responses from the upstream registry and the
+    hosts of the archives.
+    """
+
+    def __init__(
+            self, cache_dir, upstream=None, max_size=DEFAULT_MAX_SIZE,
+            max_age=DEFAULT_MAX_AGE, timeout=60, archive_scheme='https',
+            archive_hosts=None):
+        """
+        Arguments:
+
+        cache_dir
+            The directory for the cached responses.
+        upstream
+            The upstream registry; defaults to the one specified by
+            the bower_registry environment variable, or the default
+            bower registry.
+        max_size
+            The maximum total size in bytes of the cached responses.
+        max_age
+            The number of seconds the cached responses are served for
+            before they are revalidated upstream.
+        timeout
+            The timeout in seconds for the upstream requests.
+        archive_scheme
+            The scheme for the upstream requests of the archives.
+        archive_hosts
+            The hosts that the archives may be requested from, which
+            defaults to the host of the upstream registry along with
+            the ones in DEFAULT_ARCHIVE_HOSTS.  The requests for the
+            archives from any other host are refused.
+        """
+
+        self.cache = BlobCache(cache_dir, max_size)
+        self.upstream = (upstream or get_registry()).rstrip('/')
+        self.max_age = max_age
+        self.timeout = timeout
+        self.archive_scheme = archive_scheme
+        if archive_hosts is None:
+            archive_hosts = (urlsplit(self.upstream).netloc,) + (
+                DEFAULT_ARCHIVE_HOSTS)
+        self.archive_hosts = set(host.lower() for host in archive_hosts)
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    def upstream_url(self, path):
+        """
+        Return the upstream url for the requested path, or None if it is
+        not one that is proxied.
+
+        Raises UpstreamError for the archives requested from the hosts
+        that are not allowed.
+        """
+
+        if path == PACKAGES_PATH or path.startswith(PACKAGES_PATH + '/'):
+            return self.upstream + path
+        if path.startswith(ARCHIVES_PATH + '/'):
+            target = path[len(ARCHIVES_PATH) + 1:]
+            if '/' in target.strip('/'):
+                host = target.split('/', 1)[0]
+                if host.lower() not in self.archive_hosts:
+                    raise UpstreamError(
+                        403, 'archive host not allowed: %s' % host)
+                return '%s://%s' % (self.archive_scheme, target)
+        return None
+
+    def _key_lock(self, key):
+        with self._lock:
+            return self._locks.setdefault(key, threading.Lock())
+
+    def get(self, path):
+        """
+        Return a tuple of the metadata of the cached response for the
+        requested path, the path to its contents and the X-Cache status,
+        fetching or revalidating it upstream as needed.
+
+        Raises UpstreamError if there is no response to serve.
+        """
+
+        url = self.upstream_url(path)
+        if url is None:
+            raise UpstreamError(404, 'not found')
+
+        key = hashlib.sha256(path.encode('utf8')).hexdigest()
+        # concurrent requests for the same path are only done once.
+        with self._key_lock(key):
+            meta = self.cache.get(key)
+            if meta and time.time() - meta['fetched'] < self.max_age:
+                return meta, self.cache.path(key), HIT
+            meta, status = self._fetch(key, url, meta)
+            return meta, self.cache.path(key), status
+
+    def _fetch(self, key, url, meta):
+        headers = {}
+        if meta and meta.get('upstream_etag'):
+            headers['If-None-Match'] = meta['upstream_etag']
+        if meta and meta.get('upstream_last_modified'):
+            headers['If-Modified-Since'] = meta['upstream_last_modified']
+
+        try:
+            response = open_url(url, self.timeout, headers)
+        except HTTPError as e:
+            if e.code == 304 and meta:
+                logger.debug("revalidated '%s'", url)
+                meta['fetched'] = time.time()
+                self.cache.set_meta(key, meta)
+                return meta, REVALIDATED
+            if meta and e.code >= 500:
+                logger.warning("serving stale '%s': %s", url, e)
+                return meta, STALE
+            raise UpstreamError(e.code, str(e.reason))
+        except (IOError, OSError) as e:
+            if meta:
+                logger.warning("serving stale '%s': %s", url, e)
+                return meta, STALE
+            raise UpstreamError(502, 'upstream unavailable: %s' % e)
+
+        fd, tmp = self.cache.mkstemp()
+        digest = hashlib.sha256()
+        try:
+            with fd:
+                while True:
+                    chunk = response.read(CHUNK_SIZE)
+                    if not chunk:
+                        break
+                    digest.update(chunk)
+                    fd.write(chunk)
+            info = response.info()
+            now = time.time()
+            meta = {
+                'url': url,
+                'content_type': info.get(
+                    'Content-Type', 'application/octet-stream'),
+                'etag': '"%s"' % digest.hexdigest(),
+                'last_modified': info.get('Last-Modified') or http_date(now),
+                'upstream_etag': info.get('ETag'),
+                'upstream_last_modified': info.get('Last-Modified'),
+                'fetched': now,
+            }
+            self.cache.add(key, tmp, meta)
+        except (IOError, OSError) as e:
+            if exists(tmp):
+                os.remove(tmp)
+            raise UpstreamError(502, 'unable to fetch upstream: %s' % e)
+        finally:
+            response.close()
+        logger.info("fetched '%s'", url)
+        return meta, MISS
+
+
+def not_modified(headers, meta):
+    """
+    Return True if the conditional request headers are satisfied by the
+    metadata of the cached response.
+    """
+
+    if_none_match = headers.get('If-None-Match')
+    if if_none_match:
+        tags = [tag.strip() for tag in if_none_match.split(',')]
+        return '*' in tags or meta['etag'] in tags
+    since = parse_http_date(headers.get('If-Modified-Since'))
+    modified = parse_http_date(meta['last_modified'])
+    return since is not None and modified is not None and modified <= since
+
+
+def parse_range(value, size):
+    """
+    Return the offset for a Range header of the form bytes=N-, or None
+    if it is not one that can be satisfied.
+    """
+
+    if not value or not value.startswith('bytes=') or ',' in value:
+        return None
+    start, sep, end = value[len('bytes='):].partition('-')
+    if end or not start.isdigit() or int(start) >= size:
+        return None
+    return int(start)
+
+
+class ProxyHandler(BaseHTTPRequestHandler):
+
+    server_version = 'calmjs.bower.proxy'
+
+    def do_GET(self):
+        self.serve(body=True)
+
+    def do_HEAD(self):
+        self.serve(body=False)
+
+    def serve(self, body):
+        try:
+            meta, path, status = self.server.proxy.get(self.path)
+        except UpstreamError as e:
+            self.send_error(e.status, e.reason)
+            return
+
+        size = meta['size']
+        offset = parse_range(self.headers.get('Range'), size)
+        if not_modified(self.headers, meta):
+            self.send_response(304)
+        elif offset is not None:
+            self.send_response(206)
+            self.send_header('Content-Range', 'bytes %d-%d/%d' % (
+                offset, size - 1, size))
+        else:
+            self.send_response(200)
+        self.send_header('ETag', meta['etag'])
+        self.send_header('Last-Modified', meta['last_modified'])
+        self.send_header('X-Cache', status)
+        if self._response_code == 304:
+            self.end_headers()
+            return
+
+        offset = offset or 0
+        self.send_header('Content-Type', meta['content_type'])
+        self.send_header('Content-Length', str(size - offset))
+        self.send_header('Accept-Ranges', 'bytes')
+        self.end_headers()
+        if body:
+            with open(path, 'rb') as fd:
+                fd.seek(offset)
+                shutil.copyfileobj(fd, self.wfile, CHUNK_SIZE)
+
+    def send_response(self, code, *a, **kw):
+        self._response_code = code
+        BaseHTTPRequestHandler.send_response(self, code, *a, **kw)
+
+    def log_message(self, format, *args):
+        logger.debug('%s - %s', self.address_string(), format % args)
+
+
+class ProxyServer(ThreadingMixIn, HTTPServer):
+    """
+    The server for a RegistryProxy.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, server_address, proxy):
+        HTTPServer.__init__(self, server_address, ProxyHandler)
+        self.proxy = proxy
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return 'http://%s:%d' % (host, port)
+
+
+def start_proxy(proxy, host='127.0.0.1', port=0):
+    """
+    Start serving the proxy from a daemon thread, returning the server;
+    its shutdown method should be called once it is no longer needed.
+    If port is 0, an available one will be used.
+    """
+
+    server = ProxyServer((host, port), proxy)
+    # a short interval, as shutdown blocks for up to that long.
+    thread = threading.Thread(
+        target=server.serve_forever, kwargs={'poll_interval': 0.05})
+    thread.daemon = True
+    thread.start()
+    logger.debug("serving registry proxy at '%s'", server.url)
+    return server
+
+
+def make_argparser():
+    import argparse
+    parser = argparse.ArgumentParser(
+        prog='python -m calmjs.bower.proxy',
+        description='caching proxy for the bower registry',
+    )
+    parser.add_argument(
+        '--host', default='127.0.0.1', help='the address to listen on')
+    parser.add_argument(
+        '--port', type=int, default=5678, help='the port to listen on')
+    parser.add_argument(
+        '--upstream', metavar='URL', default=None,
+        help='the upstream registry; defaults to the bower_registry '
+             'environment variable')
+    parser.add_argument(
+        '--archive-host', metavar='HOST', action='append', default=None,
+        dest='archive_hosts',
+        help='a host that the archives may be fetched from, which may be '
+             'specified multiple times; defaults to the host of the '
+             'upstream registry and %s' % ', '.join(DEFAULT_ARCHIVE_HOSTS))
+    parser.add_argument(
+        '--max-size', type=int, default=DEFAULT_MAX_SIZE // 1048576,
+        metavar='MB', help='the size budget of the cache in megabytes')
+    parser.add_argument(
+        '--max-age', type=int, default=DEFAULT_MAX_AGE, metavar='SECONDS',
+        help='the age after which cached responses are revalidated')
+    parser.add_argument('cache_dir', help='the directory of the cache')
+    return parser
+
+
+def main(args=None):  # pragma: no cover
+    opts = make_argparser().parse_args(args)
+    proxy = RegistryProxy(
+        opts.cache_dir, upstream=opts.upstream,
+        max_size=opts.max_size * 1048576, max_age=opts.max_age,
+        archive_hosts=opts.archive_hosts,
+    )
+    server = ProxyServer((opts.host, opts.port), proxy)
+    logger.info(
+        "serving registry proxy for '%s' at '%s'", proxy.upstream,
+        server.url,
+    )
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+    return 0
+
+
+if __name__ == '__main__':  # pragma: no cover
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(main())
@@ -0,0 +1,252 @@
+# -*- coding: utf-8 -*-
+"""
+Reduction of the components directory to the referenced files.
+
+The ``bower_components`` extras declared by the Python packages map the
+module names to the specific files (or directories) they require from
+within the components directory.  Those paths, along with any glob
+patterns (which may also be declared there), are used to determine the
+set of files that are actually needed, such that only those are either
+exported into a separate directory, or kept within the components
+directory.
+
+The files exported into a directory are recorded in a manifest in
+there, such that only the files placed by a previous export are removed
+from there by the next one; nothing else within that directory is
+touched.  Likewise, the metadata of the installed packages and the ones
+written by the driver are retained when pruning the components
+directory in place.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import json
+import logging
+import os
+import shutil
+from fnmatch import fnmatchcase
+from os.path import dirname
+from os.path import exists
+from os.path import isdir
+from os.path import isfile
+from os.path import islink
+from os.path import join
+from os.path import relpath
+
+from calmjs.bower import INSTALL_STAMP
+from calmjs.bower.cache import replace
+from calmjs.bower.native import BOWER_META
+from calmjs.bower.verify import FILES_MANIFEST
+
+logger = logging.getLogger(__name__)
+
+GLOB_CHARS = ('*', '?', '[')
+EXPORT_MANIFEST = '.calmjs-bower-export.json'
+
+
+def is_glob(path):
+    return any(c in path for c in GLOB_CHARS)
+
+
+def _normalize(path):
+    parts = [p for p in path.replace('\\', '/').split('/') if p not in (
+        '', '.')]
+    if not parts or '..' in parts:
+        return None
+    return '/'.join(parts)
+
+
+def _walk_files(root):
+    for base, dirs, filenames in os.walk(root):
+        for name in filenames + [d for d in dirs if islink(join(base, d))]:
+            yield relpath(join(base, name), root).replace(os.sep, '/')
+
+
+def collect_files(components_dir, paths, globs=()):
+    """
+    Collect the files within the components directory that are
+    referenced by paths, which are relative to the components directory
+    and may be directories (for all the files within) or glob patterns,
+    along with the ones that match the additional globs.  The patterns
+    are matched against the complete relative paths using fnmatch, so
+    that ``*`` will also match across the directories.
+
+    Returns a tuple of the sorted list of the relative paths to the
+    files, and the list of the paths and patterns that did not match
+    anything.
+    """
+
+    files = set()
+    missing = []
+    patterns = list(globs)
+
+    for path in paths:
+        if not hasattr(path, 'split'):
+            continue
+        if is_glob(path):
+            patterns.append(path)
+            continue
+        rel = _normalize(path)
+        full = rel and join(components_dir, *rel.split('/'))
+        if full and isdir(full) and not islink(full):
+            files.update(rel + '/' + f for f in _walk_files(full))
+        elif full and (isfile(full) or islink(full)):
+            files.add(rel)
+        else:
+            missing.append(path)
+
+    if patterns:
+        matched = set()
+        for rel in _walk_files(components_dir):
+            for pattern in patterns:
+                if fnmatchcase(rel, pattern):
+                    files.add(rel)
+                    matched.add(pattern)
+        missing.extend(p for p in patterns if p not in matched)
+
+    return sorted(files), missing
+
+
+def place_file(src, dst, link=True):
+    """
+    Place src at dst as a hardlink if link is set and possible,
+    otherwise as a copy.
+    """
+
+    if link:
+        try:
+            os.link(src, dst)
+            return
+        except (IOError, OSError, AttributeError):
+            pass
+    shutil.copy2(src, dst)
+
+
+def read_export_manifest(output_dir):
+    """
+    Return the list of the relative paths to the files recorded by the
+    previous export into output_dir, or an empty list if unavailable.
+    """
+
+    try:
+        with open(join(output_dir, EXPORT_MANIFEST)) as fd:
+            files = json.load(fd)
+    except (IOError, OSError, ValueError):
+        return []
+    if not isinstance(files, list):
+        return []
+    # only the normalized paths, such that nothing outside of the
+    # output_dir will be touched.
+    return [rel for rel in (
+        _normalize(f) for f in files if hasattr(f, 'split')) if rel]
+
+
+def write_export_manifest(output_dir, files):
+    """
+    Record the relative paths to the files exported into output_dir.
+    """
+
+    path = join(output_dir, EXPORT_MANIFEST)
+    with open(path + '.tmp', 'w') as fd:
+        json.dump(sorted(files), fd, indent=2)
+    replace(path + '.tmp', path)
+
+
+def export_files(components_dir, files, output_dir, link=True):
+    """
+    Place the files from the components directory into output_dir, as
+    hardlinks if link is set and possible, otherwise as copies.  The
+    files placed by a previous export that are no longer referenced are
+    removed; everything else within output_dir is left untouched.
+
+    Returns the number of the files removed.
+    """
+
+    previous = read_export_manifest(output_dir)
+    for rel in files:
+        src = join(components_dir, *rel.split('/'))
+        dst = join(output_dir, *rel.split('/'))
+        try:
+            os.makedirs(dirname(dst))
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+        if exists(dst) or islink(dst):
+            os.remove(dst)
+        if islink(src):
+            os.symlink(os.readlink(src), dst)
+        else:
+            place_file(src, dst, link)
+    removed = remove_files(output_dir, set(previous) - set(files))
+    write_export_manifest(output_dir, files)
+    return removed
+
+
+def remove_files(root, files):
+    """
+    Remove the files within root, along with the directories left empty
+    by that; paths that lead outside of root are ignored.  Returns the
+    number of files removed.
+    """
+
+    removed = 0
+    for rel in sorted(files):
+        rel = _normalize(rel)
+        if not rel:
+            continue
+        path = join(root, *rel.split('/'))
+        if not (isfile(path) or islink(path)):
+            continue
+        os.remove(path)
+        removed += 1
+        base = dirname(path)
+        while base != root and isdir(base) and not os.listdir(base):
+            os.rmdir(base)
+            base = dirname(base)
+    return removed
+
+
+def metadata_files(components_dir):
+    """
+    Return the relative paths to the metadata files within the
+    components directory, being the metadata of every package installed
+    in there, the installation stamp and the files manifest.
+    """
+
+    paths = [
+        name + '/' + BOWER_META for name in sorted(os.listdir(components_dir))
+        if isfile(join(components_dir, name, BOWER_META))
+    ]
+    paths.extend(name for name in (INSTALL_STAMP, FILES_MANIFEST) if isfile(
+        join(components_dir, name)))
+    return paths
+
+
+def prune_components(components_dir, files):
+    """
+    Remove everything within the components directory other than the
+    files and the metadata files.  Returns the number of files removed.
+    """
+
+    return prune_directory(
+        components_dir, list(files) + metadata_files(components_dir))
+
+
+def prune_directory(root, files):
+    """
+    Remove everything within root other than the files, along with the
+    directories left empty.  Returns the number of files removed.
+    """
+
+    keep = set(files)
+    removed = 0
+    for base, dirs, filenames in os.walk(root, topdown=False):
+        for name in filenames + [d for d in dirs if islink(join(base, d))]:
+            path = join(base, name)
+            if relpath(path, root).replace(os.sep, '/') not in keep:
+                os.remove(path)
+                removed += 1
+        if base != root and not os.listdir(base):
+            os.rmdir(base)
+    return removed
@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+The calmjs runtime for bower.
+"""
+
+from __future__ import absolute_import
+
+import sys
+
+from calmjs.runtime import PackageManagerRuntime
+
+
+class BowerRuntime(PackageManagerRuntime):
+    """
+    A calmjs package manager runtime for bower, with additional options
+    specific to this package.
+    """
+
+    _pkg_manager_options = PackageManagerRuntime._pkg_manager_options + (
+        ('incremental', None,
+         "skip '%(pkg_manager_bin)s install' if the '%(pkgdef_filename)s' "
+         "and the version of '%(pkg_manager_bin)s' are unchanged since the "
+         "last successful installation"),
+        ('frozen', None,
+         "install the exact packages recorded in 'bower.lock' without any "
+         "version resolution, verifying them against the recorded "
+         "digests; fails if the lock is out of date with the generated "
+         "'%(pkgdef_filename)s'"),
+        ('delta', None,
+         "only add, change or remove the packages in the components "
+         "directory that differ from the generated '%(pkgdef_filename)s', "
+         "as determined by their installed metadata; ignored with "
+         "frozen"),
+        ('lock', None,
+         "run '%(pkg_manager_bin)s install' with generated "
+         "'%(pkgdef_filename)s' and write the exact versions, sources and "
+         "digests of the installed packages into 'bower.lock'; implies "
+         "install"),
+        ('progress', None,
+         "run '%(pkg_manager_bin)s install' with --json and report the "
+         "progress of every package from its output as it is written, "
+         "stopping at the first error"),
+        ('record', None,
+         "record the size and the digest of every file installed into the "
+         "components directory into a manifest in there, for verify"),
+        ('verify', None,
+         "verify the files in the components directory against the "
+         "manifest recorded at installation time, reporting the files "
+         "that are missing, extra or modified; fails on any differences"),
+        ('export', None,
+         "reduce the components directory to the files referenced by the "
+         "'bower_components' extras declared for the specified Python "
+         "package, either by exporting only those into the directory "
+         "specified by export-dir, or if that is not specified, by removing "
+         "everything else from the components directory"),
+        ('hashed', None,
+         "export the referenced files into export-dir with the digest of "
+         "their contents embedded in their filenames, along with a "
+         "'manifest.json' mapping the original paths to those; files "
+         "unchanged since the previous export are not read again"),
+        ('timings', None,
+         "write the durations of each of the phases done, along with the "
+         "counts of the distributions, files and packages involved, as a "
+         "line of JSON to stderr"),
+    )
+
+    # options that take a value, as (full, metavar, description).
+    _pkg_manager_value_options = (
+        ('package-store', 'DIR',
+         "install from the local store of package archives or git mirrors "
+         "at DIR without invoking '%(pkg_manager_bin)s'; falls back to "
+         "'%(pkg_manager_bin)s install' for packages that cannot be "
+         "resolved from there"),
+        ('shared-store', 'DIR',
+         "keep every installed package@version once in the content "
+         "addressed store at DIR, and fill the components directory with "
+         "hardlinks to the files in there"),
+        ('export-dir', 'DIR',
+         "the directory to export the referenced files into"),
+        ('why', 'NAME',
+         "instead of the actions, report the declarations of the bower "
+         "package NAME made by the distributions required by the "
+         "specified Python package(s), along with the chains of "
+         "requirements that lead to those and the resulting spec"),
+        ('mirror', 'DIR',
+         "instead of the actions, fetch every bower package declared for "
+         "the specified Python package(s) along with their dependencies "
+         "from the bower registry into the local mirror at DIR, for use "
+         "as the package store of later installations"),
+    )
+
+    def make_cli_value_options(self):
+        return [
+            (full, metavar, desc % {
+                'pkgdef_filename': self.cli_driver.pkgdef_filename,
+                'pkg_manager_bin': self.cli_driver.pkg_manager_bin,
+            }) for full, metavar, desc in self._pkg_manager_value_options
+        ]
+
+    def init(self):
+        self.pkg_manager_value_options = self.make_cli_value_options()
+        super(BowerRuntime, self).init()
+
+    def run(self, why=None, mirror=None, **kwargs):
+        if why:
+            kwargs.pop(self.action_key, None)
+            kwargs['stream'] = sys.stdout
+            return self.cli_driver.pkg_manager_why(why, **kwargs)
+        if mirror:
+            kwargs.pop(self.action_key, None)
+            return self.cli_driver.pkg_manager_mirror(
+                mirror_dir=mirror, **kwargs)
+        return super(BowerRuntime, self).run(**kwargs)
+
+    def init_argparser(self, argparser):
+        super(BowerRuntime, self).init_argparser(argparser)
+        for full, metavar, desc in self.pkg_manager_value_options:
+            argparser.add_argument(
+                '--' + full, metavar=metavar, help=desc, default=None)
@@ -0,0 +1,360 @@
+# -*- coding: utf-8 -*-
+"""
+Semantic versioning support for the version ranges used by bower.
+
+Ranges are parsed into a union of intervals, such that testing whether
+a given version satisfies a range, and also the intersection of ranges,
+can be done without having to go back to the original string form.
+"""
+
+from __future__ import absolute_import
+
+import re
+
+__all__ = [
+    'Version',
+    'Interval',
+    'Range',
+    'parse_version',
+    'parse_range',
+]
+
+_version_re = re.compile(
+    r'^\s*[v=]*\s*'
+    r'(\d+)(?:\.(\d+)(?:\.(\d+))?)?'
+    r'(?:-([0-9A-Za-z.-]+))?'
+    r'(?:\+[0-9A-Za-z.-]+)?\s*$'
+)
+
+# a partial version, where the components may be wildcards.
+_partial_re = re.compile(
+    r'^[v=]*'
+    r'(\d+|[xX*])(?:\.(\d+|[xX*])(?:\.(\d+|[xX*]))?)?'
+    r'(?:-([0-9A-Za-z.-]+))?'
+    r'(?:\+[0-9A-Za-z.-]+)?$'
+)
+
+_comparator_re = re.compile(r'^(<=|>=|<|>|=|~>|~|\^)?\s*(.*)$')
+_hyphen_re = re.compile(r'^\s*(\S+)\s+-\s+(\S+)\s*$')
+_op_space_re = re.compile(r'(<=|>=|<|>|=|~>|~|\^)\s+')
+
+
+def _prerelease_key(prerelease):
+    if not prerelease:
+        # release versions have precedence over the prerelease ones.
+        return (1,)
+    return (0,) + tuple(
+        (0, int(part), '') if part.isdigit() else (1, 0, part)
+        for part in prerelease.split('.')
+    )
+
+
+class Version(object):
+    """
+    A semantic version.
+    """
+
+    __slots__ = ('major', 'minor', 'patch', 'prerelease', '_key')
+
+    def __init__(self, major, minor=0, patch=0, prerelease=None):
+        self.major = major
+        self.minor = minor
+        self.patch = patch
+        self.prerelease = prerelease or None
+        self._key = (major, minor, patch, _prerelease_key(self.prerelease))
+
+    @property
+    def release(self):
+        return (self.major, self.minor, self.patch)
+
+    def __eq__(self, other):
+        return isinstance(other, Version) and self._key == other._key
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __lt__(self, other):
+        return self._key < other._key
+
+    def __le__(self, other):
+        return self._key <= other._key
+
+    def __gt__(self, other):
+        return self._key > other._key
+
+    def __ge__(self, other):
+        return self._key >= other._key
+
+    def __hash__(self):
+        return hash(self._key)
+
+    def __str__(self):
+        result = '%d.%d.%d' % self.release
+        if self.prerelease:
+            result += '-' + self.prerelease
+        return result
+
+    def __repr__(self):
+        return '<Version %s>' % self
+
+
+def parse_version(value):
+    """
+    Parse a complete version string, with the optional leading 'v'.
+
+    Returns None if the value is not a valid version.
+    """
+
+    match = _version_re.match(value)
+    if not match:
+        return None
+    major, minor, patch, prerelease = match.groups()
+    return Version(
+        int(major), int(minor or 0), int(patch or 0), prerelease)
+
+
+class Interval(object):
+    """
+    An interval of versions, where an unbound end is None.
+
+    The prerelease attribute holds the release tuples for which their
+    prerelease versions are permitted to be within this interval.
+    """
+
+    def __init__(
+            self, low=None, high=None, low_inclusive=True,
+            high_inclusive=False, prerelease=()):
+        self.low = low
+        self.high = high
+        self.low_inclusive = low_inclusive
+        self.high_inclusive = high_inclusive
+        self.prerelease = frozenset(prerelease)
+
+    @property
+    def empty(self):
+        if self.low is None or self.high is None:
+            return False
+        if self.low == self.high:
+            return not (self.low_inclusive and self.high_inclusive)
+        return self.low > self.high
+
+    def __contains__(self, version):
+        if version.prerelease and version.release not in self.prerelease:
+            return False
+        if self.low is not None:
+            if version < self.low or (
+                    version == self.low and not self.low_inclusive):
+                return False
+        if self.high is not None:
+            if version > self.high or (
+                    version == self.high and not self.high_inclusive):
+                return False
+        return True
+
+    def intersect(self, other):
+        low, low_inclusive = self.low, self.low_inclusive
+        if other.low is not None and (low is None or other.low > low or (
+                other.low == low and not other.low_inclusive)):
+            low, low_inclusive = other.low, other.low_inclusive
+
+        high, high_inclusive = self.high, self.high_inclusive
+        if other.high is not None and (high is None or other.high < high or (
+                other.high == high and not other.high_inclusive)):
+            high, high_inclusive = other.high, other.high_inclusive
+
+        return Interval(
+            low, high, low_inclusive, high_inclusive,
+            self.prerelease | other.prerelease,
+        )
+
+    def __eq__(self, other):
+        return isinstance(other, Interval) and (
+            self.low, self.high, self.low_inclusive, self.high_inclusive,
+            self.prerelease,
+        ) == (
+            other.low, other.high, other.low_inclusive, other.high_inclusive,
+            other.prerelease,
+        )
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __str__(self):
+        parts = []
+        if self.low is not None:
+            parts.append('%s%s' % ('>=' if self.low_inclusive else '>', (
+                self.low)))
+        if self.high is not None:
+            parts.append('%s%s' % ('<=' if self.high_inclusive else '<', (
+                self.high)))
+        if (self.low is not None and self.low == self.high and
+                self.low_inclusive and self.high_inclusive):
+            return str(self.low)
+        return ' '.join(parts) or '*'
+
+    def __repr__(self):
+        return '<Interval %s>' % self
+
+
+class Range(object):
+    """
+    A union of intervals.
+    """
+
+    def __init__(self, intervals, raw=None):
+        self.intervals = [i for i in intervals if not i.empty]
+        self.raw = raw
+
+    @property
+    def empty(self):
+        return not self.intervals
+
+    def __contains__(self, version):
+        return any(version in interval for interval in self.intervals)
+
+    def intersect(self, other):
+        return Range([
+            a.intersect(b)
+            for a in self.intervals for b in other.intervals
+        ])
+
+    def max_satisfying(self, versions):
+        """
+        Return the highest of the versions that satisfies this range.
+        """
+
+        candidates = [v for v in versions if v in self]
+        return max(candidates) if candidates else None
+
+    def __str__(self):
+        if self.empty:
+            return '<empty>'
+        return ' || '.join(str(interval) for interval in self.intervals)
+
+    def __repr__(self):
+        return '<Range %s>' % self
+
+
+def _parse_partial(value):
+    """
+    Return a tuple of the numeric parts (None for wildcards and those
+    omitted) and the prerelease.
+    """
+
+    match = _partial_re.match(value)
+    if not match:
+        raise ValueError('invalid version %r' % value)
+    parts = []
+    for part in match.groups()[:3]:
+        if part is None or part in 'xX*':
+            # anything after a wildcard is also a wildcard.
+            break
+        parts.append(int(part))
+    parts.extend([None] * (3 - len(parts)))
+    return tuple(parts), match.group(4)
+
+
+def _lower(parts, prerelease):
+    return Version(*(tuple(p or 0 for p in parts) + (prerelease,)))
+
+
+def _bump(parts, index):
+    values = [p or 0 for p in parts[:index + 1]]
+    values[index] += 1
+    values.extend([0] * (3 - len(values)))
+    return Version(*values)
+
+
+def _count(parts):
+    return len([p for p in parts if p is not None])
+
+
+def _parse_comparator(value):
+    """
+    Parse a single comparator into an Interval.
+    """
+
+    op, version = _comparator_re.match(value).groups()
+    if version == 'latest':
+        version = '*'
+
+    parts, prerelease = _parse_partial(version or '*')
+    count = _count(parts)
+    low = _lower(parts, prerelease)
+    pre = (low.release,) if prerelease else ()
+
+    if count == 0:
+        if op in ('<', '>'):
+            # nothing can be less or greater than everything.
+            return Interval(Version(0), Version(0), True, False)
+        return Interval()
+
+    if op in (None, '='):
+        if count == 3:
+            return Interval(low, low, True, True, pre)
+        return Interval(low, _bump(parts, count - 1), prerelease=pre)
+    if op in ('~', '~>'):
+        return Interval(low, _bump(parts, min(count, 2) - 1), prerelease=pre)
+    if op == '^':
+        # bump the left-most non-zero component within those specified.
+        index = count - 1
+        for i, part in enumerate(parts[:count]):
+            if part:
+                index = i
+                break
+        return Interval(low, _bump(parts, index), prerelease=pre)
+    if op == '>=':
+        return Interval(low, None, True, prerelease=pre)
+    if op == '>':
+        if count == 3:
+            return Interval(low, None, False, prerelease=pre)
+        return Interval(_bump(parts, count - 1), None, True)
+    if op == '<':
+        return Interval(None, low, high_inclusive=False, prerelease=pre)
+    # op == '<='
+    if count == 3:
+        return Interval(None, low, high_inclusive=True, prerelease=pre)
+    return Interval(None, _bump(parts, count - 1), high_inclusive=False)
+
+
+def _parse_set(value):
+    """
+    Parse a set of space separated comparators into an Interval.
+    """
+
+    match = _hyphen_re.match(value)
+    if match:
+        low_parts, low_pre = _parse_partial(match.group(1))
+        high_parts, high_pre = _parse_partial(match.group(2))
+        pre = set()
+        if low_pre:
+            pre.add(_lower(low_parts, low_pre).release)
+        if high_pre:
+            pre.add(_lower(high_parts, high_pre).release)
+        count = _count(high_parts)
+        if count == 3:
+            high = Interval(
+                None, _lower(high_parts, high_pre), high_inclusive=True)
+        elif count:
+            high = Interval(None, _bump(high_parts, count - 1))
+        else:
+            high = Interval()
+        return Interval(
+            _lower(low_parts, low_pre), prerelease=pre).intersect(high)
+
+    result = Interval()
+    for comparator in _op_space_re.sub(r'\1', value).split():
+        result = result.intersect(_parse_comparator(comparator))
+    return result
+
+
+def parse_range(value):
+    """
+    Parse a range as used by bower (and node-semver) into a Range.
+
+    Raises ValueError if the value is not a valid range.
+    """
+
+    value = value.strip()
+    return Range(
+        [_parse_set(part) for part in value.split('||')], raw=value)
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+Content addressed shared store for installed bower packages.
+
+Every file of every installed package@version is kept once within the
+shared store, keyed by the digest of its contents, with a manifest for
+each package@version listing the files it is made of.  The directory
+for a package within ``bower_components`` can then be populated from
+that using hardlinks (or reflinks) instead of full copies.
+
+The layout of the shared store is as follows::
+
+    <store>/objects/<2 hex>/<sha256 hex>[x]
+    <store>/trees/<name>/<version>.json
+    <store>/locks/<name>/<version>.lock
+
+The lock files are held while a package@version is being added, such
+that concurrent installations on the same host will only add each of
+them once, while different packages may be added in parallel.
+"""
+
+from __future__ import absolute_import
+
+import errno
+import hashlib
+import json
+import logging
+import os
+import shutil
+import stat
+import sys
+from os.path import dirname
+from os.path import exists
+from os.path import isdir
+from os.path import join
+from os.path import relpath
+from tempfile import mkstemp
+
+from calmjs.bower.cache import replace
+from calmjs.bower.locks import FileLock
+from calmjs.bower.native import BOWER_META
+from calmjs.bower.native import archive_files
+
+logger = logging.getLogger(__name__)
+
+HARDLINK = 'hardlink'
+REFLINK = 'reflink'
+COPY = 'copy'
+LINK_MODES = (HARDLINK, REFLINK, COPY)
+# from linux/fs.h
+FICLONE = 0x40049409
+CHUNK_SIZE = 1 << 16
+
+
+def _makedirs(path):
+    try:
+        os.makedirs(path)
+    except OSError as e:
+        if e.errno != errno.EEXIST:
+            raise
+
+
+def file_digest(path):
+    """
+    Return the sha256 hexdigest of the file at path.
+    """
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as fd:
+        for chunk in iter(lambda: fd.read(CHUNK_SIZE), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def reflink(src, dst):
+    """
+    Create dst as a copy-on-write clone of src.  Only supported on
+    Linux with filesystems that provide that (e.g. btrfs, xfs); raises
+    OSError otherwise.
+    """
+
+    if not sys.platform.startswith('linux'):
+        raise OSError(errno.EOPNOTSUPP, 'reflink not supported')
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), FICLONE, s.fileno())
+        except (IOError, OSError):
+            d.close()
+            os.remove(dst)
+            raise
+
+
+def tree_key(name, meta):
+    """
+    Return the name and version to keep the package installed as name
+    with the bower metadata meta in the store, or None if it cannot be
+    identified.
+
+    Packages installed from the registry are keyed on their registered
+    name and release, as done by the native installer.  Packages from
+    any other source (e.g. a fork, a git or an archive URL) may have the
+    same name and release as a registered package, so the version is
+    qualified by the digest of their source and its resolved commit or
+    tag.
+    """
+
+    release = meta.get('_release')
+    if not release:
+        return None
+    source = meta.get('_originalSource') or name
+    if '/' not in source and ':' not in source:
+        return source, release
+
+    resolution = meta.get('_resolution') or {}
+    resolved = resolution.get('commit') or resolution.get('tag')
+    if not meta.get('_source') or not resolved:
+        return None
+    identity = '%s#%s' % (meta['_source'], resolved)
+    return name, '%s+%s' % (release, hashlib.sha256(
+        identity.encode('utf8')).hexdigest()[:16])
+
+
+class SharedStore(object):
+    """
+    The content addressed shared store.
+    """
+
+    def __init__(self, root, link_mode=HARDLINK):
+        """
+        Arguments:
+
+        root
+            The root directory of the shared store.
+        link_mode
+            How files are placed into the target directories; one of
+            'hardlink' (the default), 'reflink' or 'copy'.  The first
+            two fall back to copying if the filesystem does not support
+            them (e.g. the target is on a different device).
+        """
+
+        if link_mode not in LINK_MODES:
+            raise ValueError(
+                "link_mode must be one of %s" % ', '.join(LINK_MODES))
+        self.root = root
+        self.link_mode = link_mode
+
+    def object_path(self, key):
+        return join(self.root, 'objects', key[:2], key)
+
+    def tree_path(self, name, version):
+        return join(self.root, 'trees', name, '%s.json' % version)
+
+    def lock_path(self, name, version):
+        return join(self.root, 'locks', name, '%s.lock' % version)
+
+    def lock(self, name, version):
+        """
+        Return the FileLock for name at version.
+        """
+
+        return FileLock(self.lock_path(name, version))
+
+    def get_tree(self, name, version):
+        """
+        Return the manifest for name at version, or None.
+        """
+
+        try:
+            with open(self.tree_path(name, version)) as fd:
+                return json.load(fd)
+        except (IOError, OSError, ValueError):
+            return None
+
+    def has_tree(self, name, version):
+        return exists(self.tree_path(name, version))
+
+    def _write_object(self, data_or_path, executable, is_path=False):
+        if is_path:
+            key = file_digest(data_or_path)
+        else:
+            key = hashlib.sha256(data_or_path).hexdigest()
+        if executable:
+            key += 'x'
+        target = self.object_path(key)
+        if exists(target):
+            return key
+
+        _makedirs(dirname(target))
+        fd, tmp = mkstemp(dir=dirname(target))
+        try:
+            with os.fdopen(fd, 'wb') as stream:
+                if is_path:
+                    with open(data_or_path, 'rb') as src:
+                        shutil.copyfileobj(src, stream)
+                else:
+                    stream.write(data_or_path)
+            os.chmod(tmp, 0o555 if executable else 0o444)
+            replace(tmp, target)
+        except Exception:
+            if exists(tmp):
+                os.remove(tmp)
+            raise
+        return key
+
+    def _write_tree(self, name, version, files):
+        path = self.tree_path(name, version)
+        _makedirs(dirname(path))
+        fd, tmp = mkstemp(dir=dirname(path))
+        with os.fdopen(fd, 'w') as stream:
+            json.dump({'files': files}, stream, sort_keys=True)
+        replace(tmp, path)
+        logger.debug("added '%s#%s' to shared store", name, version)
+        return {'files': files}
+
+    def add_package(self, name, version, package, exclude=(BOWER_META,)):
+        """
+        Add the contents of a native Package into the store as name at
+        version.  Returns the manifest.
+        """
+
+        archive = package.open()
+        try:
+            files = {
+                '/'.join(parts): self._write_object(
+                    reader(), bool(mode & stat.S_IXUSR))
+                for parts, mode, reader in archive_files(archive)
+                if '/'.join(parts) not in exclude
+            }
+        finally:
+            archive.close()
+        return self._write_tree(name, version, files)
+
+    def ensure_package(self, name, version, package):
+        """
+        Add the native Package as name at version, unless the store has
+        it already or another process added that while waiting for the
+        lock.  Returns True if added by this call.
+        """
+
+        if self.has_tree(name, version):
+            return False
+        with self.lock(name, version):
+            if self.has_tree(name, version):
+                return False
+            self.add_package(name, version, package)
+        return True
+
+    def add_directory(self, name, version, source, exclude=(BOWER_META,)):
+        """
+        Add the contents of the source directory into the store as name
+        at version.  Returns the manifest.
+        """
+
+        files = {}
+        for root, dirs, filenames in os.walk(source):
+            for filename in filenames:
+                path = join(root, filename)
+                rel = relpath(path, source).replace(os.sep, '/')
+                if rel in exclude or os.path.islink(path):
+                    continue
+                files[rel] = self._write_object(
+                    path, bool(os.stat(path).st_mode & stat.S_IXUSR),
+                    is_path=True,
+                )
+        return self._write_tree(name, version, files)
+
+    def _place(self, src, dst):
+        if self.link_mode == HARDLINK:
+            try:
+                os.link(src, dst)
+                return
+            except (IOError, OSError, AttributeError):
+                pass
+        elif self.link_mode == REFLINK:
+            try:
+                reflink(src, dst)
+                return
+            except (IOError, OSError):
+                pass
+        shutil.copyfile(src, dst)
+        shutil.copymode(src, dst)
+
+    def link_tree(self, name, version, target):
+        """
+        Populate the target directory with the files for name at version
+        from the store.  Returns False if it is not available.
+        """
+
+        manifest = self.get_tree(name, version)
+        if manifest is None:
+            return False
+        for rel, key in sorted(manifest['files'].items()):
+            dst = join(target, *rel.split('/'))
+            _makedirs(dirname(dst))
+            self._place(self.object_path(key), dst)
+        return True
+
+    def relink_directory(self, name, version, target):
+        """
+        Replace the files within the installed package directory at
+        target with the ones in this store, adding them first if the
+        store does not have name at version.  Files excluded from the
+        store (such as the bower metadata) are retained.
+        """
+
+        if not self.has_tree(name, version):
+            with self.lock(name, version):
+                if not self.has_tree(name, version):
+                    self.add_directory(name, version, target)
+
+        tmp = target + '.%d.tmp' % os.getpid()
+        if exists(tmp):
+            shutil.rmtree(tmp)
+        # created up front, as an empty package has no files to link.
+        os.mkdir(tmp)
+        try:
+            self.link_tree(name, version, tmp)
+            meta = join(target, BOWER_META)
+            if exists(meta):
+                shutil.copy2(meta, join(tmp, BOWER_META))
+        except Exception:
+            shutil.rmtree(tmp)
+            raise
+        shutil.rmtree(target)
+        os.rename(tmp, target)
+
+    def relink_components(self, components_dir):
+        """
+        Relink every package installed within the components directory
+        that has metadata identifying its version.  Returns the list of
+        the package names that were relinked.
+        """
+
+        results = []
+        if not isdir(components_dir):
+            return results
+        for name in sorted(os.listdir(components_dir)):
+            if name.startswith('.'):
+                continue
+            target = join(components_dir, name)
+            try:
+                with open(join(target, BOWER_META)) as fd:
+                    meta = json.load(fd)
+            except (IOError, OSError, ValueError):
+                continue
+            key = tree_key(name, meta)
+            if key is None:
+                continue
+            self.relink_directory(key[0], key[1], target)
+            results.append(name)
+        return results
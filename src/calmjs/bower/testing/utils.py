@@ -0,0 +1,101 @@
+# -*- coding: utf-8 -*-
+"""
+Testing utilities for calmjs.bower.
+"""
+
+from __future__ import absolute_import
+
+import io
+import json
+import os
+import tarfile
+import zipfile
+from os.path import isdir
+from os.path import join
+
+from calmjs.utils import fork_exec
+
+
+def make_package_archive(
+        store, name, version, files=None, bower_json=None, fmt='tar.gz',
+        prefix=None):
+    """
+    Create an archive for the package name at version inside the store,
+    containing the files (a mapping of relative paths to their text
+    contents) plus a bower.json if provided.  Returns the path to the
+    archive.
+    """
+
+    files = dict(files or {})
+    if bower_json is not None:
+        files['bower.json'] = json.dumps(bower_json)
+    if prefix is None:
+        prefix = '%s-%s/' % (name, version)
+
+    base = join(store, name)
+    if not isdir(base):
+        os.makedirs(base)
+    path = join(base, '%s.%s' % (version, fmt))
+
+    if fmt == 'zip':
+        with zipfile.ZipFile(path, 'w') as archive:
+            for filename, contents in sorted(files.items()):
+                archive.writestr(prefix + filename, contents)
+        return path
+
+    mode = 'w:gz' if fmt in ('tar.gz', 'tgz') else 'w'
+    with tarfile.open(path, mode) as archive:
+        for filename, contents in sorted(files.items()):
+            data = contents.encode('utf8')
+            info = tarfile.TarInfo(prefix + filename)
+            info.size = len(data)
+            info.mode = 0o644
+            archive.addfile(info, io.BytesIO(data))
+    return path
+
+
+def make_git_mirror(store, workdir, name, versions):
+    """
+    Create a bare git mirror for name inside the store, with a tag for
+    every version in versions, which is a list of (version, files).
+    """
+
+    env = dict(os.environ)
+    env.update({
+        'GIT_AUTHOR_NAME': 'tester', 'GIT_AUTHOR_EMAIL': 'tester@example.com',
+        'GIT_COMMITTER_NAME': 'tester',
+        'GIT_COMMITTER_EMAIL': 'tester@example.com',
+    })
+    work = join(workdir, name)
+    os.makedirs(work)
+    fork_exec(['git', 'init', '-q'], cwd=work, env=env)
+    for version, files in versions:
+        for filename, contents in files.items():
+            with open(join(work, filename), 'w') as fd:
+                fd.write(contents)
+        fork_exec(['git', 'add', '.'], cwd=work, env=env)
+        fork_exec(
+            ['git', 'commit', '-q', '-m', version], cwd=work, env=env)
+        fork_exec(['git', 'tag', 'v' + version], cwd=work, env=env)
+    target = join(store, name + '.git')
+    fork_exec(['git', 'clone', '-q', '--bare', work, target], env=env)
+    return target
+
+
+def make_zipped_egg(
+        working_dir, pkgname, version, metadata_map=(), info='EGG-INFO'):
+    """
+    Create a zipped egg for the package inside working_dir, with the
+    metadata_map being the filenames and contents of the files within
+    its metadata directory named info.  Returns the path to the egg,
+    which may be added as an entry to a WorkingSet.
+    """
+
+    metadata = dict(metadata_map)
+    metadata.setdefault('PKG-INFO', 'Metadata-Version: 1.0\nName: %s\n' % (
+        pkgname))
+    path = join(working_dir, '%s-%s-py2.7.egg' % (pkgname, version))
+    with zipfile.ZipFile(path, 'w') as archive:
+        for filename, contents in sorted(metadata.items()):
+            archive.writestr('%s/%s' % (info, filename), contents)
+    return path
@@ -0,0 +1,211 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+import stat
+import sys
+from io import StringIO
+from os.path import exists
+from os.path import join
+
+from pkg_resources import WorkingSet
+
+from calmjs import dist
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.utils import pretty_logging
+from calmjs.testing.utils import stub_item_attr_value
+
+from calmjs.bower import Driver
+from calmjs.bower import locks
+from calmjs.bower.tests.test_events import FAKE_BOWER
+
+try:
+    import asyncio
+except ImportError:  # pragma: no cover
+    asyncio = None
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover
+    fcntl = None
+
+# records its pid, then hangs until killed.
+SLOW_BOWER = r'''
+import os
+import time
+with open('bower.pid', 'w') as fd:
+    fd.write(str(os.getpid()))
+time.sleep(60)
+'''
+
+
+# records that it was invoked, and whether the cache lock for jquery
+# was held by then.
+PROBE_BOWER = r'''
+import fcntl
+import os
+import sys
+state = 'none'
+if os.environ.get('LOCK_PATH'):
+    fd = os.open(os.environ['LOCK_PATH'], os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except (IOError, OSError):
+        state = 'locked'
+    else:
+        state = 'free'
+with open('bower.ran', 'w') as fd:
+    fd.write(state)
+'''
+
+
+def is_unlocked(path):
+    fd = os.open(path, os.O_RDWR)
+    try:
+        fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+    except (IOError, OSError):
+        return False
+    else:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+        return True
+    finally:
+        os.close(fd)
+
+
+def make_bower(bin_dir, source):
+    bower = join(bin_dir, 'bower')
+    with open(bower, 'w') as fd:
+        fd.write('#!%s\n%s' % (sys.executable, source))
+    os.chmod(bower, os.stat(bower).st_mode | stat.S_IXUSR)
+
+
+@unittest.skipIf(
+    sys.version_info < (3, 7) or sys.platform == 'win32',
+    'requires Python 3.7+ and a shebang script')
+class AsyncDriverTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.11.0'},
+            })),
+        ), 'app', '1.0.0')
+        stub_item_attr_value(
+            self, dist, 'default_working_set',
+            WorkingSet([self._calmjs_testing_tmpdir]))
+        self.bin_dir = mkdtemp(self)
+        self.project = mkdtemp(self)
+        self.driver = Driver(
+            working_dir=self.project, env_path=self.bin_dir,
+            package_store='', cache_dir='')
+        self.loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self.loop)
+        self.addCleanup(asyncio.set_event_loop, None)
+        self.addCleanup(self.loop.close)
+
+    def run_loop(self, coro):
+        return self.loop.run_until_complete(coro)
+
+    def test_view(self):
+        stream = StringIO()
+        result = self.run_loop(
+            self.driver.pkg_manager_view_async('app', stream=stream))
+        self.assertEqual(result['dependencies'], {'jquery': '~1.11.0'})
+        self.assertEqual(json.loads(stream.getvalue()), result)
+
+    def test_init(self):
+        self.assertTrue(self.run_loop(
+            self.driver.pkg_manager_init_async('app', interactive=True)))
+        self.assertTrue(exists(join(self.project, 'bower.json')))
+
+    def test_install_events(self):
+        make_bower(self.bin_dir, FAKE_BOWER)
+        received = []
+        self.assertTrue(self.run_loop(self.driver.pkg_manager_install_async(
+            'app', events=received.append)))
+        self.assertEqual(
+            [event['id'] for event in received], ['resolve', 'install'])
+
+    def test_install_events_failure(self):
+        make_bower(self.bin_dir, FAKE_BOWER)
+        received = []
+        self.assertFalse(self.run_loop(self.driver.pkg_manager_install_async(
+            'app', args=('fail',), events=received.append)))
+        self.assertEqual(received[-1]['code'], 'ENOTFOUND')
+
+    def test_install_concurrent(self):
+        make_bower(self.bin_dir, FAKE_BOWER)
+        drivers = [self.driver] + [Driver(
+            working_dir=mkdtemp(self), env_path=self.bin_dir,
+            package_store='', cache_dir='') for i in range(3)]
+        results = self.run_loop(asyncio.gather(*[
+            driver.pkg_manager_install_async('app') for driver in drivers]))
+        self.assertEqual(results, [True] * 4)
+
+    def test_install_frozen(self):
+        make_bower(self.bin_dir, PROBE_BOWER)
+        with pretty_logging(stream=StringIO()) as stream:
+            self.assertFalse(self.run_loop(
+                self.driver.pkg_manager_install_async('app', frozen=True)))
+        # done through pkg_manager_install, which requires the lock file.
+        self.assertIn('unable to install from lock file', stream.getvalue())
+        self.assertTrue(exists(join(self.project, 'bower.json')))
+        self.assertFalse(exists(join(self.project, 'bower.ran')))
+
+    def test_install_cache_lock(self):
+        make_bower(self.bin_dir, PROBE_BOWER)
+        self.driver.cache_lock = mkdtemp(self)
+        lock_path = locks.package_lock_path(self.driver.cache_lock, 'jquery')
+        self.assertTrue(self.run_loop(self.driver.pkg_manager_install_async(
+            'app', env={'LOCK_PATH': lock_path})))
+        with open(join(self.project, 'bower.ran')) as fd:
+            self.assertEqual(fd.read(), 'locked')
+        with locks.FileLock(lock_path) as lock:
+            # released once done.
+            self.assertTrue(lock.locked)
+
+    def test_install_cancel(self):
+        make_bower(self.bin_dir, SLOW_BOWER)
+        pid_file = join(self.project, 'bower.pid')
+        task = self.loop.create_task(
+            self.driver.pkg_manager_install_async('app'))
+        for i in range(200):
+            self.run_loop(asyncio.sleep(0.05))
+            if exists(pid_file) and os.path.getsize(pid_file):
+                break
+        with open(pid_file) as fd:
+            pid = int(fd.read())
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            self.run_loop(task)
+        # the child process was killed and reaped.
+        with self.assertRaises(OSError):
+            os.kill(pid, 0)
+
+    def test_install_cancel_cache_lock(self):
+        make_bower(self.bin_dir, PROBE_BOWER)
+        self.driver.cache_lock = mkdtemp(self)
+        lock_path = locks.package_lock_path(self.driver.cache_lock, 'jquery')
+        held = locks.FileLock(lock_path)
+        held.acquire()
+        task = self.loop.create_task(
+            self.driver.pkg_manager_install_async('app'))
+        for i in range(200):
+            self.run_loop(asyncio.sleep(0.05))
+            if exists(join(self.project, 'bower.json')):
+                break
+        # give the executor the chance to block on the held lock.
+        self.run_loop(asyncio.sleep(0.2))
+        task.cancel()
+        with self.assertRaises(asyncio.CancelledError):
+            self.run_loop(task)
+        held.release()
+
+        # the lock acquired after the cancellation is released.
+        for i in range(200):
+            self.run_loop(asyncio.sleep(0.05))
+            if is_unlocked(lock_path):
+                break
+        self.assertTrue(is_unlocked(lock_path))
+        self.assertFalse(exists(join(self.project, 'bower.ran')))
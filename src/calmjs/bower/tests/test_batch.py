@@ -0,0 +1,285 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import multiprocessing
+import os
+from os.path import exists
+from os.path import join
+
+from pkg_resources import WorkingSet
+
+from calmjs import cli
+from calmjs import dist
+
+from calmjs.testing import mocks
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_base_which
+from calmjs.testing.utils import stub_item_attr_value
+from calmjs.testing.utils import stub_os_environ
+
+from calmjs.bower import Driver
+from calmjs.bower import batch
+from calmjs.bower import locks
+from calmjs.bower.testing.utils import make_package_archive
+
+
+class MetadataIndexTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('requires.txt', ''),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.8.3'},
+            })),
+        ), 'lib', '1.0.0')
+        make_dummy_dist(self, (
+            ('requires.txt', 'lib>=1.0.0'),
+            ('bower.json', json.dumps({
+                'dependencies': {'underscore': '1.x'},
+            })),
+        ), 'app', '2.0')
+        self.working_set = WorkingSet([self._calmjs_testing_tmpdir])
+        stub_item_attr_value(
+            self, dist, 'default_working_set', self.working_set)
+
+    def test_find_dists(self):
+        index = batch.MetadataIndex()
+        dists = index.find_dists(['app'])
+        self.assertEqual(
+            ['lib', 'app'], [d.project_name for d in dists])
+        self.assertEqual(
+            ['app'], [d.project_name for d in index.find_dists(
+                ['app'], explicit=True)])
+
+        # the resolved lists are memoized.
+        stub_item_attr_value(
+            self, dist, 'find_packages_requirements_dists', None)
+        self.assertEqual(dists, index.find_dists(['app']))
+
+    def test_read(self):
+        index = batch.MetadataIndex()
+        app = self.working_set.find(dist.Requirement.parse('app'))
+        self.assertEqual(index.read(app, 'bower.json'), {
+            'dependencies': {'underscore': '1.x'}})
+        self.assertIsNone(index.read(app, 'package.json'))
+
+        calls = []
+
+        def read(*a):
+            calls.append(a)
+
+        stub_item_attr_value(self, dist, 'read_dist_egginfo_json', read)
+        self.assertEqual(index.read(app, 'bower.json'), {
+            'dependencies': {'underscore': '1.x'}})
+        self.assertEqual(calls, [])
+
+    def test_driver_view(self):
+        index = batch.MetadataIndex()
+        driver = Driver(cache_dir='', index=index)
+        self.assertEqual(driver.pkg_manager_view('app')['dependencies'], {
+            'jquery': '~1.8.3', 'underscore': '1.x'})
+        self.assertEqual(len(index._metadata), 2)
+        # further drivers with the same index reuse the results.
+        index._metadata.clear()
+        index._metadata.update({
+            (d.location, d.project_name, d.version, 'bower.json'): {
+                'dependencies': {d.project_name: '1.0.0'}}
+            for d in index.find_dists(['app'])
+        })
+        self.assertEqual(Driver(cache_dir='', index=index).pkg_manager_view(
+            'app')['dependencies'], {'lib': '1.0.0', 'app': '1.0.0'})
+
+
+class ManifestTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp(self)
+        self.path = join(self.tmpdir, 'manifest.json')
+
+    def write(self, value):
+        with open(self.path, 'w') as fd:
+            json.dump(value, fd)
+
+    def test_read_manifest(self):
+        self.write([
+            {'working_dir': 'app1', 'package_names': ['app1']},
+            {'working_dir': '/srv/app2', 'package_names': ['app2', 'lib'],
+             'explicit': True},
+        ])
+        self.assertEqual(batch.read_manifest(self.path), [{
+            'working_dir': join(self.tmpdir, 'app1'),
+            'package_names': ['app1'],
+            'explicit': False,
+        }, {
+            'working_dir': '/srv/app2',
+            'package_names': ['app2', 'lib'],
+            'explicit': True,
+        }])
+
+    def test_read_manifest_malformed(self):
+        self.write({'app1': ['app1']})
+        with self.assertRaises(ValueError):
+            batch.read_manifest(self.path)
+
+        self.write([{'working_dir': 'app1', 'package_names': 'app1'}])
+        with self.assertRaises(ValueError) as e:
+            batch.read_manifest(self.path)
+        self.assertIn('project 0', str(e.exception))
+
+
+class BatchRunnerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('requires.txt', ''),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.8.3'},
+            })),
+        ), 'lib', '1.0.0')
+        for name in ('app1', 'app2', 'app3'):
+            make_dummy_dist(self, (
+                ('requires.txt', 'lib>=1.0.0'),
+                ('bower.json', json.dumps({
+                    'dependencies': {name: '~1.0.0'},
+                })),
+            ), name, '1.0')
+        stub_item_attr_value(
+            self, dist, 'default_working_set',
+            WorkingSet([self._calmjs_testing_tmpdir]))
+        self.tmpdir = mkdtemp(self)
+        self.projects = [{
+            'working_dir': join(self.tmpdir, name),
+            'package_names': [name],
+            'explicit': False,
+        } for name in ('app1', 'app2', 'app3')]
+
+    def read(self, name):
+        with open(join(self.tmpdir, name, 'bower.json')) as fd:
+            return json.load(fd)
+
+    def test_init(self):
+        calls = []
+        read_dist_egginfo_json = dist.read_dist_egginfo_json
+
+        def read(*a):
+            calls.append(a)
+            return read_dist_egginfo_json(*a)
+
+        stub_item_attr_value(self, dist, 'read_dist_egginfo_json', read)
+        runner = batch.BatchRunner(cache_dir='')
+        results = runner.init(self.projects)
+        self.assertEqual([True] * 3, [r['ok'] for r in results])
+        self.assertEqual(self.read('app2'), {
+            'dependencies': {'jquery': '~1.8.3', 'app2': '~1.0.0'},
+            'devDependencies': {},
+            'name': 'app2',
+        })
+        # the metadata of lib is only read once for all the projects.
+        self.assertEqual(len(calls), 4)
+
+    def test_init_failure(self):
+        self.projects[1]['package_names'] = ['app2 malformed']
+        with open(join(self.tmpdir, 'app3'), 'w'):
+            pass
+        runner = batch.BatchRunner(cache_dir='')
+        results = runner.init(self.projects)
+        self.assertEqual([True, False, False], [r['ok'] for r in results])
+
+    def test_install_concurrent(self):
+        calls = []
+
+        def call(cmd, **kw):
+            calls.append(kw['cwd'])
+            return 0
+
+        stub_item_attr_value(self, cli, 'call', call)
+        stub_base_which(self, 'bower')
+        stub_os_environ(self)
+        os.environ[locks.CACHE_LOCK_ENV] = join(self.tmpdir, 'lock')
+        runner = batch.BatchRunner(jobs=2, cache_dir='', package_store='')
+        results = runner.install(self.projects)
+        self.assertEqual([True] * 3, [r['ok'] for r in results])
+        # the host wide lock is used for concurrent installations.
+        self.assertEqual(
+            runner.driver_kw['cache_lock'], join(self.tmpdir, 'lock'))
+        self.assertEqual(
+            sorted(calls), [p['working_dir'] for p in self.projects])
+        self.assertEqual(self.read('app3')['name'], 'app3')
+
+    def test_install_processes(self):
+        packages = mkdtemp(self)
+        shared_store = mkdtemp(self)
+        make_package_archive(packages, 'jquery', '1.8.3', {
+            'jquery.js': '// jquery'})
+        for name in ('app1', 'app2', 'app3'):
+            make_package_archive(packages, name, '1.0.0', {
+                name + '.js': '// ' + name})
+
+        runner = batch.BatchRunner(
+            jobs=3, processes=True, cache_dir='', package_store=packages,
+            shared_store=shared_store, cache_lock=join(self.tmpdir, 'lock'),
+        )
+        results = runner.install(self.projects)
+        self.assertEqual([True] * 3, [r['ok'] for r in results])
+        # the distributions were resolved before the workers started.
+        self.assertEqual(len(runner.index._dists), 3)
+        installed = [
+            os.stat(join(
+                p['working_dir'], 'bower_components', 'jquery', 'jquery.js'))
+            for p in self.projects
+        ]
+        # the package was added to the shared store once, and linked
+        # into every project.
+        self.assertEqual(1, len(set(st.st_ino for st in installed)))
+        self.assertEqual(installed[0].st_nlink, 4)
+        self.assertTrue(exists(join(
+            self.tmpdir, 'app2', 'bower_components', 'app2', 'app2.js')))
+
+    def test_install_processes_spawn(self):
+        # the workers do not inherit anything from this process.
+        context = multiprocessing.get_context('spawn')
+        stub_item_attr_value(self, batch, 'Pool', context.Pool)
+        packages = mkdtemp(self)
+        make_package_archive(packages, 'jquery', '1.8.3', {
+            'jquery.js': '// jquery'})
+        for name in ('app1', 'app2', 'app3'):
+            make_package_archive(packages, name, '1.0.0', {
+                name + '.js': '// ' + name})
+
+        runner = batch.BatchRunner(
+            jobs=3, processes=True, cache_dir='', package_store=packages,
+            cache_lock=join(self.tmpdir, 'lock'),
+        )
+        results = runner.install(self.projects)
+        self.assertEqual([True] * 3, [r['ok'] for r in results])
+        self.assertEqual(self.read('app2')['dependencies'], {
+            'app2': '~1.0.0', 'jquery': '~1.8.3'})
+        self.assertTrue(exists(join(
+            self.tmpdir, 'app2', 'bower_components', 'jquery', 'jquery.js')))
+
+    def test_main(self):
+        path = join(self.tmpdir, 'manifest.json')
+        with open(path, 'w') as fd:
+            json.dump([
+                {'working_dir': 'app1', 'package_names': ['app1']},
+                {'working_dir': 'app2', 'package_names': ['app2']},
+            ], fd)
+        stub_item_attr_value(self, os, 'environ', {})
+        stdout = mocks.StringIO()
+        self.assertEqual(batch.main([path], stdout=stdout), 0)
+        self.assertEqual(stdout.getvalue().splitlines(), [
+            'ok ' + join(self.tmpdir, 'app1'),
+            'ok ' + join(self.tmpdir, 'app2'),
+        ])
+        self.assertTrue(exists(join(self.tmpdir, 'app1', 'bower.json')))
+        self.assertEqual(
+            batch.main([join(self.tmpdir, 'missing.json')], stdout=stdout),
+            2)
+
+    def test_run(self):
+        stub_item_attr_value(
+            self, batch.logging, 'basicConfig', lambda **kw: None)
+        with self.assertRaises(SystemExit) as e:
+            batch.run([join(self.tmpdir, 'missing.json')])
+        self.assertEqual(e.exception.code, 2)
@@ -9,6 +9,7 @@ import sys
 from os.path import join
 from os.path import exists
 
+from distutils.errors import DistutilsError
 from setuptools.dist import Distribution
 from pkg_resources import WorkingSet
 
@@ -17,21 +18,27 @@ from calmjs import dist
 from calmjs import npm
 from calmjs.utils import fork_exec
 
+from calmjs.testing.utils import create_fake_bin
 from calmjs.testing.utils import mkdtemp
 from calmjs.testing.utils import make_dummy_dist
 from calmjs.testing.utils import stub_item_attr_value
 from calmjs.testing.utils import stub_base_which
 from calmjs.testing.utils import stub_mod_call
+from calmjs.testing.utils import stub_mod_check_output
 from calmjs.testing.utils import stub_mod_check_interactive
 from calmjs.testing.utils import stub_stdin
 from calmjs.testing.utils import stub_stdouts
 
+from calmjs.bower.testing.utils import make_package_archive
+
 # suppressing warning as tests should be run within a context with no
 # immediate availability of node_modules and/or bower
 with warnings.catch_warnings():
     warnings.simplefilter('ignore')
     from calmjs.bower import Driver
+    from calmjs.bower import INSTALL_STAMP
     from calmjs.bower import bower as global_bower
+    from calmjs.bower import bower_view
 
 
 def check_simple_namespace():
@@ -107,6 +114,10 @@ class DistCommandTestCase(unittest.TestCase):
         out = sys.stdout.getvalue()
         self.assertIn('\n        "jquery": "~1.11.0"', out)
 
+    def test_module_level_view(self):
+        result = bower_view('foo')
+        self.assertEqual(result['dependencies'], {'jquery': '~1.11.0'})
+
     def test_interactive_only(self):
         tmpdir = mkdtemp(self)
         os.chdir(tmpdir)
@@ -329,6 +340,174 @@ class DistCommandTestCase(unittest.TestCase):
         # Ensure that install is NOT called.
         self.assertIsNone(self.call_args)
 
+    def test_install_incremental(self):
+        stub_mod_call(self, cli)
+        stub_mod_check_output(self, cli)
+        bower_bin = create_fake_bin(mkdtemp(self), 'bower')
+        stub_base_which(self, bower_bin)
+        self.check_output_args = None
+        tmpdir = mkdtemp(self)
+        os.chdir(tmpdir)
+
+        def run():
+            dist = Distribution(dict(
+                script_name='setup.py',
+                script_args=['bower', '--install', '--incremental'],
+                name='foo',
+            ))
+            dist.parse_command_line()
+            dist.run_commands()
+
+        run()
+        args, kwargs = self.call_args
+        self.assertEqual(args, ([bower_bin, 'install'],))
+        self.assertTrue(
+            exists(join(tmpdir, 'bower_components', INSTALL_STAMP)))
+
+        self.call_args = None
+        run()
+        # not called again, and the version of bower was never queried.
+        self.assertIsNone(self.call_args)
+        self.assertIsNone(self.check_output_args)
+
+    def test_install_package_store(self):
+        stub_mod_call(self, cli)
+        store = mkdtemp(self)
+        make_package_archive(store, 'jquery', '1.11.3', {'jquery.js': ''})
+        tmpdir = mkdtemp(self)
+        os.chdir(tmpdir)
+        dist = Distribution(dict(
+            script_name='setup.py',
+            script_args=['bower', '--install', '--package-store=' + store],
+            name='foo',
+        ))
+        dist.parse_command_line()
+        dist.run_commands()
+        self.assertIsNone(self.call_args)
+        self.assertTrue(exists(
+            join(tmpdir, 'bower_components', 'jquery', 'jquery.js')))
+
+    def test_install_lock(self):
+        stub_mod_call(self, cli)
+        store = mkdtemp(self)
+        make_package_archive(store, 'jquery', '1.11.3', {'jquery.js': ''})
+        tmpdir = mkdtemp(self)
+        os.chdir(tmpdir)
+        dist = Distribution(dict(
+            script_name='setup.py',
+            script_args=['bower', '--lock', '--package-store=' + store],
+            name='foo',
+        ))
+        dist.parse_command_line()
+        dist.run_commands()
+        self.assertIsNone(self.call_args)
+        with open(join(tmpdir, 'bower.lock')) as fd:
+            result = json.load(fd)
+        self.assertEqual(result['dependencies']['jquery']['version'], '1.11.3')
+
+    def test_install_record_verify(self):
+        stub_mod_call(self, cli)
+        store = mkdtemp(self)
+        make_package_archive(store, 'jquery', '1.11.3', {'jquery.js': ''})
+        tmpdir = mkdtemp(self)
+        os.chdir(tmpdir)
+        dist = Distribution(dict(
+            script_name='setup.py',
+            script_args=['bower', '--install', '--record',
+                         '--package-store=' + store],
+            name='foo',
+        ))
+        dist.parse_command_line()
+        dist.run_commands()
+
+        dist = Distribution(dict(
+            script_name='setup.py',
+            script_args=['bower', '--verify'],
+            name='foo',
+        ))
+        dist.parse_command_line()
+        dist.run_commands()
+
+        os.remove(join(tmpdir, 'bower_components', 'jquery', 'jquery.js'))
+        dist = Distribution(dict(
+            script_name='setup.py',
+            script_args=['bower', '--verify'],
+            name='foo',
+        ))
+        dist.parse_command_line()
+        with self.assertRaises(DistutilsError):
+            dist.run_commands()
+
+    def test_mirror(self):
+        from calmjs.bower import mirror
+        from calmjs.bower.mirror import StoreFetcher
+        store = mkdtemp(self)
+        make_package_archive(store, 'jquery', '1.11.3', {'jquery.js': ''})
+        stub_item_attr_value(
+            self, mirror, 'RegistryFetcher',
+            lambda: StoreFetcher(store))
+        mirror_dir = mkdtemp(self)
+        os.chdir(mkdtemp(self))
+        dist = Distribution(dict(
+            script_name='setup.py',
+            script_args=['bower', '--mirror=' + mirror_dir],
+            name='foo',
+        ))
+        dist.parse_command_line()
+        dist.run_commands()
+        self.assertTrue(exists(join(mirror_dir, 'jquery', '1.11.3.tar.gz')))
+        self.assertIn(
+            "mirrored 1 package(s) into '%s'" % mirror_dir,
+            sys.stdout.getvalue())
+        # through the same flow as the other actions.
+        self.assertTrue(exists('foo.egg-info'))
+        # nothing else was done.
+        self.assertFalse(exists('bower.json'))
+
+        stub_item_attr_value(
+            self, mirror, 'RegistryFetcher',
+            lambda: StoreFetcher(mkdtemp(self)))
+        dist = Distribution(dict(
+            script_name='setup.py',
+            script_args=['bower', '--mirror=' + mkdtemp(self)],
+            name='foo',
+        ))
+        dist.parse_command_line()
+        with self.assertRaises(DistutilsError):
+            dist.run_commands()
+
+    def test_mirror_dry_run(self):
+        from calmjs.bower import mirror
+        from calmjs.bower.mirror import StoreFetcher
+        store = mkdtemp(self)
+        make_package_archive(store, 'jquery', '1.11.3', {'jquery.js': ''})
+        stub_item_attr_value(
+            self, mirror, 'RegistryFetcher',
+            lambda: StoreFetcher(store))
+        mirror_dir = join(mkdtemp(self), 'mirror')
+        os.chdir(mkdtemp(self))
+        dist = Distribution(dict(
+            script_name='setup.py',
+            script_args=['bower', '--mirror=' + mirror_dir, '--dry-run'],
+            name='foo',
+        ))
+        dist.parse_command_line()
+        dist.run_commands()
+        self.assertFalse(exists(mirror_dir))
+        self.assertIn('"fetched": 1', sys.stdout.getvalue())
+
+    def test_why(self):
+        os.chdir(mkdtemp(self))
+        dist = Distribution(dict(
+            script_name='setup.py',
+            script_args=['bower', '--why=jquery'],
+            name='foo',
+        ))
+        dist.parse_command_line()
+        dist.run_commands()
+        self.assertTrue(exists('foo.egg-info'))
+        self.assertIn('"name": "jquery"', sys.stdout.getvalue())
+
     def test_install_false(self):
         stub_mod_call(self, cli)
         tmpdir = mkdtemp(self)
@@ -346,6 +525,94 @@ class DistCommandTestCase(unittest.TestCase):
         self.assertIsNone(self.call_args)
 
 
+class DriverInstallTestCase(unittest.TestCase):
+    """
+    Test the bower specific installation features of the driver.
+    """
+
+    def setUp(self):
+        stub_mod_call(self, cli)
+        stub_mod_check_output(self, cli)
+        stub_base_which(self, 'bower')
+        self.check_output_answer = b'1.8.0'
+        self.tmpdir = mkdtemp(self)
+        self.driver = Driver(working_dir=self.tmpdir)
+        self.write_bower_json({'dependencies': {'jquery': '~1.11.0'}})
+
+    def write_bower_json(self, value):
+        with open(join(self.tmpdir, 'bower.json'), 'w') as fd:
+            json.dump(value, fd)
+
+    def test_components_dir(self):
+        self.assertEqual(
+            self.driver.get_bower_components_dir(),
+            join(self.tmpdir, 'bower_components'))
+
+        with open(join(self.tmpdir, '.bowerrc'), 'w') as fd:
+            json.dump({'directory': 'lib/components'}, fd)
+        self.assertEqual(
+            self.driver.get_bower_components_dir(),
+            join(self.tmpdir, 'lib/components'))
+
+        with open(join(self.tmpdir, '.bowerrc'), 'w') as fd:
+            fd.write('not json')
+        self.assertEqual(
+            self.driver.get_bower_components_dir(),
+            join(self.tmpdir, 'bower_components'))
+
+    def test_install_not_incremental(self):
+        self.driver.pkg_manager_install()
+        self.assertIsNotNone(self.call_args)
+        self.assertIsNone(self.driver.read_install_stamp())
+
+    def test_install_incremental(self):
+        bower_bin = create_fake_bin(mkdtemp(self), 'bower')
+        stub_base_which(self, bower_bin)
+        self.check_output_args = None
+        self.driver.pkg_manager_install(incremental=True)
+        self.assertEqual(self.call_args[0], ([bower_bin, 'install'],))
+        stamp = self.driver.read_install_stamp()
+        self.assertEqual(stamp['installer'], 'bower')
+        self.assertEqual(
+            stamp['binary'],
+            self.driver._version_key(self.driver._gen_call_kws()))
+
+        self.call_args = None
+        self.driver.pkg_manager_install(incremental=True)
+        self.assertIsNone(self.call_args)
+        # bower is not executed for its version on the no-op path.
+        self.assertIsNone(self.check_output_args)
+
+        # changing the arguments will also trigger the install.
+        self.driver.pkg_manager_install(incremental=True, args=('-p',))
+        self.assertEqual(self.call_args[0], ([bower_bin, 'install', '-p'],))
+
+        self.call_args = None
+        self.write_bower_json({'dependencies': {'jquery': '~3.1.0'}})
+        self.driver.pkg_manager_install(incremental=True)
+        self.assertIsNotNone(self.call_args)
+
+        # as will an upgrade of bower.
+        self.call_args = None
+        with open(bower_bin, 'a') as fd:
+            fd.write('# upgraded\n')
+        self.driver.pkg_manager_install(incremental=True)
+        self.assertIsNotNone(self.call_args)
+
+    def test_install_incremental_failure(self):
+        stub_mod_call(self, cli, lambda *a, **kw: 1)
+        self.driver.pkg_manager_install(incremental=True)
+        self.assertIsNone(self.driver.read_install_stamp())
+
+    def test_install_incremental_no_stamp_possible(self):
+        os.unlink(join(self.tmpdir, 'bower.json'))
+        self.assertIsNone(self.driver.make_install_stamp())
+        # the bower binary cannot be located.
+        stub_base_which(self, join(self.tmpdir, 'missing'))
+        self.write_bower_json({})
+        self.assertIsNone(self.driver.make_install_stamp())
+
+
 @unittest.skipIf(npm.get_npm_version() is None, 'npm not available')
 class BowerTestCase(unittest.TestCase):
     """
@@ -416,6 +683,41 @@ class BowerRuntimeTestCase(unittest.TestCase):
         self.assertEqual(result['dependencies'], {})
         self.assertIn('DEBUG', stderr)
 
+    @unittest.skipIf(
+        not namespace_available, 'namespace module unavailable by default')
+    def test_lazy_import(self):
+        stdout, stderr = fork_exec([sys.executable, '-c', (
+            'import sys\n'
+            'from calmjs import bower\n'
+            'from calmjs.bower.utils import lazy_class_attribute as lazy\n'
+            'print(sorted(k for k, v in vars(bower.bower).items() '
+            'if isinstance(v, lazy)))\n'
+            'print("calmjs.runtime" in sys.modules)\n'
+        )])
+        self.assertEqual(stdout.splitlines(), [
+            "['cli_driver', 'runtime', 'user_options']",
+            'False',
+        ])
+        # no warnings about missing bower on import.
+        self.assertEqual(stderr, '')
+
+    @unittest.skipIf(
+        not namespace_available, 'namespace module unavailable by default')
+    def test_lazy_import_features(self):
+        modules = ['calmjs.bower.' + name for name in (
+            'aio', 'batch', 'daemon', 'delta', 'driver', 'events', 'hashed',
+            'lock', 'locks', 'merge', 'mirror', 'native', 'proxy', 'prune',
+            'shared', 'verify', 'why', 'writers', 'zipped',
+        )]
+        stdout, stderr = fork_exec([sys.executable, '-c', (
+            'import sys\n'
+            'import calmjs.bower\n'
+            'print(sorted(m for m in %r if m in sys.modules))\n' % modules
+        )])
+        # the driver is imported as it is accessed, and the modules for
+        # the features are imported by the driver as they are used.
+        self.assertEqual(stdout.strip(), '[]')
+
     def test_direct_invocation_acceptance(self):
         stdout, stderr = fork_exec(['calmjs', 'bower', '-vv', 'calmjs.bower'])
         result = json.loads(stdout)
@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+from os.path import join
+
+from pkg_resources import WorkingSet
+
+from calmjs import cli
+from calmjs import dist
+
+from calmjs.testing.utils import create_fake_bin
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import stub_base_which
+from calmjs.testing.utils import stub_item_attr_value
+from calmjs.testing.utils import stub_mod_check_output
+from calmjs.testing.utils import stub_os_environ
+
+from calmjs.bower import Driver
+from calmjs.bower import cache
+
+
+class JsonCacheTestCase(unittest.TestCase):
+
+    def test_get_set(self):
+        root = join(mkdtemp(self), 'cache')
+        c = cache.JsonCache(root)
+        self.assertIsNone(c.get('missing'))
+        self.assertEqual(c.get('missing', {}), {})
+        c.set('key', {'a': 1})
+        self.assertEqual(c.get('key'), {'a': 1})
+
+    def test_corrupted(self):
+        root = mkdtemp(self)
+        c = cache.JsonCache(root)
+        with open(join(root, 'bad.json'), 'w') as fd:
+            fd.write('{')
+        self.assertIsNone(c.get('bad'))
+        self.assertFalse(os.path.exists(join(root, 'bad.json')))
+
+    def test_evict_least_recently_used(self):
+        root = mkdtemp(self)
+        c = cache.JsonCache(root, max_entries=2)
+        c.set('a', 1)
+        c.set('b', 2)
+        os.utime(join(root, 'a.json'), (1, 1))
+        os.utime(join(root, 'b.json'), (2, 2))
+        # access a to make it most recently used.
+        self.assertEqual(c.get('a'), 1)
+        c.set('c', 3)
+        self.assertEqual(c.get('a'), 1)
+        self.assertIsNone(c.get('b'))
+        self.assertEqual(c.get('c'), 3)
+        self.assertEqual(len(c.entries()), 2)
+        c.clear()
+        self.assertEqual(c.entries(), [])
+
+    def test_digest_key(self):
+        self.assertEqual(
+            cache.digest_key({'a': 1, 'b': 2}),
+            cache.digest_key({'b': 2, 'a': 1}),
+        )
+        self.assertNotEqual(cache.digest_key(1), cache.digest_key(2))
+
+    def test_stat_key_missing(self):
+        self.assertIsNone(cache.stat_key(join(mkdtemp(self), 'nothing')))
+
+    def test_get_cache_dir(self):
+        stub_os_environ(self)
+        os.environ.pop(cache.CACHE_DIR_ENV, None)
+        self.assertIsNone(cache.get_cache_dir())
+        os.environ[cache.CACHE_DIR_ENV] = '/tmp/somewhere'
+        self.assertEqual(cache.get_cache_dir(), '/tmp/somewhere')
+
+
+class DriverFlattenCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.lib = make_dummy_dist(self, (
+            ('requires.txt', '\n'.join([])),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.8.3'},
+            })),
+        ), 'lib', '1.0.0')
+        self.app = make_dummy_dist(self, (
+            ('requires.txt', 'lib>=1.0.0'),
+            ('bower.json', json.dumps({
+                'dependencies': {'underscore': '~1.8.3'},
+            })),
+        ), 'app', '2.0')
+
+        working_set = WorkingSet()
+        working_set.add(self.lib, self._calmjs_testing_tmpdir)
+        working_set.add(self.app, self._calmjs_testing_tmpdir)
+        stub_item_attr_value(self, dist, 'default_working_set', working_set)
+        self.cache_dir = mkdtemp(self)
+
+    def test_disabled_by_default(self):
+        stub_os_environ(self)
+        os.environ.pop(cache.CACHE_DIR_ENV, None)
+        driver = Driver()
+        self.assertIsNone(driver.cache_dir)
+        self.assertIsNone(driver.flatten_cache)
+        os.environ[cache.CACHE_DIR_ENV] = self.cache_dir
+        self.assertEqual(Driver().cache_dir, self.cache_dir)
+        self.assertIsNone(Driver(cache_dir='').cache_dir)
+
+    def test_cached_view(self):
+        driver = Driver(cache_dir=self.cache_dir)
+        result = driver.pkg_manager_view('app')
+        self.assertEqual(result['dependencies'], {
+            'jquery': '~1.8.3',
+            'underscore': '~1.8.3',
+        })
+        self.assertEqual(result['name'], 'app')
+        self.assertEqual(len(driver.flatten_cache.entries()), 1)
+
+        def fail(*a, **kw):
+            raise AssertionError('metadata should not be read')
+
+        stub_item_attr_value(self, dist, 'read_dist_egginfo_json', fail)
+        self.assertEqual(driver.pkg_manager_view('app'), result)
+        # a different request is a different key.
+        with self.assertRaises(AssertionError):
+            driver.pkg_manager_view('lib')
+
+    def test_cache_invalidation(self):
+        driver = Driver(cache_dir=self.cache_dir)
+        result = driver.pkg_manager_view('app')
+        self.assertEqual(result['dependencies']['jquery'], '~1.8.3')
+
+        target = join(
+            self._calmjs_testing_tmpdir, 'lib-1.0.0.egg-info', 'bower.json')
+        with open(target, 'w') as fd:
+            json.dump({'dependencies': {'jquery': '~1.11.0'}}, fd)
+        # ensure the modification is visible regardless of timestamp
+        # resolution of the underlying filesystem.
+        os.utime(target, (1, 1))
+
+        result = driver.pkg_manager_view('app')
+        self.assertEqual(result['dependencies']['jquery'], '~1.11.0')
+        self.assertEqual(len(driver.flatten_cache.entries()), 2)
+
+    def test_uncacheable_dist(self):
+        driver = Driver(cache_dir=self.cache_dir)
+
+        class FakeDist(object):
+            project_name = 'fake'
+            version = '1.0'
+
+        self.assertIsNone(driver._flatten_key([FakeDist()]))
+
+
+class DriverVersionCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.bin_dir = mkdtemp(self)
+        self.bower_bin = create_fake_bin(self.bin_dir, 'bower')
+        stub_base_which(self, self.bower_bin)
+        stub_mod_check_output(self, cli)
+        self.check_output_answer = b'1.8.0'
+        self.cache_dir = mkdtemp(self)
+
+    def test_version_uncached(self):
+        driver = Driver(cache_dir='')
+        self.assertEqual(driver.get_pkg_manager_version(), (1, 8, 0))
+        self.check_output_answer = b'1.8.2'
+        self.assertEqual(driver.get_pkg_manager_version(), (1, 8, 2))
+
+    def test_version_cached(self):
+        driver = Driver(cache_dir=self.cache_dir)
+        self.assertEqual(driver.get_pkg_manager_version(), (1, 8, 0))
+        self.check_output_args = None
+        self.check_output_answer = b'1.8.2'
+        # another driver instance, i.e. another process.
+        driver = Driver(cache_dir=self.cache_dir)
+        self.assertEqual(driver.get_bower_version(), (1, 8, 0))
+        self.assertIsNone(self.check_output_args)
+
+        # modify the binary
+        with open(self.bower_bin, 'a') as fd:
+            fd.write('# upgraded\n')
+        self.assertEqual(driver.get_pkg_manager_version(), (1, 8, 2))
+        self.assertIsNotNone(self.check_output_args)
+
+    def test_version_not_found(self):
+        driver = Driver(cache_dir=self.cache_dir)
+        stub_base_which(self, join(self.bin_dir, 'missing'))
+        self.assertIsNone(driver._version_key({}))
+
+    def test_version_failure_not_cached(self):
+        driver = Driver(cache_dir=self.cache_dir)
+        self.check_output_answer = b'not a version'
+        self.assertIsNone(driver.get_pkg_manager_version())
+        self.assertEqual(driver.version_cache.entries(), [])
@@ -0,0 +1,258 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+import stat
+import sys
+import threading
+from os.path import exists
+from os.path import join
+
+from pkg_resources import WorkingSet
+
+from calmjs import dist
+from calmjs.utils import fork_exec
+
+from calmjs.testing import mocks
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import remember_cwd
+from calmjs.testing.utils import stub_item_attr_value
+from calmjs.testing.utils import stub_os_environ
+
+from calmjs.bower import Driver
+from calmjs.bower import client
+from calmjs.bower import daemon
+from calmjs.bower.tests.test_bower import namespace_available
+
+
+class DaemonTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('requires.txt', ''),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.8.3'},
+            })),
+        ), 'lib', '1.0.0')
+        make_dummy_dist(self, (
+            ('requires.txt', 'lib>=1.0.0'),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~3.0.0', 'underscore': '1.x'},
+            })),
+        ), 'app', '2.0')
+        self.root = self._calmjs_testing_tmpdir
+        stub_item_attr_value(
+            self, dist, 'default_working_set', WorkingSet([self.root]))
+        # keep the standard library importable for the features that
+        # are imported by the driver as they are used.
+        stub_item_attr_value(self, sys, 'path', [self.root] + sys.path)
+        self.daemon = daemon.BowerDaemon(Driver(cache_dir=''))
+
+    def test_view(self):
+        response = self.daemon.handle({
+            'action': 'view', 'package_names': ['app']})
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['result']['dependencies'], {
+            'jquery': '~3.0.0', 'underscore': '1.x'})
+        self.assertEqual(response['result']['name'], 'app')
+        self.assertIn('WARNING', [level for level, msg in response['log']])
+        self.assertIn("conflicting version ranges", '\n'.join(
+            msg for level, msg in response['log']))
+
+    def test_flatten(self):
+        response = self.daemon.handle({
+            'action': 'flatten', 'package_names': ['app'],
+            'explicit': True,
+        })
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['result']['conflicts'], [])
+        self.assertEqual(
+            response['result']['result']['dependencies']['jquery'], '~3.0.0')
+
+    def test_init(self):
+        working_dir = mkdtemp(self)
+        response = self.daemon.handle({
+            'action': 'init', 'package_names': ['app'],
+            'working_dir': working_dir,
+        })
+        self.assertTrue(response['ok'])
+        self.assertTrue(response['result'])
+        with open(join(working_dir, 'bower.json')) as fd:
+            self.assertEqual(json.load(fd)['name'], 'app')
+
+    def test_errors(self):
+        response = self.daemon.handle({'action': 'install'})
+        self.assertFalse(response['ok'])
+        self.assertIn("unsupported action 'install'", response['error'])
+        response = self.daemon.handle({
+            'action': 'flatten', 'package_names': ['app=1']})
+        self.assertFalse(response['ok'])
+        self.assertIn('malformed package name', response['error'])
+
+    def test_unrelated_modification(self):
+        monitor = self.daemon.monitor
+        monitor.refresh()
+        with open(join(self.root, 'unrelated.sock'), 'w'):
+            pass
+        os.utime(self.root, (1, 1))
+        self.assertFalse(monitor.refresh())
+
+    def test_reload(self):
+        monitor = self.daemon.monitor
+        self.assertTrue(monitor.refresh())
+        self.assertFalse(monitor.refresh())
+        generation = monitor.generation
+        self.assertIsNone(dist.default_working_set.find(
+            dist.Requirement.parse('site')))
+
+        make_dummy_dist(self, (
+            ('requires.txt', 'app'),
+            ('bower.json', '{}'),
+        ), 'site', '1.0')
+        # ensure the modification is visible regardless of timestamp
+        # resolution of the underlying filesystem.
+        os.utime(self.root, (1, 1))
+        response = self.daemon.handle({
+            'action': 'view', 'package_names': ['site']})
+        self.assertEqual(monitor.generation, generation + 1)
+        self.assertTrue(response['ok'])
+        self.assertEqual(response['result']['dependencies']['jquery'], (
+            '~3.0.0'))
+
+
+@unittest.skipIf(not hasattr(os, 'getuid'), 'requires getuid')
+class SocketPathTestCase(unittest.TestCase):
+
+    def setUp(self):
+        stub_os_environ(self)
+        os.environ.pop(client.SOCKET_ENV, None)
+        os.environ.pop('XDG_RUNTIME_DIR', None)
+        self.tmpdir = mkdtemp(self)
+        stub_item_attr_value(
+            self, client.tempfile, 'gettempdir', lambda: self.tmpdir)
+
+    def test_environ(self):
+        os.environ[client.SOCKET_ENV] = '/some/where.sock'
+        self.assertEqual(client.get_socket_path(), '/some/where.sock')
+
+    def test_runtime_dir(self):
+        os.environ['XDG_RUNTIME_DIR'] = self.tmpdir
+        self.assertEqual(client.get_socket_path(), join(
+            self.tmpdir, 'calmjs.bower-daemon.sock'))
+
+    def test_private_dir(self):
+        root = join(self.tmpdir, 'calmjs.bower-%d' % os.getuid())
+        path = join(root, 'calmjs.bower-daemon.sock')
+        # not created for the client.
+        self.assertEqual(client.get_socket_path(), path)
+        self.assertFalse(exists(root))
+        self.assertEqual(client.get_socket_path(create=True), path)
+        self.assertEqual(stat.S_IMODE(os.stat(root).st_mode), 0o700)
+        self.assertEqual(client.get_socket_path(create=True), path)
+
+    def test_insecure_dir(self):
+        root = join(self.tmpdir, 'calmjs.bower-%d' % os.getuid())
+        os.mkdir(root)
+        # as if created by another user with permissive access.
+        os.chmod(root, 0o777)
+        with self.assertRaises(client.DaemonError):
+            client.get_socket_path()
+        with self.assertRaises(client.DaemonError):
+            client.get_socket_path(create=True)
+        os.rmdir(root)
+        with open(root, 'w'):
+            pass
+        with self.assertRaises(client.DaemonError):
+            client.get_socket_path()
+
+
+@unittest.skipIf(not hasattr(client.socket, 'AF_UNIX'), 'requires AF_UNIX')
+class DaemonServerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('requires.txt', ''),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~3.0.0'},
+            })),
+        ), 'app', '2.0')
+        stub_item_attr_value(self, dist, 'default_working_set', WorkingSet(
+            [self._calmjs_testing_tmpdir]))
+        self.socket_path = join(mkdtemp(self), 'daemon.sock')
+
+    def start(self):
+        server = daemon.DaemonServer(
+            self.socket_path, daemon.BowerDaemon(Driver(cache_dir='')))
+        thread = threading.Thread(target=server.serve_until_stopped)
+        thread.start()
+
+        def stop():
+            try:
+                client.request(self.socket_path, {'action': 'stop'})
+            except client.DaemonError:
+                pass  # already stopped
+            thread.join()
+
+        self.addCleanup(stop)
+        return server
+
+    def main(self, *args):
+        stdout = mocks.StringIO()
+        stderr = mocks.StringIO()
+        rc = client.main(
+            ['--socket', self.socket_path] + list(args), stdout, stderr)
+        return rc, stdout.getvalue(), stderr.getvalue()
+
+    def test_client_round_trip(self):
+        self.start()
+        self.assertTrue(client.is_running(self.socket_path))
+        with self.assertRaises(client.DaemonError):
+            daemon.DaemonServer(self.socket_path, None)
+
+        rc, stdout, stderr = self.main('view', 'app')
+        self.assertEqual(rc, 0)
+        self.assertEqual(json.loads(stdout)['dependencies'], {
+            'jquery': '~3.0.0'})
+
+        remember_cwd(self)
+        os.chdir(mkdtemp(self))
+        rc, stdout, stderr = self.main('init', 'app')
+        self.assertEqual(rc, 0)
+        self.assertTrue(exists('bower.json'))
+
+        rc, stdout, stderr = self.main('ping')
+        self.assertEqual(json.loads(stdout)['pid'], os.getpid())
+
+    @unittest.skipIf(
+        not namespace_available, 'namespace module unavailable by default')
+    def test_client_imports(self):
+        self.start()
+        stdout, stderr = fork_exec([sys.executable, '-c', (
+            'import sys\n'
+            'from calmjs.bower.client import main\n'
+            'main(%r)\n'
+            'sys.stderr.write(repr(sorted(\n'
+            '    m for m in sys.modules if m.startswith("calmjs.")\n'
+            '    or m in ("pkg_resources", "logging"))))\n'
+        ) % (['--socket', self.socket_path, 'view', 'app'],)])
+        self.assertEqual(json.loads(stdout)['name'], 'app')
+        # only the client was needed for a request served by the daemon.
+        self.assertEqual(
+            stderr.splitlines()[-1], "['calmjs.bower', 'calmjs.bower.client']")
+
+    def test_client_fallback(self):
+        self.assertFalse(client.is_running(self.socket_path))
+        rc, stdout, stderr = self.main('view', 'app')
+        self.assertEqual(rc, 0)
+        self.assertEqual(json.loads(stdout)['name'], 'app')
+        rc, stdout, stderr = self.main('ping')
+        self.assertEqual(rc, 1)
+
+    def test_stale_socket(self):
+        with open(self.socket_path, 'w'):
+            pass
+        self.start()
+        rc, stdout, stderr = self.main('stop')
+        self.assertEqual(rc, 0)
+        self.assertEqual(stdout, '')
@@ -0,0 +1,217 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+from os.path import exists
+from os.path import join
+
+from calmjs import cli
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_base_which
+from calmjs.testing.utils import stub_item_attr_value
+from calmjs.testing.utils import stub_mod_call
+
+from calmjs.bower import Driver
+from calmjs.bower import delta
+from calmjs.bower.testing.utils import make_package_archive
+
+
+def install(components_dir, name, meta):
+    target = join(components_dir, name)
+    os.makedirs(target)
+    with open(join(target, 'index.js'), 'w') as fd:
+        fd.write(name)
+    with open(join(target, '.bower.json'), 'w') as fd:
+        json.dump(meta, fd)
+
+
+def meta(version, source=None, target=None, dependencies=None):
+    result = {'_release': version, '_target': target or version}
+    if source:
+        result['_originalSource'] = source
+    if dependencies:
+        result['dependencies'] = dependencies
+    return result
+
+
+class DeltaTestCase(unittest.TestCase):
+
+    def test_read_installed(self):
+        components_dir = mkdtemp(self)
+        self.assertEqual(delta.read_installed(join(components_dir, 'x')), {})
+        install(components_dir, 'jquery', meta('1.8.3', 'jquery'))
+        os.makedirs(join(components_dir, 'broken'))
+        os.makedirs(join(components_dir, '.hidden'))
+        self.assertEqual(
+            sorted(delta.read_installed(components_dir)), ['jquery'])
+
+    def test_split_spec_endpoint(self):
+        self.assertEqual(
+            delta.split_spec('jquery', '~1.8.3'), ('jquery', '~1.8.3'))
+        self.assertEqual(
+            delta.split_spec('jq', 'jquery#~1.8.3'), ('jquery', '~1.8.3'))
+        self.assertEqual(
+            delta.split_spec('x', 'https://example.com/x.git'),
+            ('https://example.com/x.git', '*'))
+        self.assertEqual(
+            delta.endpoint('jquery', '~1.8.3'), 'jquery=jquery#~1.8.3')
+        self.assertEqual(
+            delta.endpoint('jq', 'jquery#~1.8.3'), 'jq=jquery#~1.8.3')
+        self.assertEqual(
+            delta.endpoint('x', 'https://example.com/x.git'),
+            'x=https://example.com/x.git')
+
+    def test_satisfies(self):
+        self.assertTrue(delta.satisfies(
+            'jquery', '~1.8.0', meta('1.8.3', 'jquery')))
+        self.assertTrue(delta.satisfies('jquery', '~1.8.0', meta('1.8.3')))
+        self.assertFalse(delta.satisfies(
+            'jquery', '~1.9.0', meta('1.8.3', 'jquery')))
+        self.assertFalse(delta.satisfies(
+            'jquery', 'fork#~1.8.0', meta('1.8.3', 'jquery')))
+        self.assertTrue(delta.satisfies(
+            'x', 'owner/x#master', meta('abc123', 'owner/x', 'master')))
+        self.assertFalse(delta.satisfies(
+            'x', 'owner/x#develop', meta('abc123', 'owner/x', 'master')))
+
+    def test_plan_delta(self):
+        installed = {
+            'jquery': meta('1.8.3', 'jquery'),
+            'underscore': meta('1.5.0', 'underscore'),
+            'backbone': meta('1.0.0', 'backbone', dependencies={
+                'underscore': '>=1.4.0'}),
+            'old': meta('1.0.0', 'old'),
+            'lodash': meta('2.0.0', 'lodash'),
+            'widget': meta('1.0.0', 'widget', dependencies={
+                'lodash': '~2.0.0', 'missing': '~1.0.0'}),
+        }
+        plan = delta.plan_delta({
+            'dependencies': {
+                'jquery': '~1.9.0',
+                'backbone': '~1.0.0',
+                'bootstrap': '~3.3.0',
+                'widget': '~2.0.0',
+            },
+            'devDependencies': {'qunit': '~1.0.0'},
+        }, installed)
+        self.assertEqual(plan, {
+            'add': {'bootstrap': '~3.3.0', 'qunit': '~1.0.0'},
+            'change': {'jquery': '~1.9.0', 'widget': '~2.0.0'},
+            # lodash is retained for the widget that is being changed
+            # and underscore is still required by backbone.
+            'keep': ['backbone', 'lodash', 'underscore'],
+            'remove': ['old'],
+        })
+
+        plan = delta.plan_delta({
+            'dependencies': {'jquery': '~1.9.0'},
+            'devDependencies': {'qunit': '~1.0.0'},
+            'resolutions': {'jquery': '1.8.3'},
+        }, installed, production=True)
+        self.assertEqual(plan['add'], {})
+        self.assertEqual(plan['change'], {})
+        self.assertEqual(plan['keep'], ['jquery'])
+
+    def test_retain_required(self):
+        plan = {
+            'add': {'backbone': '1.x'},
+            'change': {'widget': '~2.0.0'},
+            'remove': ['lodash', 'old', 'underscore'],
+            'keep': ['jquery'],
+        }
+        installed = {
+            'backbone': meta('1.3.3', dependencies={'underscore': '>=1.8'}),
+            'underscore': meta('1.8.3', dependencies={'old': '1.x'}),
+            'widget': meta('2.0.0', dependencies={'jquery': '*'}),
+        }
+        self.assertEqual(delta.retain_required(plan, installed), {
+            'add': {'backbone': '1.x'},
+            'change': {'widget': '~2.0.0'},
+            'remove': ['lodash'],
+            'keep': ['jquery', 'old', 'underscore'],
+        })
+        # the plan itself is left as is.
+        self.assertEqual(plan['remove'], ['lodash', 'old', 'underscore'])
+
+
+class DeltaInstallTestCase(unittest.TestCase):
+
+    def setUp(self):
+        stub_mod_call(self, cli)
+        stub_base_which(self, 'bower')
+        self.project = mkdtemp(self)
+        self.components_dir = join(self.project, 'bower_components')
+        install(self.components_dir, 'jquery', meta('1.8.3', 'jquery'))
+        install(self.components_dir, 'underscore', meta('1.5.0'))
+        install(self.components_dir, 'old', meta('1.0.0'))
+        self.driver = Driver(
+            working_dir=self.project, package_store='', cache_dir='')
+
+    def write_pkgdef(self, dependencies):
+        with open(join(self.project, 'bower.json'), 'w') as fd:
+            json.dump({'dependencies': dependencies}, fd)
+
+    def test_delta_bower(self):
+        self.write_pkgdef({
+            'jquery': '~1.8.0', 'underscore': '~1.6.0', 'backbone': '1.x'})
+        self.assertTrue(self.driver.pkg_manager_install(delta=True))
+        self.assertEqual(self.call_args[0][0], [
+            'bower', 'install',
+            'backbone=backbone#1.x', 'underscore=underscore#~1.6.0',
+        ])
+        self.assertFalse(exists(join(self.components_dir, 'old')))
+        self.assertTrue(exists(join(self.components_dir, 'jquery')))
+
+    def test_delta_nothing_to_install(self):
+        self.write_pkgdef({'jquery': '~1.8.0', 'underscore': '1.x'})
+        self.assertTrue(self.driver.pkg_manager_install(
+            delta=True, incremental=True))
+        self.assertIsNone(self.call_args)
+        self.assertFalse(exists(join(self.components_dir, 'old')))
+
+    def test_delta_failure(self):
+        self.write_pkgdef({'jquery': '~2.0.0'})
+        stub_item_attr_value(self, cli, 'call', lambda *a, **kw: 1)
+        self.assertFalse(self.driver.pkg_manager_install(delta=True))
+        # nothing is removed.
+        self.assertTrue(exists(join(self.components_dir, 'old')))
+        self.assertTrue(exists(join(self.components_dir, 'underscore')))
+
+    def test_delta_added_dependencies(self):
+        def call(cmd, **kw):
+            install(self.components_dir, 'backbone', meta(
+                '1.3.3', dependencies={'underscore': '>=1.4'}))
+            return 0
+
+        self.write_pkgdef({'jquery': '~1.8.0', 'backbone': '1.x'})
+        stub_item_attr_value(self, cli, 'call', call)
+        self.assertTrue(self.driver.pkg_manager_install(delta=True))
+        # underscore was only found to be required by the added backbone
+        # once that was installed, so it was kept.
+        self.assertTrue(exists(join(self.components_dir, 'underscore')))
+        self.assertFalse(exists(join(self.components_dir, 'old')))
+
+    def test_delta_unreadable_pkgdef(self):
+        # falls back to a full installation.
+        self.assertTrue(self.driver.pkg_manager_install(delta=True))
+        self.assertEqual(self.call_args[0][0], ['bower', 'install'])
+
+    def test_delta_native(self):
+        store = mkdtemp(self)
+        make_package_archive(store, 'backbone', '1.3.3', {
+            'backbone.js': '// backbone'}, bower_json={
+                'dependencies': {'jquery': '>=1.8', 'underscore': '>=1.8'}})
+        make_package_archive(store, 'jquery', '1.8.3', {'jquery.js': ''})
+        make_package_archive(store, 'underscore', '1.8.3', {'u.js': ''})
+        self.write_pkgdef({'jquery': '~1.8.0', 'backbone': '~1.3.0'})
+        self.assertTrue(self.driver.pkg_manager_install(
+            delta=True, package_store=store))
+        self.assertIsNone(self.call_args)
+        installed = delta.read_installed(self.components_dir)
+        self.assertEqual(sorted(installed), [
+            'backbone', 'jquery', 'underscore'])
+        # jquery was left as is, while underscore got upgraded as the
+        # installed version did not satisfy backbone.
+        with open(join(self.components_dir, 'jquery', 'index.js')) as fd:
+            self.assertEqual(fd.read(), 'jquery')
+        self.assertEqual(installed['underscore']['_release'], '1.8.3')
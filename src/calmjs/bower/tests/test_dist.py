@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import unittest
 import json
+import os
 import sys
 import textwrap
 from os.path import join
@@ -135,3 +136,23 @@ class DistIntegrationTestCase(unittest.TestCase):
                     'jquery': 'jquery/dist/jquery.js',
                 },
             })
+
+        with open(join(egg_root, 'bower_digest.txt')) as fd:
+            digest = fd.read()
+        self.assertTrue(digest.startswith('sha256-'))
+
+    def test_setup_egg_info_unchanged(self):
+        fork_exec([sys.executable, 'setup.py', 'egg_info'], cwd=self.pkg_root)
+        egg_root = join(self.pkg_root, 'dummy_pkg.egg-info')
+        targets = [join(egg_root, name) for name in (
+            'bower.json', 'bower_digest.txt')]
+        # ensure any rewrite will be visible through the mtime.
+        for target in targets:
+            os.utime(target, (0, 0))
+
+        stdout, stderr = fork_exec(
+            [sys.executable, 'setup.py', 'egg_info'], cwd=self.pkg_root)
+        self.assertIn('bower_json unchanged', stdout)
+        self.assertNotIn('writing bower_json', stdout)
+        for target in targets:
+            self.assertEqual(os.stat(target).st_mtime, 0)
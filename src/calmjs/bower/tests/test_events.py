@@ -0,0 +1,161 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+import stat
+import sys
+from os.path import join
+
+from calmjs.utils import pretty_logging
+from calmjs.testing import mocks
+from calmjs.testing.utils import mkdtemp
+
+from calmjs.bower import Driver
+from calmjs.bower import events
+from calmjs.bower.timings import Timings
+
+# A stand-in for bower --json, which writes the entries of the JSON log
+# array to stderr as the installation progresses.
+FAKE_BOWER = r'''
+import json
+import sys
+import time
+
+entries = [
+    {'level': 'action', 'id': 'resolve', 'message': 'jquery#~1.11.0',
+     'data': {'endpoint': {'name': 'jquery'}}},
+    {'level': 'action', 'id': 'install', 'message': 'jquery#1.11.3',
+     'data': {'endpoint': {'name': 'jquery'}}},
+]
+if 'fail' in sys.argv:
+    entries.insert(1, {
+        'level': 'error', 'id': 'error', 'code': 'ENOTFOUND',
+        'message': 'Package missing not found'})
+
+sys.stderr.write('node: some warning\n')
+for i, entry in enumerate(entries):
+    sys.stderr.write(',' if i else '[')
+    text = '\n' + json.dumps(entry, indent=2)
+    # split the entry across writes.
+    for chunk in (text[:10], text[10:]):
+        sys.stderr.write(chunk)
+        sys.stderr.flush()
+        time.sleep(0.01)
+    if entry['level'] == 'error':
+        time.sleep(30)
+        sys.exit(1)
+sys.stderr.write('\n]\n')
+sys.stdout.write(json.dumps({'jquery': {'pkgMeta': {'version': '1.11.3'}}}))
+'''
+
+
+class JsonStreamDecoderTestCase(unittest.TestCase):
+
+    def test_feed(self):
+        decoder = events.JsonStreamDecoder()
+        self.assertEqual(decoder.feed('[\n{"a": '), [])
+        self.assertEqual(decoder.feed('1}'), [{'a': 1}])
+        self.assertEqual(decoder.feed(',\n{"b": "}"},{"c": [1, 2]'), [
+            {'b': '}'}])
+        self.assertEqual(decoder.feed('}\nwarning: text\n,{"d": 4}\n]\n'), [
+            {'c': [1, 2]}, {'d': 4}])
+        decoder.close()
+
+    def test_close_incomplete(self):
+        decoder = events.JsonStreamDecoder()
+        decoder.feed('[{"a": 1')
+        with self.assertRaises(ValueError):
+            decoder.close()
+
+    def test_package_name(self):
+        self.assertEqual(events.package_name({}), None)
+        self.assertEqual(events.package_name(
+            {'data': {'endpoint': {'name': 'jquery'}}}), 'jquery')
+        self.assertEqual(events.package_name(
+            {'data': {'pkgMeta': {'name': 'jquery'}}}), 'jquery')
+
+
+class EventStreamTestCase(unittest.TestCase):
+
+    def test_events(self):
+        stream = events.EventStream([sys.executable, '-c', FAKE_BOWER])
+        results = list(stream)
+        self.assertEqual(
+            [event['id'] for event in results], ['resolve', 'install'])
+        self.assertTrue(results[0]['elapsed'] <= results[1]['elapsed'])
+        self.assertEqual(stream.returncode, 0)
+        self.assertIsNone(stream.error)
+        self.assertEqual(stream.result['jquery']['pkgMeta'], {
+            'version': '1.11.3'})
+
+    def test_events_fail_fast(self):
+        stream = events.EventStream(
+            [sys.executable, '-c', FAKE_BOWER, 'fail'])
+        received = []
+        rc = stream.run(received.append)
+        self.assertNotEqual(rc, 0)
+        self.assertEqual(stream.error['code'], 'ENOTFOUND')
+        self.assertEqual(received[-1], stream.error)
+        # terminated well before the process would have exited.
+        self.assertTrue(stream.error['elapsed'] < 10)
+
+    def test_events_truncated(self):
+        stream = events.EventStream([sys.executable, '-c', (
+            'import sys\n'
+            'sys.stderr.write(\'[{"level": "action", "id": "resolve"}, {"\')\n'
+            'sys.exit(1)\n'
+        )])
+        with pretty_logging(
+                logger='calmjs.bower', stream=mocks.StringIO()) as s:
+            rc = stream.run()
+        self.assertEqual(rc, 1)
+        self.assertEqual(stream.returncode, 1)
+        self.assertIn('incomplete JSON object at end of stream', s.getvalue())
+
+    def test_package_timings(self):
+        timings = events.PackageTimings()
+        timings({'elapsed': 0.5, 'data': {'endpoint': {'name': 'a'}}})
+        timings({'elapsed': 0.7})
+        timings({'elapsed': 1.5, 'data': {'endpoint': {'name': 'a'}}})
+        self.assertEqual(timings.durations(), {'a': 1.0})
+
+
+class DriverEventsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        bin_dir = mkdtemp(self)
+        bower = join(bin_dir, 'bower')
+        with open(bower, 'w') as fd:
+            fd.write('#!%s\n%s' % (sys.executable, FAKE_BOWER))
+        os.chmod(bower, os.stat(bower).st_mode | stat.S_IXUSR)
+        self.project = mkdtemp(self)
+        with open(join(self.project, 'bower.json'), 'w') as fd:
+            json.dump({'dependencies': {'jquery': '~1.11.0'}}, fd)
+        self.driver = Driver(
+            working_dir=self.project, env_path=bin_dir, package_store='',
+            cache_dir='')
+
+    @unittest.skipIf(sys.platform == 'win32', 'requires a shebang script')
+    def test_install_events(self):
+        received = []
+        timings = self.driver.timings = Timings()
+        self.assertTrue(self.driver.pkg_manager_install(
+            events=received.append))
+        self.assertEqual(len(received), 2)
+        span = [s for s in timings.spans if s['name'] == 'subprocess'][0]
+        self.assertEqual(span['cmd'][-1], '--json')
+        self.assertEqual(list(span['packages']), ['jquery'])
+
+    @unittest.skipIf(sys.platform == 'win32', 'requires a shebang script')
+    def test_install_events_failure(self):
+        received = []
+        self.assertFalse(self.driver.pkg_manager_install(
+            args=('fail',), events=received.append))
+        self.assertEqual(received[-1]['level'], 'error')
+
+    @unittest.skipIf(sys.platform == 'win32', 'requires a shebang script')
+    def test_stream_install_events(self):
+        stream = self.driver.stream_install_events()
+        self.assertEqual(
+            [event['id'] for event in stream], ['resolve', 'install'])
+        self.assertEqual(stream.returncode, 0)
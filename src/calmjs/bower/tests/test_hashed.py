@@ -0,0 +1,152 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+from os.path import exists
+from os.path import join
+
+from pkg_resources import WorkingSet
+
+from calmjs import dist
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_item_attr_value
+
+from calmjs.bower import Driver
+from calmjs.bower import hashed
+from calmjs.bower.shared import file_digest
+from calmjs.bower.tests.test_prune import COMPONENTS
+from calmjs.bower.tests.test_prune import make_files
+
+
+class HashedTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.components_dir = join(mkdtemp(self), 'bower_components')
+        make_files(self.components_dir, COMPONENTS)
+        self.output_dir = join(mkdtemp(self), 'static')
+
+    def test_hashed_name(self):
+        digest = '0123456789abcdef'
+        self.assertEqual(
+            hashed.hashed_name('jquery/dist/jquery.min.js', digest),
+            'jquery/dist/jquery.min.0123456789ab.js')
+        self.assertEqual(
+            hashed.hashed_name('LICENSE', digest), 'LICENSE.0123456789ab')
+        self.assertEqual(
+            hashed.hashed_name('x/.bowerrc', digest, 4), 'x/.bowerrc.0123')
+
+    def test_digest_index(self):
+        path = join(self.components_dir, 'jquery', 'dist', 'jquery.js')
+        index_path = join(mkdtemp(self), 'index.json')
+        index = hashed.DigestIndex(index_path)
+        self.assertEqual(index.digest('jquery.js', path), file_digest(path))
+        index.save()
+
+        index = hashed.DigestIndex(index_path)
+        stub_item_attr_value(self, hashed, 'file_digest', None)
+        self.assertEqual(index.digest('jquery.js', path), file_digest(path))
+        self.assertEqual((index.hits, index.misses), (1, 0))
+
+    def test_digest_index_bad(self):
+        index_path = join(mkdtemp(self), 'index.json')
+        with open(index_path, 'w') as fd:
+            fd.write('[')
+        self.assertEqual(hashed.DigestIndex(index_path).entries, {})
+
+    def test_export_hashed(self):
+        files = ['jquery/dist/jquery.js', 'bootstrap/dist/fonts/a.woff']
+        manifest, index = hashed.export_hashed(
+            self.components_dir, files, self.output_dir)
+        self.assertEqual(index.misses, 2)
+        src = join(self.components_dir, 'jquery', 'dist', 'jquery.js')
+        target = manifest['jquery/dist/jquery.js']
+        self.assertEqual(target, 'jquery/dist/jquery.%s.js' % (
+            file_digest(src)[:12]))
+        self.assertEqual(os.stat(src).st_ino, os.stat(
+            join(self.output_dir, *target.split('/'))).st_ino)
+        with open(join(self.output_dir, 'manifest.json')) as fd:
+            self.assertEqual(json.load(fd), manifest)
+        # the index is kept next to the components directory.
+        self.assertEqual(sorted(os.listdir(self.output_dir)), [
+            'bootstrap', 'jquery', 'manifest.json'])
+        self.assertTrue(exists(join(
+            os.path.dirname(self.components_dir),
+            hashed.DIGEST_INDEX_FILENAME)))
+
+        # unchanged files are neither read nor placed again.
+        stub_item_attr_value(self, hashed, 'file_digest', None)
+        stub_item_attr_value(self, hashed, 'place_file', None)
+        manifest2, index = hashed.export_hashed(
+            self.components_dir, files[:1], self.output_dir)
+        self.assertEqual(index.misses, 0)
+        self.assertEqual(manifest2, {'jquery/dist/jquery.js': target})
+        # the file no longer exported is removed, along with its entry.
+        self.assertFalse(exists(join(self.output_dir, 'bootstrap')))
+        self.assertEqual(sorted(index.entries), ['jquery/dist/jquery.js'])
+
+    def test_export_hashed_unrelated(self):
+        make_files(self.output_dir, ['index.html', 'jquery/other.js'])
+        with open(join(self.output_dir, 'manifest.json'), 'w') as fd:
+            json.dump({'a.js': 'a.0123456789ab.js', 'b.js': '../b.js'}, fd)
+        make_files(self.output_dir, ['a.0123456789ab.js'])
+        index_path = join(mkdtemp(self), 'index.json')
+        hashed.export_hashed(
+            self.components_dir, ['jquery/dist/jquery.js'], self.output_dir,
+            index_path=index_path)
+        self.assertTrue(exists(index_path))
+        # only the file from the previous manifest was removed.
+        self.assertFalse(exists(join(self.output_dir, 'a.0123456789ab.js')))
+        self.assertTrue(exists(join(self.output_dir, 'index.html')))
+        self.assertTrue(exists(join(self.output_dir, 'jquery', 'other.js')))
+
+    def test_export_hashed_changed(self):
+        files = ['jquery/dist/jquery.js']
+        manifest, index = hashed.export_hashed(
+            self.components_dir, files, self.output_dir)
+        src = join(self.components_dir, 'jquery', 'dist', 'jquery.js')
+        os.remove(src)
+        with open(src, 'w') as fd:
+            fd.write('jquery version 2')
+        manifest2, index = hashed.export_hashed(
+            self.components_dir, files, self.output_dir)
+        self.assertEqual(index.misses, 1)
+        self.assertNotEqual(manifest, manifest2)
+        self.assertEqual(sorted(os.listdir(join(
+            self.output_dir, 'jquery', 'dist'))), [
+                manifest2['jquery/dist/jquery.js'].split('/')[-1]])
+
+
+class DriverHashedExportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('requires.txt', ''),
+            ('extras_calmjs.json', json.dumps({
+                'bower_components': {
+                    'jquery': 'jquery/dist/jquery.js',
+                    'bootstrap.fonts': 'bootstrap/dist/fonts',
+                },
+            })),
+        ), 'app', '1.0.0')
+        stub_item_attr_value(
+            self, dist, 'default_working_set',
+            WorkingSet([self._calmjs_testing_tmpdir]))
+        self.project = mkdtemp(self)
+        make_files(join(self.project, 'bower_components'), COMPONENTS)
+        self.driver = Driver(working_dir=self.project, cache_dir='')
+
+    def test_export_hashed(self):
+        manifest = self.driver.pkg_manager_export(
+            'app', export_dir='static', hashed=True)
+        self.assertEqual(sorted(manifest), [
+            'bootstrap/dist/fonts/a.woff',
+            'bootstrap/dist/fonts/b.woff',
+            'jquery/dist/jquery.js',
+        ])
+        self.assertTrue(exists(join(self.project, 'static', 'manifest.json')))
+
+    def test_export_hashed_no_export_dir(self):
+        self.assertIsNone(self.driver.pkg_manager_export('app', hashed=True))
+        self.assertTrue(exists(join(
+            self.project, 'bower_components', 'jquery', 'src')))
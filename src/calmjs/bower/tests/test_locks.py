@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+import sys
+import threading
+from os.path import dirname
+from os.path import exists
+from os.path import join
+
+from calmjs import cli
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_base_which
+from calmjs.testing.utils import stub_item_attr_value
+from calmjs.testing.utils import stub_os_environ
+from calmjs.utils import fork_exec
+
+from calmjs.bower import Driver
+from calmjs.bower import locks
+
+# whether the lock at the path is free, as seen from another process.
+PROBE = '''
+import fcntl, os, sys
+fd = os.open(sys.argv[1], os.O_RDWR)
+try:
+    fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+except (IOError, OSError):
+    sys.stdout.write('locked')
+else:
+    sys.stdout.write('free')
+'''
+
+
+def probe(path):
+    return fork_exec([sys.executable, '-c', PROBE, path])[0]
+
+
+@unittest.skipIf(locks.fcntl is None, 'flock is not available')
+class FileLockTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.path = join(mkdtemp(self), 'locks', 'test.lock')
+
+    def test_get_cache_lock(self):
+        stub_os_environ(self)
+        os.environ.pop(locks.CACHE_LOCK_ENV, None)
+        self.assertTrue(locks.get_cache_lock().endswith('.locks'))
+        os.environ[locks.CACHE_LOCK_ENV] = self.path
+        self.assertEqual(locks.get_cache_lock(), self.path)
+
+    def test_lock_processes(self):
+        lock = locks.FileLock(self.path)
+        self.assertFalse(lock.locked)
+        with lock:
+            self.assertTrue(exists(self.path))
+            self.assertTrue(lock.locked)
+            self.assertEqual(probe(self.path), 'locked')
+        self.assertFalse(lock.locked)
+        self.assertEqual(probe(self.path), 'free')
+        # releasing again is harmless.
+        lock.release()
+
+    def test_lock_threads(self):
+        events = []
+        acquired = threading.Event()
+
+        def contend():
+            with locks.FileLock(self.path):
+                events.append('second')
+            acquired.set()
+
+        with locks.FileLock(self.path):
+            thread = threading.Thread(target=contend)
+            thread.start()
+            self.assertFalse(acquired.wait(0.2))
+            events.append('first')
+        thread.join()
+        self.assertEqual(events, ['first', 'second'])
+
+    def test_package_locks(self):
+        root = dirname(self.path)
+        self.assertEqual(
+            locks.package_lock_path(root, 'jquery'), join(root, 'jquery.lock'))
+        self.assertEqual(
+            locks.package_lock_path(root, '../a b'),
+            join(root, '.._a_b.lock'))
+        package_locks = locks.PackageLocks(root, ['b', 'a', 'b', 'a?', 'a/'])
+        # sorted, with the names that are mapped to the same file only
+        # locked once.
+        self.assertEqual([lock.path for lock in package_locks.locks], [
+            join(root, 'a.lock'), join(root, 'a_.lock'), join(root, 'b.lock')])
+        with package_locks:
+            self.assertEqual(probe(join(root, 'a_.lock')), 'locked')
+            self.assertEqual(probe(join(root, 'b.lock')), 'locked')
+        self.assertEqual(probe(join(root, 'b.lock')), 'free')
+
+    def test_driver_cache_lock(self):
+        states = []
+        jquery = locks.package_lock_path(self.path, 'jquery')
+
+        def call(cmd, **kw):
+            states.append(probe(jquery))
+            return 0
+
+        stub_item_attr_value(self, cli, 'call', call)
+        stub_base_which(self, 'bower')
+        working_dir = mkdtemp(self)
+        with open(join(working_dir, 'bower.json'), 'w') as fd:
+            json.dump({'dependencies': {'jquery': '~1.11.0'}}, fd)
+        driver = Driver(
+            working_dir=working_dir, package_store='', cache_dir='',
+            cache_lock=self.path,
+        )
+        self.assertTrue(driver.pkg_manager_install())
+        self.assertEqual(states, ['locked'])
+        self.assertEqual(probe(jquery), 'free')
+
+        driver.cache_lock = None
+        self.assertTrue(driver.pkg_manager_install())
+        self.assertEqual(states, ['locked', 'free'])
+        self.assertEqual(driver._cache_lock_names(
+            ['b=source#1.0.0', 'a#1.0.0', 'c']), ['a', 'b', 'c'])
+
+    def test_driver_cache_lock_independent(self):
+        calls = []
+
+        def call(cmd, **kw):
+            calls.append(kw['cwd'])
+            return 0
+
+        stub_item_attr_value(self, cli, 'call', call)
+        stub_base_which(self, 'bower')
+        working_dir = mkdtemp(self)
+        with open(join(working_dir, 'bower.json'), 'w') as fd:
+            json.dump({'dependencies': {'underscore': '~1.8.0'}}, fd)
+        driver = Driver(
+            working_dir=working_dir, package_store='', cache_dir='',
+            cache_lock=self.path,
+        )
+        # another installation of a different package is not waited on.
+        with locks.PackageLocks(self.path, ['jquery']):
+            self.assertTrue(driver.pkg_manager_install())
+        self.assertEqual(calls, [working_dir])
+
+        # but one of the same package is.
+        result = []
+        thread = threading.Thread(
+            target=lambda: result.append(driver.pkg_manager_install()))
+        with locks.PackageLocks(self.path, ['underscore']):
+            thread.start()
+            thread.join(0.2)
+            self.assertTrue(thread.is_alive())
+            self.assertEqual(len(calls), 1)
+        thread.join()
+        self.assertEqual(result, [True])
+        self.assertEqual(len(calls), 2)
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import sys
+
+from pkg_resources import WorkingSet
+
+from calmjs import dist
+from calmjs.utils import fork_exec
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import stub_item_attr_value
+from calmjs.testing.utils import stub_stdouts
+
+from calmjs.bower import main
+from calmjs.bower.tests.test_bower import namespace_available
+
+# report which of the modules got imported by the invocation of main.
+CHECK_MODULES = (
+    'import sys\n'
+    'from calmjs.bower.main import main\n'
+    'try:\n'
+    '    main(%r)\n'
+    'except SystemExit:\n'
+    '    pass\n'
+    'sys.stderr.write(repr(sorted(m for m in %r if m in sys.modules)))\n'
+)
+MODULES = (
+    'argparse', 'distutils', 'pkg_resources', 'calmjs.npm', 'calmjs.runtime',
+    'calmjs.bower.driver', 'calmjs.bower.mirror', 'calmjs.bower.native',
+    'calmjs.bower.proxy', 'calmjs.bower.runtime',
+)
+
+
+class MainTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.11.0'},
+            })),
+        ), 'foo', '1.9.0')
+        stub_item_attr_value(
+            self, dist, 'default_working_set',
+            WorkingSet([self._calmjs_testing_tmpdir]))
+        stub_stdouts(self)
+
+    def test_version_info(self):
+        self.assertTrue(main.version_info().startswith('calmjs.bower '))
+        self.assertEqual(main.version_info('no.such.pkg'), '? ? from ?')
+
+    def test_main_version(self):
+        with self.assertRaises(SystemExit) as e:
+            main.main(['-v', '-V'])
+        self.assertEqual(e.exception.code, 0)
+        self.assertEqual(
+            sys.stdout.getvalue(), main.version_info() + '\n')
+
+    def test_main_version_after_separator(self):
+        with self.assertRaises(SystemExit) as e:
+            main.main(['foo', '--', '-V'])
+        # taken as a package name, which is malformed.
+        self.assertEqual(e.exception.code, 1)
+        self.assertEqual(sys.stdout.getvalue(), '')
+
+    def test_main_view(self):
+        with self.assertRaises(SystemExit) as e:
+            main.main(['foo'])
+        self.assertEqual(e.exception.code, 0)
+        result = json.loads(sys.stdout.getvalue())
+        self.assertEqual(result['dependencies'], {'jquery': '~1.11.0'})
+
+    def test_main_failure(self):
+        with self.assertRaises(SystemExit) as e:
+            main.main(['--why', 'underscore', 'foo'])
+        self.assertEqual(e.exception.code, 1)
+
+
+@unittest.skipIf(
+    not namespace_available, 'namespace module unavailable by default')
+class MainStartupTestCase(unittest.TestCase):
+    """
+    Regression tests for the startup of the standalone entry point, by
+    the modules it imports in a fresh process.
+    """
+
+    def check_modules(self, args):
+        stdout, stderr = fork_exec(
+            [sys.executable, '-c', CHECK_MODULES % (args, MODULES)])
+        return stdout, stderr.splitlines()[-1]
+
+    def test_version(self):
+        stdout, modules = self.check_modules(['-V'])
+        self.assertTrue(stdout.startswith('calmjs.bower '))
+        # neither the driver, the runtime nor any argument parser is
+        # needed, and neither is pkg_resources for the version.
+        self.assertEqual(modules, '[]')
+
+    def test_view(self):
+        stdout, modules = self.check_modules(['calmjs.bower'])
+        self.assertEqual(json.loads(stdout)['dependencies'], {})
+        # only the bower runtime is built, not the ones from the other
+        # packages registered for the calmjs runtime, and none of the
+        # modules for the features unused by view are imported.
+        self.assertEqual(modules, repr([
+            'argparse', 'calmjs.bower.driver', 'calmjs.bower.runtime',
+            'calmjs.runtime', 'distutils', 'pkg_resources',
+        ]))
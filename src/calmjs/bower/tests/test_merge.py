@@ -0,0 +1,180 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+
+from pkg_resources import WorkingSet
+
+from calmjs import dist
+from calmjs.utils import pretty_logging
+
+from calmjs.testing import mocks
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_item_attr_value
+
+from calmjs.bower import Driver
+from calmjs.bower import merge
+
+DEP_KEYS = ('dependencies', 'devDependencies')
+
+
+class FakeDist(object):
+
+    def __init__(self, project_name, bower_json):
+        self.project_name = project_name
+        self.bower_json = bower_json
+
+
+def read(dist, filename):
+    return dict(dist.bower_json) if dist.bower_json is not None else None
+
+
+def flatten(*dists):
+    return merge.flatten_dists(dists, 'bower.json', DEP_KEYS, read=read)
+
+
+class MergeDeclarationsTestCase(unittest.TestCase):
+
+    def merge(self, *specs):
+        return merge.merge_declarations('jquery', [
+            ('dist%d' % i, spec) for i, spec in enumerate(specs)
+        ], merge.RangeParser())
+
+    def test_single(self):
+        self.assertEqual(self.merge('~1.8.3'), ('~1.8.3', False))
+
+    def test_child_narrowest(self):
+        self.assertEqual(self.merge('1.x', '~1.8.3'), ('~1.8.3', False))
+        self.assertEqual(self.merge('^1.8.0', '1.8.3'), ('1.8.3', False))
+
+    def test_intersected(self):
+        self.assertEqual(
+            self.merge('~1.8.3', '1.8'), ('>=1.8.3 <1.9.0', False))
+        self.assertEqual(
+            self.merge('>=1.8.0', '<1.9.0 || >=2.0.0', '<2.5.0'),
+            ('>=1.8.0 <1.9.0 || >=2.0.0 <2.5.0', False))
+        self.assertEqual(
+            self.merge('jquery#~1.8.3', 'jquery#1.8'),
+            ('jquery#>=1.8.3 <1.9.0', False))
+
+    def test_conflict(self):
+        self.assertEqual(self.merge('~1.8.3', '~3.0.0'), ('~3.0.0', True))
+
+    def test_unmergeable(self):
+        self.assertEqual(
+            self.merge('~1.8.3', 'https://example.com/jquery.tar.gz'),
+            ('https://example.com/jquery.tar.gz', False))
+        self.assertEqual(self.merge('~1.8.3', 'master'), ('master', False))
+        self.assertEqual(
+            self.merge('jquery#~1.8.3', 'fork#~3.0.0'),
+            ('fork#~3.0.0', False))
+
+    def test_parser_memoized(self):
+        parser = merge.RangeParser()
+        self.assertIs(
+            parser('jquery', '~1.8.3')[1], parser('other', 'other#~1.8.3')[1])
+        self.assertIsNone(parser('jquery', 'master'))
+        self.assertIsNone(parser('jquery', 1))
+
+
+class FlattenDistsTestCase(unittest.TestCase):
+
+    def test_flatten_conflict_resolutions(self):
+        result, conflicts = flatten(
+            FakeDist('lib', {
+                'dependencies': {'jquery': '~1.8.3', 'underscore': '1.x'},
+            }),
+            FakeDist('app', {
+                'name': 'app',
+                'dependencies': {'jquery': '~3.0.0', 'underscore': '~1.8.0'},
+            }),
+        )
+        self.assertEqual(result, {
+            'name': 'app',
+            'dependencies': {'jquery': '~3.0.0', 'underscore': '~1.8.0'},
+            'devDependencies': {},
+            'resolutions': {'jquery': '~3.0.0'},
+        })
+        self.assertEqual(conflicts, [{
+            'name': 'jquery',
+            'key': 'dependencies',
+            'declarations': [['lib', '~1.8.3'], ['app', '~3.0.0']],
+            'resolution': '~3.0.0',
+        }])
+
+    def test_flatten_declared_resolutions(self):
+        result, conflicts = flatten(
+            FakeDist('lib', {'dependencies': {'jquery': '~1.8.3'}}),
+            FakeDist('app', {
+                'dependencies': {'jquery': '~3.0.0'},
+                'resolutions': {'jquery': '3.0.1'},
+            }),
+        )
+        self.assertEqual(result['resolutions'], {'jquery': '3.0.1'})
+        self.assertEqual(conflicts[0]['resolution'], '3.0.1')
+
+    def test_flatten_removal(self):
+        result, conflicts = flatten(
+            FakeDist('lib', {'dependencies': {'jquery': '~1.8.3'}}),
+            FakeDist('app', {'dependencies': {'jquery': None}}),
+            FakeDist('site', {'dependencies': {'jquery': '~3.0.0'}}),
+        )
+        self.assertEqual(result['dependencies'], {'jquery': '~3.0.0'})
+        self.assertNotIn('resolutions', result)
+        self.assertEqual(conflicts, [])
+
+    def test_flatten_no_metadata(self):
+        result, conflicts = flatten(
+            FakeDist('lib', {'dependencies': {'jquery': '~1.8.3'}}),
+            FakeDist('app', None),
+        )
+        self.assertEqual(result, {
+            'dependencies': {'jquery': '~1.8.3'},
+            'devDependencies': {},
+        })
+
+
+class DriverMergeTestCase(unittest.TestCase):
+
+    def setUp(self):
+        lib = make_dummy_dist(self, (
+            ('requires.txt', ''),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.8.3', 'underscore': '1.8'},
+            })),
+        ), 'lib', '1.0.0')
+        app = make_dummy_dist(self, (
+            ('requires.txt', 'lib>=1.0.0'),
+            ('bower.json', json.dumps({
+                'dependencies': {
+                    'jquery': '~3.0.0', 'underscore': '>=1.8.3'},
+            })),
+        ), 'app', '2.0')
+        working_set = WorkingSet()
+        working_set.add(lib, self._calmjs_testing_tmpdir)
+        working_set.add(app, self._calmjs_testing_tmpdir)
+        stub_item_attr_value(self, dist, 'default_working_set', working_set)
+
+    def test_view_reports_conflicts(self):
+        driver = Driver(cache_dir='')
+        with pretty_logging(stream=mocks.StringIO()) as stream:
+            result = driver.pkg_manager_view('app')
+        self.assertEqual(result['dependencies'], {
+            'jquery': '~3.0.0',
+            'underscore': '>=1.8.3 <1.9.0',
+        })
+        self.assertEqual(result['resolutions'], {'jquery': '~3.0.0'})
+        self.assertIn(
+            "conflicting version ranges declared for 'jquery' in "
+            "'dependencies': '~1.8.3' (lib), '~3.0.0' (app); resolving to "
+            "'~3.0.0'", stream.getvalue()
+        )
+
+    def test_cached_report(self):
+        driver = Driver(cache_dir=mkdtemp(self))
+        driver.pkg_manager_view('app')
+        with pretty_logging(stream=mocks.StringIO()) as stream:
+            result = driver.pkg_manager_view('app')
+        self.assertIn('using cached', stream.getvalue())
+        self.assertIn("conflicting version ranges", stream.getvalue())
+        self.assertEqual(result['resolutions'], {'jquery': '~3.0.0'})
@@ -0,0 +1,356 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+from io import StringIO
+from os.path import exists
+from os.path import getsize
+from os.path import join
+
+from pkg_resources import WorkingSet
+
+from calmjs import dist
+from calmjs.utils import which
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_item_attr_value
+
+from calmjs.bower import Driver
+from calmjs.bower import mirror
+from calmjs.bower.native import LocalStore
+from calmjs.bower.native import ResolutionError
+from calmjs.bower.semver import parse_range
+from calmjs.bower.testing.utils import make_git_mirror
+from calmjs.bower.testing.utils import make_package_archive
+
+
+class CountingFetcher(mirror.StoreFetcher):
+
+    def __init__(self, root):
+        super(CountingFetcher, self).__init__(root)
+        self.fetched = []
+
+    def fetch(self, name, tag, path):
+        self.fetched.append((name, tag, getsize(path) if exists(
+            path) else 0))
+        super(CountingFetcher, self).fetch(name, tag, path)
+
+
+class BrokenFetcher(mirror.StoreFetcher):
+
+    def fetch(self, name, tag, path):
+        with open(path, 'wb') as fd:
+            fd.write(b'not an archive')
+
+
+def make_upstream(testcase):
+    upstream = mkdtemp(testcase)
+    for version in ('3.1.0', '3.1.1', '3.2.0'):
+        make_package_archive(
+            upstream, 'jquery', version, {'jquery.js': version})
+    make_package_archive(
+        upstream, 'bootstrap', '3.3.7', {'bootstrap.js': ''},
+        bower_json={'dependencies': {'jquery': '1.9.1 - 3'}})
+    make_package_archive(
+        upstream, 'underscore', '1.8.3', {'underscore.js': ''}, fmt='zip')
+    return upstream
+
+
+class MirrorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.upstream = make_upstream(self)
+        self.root = mkdtemp(self)
+
+    def test_declarations(self):
+        self.assertEqual(mirror.pkgdef_declarations({
+            'dependencies': {'jquery': '~3.1.0', 'removed': None},
+            'devDependencies': {'qunit': '~2.0.0'},
+            'resolutions': {'jquery': '~3.1.1'},
+        }, ('dependencies',)), {('jquery', '~3.1.0'), ('jquery', '~3.1.1')})
+
+    def test_mirror(self):
+        fetcher = CountingFetcher(self.upstream)
+        builder = mirror.Mirror(self.root, fetcher, jobs=2)
+        report = builder.mirror([
+            ('jquery', '~3.1.0'), ('bootstrap', '~3.3.0'),
+            ('underscore', '~1.8.0'),
+        ])
+        self.assertEqual(report, {
+            'packages': {
+                'bootstrap': ['3.3.7'],
+                'jquery': ['3.1.1', '3.2.0'],
+                'underscore': ['1.8.3'],
+            },
+            'fetched': 4,
+            'missing': {},
+        })
+        self.assertTrue(exists(join(self.root, 'underscore', '1.8.3.zip')))
+
+        with open(join(self.root, 'index.json')) as fd:
+            index = json.load(fd)
+        self.assertEqual(index['version'], 1)
+        tag, size, digest = index['packages']['jquery']['3.1.1']
+        self.assertEqual(tag, '3.1.1')
+        self.assertEqual(
+            size, getsize(join(self.root, 'jquery', '3.1.1.tar.gz')))
+        self.assertEqual(len(digest), 64)
+
+        # usable as a package store.
+        package = LocalStore(self.root).resolve(
+            'jquery', parse_range('~3.1.0'))
+        self.assertEqual(str(package.version), '3.1.1')
+
+        # nothing is fetched again.
+        fetcher.fetched = []
+        report = mirror.Mirror(self.root, fetcher).mirror(
+            [('jquery', '~3.1.0')])
+        self.assertEqual(report['fetched'], 0)
+        self.assertEqual(fetcher.fetched, [])
+        # the index retains the earlier entries.
+        with open(join(self.root, 'index.json')) as fd:
+            self.assertEqual(json.load(fd), index)
+
+    def test_mirror_dry_run(self):
+        fetcher = CountingFetcher(self.upstream)
+        builder = mirror.Mirror(self.root, fetcher)
+        builder.mirror([('jquery', '~3.1.0')])
+        with open(join(self.root, 'index.json')) as fd:
+            index = json.load(fd)
+        fetcher.fetched = []
+        report = builder.mirror([
+            ('jquery', '~3.1.0'), ('bootstrap', '~3.3.0'),
+        ], dry_run=True)
+        # the dependencies of bootstrap are unknown without its archive.
+        self.assertEqual(report, {
+            'packages': {'bootstrap': ['3.3.7'], 'jquery': ['3.1.1']},
+            'fetched': 1,
+            'missing': {},
+        })
+        self.assertEqual(fetcher.fetched, [])
+        self.assertFalse(exists(join(self.root, 'bootstrap')))
+        with open(join(self.root, 'index.json')) as fd:
+            self.assertEqual(json.load(fd), index)
+
+    def test_mirror_deduplicated(self):
+        fetcher = CountingFetcher(self.upstream)
+        report = mirror.Mirror(self.root, fetcher, jobs=4).mirror([
+            ('jquery', '~3.1.0'), ('jquery', '3.1.1'),
+            ('jq', 'jquery#>=3.1.1 <3.2'),
+        ])
+        self.assertEqual(report['packages'], {'jquery': ['3.1.1']})
+        self.assertEqual(fetcher.fetched, [('jquery', '3.1.1', 0)])
+
+    def test_mirror_resume(self):
+        source = join(self.upstream, 'jquery', '3.1.1.tar.gz')
+        os.makedirs(join(self.root, 'jquery'))
+        with open(source, 'rb') as fd:
+            head = fd.read(16)
+        with open(join(self.root, 'jquery', '3.1.1.tar.gz.part'), 'wb') as fd:
+            fd.write(head)
+
+        fetcher = CountingFetcher(self.upstream)
+        report = mirror.Mirror(self.root, fetcher).mirror(
+            [('jquery', '3.1.1')])
+        self.assertEqual(report['fetched'], 1)
+        self.assertEqual(fetcher.fetched, [('jquery', '3.1.1', 16)])
+        self.assertFalse(
+            exists(join(self.root, 'jquery', '3.1.1.tar.gz.part')))
+        with open(source, 'rb') as fd:
+            expected = fd.read()
+        with open(join(self.root, 'jquery', '3.1.1.tar.gz'), 'rb') as fd:
+            self.assertEqual(fd.read(), expected)
+
+    def test_mirror_invalid_archive(self):
+        report = mirror.Mirror(self.root, BrokenFetcher(self.upstream)).mirror(
+            [('jquery', '3.1.1')])
+        self.assertEqual(report['packages'], {})
+        self.assertIn('jquery#3.1.1', report['missing'])
+        self.assertEqual(os.listdir(join(self.root, 'jquery')), [])
+
+    def test_mirror_unresolvable(self):
+        report = mirror.Mirror(self.root, CountingFetcher(
+            self.upstream)).mirror([
+                ('jquery', '~4.0.0'),
+                ('missing', '~1.0.0'),
+                ('remote', 'https://example.com/remote.git'),
+                ('bootstrap', '~3.3.0'),
+            ])
+        self.assertEqual(sorted(report['missing']), [
+            'jquery#~4.0.0', 'missing#~1.0.0',
+            'remote#https://example.com/remote.git',
+        ])
+        # the others are still mirrored.
+        self.assertEqual(report['packages'], {
+            'bootstrap': ['3.3.7'], 'jquery': ['3.2.0']})
+
+    @unittest.skipIf(which('git') is None, 'git not available')
+    def test_mirror_from_git(self):
+        upstream = mkdtemp(self)
+        make_git_mirror(upstream, mkdtemp(self), 'lib', [
+            ('1.0.0', {'lib.js': '1'}),
+            ('1.1.0', {'lib.js': '2', 'bower.json': json.dumps(
+                {'dependencies': {'jquery': '~3.1.0'}})}),
+        ])
+        make_package_archive(upstream, 'jquery', '3.1.1', {'jquery.js': ''})
+        report = mirror.Mirror(self.root, mirror.StoreFetcher(
+            upstream)).mirror([('lib', '~1.0.0'), ('lib', '~1.1.0')])
+        self.assertEqual(report['packages'], {
+            'jquery': ['3.1.1'], 'lib': ['1.0.0', '1.1.0']})
+        package = LocalStore(self.root).resolve('lib', parse_range('1.1'))
+        self.assertEqual(package.tag, 'v1.1.0')
+        self.assertEqual(package.kind, 'archive')
+
+
+@unittest.skipIf(which('git') is None, 'git not available')
+class RegistryFetcherTestCase(unittest.TestCase):
+
+    def setUp(self):
+        upstream = mkdtemp(self)
+        self.repo = make_git_mirror(upstream, mkdtemp(self), 'lib', [
+            ('1.0.0', {'lib.js': '1'}),
+            ('1.1.0', {'lib.js': '2'}),
+        ])
+        registry = mkdtemp(self)
+        os.makedirs(join(registry, 'packages'))
+        with open(join(registry, 'packages', 'lib'), 'w') as fd:
+            json.dump({'name': 'lib', 'url': self.repo}, fd)
+        self.fetcher = mirror.RegistryFetcher('file://' + registry)
+
+    def test_get_registry(self):
+        stub_item_attr_value(self, os, 'environ', {})
+        self.assertEqual(mirror.get_registry(), mirror.DEFAULT_REGISTRY)
+        os.environ['bower_registry'] = 'http://localhost:5678'
+        self.assertEqual(mirror.get_registry(), 'http://localhost:5678')
+        self.assertEqual(
+            mirror.RegistryFetcher().registry, 'http://localhost:5678')
+
+    def test_github_url(self):
+        self.assertEqual(mirror.GITHUB_URL.match(
+            'https://github.com/jquery/jquery-dist.git').groups(),
+            ('jquery', 'jquery-dist'))
+        self.assertEqual(mirror.GITHUB_URL.match(
+            'git://github.com/jashkenas/underscore.git').groups(),
+            ('jashkenas', 'underscore'))
+        self.assertIsNone(mirror.GITHUB_URL.match(
+            'https://example.com/lib.git'))
+
+    def test_lookup_versions(self):
+        self.assertEqual(self.fetcher.lookup('lib'), self.repo)
+        self.assertEqual(
+            sorted(self.fetcher.versions('lib')), ['v1.0.0', 'v1.1.0'])
+
+    def test_mirror(self):
+        root = mkdtemp(self)
+        report = mirror.Mirror(root, self.fetcher).mirror([('lib', '~1.0')])
+        self.assertEqual(report['packages'], {'lib': ['1.0.0']})
+        package = LocalStore(root).resolve('lib', parse_range('~1.0'))
+        target = mkdtemp(self)
+        package.extract(target)
+        with open(join(target, 'lib.js')) as fd:
+            self.assertEqual(fd.read(), '1')
+
+    def test_git_failure(self):
+        self.fetcher._urls['missing'] = join(mkdtemp(self), 'missing.git')
+        with self.assertRaises(ResolutionError) as e:
+            self.fetcher.versions('missing')
+        self.assertIn("'git ls-remote' exited with return code", str(
+            e.exception))
+        with self.assertRaises(ResolutionError) as e:
+            self.fetcher.fetch('lib', 'v9.9.9', join(mkdtemp(self), 'lib'))
+        self.assertIn("'git clone' exited with return code", str(
+            e.exception))
+
+        report = mirror.Mirror(mkdtemp(self), self.fetcher).mirror(
+            [('missing', '~1.0')])
+        self.assertIn('ls-remote', report['missing']['missing#~1.0'])
+
+    def test_download(self):
+        tmpdir = mkdtemp(self)
+        source = join(tmpdir, 'source')
+        target = join(tmpdir, 'target')
+        with open(source, 'wb') as fd:
+            fd.write(b'0123456789')
+        with open(target, 'wb') as fd:
+            fd.write(b'stale')
+        # without support for ranges, the partial file is overwritten.
+        self.fetcher.download('file://' + source, target)
+        with open(target, 'rb') as fd:
+            self.assertEqual(fd.read(), b'0123456789')
+
+
+class DriverMirrorTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('bower.json', json.dumps({
+                'dependencies': {'bootstrap': '~3.3.0'},
+            })),
+        ), 'example.lib', '1.0')
+        make_dummy_dist(self, (
+            ('requires.txt', 'example.lib'),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~3.1.0'},
+            })),
+        ), 'example.app', '1.0')
+        make_dummy_dist(self, (
+            ('bower.json', json.dumps({
+                'dependencies': {'underscore': '~1.8.0'},
+            })),
+        ), 'example.other', '1.0')
+        stub_item_attr_value(
+            self, dist, 'default_working_set',
+            WorkingSet([self._calmjs_testing_tmpdir]))
+        self.upstream = make_upstream(self)
+        self.root = mkdtemp(self)
+        self.driver = Driver(
+            working_dir=mkdtemp(self), cache_dir='', package_store='')
+
+    def test_mirror_packages(self):
+        report = self.driver.pkg_manager_mirror(
+            ['example.app'], mirror_dir=self.root,
+            fetcher=mirror.StoreFetcher(self.upstream))
+        # the range declared by bootstrap is resolved on its own.
+        self.assertEqual(report['packages'], {
+            'bootstrap': ['3.3.7'], 'jquery': ['3.1.1', '3.2.0']})
+
+        # then installed natively from the mirror.
+        driver = Driver(
+            working_dir=self.driver.working_dir, cache_dir='',
+            package_store=self.root)
+        self.assertTrue(driver.pkg_manager_install(['example.app']))
+        self.assertTrue(exists(join(
+            driver.working_dir, 'bower_components', 'bootstrap',
+            'bootstrap.js')))
+
+    def test_mirror_working_set(self):
+        report = self.driver.pkg_manager_mirror(
+            mirror_dir=self.root, fetcher=mirror.StoreFetcher(self.upstream))
+        self.assertEqual(sorted(report['packages']), [
+            'bootstrap', 'jquery', 'underscore'])
+
+    def test_mirror_failure(self):
+        self.assertIsNone(self.driver.pkg_manager_mirror(
+            ['example.app'], fetcher=mirror.StoreFetcher(self.upstream)))
+        self.assertIsNone(self.driver.pkg_manager_mirror(
+            ['example.app'], mirror_dir=self.root,
+            fetcher=mirror.StoreFetcher(mkdtemp(self))))
+
+    def test_main(self):
+        stdout = StringIO()
+        self.assertEqual(mirror.main([
+            '--store', self.upstream, self.root, 'example.other',
+        ], stdout=stdout), 0)
+        self.assertEqual(stdout.getvalue(), 'underscore 1.8.3\n')
+        self.assertEqual(mirror.main([
+            '--store', mkdtemp(self), self.root, 'example.other',
+        ], stdout=stdout), 1)
+
+    def test_runtime(self):
+        stub_item_attr_value(
+            self, mirror, 'RegistryFetcher',
+            lambda: mirror.StoreFetcher(self.upstream))
+        from calmjs.bower.runtime import BowerRuntime
+        rt = BowerRuntime(self.driver)
+        self.assertTrue(rt(['--mirror', self.root, 'example.other']))
+        self.assertTrue(exists(join(self.root, 'underscore', '1.8.3.zip')))
@@ -0,0 +1,343 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+import tarfile
+from io import BytesIO
+from os.path import exists
+from os.path import join
+
+from calmjs import cli
+from calmjs.utils import pretty_logging
+from calmjs.utils import which
+
+from calmjs.testing import mocks
+from calmjs.testing.utils import create_fake_bin
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_base_which
+from calmjs.testing.utils import stub_mod_call
+
+from calmjs.bower import Driver
+from calmjs.bower import native
+from calmjs.bower.semver import parse_range
+from calmjs.bower.semver import Version
+from calmjs.bower.testing.utils import make_git_mirror
+from calmjs.bower.testing.utils import make_package_archive
+
+
+class UtilsTestCase(unittest.TestCase):
+
+    def test_split_endpoint(self):
+        source, target = native.split_endpoint('jquery', '~1.8.3')
+        self.assertEqual(source, 'jquery')
+        self.assertIn(Version(1, 8, 5), target)
+        source, target = native.split_endpoint('jq', 'jquery#1.x')
+        self.assertEqual(source, 'jquery')
+        self.assertIn(Version(1, 11, 0), target)
+
+        with self.assertRaises(native.ResolutionError):
+            native.split_endpoint('jquery', 'jquery/jquery#1.x')
+        with self.assertRaises(native.ResolutionError):
+            native.split_endpoint(
+                'jquery', 'https://example.com/jquery.tar.gz')
+        with self.assertRaises(native.ResolutionError):
+            native.split_endpoint('jquery', 'master')
+
+    def test_archive_files_prefix(self):
+        store = mkdtemp(self)
+        path = make_package_archive(store, 'pkg', '1.0.0', {
+            'a.js': 'a', 'dist/b.js': 'b'})
+        with tarfile.open(path) as archive:
+            self.assertEqual(sorted(
+                parts for parts, mode, reader in native.archive_files(
+                    archive)), [['a.js'], ['dist', 'b.js']])
+
+        path = make_package_archive(store, 'pkg', '1.0.1', {
+            'a.js': 'a'}, prefix='')
+        with tarfile.open(path) as archive:
+            self.assertEqual([
+                parts for parts, mode, reader in native.archive_files(
+                    archive)], [['a.js']])
+
+    def test_archive_files_unsafe(self):
+        raw = BytesIO()
+        with tarfile.open(fileobj=raw, mode='w') as archive:
+            for name in ('../evil.js', 'safe.js'):
+                info = tarfile.TarInfo(name)
+                info.size = 1
+                archive.addfile(info, BytesIO(b'x'))
+        raw.seek(0)
+        with pretty_logging(stream=mocks.StringIO()) as s:
+            with tarfile.open(fileobj=raw) as archive:
+                self.assertEqual([
+                    parts for parts, mode, reader in native.archive_files(
+                        archive)], [['safe.js']])
+        self.assertIn("skipping unsafe archive member '../evil.js'", (
+            s.getvalue()))
+
+
+class LocalStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.store_root = mkdtemp(self)
+        make_package_archive(self.store_root, 'jquery', '1.8.3', {
+            'jquery.js': '// jquery 1.8.3'})
+        make_package_archive(self.store_root, 'jquery', '1.8.2', {
+            'jquery.js': '// jquery 1.8.2'}, fmt='zip')
+        make_package_archive(self.store_root, 'jquery', '3.1.0', {
+            'jquery.js': '// jquery 3.1.0'}, fmt='tgz')
+        with open(join(self.store_root, 'jquery', 'README'), 'w') as fd:
+            fd.write('not a package')
+        self.store = native.LocalStore(self.store_root)
+
+    def test_packages(self):
+        packages = self.store.packages('jquery')
+        self.assertEqual(sorted(str(v) for v in packages), [
+            '1.8.2', '1.8.3', '3.1.0'])
+        self.assertEqual(self.store.packages('missing'), {})
+
+    def test_resolve(self):
+        package = self.store.resolve('jquery', parse_range('~1.8.0'))
+        self.assertEqual(package.version, Version(1, 8, 3))
+        self.assertEqual(repr(package), '<Package jquery#1.8.3>')
+        package = self.store.resolve('jquery', parse_range('1.8.2'))
+        self.assertTrue(package.path.endswith('.zip'))
+        self.assertIsNone(self.store.resolve('jquery', parse_range('^2')))
+
+    def test_package_read_extract(self):
+        package = self.store.resolve('jquery', parse_range('1.8.2'))
+        self.assertEqual(package.read_json(), {})
+        target = mkdtemp(self)
+        package.extract(target)
+        with open(join(target, 'jquery.js')) as fd:
+            self.assertEqual(fd.read(), '// jquery 1.8.2')
+
+    def test_invalid_bower_json(self):
+        make_package_archive(self.store_root, 'broken', '1.0.0', {
+            'bower.json': '{'})
+        package = self.store.resolve('broken', parse_range('*'))
+        with pretty_logging(stream=mocks.StringIO()) as s:
+            self.assertEqual(package.read_json(), {})
+        self.assertIn("ignoring invalid 'bower.json'", s.getvalue())
+
+    @unittest.skipIf(which('git') is None, 'git not available')
+    def test_git_mirror(self):
+        make_git_mirror(self.store_root, mkdtemp(self), 'underscore', [
+            ('1.8.2', {'underscore.js': '// 1.8.2'}),
+            ('1.8.3', {'underscore.js': '// 1.8.3', 'bower.json': json.dumps(
+                {'name': 'underscore'})}),
+        ])
+        package = self.store.resolve('underscore', parse_range('~1.8.0'))
+        self.assertEqual(package.kind, 'git')
+        self.assertEqual(package.tag, 'v1.8.3')
+        self.assertEqual(package.read_json(), {'name': 'underscore'})
+        target = mkdtemp(self)
+        package.extract(target)
+        with open(join(target, 'underscore.js')) as fd:
+            self.assertEqual(fd.read(), '// 1.8.3')
+
+
+class NativeInstallerTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.store_root = mkdtemp(self)
+        make_package_archive(self.store_root, 'jquery', '1.8.3', {
+            'jquery.js': '// jquery 1.8.3'})
+        make_package_archive(self.store_root, 'jquery', '3.1.0', {
+            'jquery.js': '// jquery 3.1.0'})
+        make_package_archive(self.store_root, 'plugin', '1.0.0', {
+            'plugin.js': '// plugin'}, bower_json={
+            'name': 'plugin',
+            'dependencies': {'jquery': '~1.8.0', 'underscore': '^1.8.0'},
+        })
+        make_package_archive(self.store_root, 'underscore', '1.8.3', {
+            'underscore.js': '// underscore 1.8.3'})
+        make_package_archive(self.store_root, 'sinon', '1.17.0', {
+            'sinon.js': '// sinon 1.17.0'})
+        self.target = join(mkdtemp(self), 'bower_components')
+        self.installer = native.NativeInstaller(
+            native.LocalStore(self.store_root), self.target, jobs=2)
+
+    def test_resolve_transitive(self):
+        resolved = self.installer.resolve({
+            'dependencies': {'plugin': '~1.0.0'},
+            'devDependencies': {'sinon': '~1.17.0'},
+        })
+        self.assertEqual(
+            sorted((k, str(p.version)) for k, (p, t) in resolved.items()), [
+                ('jquery', '1.8.3'),
+                ('plugin', '1.0.0'),
+                ('sinon', '1.17.0'),
+                ('underscore', '1.8.3'),
+            ])
+
+    def test_resolve_production(self):
+        self.installer.production = True
+        resolved = self.installer.resolve({
+            'dependencies': {'jquery': '*'},
+            'devDependencies': {'sinon': '~1.17.0'},
+        })
+        self.assertEqual(list(resolved), ['jquery'])
+        self.assertEqual(resolved['jquery'][0].version, Version(3, 1, 0))
+
+    def test_resolve_conflict_first_wins(self):
+        with pretty_logging(stream=mocks.StringIO()) as s:
+            resolved = self.installer.resolve({
+                'dependencies': {'jquery': '~3.1.0', 'plugin': '~1.0.0'},
+            })
+        self.assertEqual(resolved['jquery'][0].version, Version(3, 1, 0))
+        self.assertIn(
+            "'jquery#~1.8.0' required by 'plugin' conflicts with the "
+            "resolved version '3.1.0'", s.getvalue())
+
+    def test_resolve_resolutions(self):
+        resolved = self.installer.resolve({
+            'dependencies': {'jquery': '~3.1.0', 'plugin': '~1.0.0'},
+            'resolutions': {'jquery': '~1.8.0'},
+        })
+        self.assertEqual(resolved['jquery'][0].version, Version(1, 8, 3))
+
+    def test_resolve_missing(self):
+        with self.assertRaises(native.ResolutionError):
+            self.installer.resolve({'dependencies': {'missing': '*'}})
+        with self.assertRaises(native.ResolutionError):
+            self.installer.resolve({'dependencies': {'jquery': '^2.0.0'}})
+
+    def test_install(self):
+        resolved = self.installer.resolve({
+            'dependencies': {'plugin': '~1.0.0'},
+        })
+        os.makedirs(join(self.target, 'jquery'))
+        with open(join(self.target, 'jquery', 'stale.js'), 'w') as fd:
+            fd.write('stale')
+
+        installed = self.installer.install(resolved)
+        self.assertEqual(
+            sorted(installed), ['jquery', 'plugin', 'underscore'])
+        self.assertFalse(exists(join(self.target, 'jquery', 'stale.js')))
+        with open(join(self.target, 'jquery', 'jquery.js')) as fd:
+            self.assertEqual(fd.read(), '// jquery 1.8.3')
+        with open(join(self.target, 'plugin', native.BOWER_META)) as fd:
+            meta = json.load(fd)
+        self.assertEqual(meta['name'], 'plugin')
+        self.assertEqual(meta['_release'], '1.0.0')
+        self.assertEqual(meta['_target'], '~1.0.0')
+        self.assertEqual(meta['dependencies']['jquery'], '~1.8.0')
+        self.assertEqual(sorted(os.listdir(self.target)), [
+            'jquery', 'plugin', 'underscore'])
+
+    def test_install_corrupted(self):
+        resolved = self.installer.resolve({
+            'dependencies': {'plugin': '~1.0.0'},
+        })
+        with open(resolved['underscore'][0].path, 'wb') as fd:
+            fd.write(b'not an archive')
+        with self.assertRaises(native.ResolutionError) as e:
+            self.installer.install(resolved)
+        self.assertIn("unable to install 'underscore#1.8.3'", str(e.exception))
+        # no partially extracted packages are left behind.
+        self.assertEqual([
+            name for name in os.listdir(self.target) if name.endswith('.tmp')
+        ], [])
+
+    def test_install_empty_package(self):
+        make_package_archive(self.store_root, 'empty', '1.0.0', {})
+        self.installer.install(self.installer.resolve({
+            'dependencies': {'empty': '~1.0.0'},
+        }))
+        self.assertEqual(os.listdir(join(self.target, 'empty')), [
+            native.BOWER_META])
+
+
+class DriverNativeInstallTestCase(unittest.TestCase):
+
+    def setUp(self):
+        stub_mod_call(self, cli)
+        stub_base_which(self, 'bower')
+        self.store_root = mkdtemp(self)
+        make_package_archive(self.store_root, 'jquery', '1.11.3', {
+            'jquery.js': '// jquery 1.11.3'})
+        self.tmpdir = mkdtemp(self)
+        self.driver = Driver(
+            working_dir=self.tmpdir, package_store=self.store_root)
+
+    def write_bower_json(self, value):
+        with open(join(self.tmpdir, 'bower.json'), 'w') as fd:
+            json.dump(value, fd)
+
+    def test_native_install(self):
+        self.write_bower_json({'dependencies': {'jquery': '~1.11.0'}})
+        self.driver.pkg_manager_install()
+        self.assertIsNone(self.call_args)
+        self.assertTrue(exists(join(
+            self.tmpdir, 'bower_components', 'jquery', 'jquery.js')))
+
+    def test_native_install_incremental(self):
+        self.write_bower_json({'dependencies': {'jquery': '~1.11.0'}})
+        self.driver.pkg_manager_install(incremental=True)
+        self.assertEqual(
+            self.driver.read_install_stamp()['installer'], 'native')
+        target = join(self.tmpdir, 'bower_components', 'jquery', 'jquery.js')
+        os.unlink(target)
+        self.driver.pkg_manager_install(incremental=True)
+        # not reinstalled.
+        self.assertFalse(exists(target))
+
+    def test_native_install_fallback_incremental(self):
+        bower_bin = create_fake_bin(mkdtemp(self), 'bower')
+        stub_base_which(self, bower_bin)
+        self.write_bower_json({'dependencies': {'missing': '~1.11.0'}})
+        self.driver.pkg_manager_install(incremental=True)
+        self.assertEqual(self.call_args[0], ([bower_bin, 'install'],))
+        # the stamp records the installer that was actually used.
+        self.assertEqual(
+            self.driver.read_install_stamp()['installer'], 'bower')
+        self.call_args = None
+        self.driver.pkg_manager_install(incremental=True)
+        self.assertIsNone(self.call_args)
+
+    def test_native_install_production(self):
+        self.write_bower_json({
+            'dependencies': {'jquery': '~1.11.0'},
+            'devDependencies': {'sinon': '*'},
+        })
+        self.driver.pkg_manager_install(args=('--production',))
+        self.assertIsNone(self.call_args)
+
+    def test_native_install_fallback(self):
+        self.write_bower_json({'dependencies': {'missing': '~1.11.0'}})
+        self.driver.pkg_manager_install()
+        self.assertEqual(self.call_args[0], (['bower', 'install'],))
+
+    def test_native_install_fallback_corrupted(self):
+        path = make_package_archive(self.store_root, 'corrupted', '1.0.0', {
+            'corrupted.js': '// corrupted'}, fmt='zip')
+        with open(path, 'rb') as fd:
+            data = fd.read()
+        # the central directory remains readable, but not the contents.
+        with open(path, 'wb') as fd:
+            fd.write(data.replace(b'// corrupted', b'// CORRUPTED', 1))
+        self.write_bower_json({'dependencies': {'corrupted': '~1.0.0'}})
+        with pretty_logging(stream=mocks.StringIO()) as s:
+            self.driver.pkg_manager_install()
+        self.assertIn("unable to install 'corrupted#1.0.0'", s.getvalue())
+        self.assertEqual(self.call_args[0], (['bower', 'install'],))
+        self.assertEqual(os.listdir(join(
+            self.tmpdir, 'bower_components')), [])
+
+    def test_native_install_fallback_args(self):
+        self.write_bower_json({'dependencies': {'jquery': '~1.11.0'}})
+        self.driver.pkg_manager_install(args=('--force-latest',))
+        self.assertEqual(
+            self.call_args[0], (['bower', 'install', '--force-latest'],))
+
+    def test_native_install_fallback_no_bower_json(self):
+        self.driver.pkg_manager_install()
+        self.assertEqual(self.call_args[0], (['bower', 'install'],))
+
+    def test_explicit_package_store(self):
+        driver = Driver(working_dir=self.tmpdir, package_store='')
+        self.assertIsNone(driver.package_store)
+        self.write_bower_json({'dependencies': {'jquery': '~1.11.0'}})
+        driver.pkg_manager_install(package_store=self.store_root)
+        self.assertIsNone(self.call_args)
@@ -0,0 +1,366 @@
+# -*- coding: utf-8 -*-
+import unittest
+import hashlib
+import json
+import os
+import threading
+import time
+from os.path import join
+
+try:
+    from http.server import BaseHTTPRequestHandler
+    from http.server import HTTPServer
+    from urllib.error import HTTPError
+except ImportError:  # pragma: no cover
+    from BaseHTTPServer import BaseHTTPRequestHandler
+    from BaseHTTPServer import HTTPServer
+    from urllib2 import HTTPError
+
+from pkg_resources import WorkingSet
+
+from calmjs import cli
+from calmjs import dist
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_base_which
+from calmjs.testing.utils import stub_item_attr_value
+from calmjs.testing.utils import stub_mod_call
+
+from calmjs.bower import Driver
+from calmjs.bower import cache
+from calmjs.bower import mirror
+from calmjs.bower import proxy
+from calmjs.bower.testing.utils import make_package_archive
+
+
+class StubHandler(BaseHTTPRequestHandler):
+
+    def do_GET(self):
+        upstream = self.server.upstream
+        upstream.requests.append((self.path, dict(self.headers)))
+        if upstream.broken:
+            self.send_error(503)
+            return
+        body = upstream.content.get(self.path)
+        if body is None:
+            self.send_error(404)
+            return
+        etag = '"%s"' % hashlib.sha1(body).hexdigest()
+        if self.headers.get('If-None-Match') == etag:
+            self.send_response(304)
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('ETag', etag)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *a):
+        pass
+
+
+class StubUpstream(object):
+    """
+    A stub upstream, serving the content by path with an ETag.
+    """
+
+    def __init__(self, testcase):
+        self.content = {}
+        self.requests = []
+        self.broken = False
+        self.server = HTTPServer(('127.0.0.1', 0), StubHandler)
+        self.server.upstream = self
+        thread = threading.Thread(
+            target=self.server.serve_forever, kwargs={'poll_interval': 0.05})
+        thread.daemon = True
+        thread.start()
+        testcase.addCleanup(self.server.server_close)
+        testcase.addCleanup(self.server.shutdown)
+
+    @property
+    def url(self):
+        return 'http://127.0.0.1:%d' % self.server.server_address[1]
+
+    def paths(self):
+        return [path for path, headers in self.requests]
+
+
+def lookup(name, url):
+    return json.dumps({'name': name, 'url': url}).encode('utf8')
+
+
+class BlobCacheTestCase(unittest.TestCase):
+
+    def add(self, blobs, key, content):
+        fd, tmp = blobs.mkstemp()
+        with fd:
+            fd.write(content)
+        blobs.add(key, tmp, {'key': key})
+
+    def test_add_get(self):
+        blobs = proxy.BlobCache(join(mkdtemp(self), 'blobs'))
+        self.assertIsNone(blobs.get('a'))
+        self.add(blobs, 'a', b'content')
+        self.assertEqual(blobs.get('a'), {'key': 'a', 'size': 7})
+        with open(blobs.path('a'), 'rb') as fd:
+            self.assertEqual(fd.read(), b'content')
+
+    def test_missing_or_corrupted(self):
+        blobs = proxy.BlobCache(mkdtemp(self))
+        self.add(blobs, 'a', b'content')
+        self.add(blobs, 'b', b'content')
+        os.remove(blobs.path('a'))
+        self.assertIsNone(blobs.get('a'))
+        with open(blobs.path('b') + '.json', 'w') as fd:
+            fd.write('{')
+        self.assertIsNone(blobs.get('b'))
+        self.assertEqual(os.listdir(blobs.root), [])
+
+    def test_evict_lru(self):
+        blobs = proxy.BlobCache(mkdtemp(self), max_size=10)
+        for key in ('a', 'b', 'c'):
+            self.add(blobs, key, b'1234')
+            # ensure the modification times are distinct.
+            mtime = time.time() - 10 + len(blobs.entries())
+            os.utime(blobs.path(key) + '.json', (mtime, mtime))
+        # the total of 12 bytes exceeded the budget, evicting the oldest.
+        self.assertIsNone(blobs.get('a'))
+        # mark b as the most recently used.
+        self.assertIsNotNone(blobs.get('b'))
+        self.add(blobs, 'd', b'1234')
+        self.assertIsNone(blobs.get('c'))
+        self.assertIsNotNone(blobs.get('b'))
+        self.assertIsNotNone(blobs.get('d'))
+
+
+class RegistryProxyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.upstream = StubUpstream(self)
+        self.upstream.content['/packages/jquery'] = lookup(
+            'jquery', 'https://github.com/jquery/jquery-dist.git')
+        self.upstream.content['/archives/jquery.tar.gz'] = b'0123456789'
+        self.proxy = proxy.RegistryProxy(
+            mkdtemp(self), upstream=self.upstream.url,
+            archive_scheme='http')
+        self.server = proxy.start_proxy(self.proxy)
+        self.addCleanup(self.server.server_close)
+        self.addCleanup(self.server.shutdown)
+
+    def get(self, path, headers={}):
+        return mirror.open_url(self.server.url + path, 10, headers)
+
+    def archive_path(self):
+        return '/archives/127.0.0.1:%d/archives/jquery.tar.gz' % (
+            self.upstream.server.server_address[1])
+
+    def test_upstream_url(self):
+        self.assertEqual(
+            self.proxy.upstream_url('/packages/jquery'),
+            self.upstream.url + '/packages/jquery')
+        self.assertEqual(
+            self.proxy.upstream_url(
+                '/archives/codeload.github.com/a/b/tar.gz/1.0.0'),
+            'http://codeload.github.com/a/b/tar.gz/1.0.0')
+        self.assertEqual(
+            self.proxy.upstream_url(self.archive_path()),
+            self.upstream.url + '/archives/jquery.tar.gz')
+        self.assertIsNone(self.proxy.upstream_url('/archives/example.com'))
+        self.assertIsNone(self.proxy.upstream_url('/other'))
+
+    def test_upstream_url_archive_hosts(self):
+        for path in (
+                '/archives/example.com/a.tar.gz',
+                '/archives/169.254.169.254/latest/meta-data',
+                '/archives/codeload.github.com@example.com/a.tar.gz',
+                '/archives/codeload.github.com:22/a.tar.gz'):
+            with self.assertRaises(proxy.UpstreamError) as e:
+                self.proxy.upstream_url(path)
+            self.assertEqual(e.exception.status, 403)
+
+        explicit = proxy.RegistryProxy(
+            mkdtemp(self), upstream=self.upstream.url,
+            archive_hosts=['Example.com'])
+        self.assertEqual(
+            explicit.upstream_url('/archives/example.com/a.tar.gz'),
+            'https://example.com/a.tar.gz')
+        with self.assertRaises(proxy.UpstreamError):
+            explicit.upstream_url(
+                '/archives/codeload.github.com/a/b/tar.gz/1.0.0')
+
+    def test_archive_host_refused(self):
+        with self.assertRaises(HTTPError) as e:
+            self.get('/archives/example.com/a.tar.gz')
+        self.assertEqual(e.exception.code, 403)
+        self.assertEqual(self.upstream.paths(), [])
+
+    def test_lookup_cached(self):
+        response = self.get('/packages/jquery')
+        self.assertEqual(json.loads(response.read().decode('utf8'))['url'],
+                         'https://github.com/jquery/jquery-dist.git')
+        self.assertEqual(response.info()['X-Cache'], proxy.MISS)
+        response = self.get('/packages/jquery')
+        self.assertEqual(response.info()['X-Cache'], proxy.HIT)
+        self.assertEqual(self.upstream.paths(), ['/packages/jquery'])
+
+    def test_not_found(self):
+        with self.assertRaises(HTTPError) as e:
+            self.get('/packages/nothing')
+        self.assertEqual(e.exception.code, 404)
+        with self.assertRaises(HTTPError) as e:
+            self.get('/nothing')
+        self.assertEqual(e.exception.code, 404)
+        self.assertEqual(self.upstream.paths(), ['/packages/nothing'])
+
+    def test_client_conditional(self):
+        response = self.get('/packages/jquery')
+        etag = response.info()['ETag']
+        last_modified = response.info()['Last-Modified']
+        with self.assertRaises(HTTPError) as e:
+            self.get('/packages/jquery', {'If-None-Match': etag})
+        self.assertEqual(e.exception.code, 304)
+        with self.assertRaises(HTTPError) as e:
+            self.get('/packages/jquery', {'If-Modified-Since': last_modified})
+        self.assertEqual(e.exception.code, 304)
+        response = self.get('/packages/jquery', {'If-None-Match': '"x"'})
+        self.assertEqual(response.getcode(), 200)
+
+    def test_upstream_revalidate(self):
+        self.proxy.max_age = 0
+        self.get('/packages/jquery').read()
+        response = self.get('/packages/jquery')
+        self.assertEqual(response.info()['X-Cache'], proxy.REVALIDATED)
+        path, headers = self.upstream.requests[-1]
+        self.assertIn('If-None-Match', headers)
+
+        # changed upstream
+        self.upstream.content['/packages/jquery'] = lookup(
+            'jquery', 'https://example.com/jquery.git')
+        response = self.get('/packages/jquery')
+        self.assertEqual(response.info()['X-Cache'], proxy.MISS)
+        self.assertEqual(json.loads(response.read().decode('utf8'))['url'],
+                         'https://example.com/jquery.git')
+
+    def test_upstream_unavailable(self):
+        self.proxy.max_age = 0
+        self.get('/packages/jquery').read()
+        self.upstream.broken = True
+        response = self.get('/packages/jquery')
+        self.assertEqual(response.info()['X-Cache'], proxy.STALE)
+        self.assertIn(b'jquery-dist', response.read())
+        with self.assertRaises(HTTPError) as e:
+            self.get('/packages/underscore')
+        self.assertEqual(e.exception.code, 503)
+
+        self.proxy.upstream = 'http://127.0.0.1:1'
+        with self.assertRaises(HTTPError) as e:
+            self.get('/packages/underscore')
+        self.assertEqual(e.exception.code, 502)
+
+    def test_archive_range(self):
+        self.assertEqual(self.get(self.archive_path()).read(), b'0123456789')
+        response = self.get(self.archive_path(), {'Range': 'bytes=4-'})
+        self.assertEqual(response.getcode(), 206)
+        self.assertEqual(response.info()['Content-Range'], 'bytes 4-9/10')
+        self.assertEqual(response.read(), b'456789')
+        # unsatisfiable ranges are served in full.
+        response = self.get(self.archive_path(), {'Range': 'bytes=10-'})
+        self.assertEqual(response.getcode(), 200)
+        self.assertEqual(response.read(), b'0123456789')
+        self.assertEqual(len(self.upstream.requests), 1)
+
+    def test_registry_fetcher_download(self):
+        fetcher = mirror.RegistryFetcher(
+            self.server.url, archives=self.server.url + '/archives')
+        target = join(mkdtemp(self), 'jquery.tar.gz')
+        with open(target, 'wb') as fd:
+            fd.write(b'0123')
+        # the partial download is continued from the cache.
+        fetcher.download(self.server.url + self.archive_path(), target)
+        with open(target, 'rb') as fd:
+            self.assertEqual(fd.read(), b'0123456789')
+
+    def test_parse_range(self):
+        self.assertEqual(proxy.parse_range('bytes=0-', 10), 0)
+        self.assertEqual(proxy.parse_range('bytes=9-', 10), 9)
+        self.assertIsNone(proxy.parse_range('bytes=10-', 10))
+        self.assertIsNone(proxy.parse_range('bytes=1-2', 10))
+        self.assertIsNone(proxy.parse_range('bytes=-2', 10))
+        self.assertIsNone(proxy.parse_range('items=1-', 10))
+        self.assertIsNone(proxy.parse_range(None, 10))
+
+
+class DriverRegistryProxyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~3.1.0'},
+            })),
+        ), 'example.app', '1.0')
+        stub_item_attr_value(
+            self, dist, 'default_working_set',
+            WorkingSet([self._calmjs_testing_tmpdir]))
+        self.registry_cache = mkdtemp(self)
+        self.driver = Driver(
+            working_dir=mkdtemp(self), cache_dir='', package_store='',
+            registry_cache=self.registry_cache)
+        self.addCleanup(self.driver.stop_registry_proxy)
+
+    def test_get_registry_cache(self):
+        stub_item_attr_value(self, os, 'environ', {})
+        self.assertIsNone(cache.get_registry_cache())
+        self.assertIsNone(Driver().get_registry_url())
+        os.environ['CALMJS_BOWER_REGISTRY_CACHE'] = self.registry_cache
+        self.assertEqual(cache.get_registry_cache(), self.registry_cache)
+        self.assertEqual(Driver().registry_cache, self.registry_cache)
+
+    def test_registry_url(self):
+        url = self.driver.get_registry_url()
+        self.assertTrue(url.startswith('http://127.0.0.1:'))
+        self.assertEqual(self.driver.get_registry_url(), url)
+        self.driver.stop_registry_proxy()
+        self.assertIsNone(self.driver._registry_server)
+
+    def test_install_args(self):
+        stub_mod_call(self, cli)
+        stub_base_which(self, 'bower')
+        self.assertTrue(self.driver.pkg_manager_install(['example.app']))
+        args, kwargs = self.call_args
+        self.assertEqual(args, ([
+            'bower', 'install',
+            '--config.registry=' + self.driver.get_registry_url(),
+        ],))
+        cmd = self.driver.stream_install_events(endpoints=['jquery']).cmd
+        self.assertEqual(cmd[2:], [
+            '--config.registry=' + self.driver.get_registry_url(),
+            'jquery', '--json',
+        ])
+
+    def test_mirror_through_proxy(self):
+        upstream = StubUpstream(self)
+        archive = make_package_archive(
+            mkdtemp(self), 'jquery', '3.1.1', {'jquery.js': ''})
+        with open(archive, 'rb') as fd:
+            upstream.content['/jquery/jquery-dist/tar.gz/3.1.1'] = fd.read()
+        upstream.content['/packages/jquery'] = lookup(
+            'jquery', 'https://github.com/jquery/jquery-dist.git')
+
+        class StubProxy(proxy.RegistryProxy):
+            # the stub upstream stands in for codeload.github.com.
+            def upstream_url(self, path):
+                return upstream.url + path.replace(
+                    '/archives/codeload.github.com', '')
+
+        self.driver._registry_server = proxy.start_proxy(
+            StubProxy(self.registry_cache))
+        stub_item_attr_value(
+            self, mirror.RegistryFetcher, 'versions',
+            lambda self, name: [self.lookup(name) and '3.1.1'])
+        report = self.driver.pkg_manager_mirror(
+            ['example.app'], mirror_dir=mkdtemp(self))
+        self.assertEqual(report['packages'], {'jquery': ['3.1.1']})
+        self.assertEqual(upstream.paths(), [
+            '/packages/jquery', '/jquery/jquery-dist/tar.gz/3.1.1'])
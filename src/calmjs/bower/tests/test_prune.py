@@ -0,0 +1,224 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+from os.path import exists
+from os.path import join
+
+from pkg_resources import WorkingSet
+
+from calmjs import dist
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_item_attr_value
+
+from calmjs.bower import Driver
+from calmjs.bower import INSTALL_STAMP
+from calmjs.bower import prune
+from calmjs.bower.native import BOWER_META
+from calmjs.bower.timings import Timings
+from calmjs.bower.verify import FILES_MANIFEST
+
+
+def make_files(root, paths):
+    for path in paths:
+        target = join(root, *path.split('/'))
+        if not exists(os.path.dirname(target)):
+            os.makedirs(os.path.dirname(target))
+        with open(target, 'w') as fd:
+            fd.write(path)
+
+
+COMPONENTS = (
+    'jquery/dist/jquery.js',
+    'jquery/dist/jquery.min.js',
+    'jquery/src/core.js',
+    'jquery/test/unit.js',
+    'bootstrap/dist/css/bootstrap.css',
+    'bootstrap/dist/fonts/a.woff',
+    'bootstrap/dist/fonts/b.woff',
+    'bootstrap/less/bootstrap.less',
+    'bootstrap/docs/index.html',
+)
+
+
+class PruneTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.components_dir = mkdtemp(self)
+        make_files(self.components_dir, COMPONENTS)
+
+    def test_collect_files(self):
+        files, missing = prune.collect_files(self.components_dir, [
+            'jquery/dist/jquery.js',
+            './bootstrap/dist/fonts',
+            'bootstrap/dist/*.css',
+            'missing/missing.js',
+            '../escape.js',
+            None,
+        ], globs=['*.min.js', 'nothing/*'])
+        self.assertEqual(files, [
+            'bootstrap/dist/css/bootstrap.css',
+            'bootstrap/dist/fonts/a.woff',
+            'bootstrap/dist/fonts/b.woff',
+            'jquery/dist/jquery.js',
+            'jquery/dist/jquery.min.js',
+        ])
+        self.assertEqual(
+            missing, ['missing/missing.js', '../escape.js', 'nothing/*'])
+
+    def test_export_files(self):
+        output_dir = join(mkdtemp(self), 'export')
+        make_files(output_dir, ['other/other.js', 'jquery/dist/jquery.js'])
+        files = ['jquery/dist/jquery.js', 'bootstrap/dist/fonts/a.woff']
+        self.assertEqual(
+            prune.export_files(self.components_dir, files, output_dir), 0)
+        # files not placed by an export are left untouched.
+        self.assertTrue(exists(join(output_dir, 'other', 'other.js')))
+        self.assertEqual(prune.read_export_manifest(output_dir), sorted(files))
+        src = join(self.components_dir, 'jquery', 'dist', 'jquery.js')
+        dst = join(output_dir, 'jquery', 'dist', 'jquery.js')
+        self.assertEqual(os.stat(src).st_ino, os.stat(dst).st_ino)
+
+        copied = join(mkdtemp(self), 'export')
+        prune.export_files(self.components_dir, files, copied, link=False)
+        self.assertNotEqual(
+            os.stat(src).st_ino,
+            os.stat(join(copied, 'jquery', 'dist', 'jquery.js')).st_ino)
+
+    def test_export_files_previous(self):
+        output_dir = join(mkdtemp(self), 'export')
+        make_files(output_dir, ['other/other.js'])
+        prune.export_files(self.components_dir, [
+            'jquery/dist/jquery.js', 'bootstrap/dist/fonts/a.woff',
+        ], output_dir)
+        # the files no longer referenced are removed, along with their
+        # directories left empty.
+        self.assertEqual(prune.export_files(self.components_dir, [
+            'jquery/dist/jquery.js'], output_dir), 1)
+        self.assertEqual(sorted(os.listdir(output_dir)), [
+            prune.EXPORT_MANIFEST, 'jquery', 'other'])
+        self.assertTrue(exists(join(output_dir, 'other', 'other.js')))
+
+    def test_read_export_manifest(self):
+        output_dir = mkdtemp(self)
+        self.assertEqual(prune.read_export_manifest(output_dir), [])
+        with open(join(output_dir, prune.EXPORT_MANIFEST), 'w') as fd:
+            json.dump(['a/b.js', '../outside.js', './c.js', 1], fd)
+        self.assertEqual(prune.read_export_manifest(output_dir), [
+            'a/b.js', 'c.js'])
+        with open(join(output_dir, prune.EXPORT_MANIFEST), 'w') as fd:
+            json.dump({}, fd)
+        self.assertEqual(prune.read_export_manifest(output_dir), [])
+
+    def test_prune_components(self):
+        make_files(self.components_dir, [
+            'jquery/' + BOWER_META,
+            'bootstrap/' + BOWER_META,
+            INSTALL_STAMP,
+            FILES_MANIFEST,
+        ])
+        removed = prune.prune_components(
+            self.components_dir, ['jquery/dist/jquery.js'])
+        self.assertEqual(removed, 8)
+        self.assertEqual(sorted(os.listdir(self.components_dir)), sorted([
+            FILES_MANIFEST, INSTALL_STAMP, 'bootstrap', 'jquery']))
+        self.assertEqual(
+            os.listdir(join(self.components_dir, 'bootstrap')), [BOWER_META])
+        self.assertEqual(
+            sorted(os.listdir(join(self.components_dir, 'jquery'))),
+            sorted([BOWER_META, 'dist']))
+
+    def test_prune_directory(self):
+        removed = prune.prune_directory(self.components_dir, [
+            'jquery/dist/jquery.js', 'bootstrap/dist/css/bootstrap.css'])
+        self.assertEqual(removed, 7)
+        self.assertEqual(sorted(os.listdir(self.components_dir)), [
+            'bootstrap', 'jquery'])
+        self.assertEqual(
+            os.listdir(join(self.components_dir, 'jquery')), ['dist'])
+        self.assertFalse(
+            exists(join(self.components_dir, 'bootstrap', 'docs')))
+
+
+class DriverExportTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('requires.txt', ''),
+            ('extras_calmjs.json', json.dumps({
+                'bower_components': {
+                    'jquery': 'jquery/dist/jquery.js',
+                },
+            })),
+        ), 'lib', '1.0.0')
+        make_dummy_dist(self, (
+            ('requires.txt', 'lib'),
+            ('extras_calmjs.json', json.dumps({
+                'bower_components': {
+                    'bootstrap': 'bootstrap/dist/css/bootstrap.css',
+                    'bootstrap.fonts': 'bootstrap/dist/fonts/*.woff',
+                },
+            })),
+        ), 'app', '1.0.0')
+        stub_item_attr_value(
+            self, dist, 'default_working_set',
+            WorkingSet([self._calmjs_testing_tmpdir]))
+        self.project = mkdtemp(self)
+        self.components_dir = join(self.project, 'bower_components')
+        make_files(self.components_dir, COMPONENTS)
+        self.driver = Driver(working_dir=self.project, cache_dir='')
+
+    def test_export(self):
+        files = self.driver.pkg_manager_export('app', export_dir='export')
+        self.assertEqual(files, [
+            'bootstrap/dist/css/bootstrap.css',
+            'bootstrap/dist/fonts/a.woff',
+            'bootstrap/dist/fonts/b.woff',
+            'jquery/dist/jquery.js',
+        ])
+        self.assertTrue(exists(join(
+            self.project, 'export', 'bootstrap', 'dist', 'fonts', 'b.woff')))
+        self.assertFalse(exists(join(self.project, 'export', 'jquery', 'src')))
+        # the components directory is left as is.
+        self.assertTrue(exists(join(self.components_dir, 'jquery', 'src')))
+
+    def test_export_timings(self):
+        spans = Timings()
+        driver = Driver(
+            working_dir=self.project, cache_dir='', timings=spans)
+        driver.pkg_manager_export('app', export_dir='export')
+        self.assertEqual([
+            (s['name'], s['depth']) for s in spans.to_json()['spans']], [
+            ('export', 0), ('resolve_dists', 1), ('flatten_extras', 1),
+            ('collect', 1), ('place', 1)])
+        by_name = {s['name']: s for s in spans.spans}
+        self.assertEqual(by_name['resolve_dists']['dists'], 2)
+        self.assertEqual(by_name['collect']['files'], 4)
+
+    def test_prune(self):
+        make_files(self.components_dir, ['jquery/' + BOWER_META])
+        self.driver.write_install_stamp({})
+        files = self.driver.pkg_manager_export('lib')
+        self.assertEqual(files, ['jquery/dist/jquery.js'])
+        self.assertEqual(sorted(os.listdir(self.components_dir)), [
+            INSTALL_STAMP, 'jquery'])
+        self.assertTrue(
+            exists(join(self.components_dir, 'jquery', BOWER_META)))
+
+    def test_nothing_referenced(self):
+        make_dummy_dist(self, (
+            ('requires.txt', ''),
+        ), 'plain', '1.0.0')
+        stub_item_attr_value(
+            self, dist, 'default_working_set',
+            WorkingSet([self._calmjs_testing_tmpdir]))
+        self.assertIsNone(self.driver.pkg_manager_export('plain'))
+        # nothing got removed.
+        self.assertTrue(exists(join(self.components_dir, 'bootstrap')))
+
+    def test_missing_components_dir(self):
+        driver = Driver(working_dir=mkdtemp(self), cache_dir='')
+        self.assertIsNone(driver.pkg_manager_export('app'))
+        with self.assertRaises(ValueError):
+            driver.pkg_manager_export(['app', '[malformed'])
@@ -23,6 +23,8 @@ from calmjs.testing.utils import stub_mod_call
 from calmjs.testing.utils import stub_mod_check_interactive
 from calmjs.testing.utils import stub_stdouts
 
+from calmjs.bower.testing.utils import make_package_archive
+
 which_bower = which('bower')
 
 
@@ -114,6 +116,127 @@ class IntegrationTestCase(unittest.TestCase):
         # test and values will differ between environments
         self.assertEqual(finalize_env(env), finalize_env(env))
 
+    def test_bower_install_package_store(self):
+        remember_cwd(self)
+        tmpdir = mkdtemp(self)
+        store = mkdtemp(self)
+        make_package_archive(store, 'jquery', '3.1.1', {'jquery.js': ''})
+        os.chdir(tmpdir)
+        stub_mod_call(self, cli)
+        stub_base_which(self, which_bower)
+        rt = self.setup_runtime()
+        rt(['bower', '--install', '--package-store', store,
+            'example.package1'])
+        # bower not invoked
+        self.assertIsNone(self.call_args)
+        self.assertTrue(os.path.exists(
+            join(tmpdir, 'bower_components', 'jquery', 'jquery.js')))
+
+    def test_bower_install_shared_store(self):
+        remember_cwd(self)
+        tmpdir = mkdtemp(self)
+        store = mkdtemp(self)
+        shared_store = mkdtemp(self)
+        make_package_archive(store, 'jquery', '3.1.1', {'jquery.js': ''})
+        os.chdir(tmpdir)
+        stub_mod_call(self, cli)
+        stub_base_which(self, which_bower)
+        rt = self.setup_runtime()
+        rt(['bower', '--install', '--package-store', store,
+            '--shared-store', shared_store, 'example.package1'])
+        self.assertIsNone(self.call_args)
+        self.assertEqual(os.stat(join(
+            tmpdir, 'bower_components', 'jquery', 'jquery.js')).st_nlink, 2)
+
+    def test_bower_lock_frozen(self):
+        remember_cwd(self)
+        tmpdir = mkdtemp(self)
+        store = mkdtemp(self)
+        make_package_archive(store, 'jquery', '3.1.1', {'jquery.js': ''})
+        os.chdir(tmpdir)
+        stub_mod_call(self, cli)
+        stub_base_which(self, which_bower)
+        rt = self.setup_runtime()
+        rt(['bower', '--lock', '--package-store', store, 'example.package1'])
+        with open(join(tmpdir, 'bower.lock')) as fd:
+            result = json.load(fd)
+        self.assertEqual(result['dependencies']['jquery']['version'], '3.1.1')
+
+        rt(['bower', '--install', '--frozen', '-w', 'example.package1'])
+        self.assertEqual(self.call_args[0][0][1:], [
+            'install', 'jquery=jquery#3.1.1'])
+
+    def test_bower_install_delta(self):
+        remember_cwd(self)
+        tmpdir = mkdtemp(self)
+        os.chdir(tmpdir)
+        stub_mod_call(self, cli)
+        stub_base_which(self, which_bower)
+        rt = self.setup_runtime()
+        rt(['bower', '--install', '--delta', 'example.package1'])
+        self.assertEqual(self.call_args[0][0][1:], [
+            'install', 'jquery=jquery#~3.1.0'])
+
+    def test_bower_export(self):
+        remember_cwd(self)
+        tmpdir = mkdtemp(self)
+        os.chdir(tmpdir)
+        make_dummy_dist(self, (
+            ('extras_calmjs.json', json.dumps({
+                'bower_components': {'jquery': 'jquery/dist/*.js'},
+            })),
+        ), 'example.package3', '1.0')
+        for name in ('jquery.js', 'README.md'):
+            target = join(tmpdir, 'bower_components', 'jquery', 'dist')
+            if not os.path.isdir(target):
+                os.makedirs(target)
+            with open(join(target, name), 'w') as fd:
+                fd.write(name)
+        rt = self.setup_runtime()
+        rt(['bower', '--export', '--export-dir', 'static',
+            'example.package3'])
+        self.assertEqual(os.listdir(
+            join(tmpdir, 'static', 'jquery', 'dist')), ['jquery.js'])
+
+    def test_bower_record_verify(self):
+        remember_cwd(self)
+        tmpdir = mkdtemp(self)
+        store = mkdtemp(self)
+        make_package_archive(store, 'jquery', '3.1.1', {'jquery.js': ''})
+        os.chdir(tmpdir)
+        rt = self.setup_runtime()
+        self.assertTrue(rt(['bower', '--install', '--record',
+                            '--package-store', store, 'example.package1']))
+        self.assertTrue(rt(['bower', '--verify', 'example.package1']))
+        with open(join(tmpdir, 'bower_components', 'jquery', 'extra.js'),
+                  'w') as fd:
+            fd.write('extra')
+        self.assertFalse(rt(['bower', '--verify', 'example.package1']))
+
+    def test_bower_why(self):
+        stub_stdouts(self)
+        rt = self.setup_runtime()
+        self.assertTrue(rt([
+            'bower', '--why', 'jquery', 'example.package1',
+            'example.package2']))
+        result = json.loads(sys.stdout.getvalue())
+        self.assertEqual(result['flattened'], {'dependencies': '~3.1.0'})
+        self.assertEqual(
+            result['declarations'][0]['chain'], ['example.package1'])
+        self.assertFalse(rt(['bower', '--why', 'missing', 'example.package1']))
+
+    def test_bower_view_timings(self):
+        remember_cwd(self)
+        os.chdir(mkdtemp(self))
+        stub_stdouts(self)
+        rt = self.setup_runtime()
+        rt(['bower', '--view', '--timings', 'example.package1'])
+        self.assertEqual(
+            json.loads(sys.stdout.getvalue())['dependencies']['jquery'],
+            '~3.1.0')
+        spans = json.loads(sys.stderr.getvalue().splitlines()[-1])['spans']
+        self.assertEqual(spans[0]['name'], 'view')
+
     def test_bower_view(self):
         remember_cwd(self)
         tmpdir = mkdtemp(self)
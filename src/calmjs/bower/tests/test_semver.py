@@ -0,0 +1,125 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from calmjs.bower.semver import Interval
+from calmjs.bower.semver import Version
+from calmjs.bower.semver import parse_range
+from calmjs.bower.semver import parse_version
+
+
+class VersionTestCase(unittest.TestCase):
+
+    def test_parse_version(self):
+        self.assertEqual(parse_version('1.2.3'), Version(1, 2, 3))
+        self.assertEqual(parse_version('v1.2.3'), Version(1, 2, 3))
+        self.assertEqual(parse_version('1.2'), Version(1, 2, 0))
+        self.assertEqual(parse_version('1.2.3+build.4'), Version(1, 2, 3))
+        self.assertEqual(
+            parse_version('1.2.3-beta.1'), Version(1, 2, 3, 'beta.1'))
+        self.assertIsNone(parse_version('latest'))
+        self.assertIsNone(parse_version('1.2.3.4'))
+
+    def test_ordering(self):
+        versions = [parse_version(v) for v in (
+            '1.0.0', '1.0.0-rc.1', '1.0.0-beta.11', '1.0.0-beta.2',
+            '1.0.0-beta', '1.0.0-alpha.beta', '1.0.0-alpha.1', '1.0.0-alpha',
+            '0.9.9', '1.0.1',
+        )]
+        self.assertEqual([str(v) for v in sorted(versions)], [
+            '0.9.9', '1.0.0-alpha', '1.0.0-alpha.1', '1.0.0-alpha.beta',
+            '1.0.0-beta', '1.0.0-beta.2', '1.0.0-beta.11', '1.0.0-rc.1',
+            '1.0.0', '1.0.1',
+        ])
+        self.assertNotEqual(Version(1), Version(2))
+        self.assertEqual(repr(Version(1)), '<Version 1.0.0>')
+
+
+class RangeTestCase(unittest.TestCase):
+
+    def assertRange(self, spec, expected, matches=(), rejects=()):
+        result = parse_range(spec)
+        self.assertEqual(str(result), expected)
+        for version in matches:
+            self.assertIn(parse_version(version), result)
+        for version in rejects:
+            self.assertNotIn(parse_version(version), result)
+
+    def test_wildcards(self):
+        self.assertRange('*', '*', ['0.0.0', '99.0.0'], ['1.0.0-beta'])
+        self.assertRange('', '*', ['1.0.0'])
+        self.assertRange('latest', '*', ['1.0.0'])
+        self.assertRange('1.x', '>=1.0.0 <2.0.0', ['1.9.9'], ['2.0.0'])
+        self.assertRange('1.2.*', '>=1.2.0 <1.3.0', ['1.2.9'], ['1.3.0'])
+        self.assertRange('1', '>=1.0.0 <2.0.0')
+        self.assertRange('>x', '<empty>', [], ['0.0.0', '1.0.0'])
+
+    def test_exact(self):
+        self.assertRange('1.2.3', '1.2.3', ['1.2.3'], ['1.2.4'])
+        self.assertRange('=v1.2.3', '1.2.3', ['1.2.3'])
+        self.assertRange(
+            '1.2.3-beta', '1.2.3-beta', ['1.2.3-beta'], ['1.2.3'])
+
+    def test_tilde(self):
+        self.assertRange(
+            '~1.8.3', '>=1.8.3 <1.9.0', ['1.8.3', '1.8.9'],
+            ['1.8.2', '1.9.0'])
+        self.assertRange('~1.8', '>=1.8.0 <1.9.0')
+        self.assertRange('~1', '>=1.0.0 <2.0.0')
+        self.assertRange('~> 1.2.3', '>=1.2.3 <1.3.0')
+
+    def test_caret(self):
+        self.assertRange('^1.2.3', '>=1.2.3 <2.0.0')
+        self.assertRange('^0.2.3', '>=0.2.3 <0.3.0')
+        self.assertRange('^0.0.3', '>=0.0.3 <0.0.4')
+        self.assertRange('^0.0', '>=0.0.0 <0.1.0')
+        self.assertRange('^1.2', '>=1.2.0 <2.0.0')
+
+    def test_comparators(self):
+        self.assertRange('>=1.2.3', '>=1.2.3', ['1.2.3', '5.0.0'])
+        self.assertRange('>1.2.3', '>1.2.3', ['1.2.4'], ['1.2.3'])
+        self.assertRange('>1.2', '>=1.3.0', ['1.3.0'], ['1.2.9'])
+        self.assertRange('<1.2.3', '<1.2.3', ['1.2.2'], ['1.2.3'])
+        self.assertRange('<=1.2.3', '<=1.2.3', ['1.2.3'], ['1.2.4'])
+        self.assertRange('<=1.2', '<1.3.0', ['1.2.9'], ['1.3.0'])
+        self.assertRange('>= 1.2 < 1.4', '>=1.2.0 <1.4.0')
+
+    def test_hyphen_and_union(self):
+        self.assertRange(
+            '1.2.3 - 2.3', '>=1.2.3 <2.4.0', ['2.3.9'], ['2.4.0'])
+        self.assertRange('1.2.3 - 2.3.4', '>=1.2.3 <=2.3.4', ['2.3.4'])
+        self.assertRange('1.2.3 - *', '>=1.2.3')
+        self.assertRange(
+            '1.x || >=2.5.0', '>=1.0.0 <2.0.0 || >=2.5.0',
+            ['1.0.0', '2.5.0'], ['2.0.0'])
+
+    def test_prerelease(self):
+        self.assertRange(
+            '>=1.0.0-beta <2', '>=1.0.0-beta <2.0.0',
+            ['1.0.0-beta.2', '1.5.0'], ['1.0.0-alpha', '1.5.0-rc'])
+        self.assertRange(
+            '1.0.0-alpha - 1.0.0-rc', '>=1.0.0-alpha <=1.0.0-rc',
+            ['1.0.0-beta'])
+
+    def test_invalid(self):
+        with self.assertRaises(ValueError):
+            parse_range('git://github.com/jquery/jquery.git')
+        with self.assertRaises(ValueError):
+            parse_range('~1.x.3.4')
+
+    def test_intersect(self):
+        self.assertTrue(
+            parse_range('~1.8.3').intersect(parse_range('~3.0.0')).empty)
+        self.assertEqual(str(
+            parse_range('>=1.8').intersect(parse_range('<1.9 || >3'))),
+            '>=1.8.0 <1.9.0 || >=4.0.0')
+        self.assertEqual(str(parse_range('<1 || >2').intersect(
+            parse_range('1.5.0'))), '<empty>')
+        self.assertEqual(
+            Interval(Version(1), Version(1), True, True).intersect(
+                Interval(Version(1), None, False)).empty, True)
+
+    def test_max_satisfying(self):
+        versions = [parse_version(v) for v in ('2.0.0', '2.4.1', '3.0.0')]
+        self.assertEqual(
+            parse_range('2.x').max_satisfying(versions), Version(2, 4, 1))
+        self.assertIsNone(parse_range('^4').max_satisfying(versions))
@@ -0,0 +1,322 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+from os.path import exists
+from os.path import join
+
+from calmjs import cli
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_base_which
+from calmjs.testing.utils import stub_mod_call
+from calmjs.testing.utils import stub_os_environ
+
+from calmjs.bower import Driver
+from calmjs.bower import cache
+from calmjs.bower import native
+from calmjs.bower import shared
+from calmjs.bower.testing.utils import make_package_archive
+
+
+def inode(path):
+    return os.stat(path).st_ino
+
+
+class SharedStoreTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.root = mkdtemp(self)
+        self.store = shared.SharedStore(join(self.root, 'shared'))
+        self.packages = mkdtemp(self)
+        make_package_archive(self.packages, 'jquery', '1.11.3', {
+            'jquery.js': '// jquery', 'dist/jquery.min.js': '//'})
+        self.package = native.LocalStore(self.packages).packages(
+            'jquery')[native.parse_version('1.11.3')]
+
+    def test_get_shared_store(self):
+        stub_os_environ(self)
+        os.environ.pop(cache.SHARED_STORE_ENV, None)
+        self.assertIsNone(cache.get_shared_store())
+        os.environ[cache.SHARED_STORE_ENV] = '/tmp/shared'
+        self.assertEqual(cache.get_shared_store(), '/tmp/shared')
+
+    def test_link_mode(self):
+        with self.assertRaises(ValueError):
+            shared.SharedStore(self.root, link_mode='symlink')
+
+    def test_add_package_link_tree(self):
+        self.assertFalse(self.store.has_tree('jquery', '1.11.3'))
+        self.assertFalse(self.store.link_tree('jquery', '1.11.3', 'x'))
+        manifest = self.store.add_package('jquery', '1.11.3', self.package)
+        self.assertEqual(sorted(manifest['files']), [
+            'dist/jquery.min.js', 'jquery.js'])
+        self.assertTrue(self.store.has_tree('jquery', '1.11.3'))
+
+        first = join(self.root, 'first')
+        second = join(self.root, 'second')
+        self.assertTrue(self.store.link_tree('jquery', '1.11.3', first))
+        self.assertTrue(self.store.link_tree('jquery', '1.11.3', second))
+        with open(join(first, 'jquery.js')) as fd:
+            self.assertEqual(fd.read(), '// jquery')
+        self.assertEqual(
+            inode(join(first, 'jquery.js')),
+            inode(join(second, 'jquery.js')),
+        )
+        self.assertEqual(
+            inode(join(first, 'dist', 'jquery.min.js')),
+            inode(self.store.object_path(
+                manifest['files']['dist/jquery.min.js'])),
+        )
+
+    def test_ensure_package(self):
+        self.assertTrue(
+            self.store.ensure_package('jquery', '1.11.3', self.package))
+        self.assertTrue(exists(self.store.lock_path('jquery', '1.11.3')))
+        self.assertFalse(
+            self.store.ensure_package('jquery', '1.11.3', self.package))
+
+    def test_ensure_package_added_while_waiting(self):
+        # as if another process added this while this one waited for
+        # the lock.
+        results = iter([False, True])
+        self.store.has_tree = lambda name, version: next(results)
+        self.store.add_package = None
+        self.assertFalse(
+            self.store.ensure_package('jquery', '1.11.3', self.package))
+
+    def test_identical_files_deduplicated(self):
+        source = join(self.root, 'source')
+        os.makedirs(source)
+        for name in ('a.js', 'b.js'):
+            with open(join(source, name), 'w') as fd:
+                fd.write('same')
+        manifest = self.store.add_directory('pkg', '1.0.0', source)
+        self.assertEqual(
+            manifest['files']['a.js'], manifest['files']['b.js'])
+
+    def test_copy_mode(self):
+        store = shared.SharedStore(self.store.root, link_mode=shared.COPY)
+        manifest = store.add_package('jquery', '1.11.3', self.package)
+        target = join(self.root, 'target')
+        store.link_tree('jquery', '1.11.3', target)
+        self.assertNotEqual(
+            inode(join(target, 'jquery.js')),
+            inode(store.object_path(manifest['files']['jquery.js'])),
+        )
+
+    def test_reflink_fallback(self):
+        # reflinks are typically unsupported by the filesystems used
+        # for temporary directories, so a copy must be made.
+        store = shared.SharedStore(self.store.root, link_mode=shared.REFLINK)
+        store.add_package('jquery', '1.11.3', self.package)
+        target = join(self.root, 'target')
+        store.link_tree('jquery', '1.11.3', target)
+        with open(join(target, 'jquery.js')) as fd:
+            self.assertEqual(fd.read(), '// jquery')
+
+    def test_relink_components(self):
+        components = join(self.root, 'bower_components')
+        for name, meta in (
+                ('jquery', {'_release': '1.11.3'}),
+                ('forked', {
+                    '_release': '1.0.0',
+                    '_source': 'https://example.com/forked.git',
+                    '_resolution': {'type': 'version', 'commit': 'abc123'},
+                    '_originalSource': 'https://example.com/forked.git'}),
+                ('unresolved', {
+                    '_release': '1.0.0',
+                    '_originalSource': 'https://example.com/unresolved.git'}),
+                ('unversioned', {}),
+                ('broken', None)):
+            os.makedirs(join(components, name))
+            with open(join(components, name, 'index.js'), 'w') as fd:
+                fd.write(name)
+            if meta is not None:
+                with open(join(components, name, '.bower.json'), 'w') as fd:
+                    json.dump(meta, fd)
+
+        self.assertEqual(
+            self.store.relink_components(components), ['forked', 'jquery'])
+        self.assertTrue(self.store.has_tree('jquery', '1.11.3'))
+        self.assertFalse(self.store.has_tree('forked', '1.0.0'))
+        self.assertTrue(self.store.has_tree(*shared.tree_key('forked', {
+            '_release': '1.0.0',
+            '_source': 'https://example.com/forked.git',
+            '_resolution': {'commit': 'abc123'},
+            '_originalSource': 'https://example.com/forked.git',
+        })))
+        self.assertEqual(
+            sorted(self.store.get_tree('jquery', '1.11.3')['files']),
+            ['index.js'])
+        # metadata retained
+        self.assertTrue(exists(join(components, 'jquery', '.bower.json')))
+        self.assertEqual(os.stat(
+            join(components, 'jquery', 'index.js')).st_nlink, 2)
+        for name in ('unresolved', 'unversioned'):
+            self.assertEqual(os.stat(
+                join(components, name, 'index.js')).st_nlink, 1)
+        self.assertEqual(
+            self.store.relink_components(join(self.root, 'missing')), [])
+
+    def test_tree_key(self):
+        self.assertEqual(shared.tree_key('jquery', {
+            '_release': '1.8.3'}), ('jquery', '1.8.3'))
+        self.assertEqual(shared.tree_key('jq', {
+            '_release': '1.8.3', '_originalSource': 'jquery'}),
+            ('jquery', '1.8.3'))
+        self.assertIsNone(shared.tree_key('jquery', {}))
+        fork = {
+            '_release': '1.8.3',
+            '_source': 'https://github.com/fork/jquery.git',
+            '_resolution': {'type': 'version', 'tag': '1.8.3'},
+            '_originalSource': 'https://github.com/fork/jquery.git',
+        }
+        name, version = shared.tree_key('jquery', fork)
+        self.assertEqual(name, 'jquery')
+        self.assertTrue(version.startswith('1.8.3+'))
+        fork['_resolution'] = {'type': 'version', 'commit': 'abc123'}
+        self.assertNotEqual(shared.tree_key('jquery', fork)[1], version)
+        self.assertIsNone(shared.tree_key('jquery', {
+            '_release': '1.8.3', '_originalSource': 'fork/jquery'}))
+
+    def test_relink_components_fork_and_registry(self):
+        def install(project, contents, meta):
+            target = join(project, 'bower_components', 'jquery')
+            os.makedirs(target)
+            with open(join(target, 'jquery.js'), 'w') as fd:
+                fd.write(contents)
+            with open(join(target, '.bower.json'), 'w') as fd:
+                json.dump(meta, fd)
+            return join(project, 'bower_components')
+
+        registry = install(mkdtemp(self), '// registry', {
+            '_release': '1.8.3',
+            '_source': 'https://github.com/jquery/jquery.git',
+            '_resolution': {'type': 'version', 'tag': '1.8.3'},
+            '_originalSource': 'jquery',
+        })
+        fork_meta = {
+            '_release': '1.8.3',
+            '_source': 'https://github.com/fork/jquery.git',
+            '_resolution': {'type': 'version', 'tag': '1.8.3'},
+            '_originalSource': 'https://github.com/fork/jquery.git#1.8.3',
+        }
+        forks = [
+            install(mkdtemp(self), '// fork', fork_meta) for i in range(2)]
+
+        for components in [registry] + forks:
+            self.assertEqual(
+                self.store.relink_components(components), ['jquery'])
+
+        def read(components):
+            with open(join(components, 'jquery', 'jquery.js')) as fd:
+                return fd.read()
+
+        self.assertEqual(read(registry), '// registry')
+        self.assertEqual(read(forks[0]), '// fork')
+        self.assertEqual(read(forks[1]), '// fork')
+        # the forks share their files, which are distinct from the
+        # registry package.
+        self.assertEqual(
+            inode(join(forks[0], 'jquery', 'jquery.js')),
+            inode(join(forks[1], 'jquery', 'jquery.js')),
+        )
+        self.assertNotEqual(
+            inode(join(registry, 'jquery', 'jquery.js')),
+            inode(join(forks[0], 'jquery', 'jquery.js')),
+        )
+
+    def test_relink_directory_failure(self):
+        components = join(self.root, 'bower_components')
+        target = join(components, 'jquery')
+        os.makedirs(target)
+        with open(join(target, 'jquery.js'), 'w') as fd:
+            fd.write('// jquery')
+
+        def fail(*a, **kw):
+            raise OSError('no space left on device')
+
+        self.store.add_directory('jquery', '1.8.3', target)
+        self.store._place = fail
+        with self.assertRaises(OSError):
+            self.store.relink_directory('jquery', '1.8.3', target)
+        self.assertEqual(os.listdir(components), ['jquery'])
+        with open(join(target, 'jquery.js')) as fd:
+            self.assertEqual(fd.read(), '// jquery')
+
+    def test_add_package_excludes_metadata(self):
+        make_package_archive(self.packages, 'meta', '1.0.0', {
+            'meta.js': '// meta', '.bower.json': '{}'})
+        package = native.LocalStore(self.packages).packages(
+            'meta')[native.parse_version('1.0.0')]
+        manifest = self.store.add_package('meta', '1.0.0', package)
+        self.assertEqual(sorted(manifest['files']), ['meta.js'])
+
+    def test_relink_components_empty_package(self):
+        components = join(self.root, 'bower_components')
+        os.makedirs(join(components, 'empty'))
+        with open(join(components, 'empty', '.bower.json'), 'w') as fd:
+            json.dump({'_release': '1.0.0'}, fd)
+
+        self.assertEqual(self.store.relink_components(components), ['empty'])
+        self.assertEqual(
+            self.store.get_tree('empty', '1.0.0')['files'], {})
+        self.assertEqual(
+            os.listdir(join(components, 'empty')), ['.bower.json'])
+        self.assertEqual(os.listdir(components), ['empty'])
+
+
+class SharedInstallTestCase(unittest.TestCase):
+
+    def setUp(self):
+        stub_mod_call(self, cli)
+        stub_base_which(self, 'bower')
+        self.packages = mkdtemp(self)
+        make_package_archive(self.packages, 'jquery', '1.11.3', {
+            'jquery.js': '// jquery 1.11.3'})
+        self.shared_root = mkdtemp(self)
+
+    def make_project(self):
+        tmpdir = mkdtemp(self)
+        with open(join(tmpdir, 'bower.json'), 'w') as fd:
+            json.dump({'dependencies': {'jquery': '~1.11.0'}}, fd)
+        return tmpdir
+
+    def test_native_install_shared(self):
+        projects = [self.make_project(), self.make_project()]
+        for project in projects:
+            driver = Driver(
+                working_dir=project, package_store=self.packages,
+                shared_store=self.shared_root,
+            )
+            driver.pkg_manager_install()
+        self.assertIsNone(self.call_args)
+        targets = [
+            join(p, 'bower_components', 'jquery', 'jquery.js')
+            for p in projects
+        ]
+        self.assertEqual(inode(targets[0]), inode(targets[1]))
+        with open(join(
+                projects[0], 'bower_components', 'jquery',
+                '.bower.json')) as fd:
+            self.assertEqual(json.load(fd)['_release'], '1.11.3')
+
+    def test_subprocess_install_shared(self):
+        project = self.make_project()
+        installed = join(project, 'bower_components', 'jquery')
+        os.makedirs(installed)
+        with open(join(installed, 'jquery.js'), 'w') as fd:
+            fd.write('// jquery')
+        with open(join(installed, '.bower.json'), 'w') as fd:
+            json.dump({'_release': '1.11.3'}, fd)
+
+        driver = Driver(working_dir=project, package_store='')
+        driver.pkg_manager_install(shared_store=self.shared_root)
+        self.assertEqual(self.call_args[0], (['bower', 'install'],))
+        self.assertEqual(os.stat(join(installed, 'jquery.js')).st_nlink, 2)
+
+    def test_shared_store_environ(self):
+        stub_os_environ(self)
+        os.environ[cache.SHARED_STORE_ENV] = self.shared_root
+        self.assertEqual(Driver().shared_store, self.shared_root)
+        self.assertIsNone(Driver(shared_store='').shared_store)
@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+from os.path import join
+
+from pkg_resources import WorkingSet
+
+from calmjs import cli
+from calmjs import dist
+
+from calmjs.testing import mocks
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_base_which
+from calmjs.testing.utils import stub_item_attr_value
+from calmjs.testing.utils import stub_mod_call
+
+from calmjs.bower import Driver
+from calmjs.bower import timings
+
+
+class TimingsTestCase(unittest.TestCase):
+
+    def test_spans(self):
+        completed = []
+        t = timings.Timings(callback=completed.append)
+        with t.span('outer', files=1) as outer:
+            with t.span('inner'):
+                pass
+            outer['dists'] = 2
+        self.assertEqual([s['name'] for s in completed], ['inner', 'outer'])
+        spans = t.to_json()['spans']
+        self.assertEqual([s['name'] for s in spans], ['outer', 'inner'])
+        self.assertEqual(spans[0]['depth'], 0)
+        self.assertEqual(spans[0]['files'], 1)
+        self.assertEqual(spans[0]['dists'], 2)
+        self.assertEqual(spans[1]['depth'], 1)
+        self.assertGreaterEqual(spans[0]['duration'], spans[1]['duration'])
+
+        stream = mocks.StringIO()
+        t.emit(stream)
+        self.assertEqual(json.loads(stream.getvalue()), t.to_json())
+
+    def test_span_on_error(self):
+        t = timings.Timings()
+        with self.assertRaises(ValueError):
+            with t.span('failing'):
+                raise ValueError('failed')
+        self.assertEqual(t.spans[0]['name'], 'failing')
+
+    def test_child_cpu_time(self):
+        self.assertIsInstance(timings.child_cpu_time(), float)
+
+
+class DriverTimingsTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('requires.txt', ''),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.11.0'},
+            })),
+        ), 'lib', '1.0.0')
+        make_dummy_dist(self, (
+            ('requires.txt', 'lib'),
+        ), 'app', '1.0.0')
+        stub_item_attr_value(self, dist, 'default_working_set', WorkingSet(
+            [self._calmjs_testing_tmpdir]))
+        self.tmpdir = mkdtemp(self)
+
+    def test_hook(self):
+        spans = timings.Timings()
+        driver = Driver(
+            working_dir=self.tmpdir, cache_dir='', timings=spans)
+        driver.pkg_manager_view('app')
+        self.assertEqual([
+            (s['name'], s['depth']) for s in spans.to_json()['spans']], [
+            ('view', 0), ('resolve_dists', 1), ('flatten', 1),
+            ('read_metadata', 2), ('merge', 2)])
+        by_name = {s['name']: s for s in spans.spans}
+        self.assertEqual(by_name['resolve_dists']['dists'], 2)
+        self.assertEqual(by_name['read_metadata']['files'], 1)
+        self.assertEqual(by_name['merge']['conflicts'], 0)
+
+    def test_cached_flatten(self):
+        spans = timings.Timings()
+        driver = Driver(
+            working_dir=self.tmpdir, cache_dir=mkdtemp(self), timings=spans)
+        driver.pkg_manager_view('app')
+        driver.pkg_manager_view('app')
+        flattens = [s for s in spans.spans if s['name'] == 'flatten']
+        self.assertEqual([s['cached'] for s in flattens], [False, True])
+        self.assertEqual(len([
+            s for s in spans.spans if s['name'] == 'read_metadata']), 1)
+
+    def test_install_emitted(self):
+        stub_mod_call(self, cli)
+        stub_base_which(self, 'bower')
+        driver = Driver(working_dir=self.tmpdir, cache_dir='')
+        driver.timings_stream = mocks.StringIO()
+        driver.pkg_manager_install('app', timings=True)
+        self.assertIsNone(driver.timings)
+        spans = json.loads(driver.timings_stream.getvalue())['spans']
+        names = [s['name'] for s in spans]
+        self.assertEqual(names[:3], ['install', 'init', 'view'])
+        subprocess = spans[names.index('subprocess')]
+        self.assertEqual(subprocess['cmd'], ['bower', 'install'])
+        self.assertIn('cpu', subprocess)
+        self.assertIn('returncode', subprocess)
+        with open(join(self.tmpdir, 'bower.json')) as fd:
+            self.assertEqual(json.load(fd)['name'], 'app')
+
+    def test_disabled(self):
+        driver = Driver(working_dir=self.tmpdir, cache_dir='')
+        driver.timings_stream = mocks.StringIO()
+        driver.pkg_manager_view('app', timings=False)
+        self.assertEqual(driver.timings_stream.getvalue(), '')
@@ -0,0 +1,23 @@
+# -*- coding: utf-8 -*-
+import unittest
+
+from calmjs.bower.utils import lazy_class_attribute
+
+
+class LazyClassAttributeTestCase(unittest.TestCase):
+
+    def test_lazy_class_attribute(self):
+        calls = []
+
+        def factory(cls):
+            calls.append(cls)
+            return 'value'
+
+        class Thing(object):
+            attr = lazy_class_attribute('attr', factory)
+
+        self.assertEqual(calls, [])
+        self.assertEqual(Thing.attr, 'value')
+        self.assertEqual(Thing().attr, 'value')
+        self.assertEqual(calls, [Thing])
+        self.assertEqual(vars(Thing)['attr'], 'value')
@@ -0,0 +1,146 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+from os.path import exists
+from os.path import join
+
+from calmjs import cli
+from calmjs.utils import pretty_logging
+from calmjs.testing import mocks
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_base_which
+from calmjs.testing.utils import stub_item_attr_value
+from calmjs.testing.utils import stub_mod_call
+
+from calmjs.bower import Driver
+from calmjs.bower import verify
+from calmjs.bower.shared import file_digest
+from calmjs.bower.testing.utils import make_package_archive
+from calmjs.bower.tests.test_prune import COMPONENTS
+from calmjs.bower.tests.test_prune import make_files
+
+
+class VerifyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.components_dir = mkdtemp(self)
+        make_files(self.components_dir, COMPONENTS)
+
+    def test_mmap_digest(self):
+        path = join(self.components_dir, 'jquery', 'src', 'core.js')
+        self.assertEqual(verify.mmap_digest(path), file_digest(path))
+        empty = join(self.components_dir, 'empty')
+        open(empty, 'w').close()
+        self.assertEqual(verify.mmap_digest(empty), file_digest(empty))
+
+    def test_digest_files(self):
+        files = verify.scan_files(self.components_dir)
+        self.assertEqual(files, sorted(COMPONENTS))
+        threaded = verify.digest_files(self.components_dir, files, jobs=4)
+        self.assertEqual(
+            threaded, verify.digest_files(self.components_dir, files, jobs=1))
+        self.assertEqual(threaded['jquery/src/core.js'], file_digest(
+            join(self.components_dir, 'jquery', 'src', 'core.js')))
+
+    def test_manifest_roundtrip(self):
+        manifest = verify.make_manifest(self.components_dir)
+        path = join(self.components_dir, verify.FILES_MANIFEST)
+        verify.write_manifest(path, manifest)
+        self.assertEqual(verify.read_manifest(path), manifest)
+        self.assertEqual(manifest['files']['jquery/src/core.js'][0], len(
+            'jquery/src/core.js'))
+        # the manifest itself is never included.
+        self.assertEqual(
+            sorted(verify.make_manifest(self.components_dir)['files']),
+            sorted(COMPONENTS))
+
+    def test_read_manifest_bad(self):
+        path = join(self.components_dir, 'manifest.json')
+        with self.assertRaises(verify.ManifestError):
+            verify.read_manifest(path)
+        with open(path, 'w') as fd:
+            json.dump({'files': {}}, fd)
+        with self.assertRaises(verify.ManifestError):
+            verify.read_manifest(path)
+
+    def test_verify_manifest(self):
+        manifest = verify.make_manifest(self.components_dir)
+        self.assertEqual(
+            verify.verify_manifest(self.components_dir, manifest),
+            {'missing': [], 'extra': [], 'modified': []},
+        )
+        os.remove(join(self.components_dir, 'jquery', 'test', 'unit.js'))
+        make_files(self.components_dir, ['jquery/extra.js'])
+        # same size, different contents.
+        with open(join(self.components_dir, 'jquery', 'src', 'core.js'),
+                  'w') as fd:
+            fd.write('jquery/src/CORE.js')
+        with open(join(self.components_dir, 'bootstrap', 'docs',
+                       'index.html'), 'w') as fd:
+            fd.write('')
+        self.assertEqual(
+            verify.verify_manifest(self.components_dir, manifest), {
+                'missing': ['jquery/test/unit.js'],
+                'extra': ['jquery/extra.js'],
+                'modified': [
+                    'bootstrap/docs/index.html', 'jquery/src/core.js'],
+            },
+        )
+
+    def test_verify_manifest_unreadable(self):
+        manifest = verify.make_manifest(self.components_dir)
+        target = join(self.components_dir, 'jquery', 'test', 'unit.js')
+        os.remove(target)
+        os.symlink(join(self.components_dir, 'nowhere'), target)
+        core = join(self.components_dir, 'jquery', 'src', 'core.js')
+
+        def mmap_digest(path):
+            if path == core:
+                raise IOError('permission denied')
+            return file_digest(path)
+
+        stub_item_attr_value(self, verify, 'mmap_digest', mmap_digest)
+        with pretty_logging(
+                logger='calmjs.bower', stream=mocks.StringIO()) as s:
+            report = verify.verify_manifest(
+                self.components_dir, manifest, jobs=4)
+        self.assertEqual(report, {
+            'missing': ['jquery/test/unit.js'],
+            'extra': [],
+            'modified': ['jquery/src/core.js'],
+        })
+        self.assertIn(
+            "unable to read 'jquery/src/core.js'", s.getvalue())
+        with self.assertRaises(IOError):
+            verify.digest_files(self.components_dir, ['jquery/src/core.js'])
+
+
+class DriverVerifyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        stub_mod_call(self, cli)
+        stub_base_which(self, 'bower')
+        self.project = mkdtemp(self)
+        self.store = mkdtemp(self)
+        make_package_archive(self.store, 'jquery', '1.11.3', {
+            'jquery.js': '// jquery', 'src/core.js': '// core'})
+        with open(join(self.project, 'bower.json'), 'w') as fd:
+            json.dump({'dependencies': {'jquery': '~1.11.0'}}, fd)
+        self.driver = Driver(
+            working_dir=self.project, package_store=self.store, cache_dir='')
+        self.components_dir = join(self.project, 'bower_components')
+
+    def test_install_record_verify(self):
+        self.assertTrue(self.driver.pkg_manager_install(
+            record=True, incremental=True))
+        self.assertTrue(exists(
+            join(self.components_dir, verify.FILES_MANIFEST)))
+        self.assertTrue(self.driver.pkg_manager_verify())
+
+        os.remove(join(self.components_dir, 'jquery', 'src', 'core.js'))
+        self.assertFalse(self.driver.pkg_manager_verify())
+
+    def test_verify_no_manifest(self):
+        self.assertTrue(self.driver.pkg_manager_install())
+        self.assertFalse(self.driver.pkg_manager_verify())
@@ -0,0 +1,95 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import sys
+
+from pkg_resources import WorkingSet
+
+from calmjs import dist
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_item_attr_value
+from calmjs.testing.utils import stub_stdouts
+
+from calmjs.bower import Driver
+from calmjs.bower import why
+
+
+class WhyTestCase(unittest.TestCase):
+
+    def setUp(self):
+        make_dummy_dist(self, (
+            ('requires.txt', ''),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.8.3', 'underscore': '~1.8.0'},
+            })),
+        ), 'example.lib', '1.0')
+        make_dummy_dist(self, (
+            ('requires.txt', 'example.lib'),
+        ), 'example.middle', '1.0')
+        make_dummy_dist(self, (
+            ('requires.txt', 'example.middle'),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '1.8', 'underscore': None},
+            })),
+        ), 'example.app', '2.0')
+        self.working_set = WorkingSet([self._calmjs_testing_tmpdir])
+        stub_item_attr_value(
+            self, dist, 'default_working_set', self.working_set)
+
+    def test_requirement_chains(self):
+        dists = dist.find_packages_requirements_dists(['example.app'])
+        self.assertEqual(why.requirement_chains(dists, ['example.app']), {
+            'example.app': ['example.app'],
+            'example.middle': ['example.app', 'example.middle'],
+            'example.lib': ['example.app', 'example.middle', 'example.lib'],
+        })
+
+    def test_driver_why(self):
+        driver = Driver(cache_dir='')
+        result = driver.pkg_manager_why('jquery', ['example.app'])
+        self.assertEqual(result['flattened'], {
+            'dependencies': '>=1.8.3 <1.9.0'})
+        self.assertEqual(result['declarations'], [{
+            'key': 'dependencies',
+            'spec': '~1.8.3',
+            'project_name': 'example.lib',
+            'version': '1.0',
+            'chain': ['example.app', 'example.middle', 'example.lib'],
+        }, {
+            'key': 'dependencies',
+            'spec': '1.8',
+            'project_name': 'example.app',
+            'version': '2.0',
+            'chain': ['example.app'],
+        }])
+
+        # removed by the child.
+        result = driver.pkg_manager_why('underscore', ['example.app'])
+        self.assertEqual(result['flattened'], {})
+        self.assertEqual(
+            [d['spec'] for d in result['declarations']], ['~1.8.0', None])
+
+        self.assertIsNone(driver.pkg_manager_why('missing', ['example.app']))
+
+    def test_driver_why_cached(self):
+        cache_dir = mkdtemp(self)
+        driver = Driver(cache_dir=cache_dir)
+        index = driver.build_why_index(['example.app'])
+        # served from the instance.
+        self.assertIs(driver.build_why_index(['example.app']), index)
+
+        # a new instance is served from the persistent cache.
+        driver = Driver(cache_dir=cache_dir)
+        stub_item_attr_value(self, why, 'merge_dists', None)
+        stub_item_attr_value(self, why, 'build_index', None)
+        self.assertEqual(driver.build_why_index(['example.app']), index)
+
+    def test_driver_why_stream(self):
+        stub_stdouts(self)
+        driver = Driver(cache_dir='')
+        driver.pkg_manager_why('jquery', 'example.lib', stream=sys.stdout)
+        result = json.loads(sys.stdout.getvalue())
+        self.assertEqual(result['name'], 'jquery')
+        self.assertEqual(
+            result['declarations'][0]['chain'], ['example.lib'])
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import os
+from os.path import exists
+from os.path import join
+
+from setuptools.dist import Distribution
+
+from calmjs.testing.utils import mkdtemp
+
+from calmjs.bower import writers
+
+
+class FakeCmd(object):
+
+    def __init__(self, **attrs):
+        self.distribution = Distribution()
+        for key, value in attrs.items():
+            setattr(self.distribution, key, value)
+        self.written = []
+
+    def write_file(self, what, filename, data):
+        self.written.append(what)
+        with open(filename, 'wb') as fd:
+            fd.write(data.encode('utf8'))
+
+    def delete_file(self, filename):
+        os.unlink(filename)
+
+
+class WritersTestCase(unittest.TestCase):
+
+    def test_canonical_json(self):
+        value = {'dependencies': {'b': '1', 'a': '2'}}
+        self.assertEqual(
+            writers.canonical_json(value),
+            writers.canonical_json(json.dumps(value, indent=1)),
+        )
+        self.assertEqual(writers.canonical_json('not json'), 'not json')
+
+    def test_bower_digest(self):
+        value = {'dependencies': {'b': '1', 'a': '2'}}
+        digest = writers.bower_digest(value, {'a': 'a/a.js'})
+        self.assertEqual(
+            digest, writers.bower_digest(json.dumps(value), {'a': 'a/a.js'}))
+        self.assertNotEqual(digest, writers.bower_digest(value, None))
+
+    def test_write_bower_json(self):
+        target = join(mkdtemp(self), 'bower.json')
+        cmd = FakeCmd(bower_json={'dependencies': {'jquery': '~3.0.0'}})
+        writers.write_bower_json(cmd, 'bower.json', target)
+        writers.write_bower_json(cmd, 'bower.json', target)
+        self.assertEqual(cmd.written, ['bower_json'])
+        with open(target) as fd:
+            self.assertEqual(json.load(fd), cmd.distribution.bower_json)
+
+        cmd.distribution.bower_json = {'dependencies': {'jquery': '~3.1.0'}}
+        writers.write_bower_json(cmd, 'bower.json', target)
+        self.assertEqual(cmd.written, ['bower_json', 'bower_json'])
+
+        # an empty mapping is written, as with the writer from calmjs.
+        cmd.distribution.bower_json = {}
+        writers.write_bower_json(cmd, 'bower.json', target)
+        with open(target) as fd:
+            self.assertEqual(json.load(fd), {})
+
+        cmd.distribution.bower_json = ''
+        writers.write_bower_json(cmd, 'bower.json', target)
+        self.assertFalse(exists(target))
+
+        cmd.distribution.bower_json = {}
+        writers.write_bower_json(cmd, 'bower.json', target)
+        cmd.distribution.bower_json = None
+        writers.write_bower_json(cmd, 'bower.json', target)
+        self.assertFalse(exists(target))
+
+    def test_write_bower_digest(self):
+        target = join(mkdtemp(self), 'bower_digest.txt')
+        cmd = FakeCmd(extras_calmjs={'bower_components': {'a': 'a/a.js'}})
+        writers.write_bower_digest(cmd, 'bower_digest.txt', target)
+        with open(target) as fd:
+            self.assertEqual(fd.read(), writers.bower_digest(
+                None, {'a': 'a/a.js'}) + '\n')
+        writers.write_bower_digest(cmd, 'bower_digest.txt', target)
+        self.assertEqual(cmd.written, ['bower_digest'])
+
+        # unrelated extras are not included.
+        cmd.distribution.extras_calmjs = {'something_else': {}}
+        writers.write_bower_digest(cmd, 'bower_digest.txt', target)
+        self.assertFalse(exists(target))
+
+        cmd.distribution.bower_json = {}
+        writers.write_bower_digest(cmd, 'bower_digest.txt', target)
+        with open(target) as fd:
+            self.assertEqual(fd.read(), writers.bower_digest({}, None) + '\n')
@@ -0,0 +1,189 @@
+# -*- coding: utf-8 -*-
+import unittest
+import json
+import zipfile
+import zipimport
+from os.path import join
+
+from pkg_resources import Distribution
+from pkg_resources import EggMetadata
+from pkg_resources import Requirement
+from pkg_resources import WorkingSet
+
+from calmjs import dist
+from calmjs.testing.utils import make_dummy_dist
+from calmjs.testing.utils import mkdtemp
+from calmjs.testing.utils import stub_item_attr_value
+
+from calmjs.bower import Driver
+from calmjs.bower import zipped
+from calmjs.bower.batch import MetadataIndex
+from calmjs.bower.testing.utils import make_zipped_egg
+
+
+def fail(*a, **kw):
+    raise AssertionError('zipped metadata should not be read by calmjs')
+
+
+class ArchiveCacheTestCase(unittest.TestCase):
+
+    def setUp(self):
+        self.tmpdir = mkdtemp(self)
+        self.cache = zipped.ArchiveCache(max_open=2)
+        self.addCleanup(self.cache.clear)
+
+    def make_archive(self, name, files, compression=zipfile.ZIP_STORED):
+        path = join(self.tmpdir, name)
+        with zipfile.ZipFile(path, 'w', compression) as archive:
+            for filename, contents in files:
+                archive.writestr(filename, contents)
+        return path
+
+    def test_read(self):
+        path = self.make_archive('a.zip', [('a/1', '1'), ('a/2', '22')])
+        self.assertEqual(self.cache.read(path, 'a/1'), b'1')
+        self.assertEqual(self.cache.read(path, 'a/2'), b'22')
+        self.assertIsNone(self.cache.read(path, 'a/3'))
+        self.assertEqual(self.cache.opened, 1)
+
+    def test_read_deflated(self):
+        path = self.make_archive(
+            'a.zip', [('a/1', '1' * 1000)], zipfile.ZIP_DEFLATED)
+        self.assertEqual(self.cache.read(path, 'a/1'), b'1' * 1000)
+
+    def test_read_corrupted(self):
+        path = self.make_archive('a.zip', [('a/1', 'content')])
+        with open(path, 'rb') as fd:
+            data = fd.read()
+        with open(path, 'wb') as fd:
+            fd.write(data.replace(b'content', b'CONTENT', 1))
+        with self.assertRaises(zipfile.BadZipfile):
+            self.cache.read(path, 'a/1')
+
+    def test_reopen_modified(self):
+        path = self.make_archive('a.zip', [('a/1', '1')])
+        self.assertEqual(self.cache.read(path, 'a/1'), b'1')
+        self.make_archive('a.zip', [('a/1', '11')])
+        self.assertEqual(self.cache.read(path, 'a/1'), b'11')
+        self.assertEqual(self.cache.opened, 2)
+
+    def test_max_open(self):
+        paths = [self.make_archive('%d.zip' % i, [('f', str(i))])
+                 for i in range(3)]
+        for path in paths:
+            self.cache.read(path, 'f')
+        self.assertEqual(list(self.cache._archives), paths[1:])
+        self.assertEqual(self.cache.read(paths[0], 'f'), b'0')
+        self.assertEqual(self.cache.opened, 4)
+
+    def test_invalid(self):
+        path = join(self.tmpdir, 'bad.zip')
+        with self.assertRaises(IOError):
+            self.cache.read(path, 'f')
+        with open(path, 'wb') as fd:
+            fd.write(b'not a zip')
+        with self.assertRaises(zipfile.BadZipfile):
+            self.cache.read(path, 'f')
+        with open(path, 'wb'):
+            pass
+        with self.assertRaises(ValueError):
+            self.cache.read(path, 'f')
+
+
+class ZippedMetadataTestCase(unittest.TestCase):
+
+    def setUp(self):
+        tmpdir = mkdtemp(self)
+        self.lib = make_zipped_egg(tmpdir, 'lib', '1.0.0', (
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.8.0'},
+            })),
+            ('extras_calmjs.json', json.dumps({
+                'bower_components': {'jquery': 'jquery/jquery.js'},
+            })),
+        ))
+        self.app = make_zipped_egg(tmpdir, 'app', '1.0.0', (
+            ('requires.txt', 'lib'),
+            ('bower.json', json.dumps({
+                'dependencies': {'jquery': '~1.8.3', 'underscore': '~1.8.0'},
+            })),
+        ))
+        self.bad = make_zipped_egg(tmpdir, 'bad', '1.0.0', (
+            ('bower.json', '{'),
+        ))
+        self.working_set = WorkingSet([self.lib, self.app, self.bad])
+        stub_item_attr_value(self, dist, 'default_working_set',
+                             self.working_set)
+        self.cache = zipped.ArchiveCache()
+        stub_item_attr_value(self, zipped, 'archives', self.cache)
+        self.addCleanup(self.cache.clear)
+
+    def get_dist(self, name):
+        return self.working_set.find(Requirement.parse(name))
+
+    def test_zipped_metadata_path(self):
+        self.assertEqual(zipped.zipped_metadata_path(
+            self.get_dist('lib'), 'bower.json'),
+            (self.lib, 'EGG-INFO/bower.json'))
+        dummy = make_dummy_dist(self, (), 'dummy', '1.0')
+        self.assertIsNone(zipped.zipped_metadata_path(dummy, 'bower.json'))
+        self.assertIsNone(zipped.zipped_metadata_path(object(), 'bower.json'))
+
+    def test_read_dist_egginfo_json(self):
+        stub_item_attr_value(self, dist, 'read_dist_egginfo_json', fail)
+        lib = self.get_dist('lib')
+        self.assertEqual(zipped.read_dist_egginfo_json(lib, 'bower.json'), {
+            'dependencies': {'jquery': '~1.8.0'}})
+        self.assertIsNone(zipped.read_dist_egginfo_json(lib, 'package.json'))
+        self.assertIsNone(zipped.read_dist_egginfo_json(
+            self.get_dist('bad'), 'bower.json'))
+        self.assertEqual(self.cache.opened, 2)
+
+    def test_read_dist_info(self):
+        path = make_zipped_egg(mkdtemp(self), 'whl', '1.0', (
+            ('bower.json', '{"name": "whl"}'),
+        ), info='whl-1.0.dist-info')
+        # as produced by pkg_resources for the metadata in a zip.
+        metadata = EggMetadata(zipimport.zipimporter(path))
+        metadata.egg_info = join(path, 'whl-1.0.dist-info')
+        whl = Distribution.from_location(path, 'whl-1.0.dist-info', metadata)
+        stub_item_attr_value(self, dist, 'read_dist_egginfo_json', fail)
+        self.assertEqual(zipped.read_dist_egginfo_json(whl, 'bower.json'), {
+            'name': 'whl'})
+
+    def test_read_fallback(self):
+        def read(path, name):
+            raise IOError('unreadable')
+
+        lib = self.get_dist('lib')
+        broken = zipped.ArchiveCache()
+        stub_item_attr_value(self, broken, 'read', read)
+        # read through pkg_resources instead.
+        self.assertEqual(zipped.read_dist_egginfo_json(
+            lib, 'bower.json', cache=broken), {
+                'dependencies': {'jquery': '~1.8.0'}})
+
+    def test_driver_view(self):
+        stub_item_attr_value(self, dist, 'read_dist_egginfo_json', fail)
+        driver = Driver(cache_dir='')
+        result = driver.pkg_manager_view('app')
+        self.assertEqual(result['dependencies'], {
+            'jquery': '~1.8.3', 'underscore': '~1.8.0'})
+        driver.pkg_manager_view('app')
+        # every archive opened only once across the invocations.
+        self.assertEqual(self.cache.opened, 2)
+
+    def test_metadata_index(self):
+        stub_item_attr_value(self, dist, 'read_dist_egginfo_json', fail)
+        driver = Driver(cache_dir='', index=MetadataIndex(self.working_set))
+        self.assertEqual(driver.pkg_manager_view('app')['dependencies'], {
+            'jquery': '~1.8.3', 'underscore': '~1.8.0'})
+
+    def test_flatten_extras_calmjs(self):
+        stub_item_attr_value(self, dist, 'read_dist_egginfo_json', fail)
+        self.assertEqual(
+            zipped.flatten_extras_calmjs(['app'])['bower_components'],
+            {'jquery': 'jquery/jquery.js'})
+        self.assertEqual(
+            zipped.flatten_extras_calmjs(['lib'])['bower_components'],
+            {'jquery': 'jquery/jquery.js'})
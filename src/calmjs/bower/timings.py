@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+"""
+Phase level timings for the bower driver.
+
+A Timings instance records a span for every phase done by the Driver
+(e.g. the resolution of the distributions, the reading of their
+metadata, the merging, the installation), with the duration and other
+attributes such as the number of distributions or files involved.
+"""
+
+from __future__ import absolute_import
+
+import json
+import time
+from contextlib import contextmanager
+from functools import wraps
+
+try:  # pragma: no cover
+    import resource
+except ImportError:  # pragma: no cover
+    # not available on Windows.
+    resource = None
+
+timer = getattr(time, 'perf_counter', time.time)
+
+
+def child_cpu_time():
+    """
+    Return the total user and system CPU time used by the terminated
+    child processes of this process, or None if unavailable.
+    """
+
+    if resource is None:  # pragma: no cover
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return usage.ru_utime + usage.ru_stime
+
+
+@contextmanager
+def null_span():
+    """
+    A span that records nothing.
+    """
+
+    yield {}
+
+
+class Timings(object):
+    """
+    A collection of spans.
+    """
+
+    def __init__(self, callback=None):
+        """
+        Arguments:
+
+        callback
+            An optional callable, which will be called with every span
+            as it completes.
+        """
+
+        self.callback = callback
+        self.spans = []
+        self._depth = 0
+        self._origin = timer()
+
+    @contextmanager
+    def span(self, name, **attrs):
+        """
+        Record the duration of the enclosed block as a span named name.
+        The span is provided as a dict, for the addition of further
+        attributes.
+        """
+
+        record = {'name': name, 'depth': self._depth}
+        record.update(attrs)
+        start = timer()
+        self._depth += 1
+        try:
+            yield record
+        finally:
+            self._depth -= 1
+            record['start'] = round(start - self._origin, 6)
+            record['duration'] = round(timer() - start, 6)
+            self.spans.append(record)
+            if self.callback:
+                self.callback(record)
+
+    def to_json(self):
+        """
+        Return the spans ordered by their starting time.
+        """
+
+        return {'spans': sorted(
+            self.spans, key=lambda span: (span['start'], span['depth']))}
+
+    def emit(self, stream):
+        """
+        Write the spans as a single line of JSON into the stream.
+        """
+
+        json.dump(self.to_json(), stream, sort_keys=True)
+        stream.write('\n')
+
+
+def timed(name):
+    """
+    Decorator for the methods of a Driver, such that the invocation is
+    recorded as a span named name.  The decorated method will accept
+    the timings keyword argument; if True, the timings will be collected
+    and emitted for the invocation, please refer to the Driver method
+    collect_timings for details.
+    """
+
+    def decorator(f):
+        @wraps(f)
+        def wrapper(self, *a, **kw):
+            with self.collect_timings(kw.pop('timings', False)):
+                with self.span(name):
+                    return f(self, *a, **kw)
+        return wrapper
+    return decorator
@@ -0,0 +1,26 @@
+# -*- coding: utf-8 -*-
+"""
+Assortment of utilities for calmjs.bower.
+"""
+
+from __future__ import absolute_import
+
+
+class lazy_class_attribute(object):
+    """
+    A descriptor that produces the value for a class attribute on first
+    access through the factory, which is called with the owner class.
+    The value will then replace this descriptor on the owner class.
+
+    Note that under Python 2, the owner must be a new-style class.
+    """
+
+    def __init__(self, name, factory):
+        self.name = name
+        self.factory = factory
+        self.__doc__ = factory.__doc__
+
+    def __get__(self, inst, owner):
+        value = self.factory(owner)
+        setattr(owner, self.name, value)
+        return value
@@ -0,0 +1,190 @@
+# -*- coding: utf-8 -*-
+"""
+Integrity verification of the installed components directory.
+
+A manifest of the size and the digest of every file installed into the
+components directory may be recorded at installation time, such that
+the tree can later be verified against that, with the files that are
+missing, the ones that are not listed in the manifest and the ones that
+were modified reported.
+
+The files are digested from memory mapped reads by a pool of threads,
+as the hashing releases the GIL for the large buffers involved.
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+import logging
+import mmap
+import os
+from multiprocessing.pool import ThreadPool
+from os.path import join
+from os.path import relpath
+
+from calmjs.bower.cache import replace
+
+logger = logging.getLogger(__name__)
+
+FILES_MANIFEST = '.calmjs-bower-files.json'
+MANIFEST_VERSION = 1
+MISSING = 'missing'
+EXTRA = 'extra'
+MODIFIED = 'modified'
+
+
+class ManifestError(ValueError):
+    """
+    Raised when a manifest is missing or invalid.
+    """
+
+
+def mmap_digest(path):
+    """
+    Return the sha256 hexdigest of the file at path, read through a
+    memory map.
+    """
+
+    h = hashlib.sha256()
+    with open(path, 'rb') as fd:
+        try:
+            mm = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:
+            # empty files cannot be mapped.
+            return h.hexdigest()
+        try:
+            h.update(mm)
+        finally:
+            mm.close()
+    return h.hexdigest()
+
+
+def scan_files(root, exclude=()):
+    """
+    Return the sorted list of the relative paths of the files within
+    root, other than the ones in exclude.
+    """
+
+    results = []
+    for base, dirs, filenames in os.walk(root):
+        for filename in filenames:
+            rel = relpath(join(base, filename), root).replace(os.sep, '/')
+            if rel not in exclude:
+                results.append(rel)
+    return sorted(results)
+
+
+def digest_files(root, files, jobs=None, ignore_errors=False):
+    """
+    Return a dict of the relative paths in files to their digests,
+    digested by up to jobs number of threads (defaults to the number of
+    processors).  If ignore_errors is True, the files that cannot be
+    read are logged and mapped to None instead of raising the error.
+    """
+
+    def digest(rel):
+        try:
+            return rel, mmap_digest(join(root, *rel.split('/')))
+        except (IOError, OSError) as e:
+            if not ignore_errors:
+                raise
+            logger.warning("unable to read '%s' in '%s': %s", rel, root, e)
+            return rel, None
+
+    if len(files) < 2 or jobs == 1:
+        return dict(digest(rel) for rel in files)
+    pool = ThreadPool(jobs)
+    try:
+        return dict(pool.imap_unordered(digest, files, chunksize=16))
+    finally:
+        pool.close()
+        pool.join()
+
+
+def make_manifest(components_dir, exclude=(), jobs=None):
+    """
+    Produce the manifest for the files within the components directory.
+    """
+
+    exclude = set(exclude) | {FILES_MANIFEST}
+    files = scan_files(components_dir, exclude)
+    digests = digest_files(components_dir, files, jobs)
+    return {
+        'manifestVersion': MANIFEST_VERSION,
+        'files': {
+            rel: [os.path.getsize(join(components_dir, *rel.split('/'))),
+                  digests[rel]]
+            for rel in files
+        },
+    }
+
+
+def read_manifest(path):
+    """
+    Read the manifest at path.  Raises ManifestError if it cannot be
+    read or is not a supported manifest.
+    """
+
+    try:
+        with open(path) as fd:
+            manifest = json.load(fd)
+    except (IOError, OSError, ValueError) as e:
+        raise ManifestError("unable to read manifest '%s': %s" % (path, e))
+
+    if not isinstance(manifest, dict) or manifest.get(
+            'manifestVersion') != MANIFEST_VERSION:
+        raise ManifestError("unsupported manifest '%s'" % path)
+    return manifest
+
+
+def write_manifest(path, manifest):
+    """
+    Write the manifest to path.
+    """
+
+    with open(path + '.tmp', 'w') as fd:
+        json.dump(manifest, fd, sort_keys=True)
+    replace(path + '.tmp', path)
+
+
+def verify_manifest(components_dir, manifest, exclude=(), jobs=None):
+    """
+    Verify the files within the components directory against the
+    manifest.  Only the files with the recorded sizes are digested.
+
+    Returns a dict with the sorted lists of the relative paths of the
+    files that are missing, extra and modified; files that cannot be
+    found or read are reported as missing or modified respectively.
+    """
+
+    recorded = manifest['files']
+    exclude = set(exclude) | {FILES_MANIFEST}
+    present = set(scan_files(components_dir, exclude))
+    result = {
+        MISSING: sorted(set(recorded) - present),
+        EXTRA: sorted(present - set(recorded)),
+        MODIFIED: [],
+    }
+
+    candidates = []
+    for rel in sorted(present & set(recorded)):
+        try:
+            size = os.path.getsize(join(components_dir, *rel.split('/')))
+        except (IOError, OSError):
+            # such as a broken symlink.
+            result[MISSING].append(rel)
+            continue
+        if size != recorded[rel][0]:
+            result[MODIFIED].append(rel)
+        else:
+            candidates.append(rel)
+    result[MISSING].sort()
+
+    # the files that cannot be read are reported as modified.
+    digests = digest_files(
+        components_dir, candidates, jobs, ignore_errors=True)
+    result[MODIFIED].extend(
+        rel for rel in candidates if digests[rel] != recorded[rel][1])
+    result[MODIFIED].sort()
+    return result
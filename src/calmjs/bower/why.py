@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+Reverse dependency index for the flattened bower.json.
+
+Maps every bower package declared through the bower.json of the
+distributions required by a set of Python packages to the declarations
+made for it, along with the chains of requirements that lead from the
+specified Python packages to the distributions that declared them, such
+that the reason a given bower package (and version range) ends up in
+the flattened bower.json can be looked up without flattening again.
+"""
+
+from __future__ import absolute_import
+
+import logging
+from collections import deque
+
+from pkg_resources import Requirement
+
+from calmjs.bower.merge import merge_dists
+
+logger = logging.getLogger(__name__)
+
+
+def requirement_chains(dists, pkg_names):
+    """
+    Return a dict of the project names of the distributions to the
+    shortest chain of project names of the distributions through which
+    they are required, starting from one of pkg_names.  The dists are
+    the distributions with their requirements already resolved.
+    """
+
+    by_key = {dist.key: dist for dist in dists}
+    chains = {}
+    queue = deque()
+    for pkg_name in pkg_names:
+        dist = by_key.get(Requirement.parse(pkg_name).key)
+        if dist is not None and dist.project_name not in chains:
+            chains[dist.project_name] = [dist.project_name]
+            queue.append(dist)
+
+    while queue:
+        dist = queue.popleft()
+        try:
+            requires = dist.requires()
+        except Exception as e:  # pragma: no cover
+            logger.debug("unable to read requirements of '%s': %s", dist, e)
+            continue
+        for req in requires:
+            child = by_key.get(req.key)
+            if child is None or child.project_name in chains:
+                continue
+            chains[child.project_name] = (
+                chains[dist.project_name] + [child.project_name])
+            queue.append(child)
+    return chains
+
+
+def build_index(entries, chains, dep_keys, filename='bower.json'):
+    """
+    Build the index from the entries of distributions with their json,
+    as returned by calmjs.bower.merge.read_dists ordered from the
+    parents to the child, and the requirement chains for those.
+
+    Returns a dict of the bower package names to a dict with the list
+    of the declarations, and the flattened spec for every dep_key as
+    it would be generated.  A declaration with a spec of None removes
+    the ones made by the parents.
+    """
+
+    packages = {}
+    for dist, obj in entries:
+        if not obj:
+            continue
+        for key in dep_keys:
+            for name, spec in sorted((obj.get(key) or {}).items()):
+                packages.setdefault(name, {
+                    'declarations': [], 'flattened': {},
+                })['declarations'].append({
+                    'key': key,
+                    'spec': spec,
+                    'project_name': dist.project_name,
+                    'version': dist.version,
+                    'chain': chains.get(
+                        dist.project_name, [dist.project_name]),
+                })
+
+    flattened, conflicts = merge_dists(entries, dep_keys, filename=filename)
+    for key in dep_keys:
+        for name, spec in (flattened.get(key) or {}).items():
+            packages[name]['flattened'][key] = spec
+    return packages
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""
+The egg_info writers for calmjs.bower.
+
+The files are serialized in a canonical form and are only written if
+their contents differ from what is already in the egg-info directory,
+such that the modification times of those files (which the caches and
+the build tools downstream may rely on) are only changed with their
+contents.
+
+Along with ``bower.json``, a digest of the ``bower_json`` and of the
+``bower_components`` extras declared for the package is written into
+``bower_digest.txt``, for the tools that only need to know whether the
+front-end dependencies have changed.
+"""
+
+from __future__ import absolute_import
+
+import hashlib
+import json
+from distutils import log
+from os.path import exists
+
+from calmjs.bower import BOWER_COMPONENTS
+from calmjs.bower import BOWER_FIELD
+
+EXTRAS_FIELD = 'extras_calmjs'
+DIGEST_FIELD = 'bower_digest'
+
+
+def _load(value):
+    if hasattr(value, 'split'):
+        try:
+            return json.loads(value)
+        except ValueError:
+            return value
+    return value
+
+
+def canonical_json(value):
+    """
+    Return the canonical serialization of the value, which may also be
+    a JSON string.  Strings that are not valid JSON are returned as is.
+    """
+
+    value = _load(value)
+    if hasattr(value, 'split'):
+        return value
+    return json.dumps(value, indent=4, sort_keys=True, separators=(',', ': '))
+
+
+def write_if_changed(cmd, what, filename, data):
+    """
+    Write data into filename through the egg_info command cmd, unless
+    the file already has identical contents.  If data is None, the file
+    is deleted if it exists.
+    """
+
+    if data is None:
+        if exists(filename):
+            cmd.delete_file(filename)
+        return
+
+    try:
+        with open(filename, 'rb') as fd:
+            unchanged = fd.read() == data.encode('utf8')
+    except (IOError, OSError):
+        unchanged = False
+
+    if unchanged:
+        log.info("%s unchanged in %s", what, filename)
+    else:
+        cmd.write_file(what, filename, data)
+
+
+def write_bower_json(cmd, basename, filename):
+    """
+    Write the bower_json declared for the distribution; as with the
+    writer provided by calmjs, an empty mapping is written, while the
+    file is deleted if nothing (or an empty string) was declared.
+    """
+
+    value = getattr(cmd.distribution, BOWER_FIELD, None)
+    data = canonical_json(value) if value is not None else None
+    write_if_changed(cmd, BOWER_FIELD, filename, data or None)
+
+
+def bower_digest(bower_json, bower_components):
+    """
+    Return the digest of the bower_json and the bower_components extras.
+    """
+
+    raw = json.dumps(
+        [_load(bower_json), _load(bower_components)],
+        sort_keys=True, separators=(',', ':'),
+    )
+    return 'sha256-' + hashlib.sha256(raw.encode('utf8')).hexdigest()
+
+
+def write_bower_digest(cmd, basename, filename):
+    """
+    Write the digest of the bower_json and the bower_components extras
+    declared for the distribution, if any of those are declared.
+    """
+
+    bower_json = getattr(cmd.distribution, BOWER_FIELD, None)
+    if bower_json == '':
+        bower_json = None
+    extras = _load(getattr(cmd.distribution, EXTRAS_FIELD, None))
+    bower_components = (
+        extras.get(BOWER_COMPONENTS) if isinstance(extras, dict) else None)
+    write_if_changed(
+        cmd, DIGEST_FIELD, filename,
+        bower_digest(bower_json, bower_components) + '\n'
+        if bower_json is not None or bower_components else None,
+    )
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+Reading of the metadata of zipped distributions.
+
+The metadata of distributions installed as zipped eggs (or of any
+distribution with its egg-info or dist-info directory within a zip
+archive, such as a wheel) is read through pkg_resources by the default
+reader provided by calmjs, which goes through the zipimporter for every
+file and reopens the archive for each of them.  Here the archives are
+memory mapped once and kept in a cache shared by all the readers, with
+the central directory parsed once, such that the members are looked up
+and sliced out of the mapping without any further system calls.  The
+cached archives are validated against the modification time and size
+of their files on every read, and the least recently used ones are
+unmapped once more than the maximum number are mapped.
+
+Distributions that are not zipped are read through the default reader
+from calmjs.
+"""
+
+from __future__ import absolute_import
+
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+import zipfile
+import zlib
+from collections import OrderedDict
+
+import calmjs.dist
+from calmjs.registry import get
+
+from calmjs.bower.cache import stat_key
+
+logger = logging.getLogger(__name__)
+
+# as the file descriptors are closed once mapped, this only bounds the
+# address space and the number of the mappings used.
+DEFAULT_MAX_OPEN = 1024
+FILE_HEADER = struct.Struct(zipfile.structFileHeader)
+# the offsets of the lengths of the filename and extra field within it.
+FH_FILENAME_LENGTH = 10
+FH_EXTRA_FIELD_LENGTH = 11
+
+
+class MappedFile(object):
+    """
+    A read-only file object over a memory map, for zipfile.ZipFile;
+    the memory map does not provide everything that is required by
+    that on all the supported versions of Python.
+    """
+
+    def __init__(self, mapped, name=None):
+        self.mapped = mapped
+        self.name = name
+
+    def read(self, size=-1):
+        if size is None or size < 0:
+            return self.mapped.read(len(self.mapped) - self.mapped.tell())
+        return self.mapped.read(size)
+
+    def seek(self, offset, whence=os.SEEK_SET):
+        try:
+            self.mapped.seek(offset, whence)
+        except ValueError as e:
+            # as raised by files, which zipfile expects.
+            raise IOError(str(e))
+        return self.mapped.tell()
+
+    def tell(self):
+        return self.mapped.tell()
+
+    def seekable(self):
+        return True
+
+    def close(self):
+        self.mapped.close()
+
+
+class ArchiveCache(object):
+    """
+    A cache of the opened zip archives, keyed by their paths.
+    """
+
+    def __init__(self, max_open=DEFAULT_MAX_OPEN):
+        """
+        Arguments:
+
+        max_open
+            The maximum number of archives to keep mapped.
+        """
+
+        self.max_open = max_open
+        self._archives = OrderedDict()
+        self._lock = threading.Lock()
+        # the number of times an archive was opened, for reporting.
+        self.opened = 0
+
+    def _open(self, path):
+        with open(path, 'rb') as fd:
+            # the mapping remains valid after the file is closed.
+            mapped = mmap.mmap(fd.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            archive = zipfile.ZipFile(MappedFile(mapped, path))
+        except Exception:
+            mapped.close()
+            raise
+        self.opened += 1
+        logger.debug("opened zipped archive '%s'", path)
+        return archive
+
+    def _get(self, path):
+        key = stat_key(path)
+        if key is None:
+            raise IOError("unable to stat '%s'" % path)
+        entry = self._archives.pop(path, None)
+        if entry is not None and entry[0] != key:
+            entry[1].fp.close()
+            entry = None
+        if entry is None:
+            entry = (key, self._open(path))
+        self._archives[path] = entry
+        while len(self._archives) > self.max_open:
+            path, (key, archive) = self._archives.popitem(last=False)
+            archive.fp.close()
+        return entry[1]
+
+    def _read_member(self, archive, info):
+        if info.flag_bits & 0x1 or info.compress_type not in (
+                zipfile.ZIP_STORED, zipfile.ZIP_DEFLATED):
+            # encrypted or otherwise compressed; leave those to zipfile.
+            return archive.read(info)
+
+        mapped = archive.fp.mapped
+        offset = info.header_offset
+        header = FILE_HEADER.unpack(mapped[offset:offset + FILE_HEADER.size])
+        if header[0] != zipfile.stringFileHeader:
+            raise zipfile.BadZipfile(
+                "bad local file header for '%s'" % info.filename)
+        start = offset + FILE_HEADER.size + (
+            header[FH_FILENAME_LENGTH] + header[FH_EXTRA_FIELD_LENGTH])
+        data = mapped[start:start + info.compress_size]
+        if info.compress_type == zipfile.ZIP_DEFLATED:
+            data = zlib.decompress(data, -15)
+        if zlib.crc32(data) & 0xffffffff != info.CRC:
+            raise zipfile.BadZipfile("bad CRC for '%s'" % info.filename)
+        return data
+
+    def read(self, path, name):
+        """
+        Return the contents of the member name within the archive at
+        path, or None if the archive has no such member.
+
+        Raises IOError if the archive cannot be read, or zipfile's
+        BadZipfile if it is not a valid zip archive.
+        """
+
+        with self._lock:
+            archive = self._get(path)
+            try:
+                info = archive.getinfo(name)
+            except KeyError:
+                return None
+            return self._read_member(archive, info)
+
+    def clear(self):
+        """
+        Unmap all the archives.
+        """
+
+        with self._lock:
+            while self._archives:
+                path, (key, archive) = self._archives.popitem()
+                archive.fp.close()
+
+
+# the cache shared by the readers of the metadata.
+archives = ArchiveCache()
+
+
+def zipped_metadata_path(dist, filename):
+    """
+    Return a tuple of the path to the zip archive and the name of the
+    member for the metadata file of the distribution, or None if the
+    distribution is not zipped.
+    """
+
+    provider = getattr(dist, '_provider', None)
+    egg_info = getattr(provider, 'egg_info', None)
+    archive = getattr(getattr(provider, 'loader', None), 'archive', None)
+    if not egg_info or not archive:
+        return None
+    prefix = archive + os.sep
+    if not egg_info.startswith(prefix):
+        return None
+    return archive, '/'.join(
+        egg_info[len(prefix):].split(os.sep) + [filename])
+
+
+def read_dist_egginfo_json(dist, filename, cache=None):
+    """
+    Read the json file within the metadata of the distribution, or None
+    if unavailable; a drop-in replacement for the function from
+    calmjs.dist, reading the zipped distributions through the cache,
+    which defaults to the shared one.
+    """
+
+    location = zipped_metadata_path(dist, filename)
+    if location is None:
+        # looked up at call time, such that it may be replaced.
+        return calmjs.dist.read_dist_egginfo_json(dist, filename)
+
+    cache = archives if cache is None else cache
+    try:
+        result = cache.read(*location)
+    except (IOError, OSError, ValueError, zipfile.BadZipfile):
+        logger.debug(
+            "unable to read '%s' from zipped archive '%s'; falling back",
+            filename, location[0],
+        )
+        return calmjs.dist.read_dist_egginfo_json(dist, filename)
+
+    if result is None:
+        logger.debug("no '%s' for '%s'", filename, dist)
+        return None
+
+    try:
+        obj = json.loads(result.decode('utf8'))
+    except (TypeError, ValueError):
+        logger.error(
+            "the '%s' found in '%s' is not a valid json.", filename, dist)
+        return None
+
+    logger.debug("found '%s' for '%s'.", filename, dist)
+    return obj
+
+
+def flatten_extras_calmjs(pkg_names, working_set=None, read=None):
+    """
+    Flatten the extras_calmjs.json of the distributions required by the
+    packages, in the same manner as the function from calmjs.dist, but
+    with the metadata read by read, which defaults to the reader above.
+    """
+
+    working_set = working_set or calmjs.dist.default_working_set
+    return flatten_dists_extras_calmjs(
+        calmjs.dist.find_packages_requirements_dists(
+            pkg_names, working_set=working_set),
+        read=read,
+    )
+
+
+def flatten_dists_extras_calmjs(dists, read=None):
+    """
+    Flatten the extras_calmjs.json of the list of distributions, which
+    have already been resolved; the metadata is read by read, which
+    defaults to the reader above.
+    """
+
+    read = read or read_dist_egginfo_json
+    dep_keys = set(get('calmjs.extras_keys').iter_records())
+
+    obj = {}
+    depends = {dep: {} for dep in dep_keys}
+    for dist in dists:
+        obj = read(dist, calmjs.dist.EXTRAS_CALMJS_JSON)
+        if not obj:
+            continue
+        for dep in dep_keys:
+            depends[dep].update(obj.get(dep, {}))
+
+    if obj is None:
+        return depends
+    for dep in dep_keys:
+        obj[dep] = {k: v for k, v in depends[dep].items() if v is not None}
+    return obj